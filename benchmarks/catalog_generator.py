@@ -0,0 +1,278 @@
+# benchmarks/catalog_generator.py
+"""
+以 data/mock_menu_dataset.json 為樣板，放大成指定規模的合成目錄（SQLite）。
+
+- 每個 role 產生 dishes_per_role 道菜：輪流套用樣板菜色，超過樣板數量的菜改用食材的變體
+- 食材放大到 ingredients 種：樣板食材之外的都是樣板食材的變體（同分類、同單位）
+- 每種食材 price_days 天的價格歷史（每天一筆，隨機漫步）；inventory_density 比例的食材有庫存
+- 樣板沒有的 role（veg、noodle）分別由不含肉的配菜、主菜加麵條衍生
+- 預設不連結調味料：樣板每道菜都有鹽、油等調味料，會讓食材重複限制幾乎排不出湯品；
+  正式資料庫的菜色食材中調味料約只佔 5%
+- 同一組參數與 seed 產生的資料完全相同
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sqlite3
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_TEMPLATE = ROOT / "data" / "mock_menu_dataset.json"
+
+ROLES = ("main", "noodle", "side", "veg", "soup", "fruit")
+MEAT_CATEGORIES = {"meat", "seafood"}
+NOODLE_INGREDIENT = {"ingredient_id": "ing_noodles", "qty": 150, "unit": "g"}
+
+# 樣板沒有價格的食材，依分類給每單位價格（g / ml / piece）
+CATEGORY_PRICE = {
+    "vegetable": 0.05,
+    "fruit": 0.08,
+    "meat": 0.3,
+    "seafood": 0.4,
+    "seasoning": 0.02,
+    "grain": 0.03,
+    "soy": 0.06,
+    "egg": 5.0,
+}
+
+DDL = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE ingredients (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT NOT NULL,
+                          protein_group TEXT, default_unit TEXT NOT NULL);
+CREATE TABLE dishes (id TEXT PRIMARY KEY, name TEXT NOT NULL, role TEXT NOT NULL, cuisine TEXT, meat_type TEXT,
+                     tags_json TEXT NOT NULL DEFAULT '[]',
+                     allowed_weekdays_json TEXT NOT NULL DEFAULT '[1,2,3,4,5,6,7]',
+                     prep_minutes INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE dish_ingredients (dish_id TEXT NOT NULL, ingredient_id TEXT NOT NULL, qty REAL NOT NULL,
+                               unit TEXT NOT NULL, PRIMARY KEY (dish_id, ingredient_id));
+CREATE TABLE ingredient_prices (ingredient_id TEXT NOT NULL, price_date TEXT NOT NULL, price_per_unit REAL NOT NULL,
+                                unit TEXT NOT NULL, PRIMARY KEY (ingredient_id, price_date));
+CREATE TABLE inventory (ingredient_id TEXT PRIMARY KEY, qty_on_hand REAL NOT NULL, unit TEXT NOT NULL,
+                        updated_at TEXT NOT NULL, expiry_date TEXT);
+CREATE TABLE unit_conversions (from_unit TEXT NOT NULL, to_unit TEXT NOT NULL, factor REAL NOT NULL,
+                               PRIMARY KEY (from_unit, to_unit));
+CREATE INDEX idx_dishes_role ON dishes(role);
+CREATE INDEX idx_di_ingredient ON dish_ingredients(ingredient_id);
+CREATE INDEX idx_prices_date ON ingredient_prices(price_date);
+"""
+
+
+@dataclass(frozen=True)
+class CatalogSpec:
+    dishes_per_role: int = 40
+    ingredients: int = 120
+    price_days: int = 30
+    inventory_density: float = 0.3
+    link_seasonings: bool = False
+    start_date: str = "2026-03-02"
+    seed: int = 7
+
+    def label(self) -> str:
+        return (
+            f"d{self.dishes_per_role}-i{self.ingredients}-p{self.price_days}"
+            f"-inv{int(round(self.inventory_density * 100))}-s{self.seed}"
+        )
+
+
+def load_template(path: Optional[Path] = None) -> Dict[str, Any]:
+    return json.loads(Path(path or DEFAULT_TEMPLATE).read_text(encoding="utf-8"))
+
+
+def _role_templates(template: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    categories = {ing["id"]: ing.get("category") for ing in template["ingredients"]}
+    by_role: Dict[str, List[Dict[str, Any]]] = {role: [] for role in ROLES}
+    for dish in template["dishes"]:
+        if dish.get("role") in by_role:
+            by_role[dish["role"]].append(dish)
+
+    if not by_role["veg"]:
+        meatless = [
+            d for d in by_role["side"]
+            if not any(categories.get(di["ingredient_id"]) in MEAT_CATEGORIES for di in d.get("ingredients") or [])
+        ]
+        by_role["veg"] = [{**d, "role": "veg"} for d in (meatless or by_role["side"])]
+    if not by_role["noodle"]:
+        by_role["noodle"] = [
+            {
+                **d,
+                "role": "noodle",
+                "name": f"{d['name']}麵",
+                "ingredients": [
+                    *[di for di in d.get("ingredients") or [] if di["ingredient_id"] != NOODLE_INGREDIENT["ingredient_id"]],
+                    NOODLE_INGREDIENT,
+                ],
+            }
+            for d in by_role["main"]
+        ]
+    missing = [role for role, dishes in by_role.items() if not dishes]
+    if missing:
+        raise ValueError(f"樣板缺少可衍生的菜色：{', '.join(missing)}")
+    return by_role
+
+
+def _scale_ingredients(template: Dict[str, Any], total: int) -> Dict[str, List[Dict[str, Any]]]:
+    """回傳 {樣板食材 id: [原食材, 變體1, ...]}；總數至少為樣板食材數。"""
+    base = list(template["ingredients"])
+    variants: Dict[str, List[Dict[str, Any]]] = {ing["id"]: [dict(ing)] for ing in base}
+    for j in range(max(0, total - len(base))):
+        src = base[j % len(base)]
+        k = j // len(base) + 1
+        variants[src["id"]].append({**src, "id": f"{src['id']}__v{k}", "name": f"{src['name']}{k}"})
+    return variants
+
+
+def generate_dataset(template: Dict[str, Any], spec: CatalogSpec) -> Dict[str, Any]:
+    """依 spec 放大樣板，回傳與樣板相同結構（ingredients / dishes / prices / inventory / unit_conversions）。"""
+    rng = random.Random(spec.seed)
+    start = date.fromisoformat(spec.start_date)
+    variants = _scale_ingredients(template, spec.ingredients)
+    categories = {ing["id"]: ing.get("category") for ing in template["ingredients"]}
+    ingredients = [ing for group in variants.values() for ing in group]
+
+    dishes: List[Dict[str, Any]] = []
+    for role, bases in _role_templates(template).items():
+        for i in range(spec.dishes_per_role):
+            base = bases[i % len(bases)]
+            rounds = i // len(bases)
+            items = []
+            for di in base.get("ingredients") or []:
+                if not spec.link_seasonings and categories.get(di["ingredient_id"]) == "seasoning":
+                    continue
+                choices = variants.get(di["ingredient_id"]) or [{"id": di["ingredient_id"]}]
+                # 第一輪保留樣板食材，之後隨機換成變體
+                picked = choices[0] if rounds == 0 else rng.choice(choices)
+                items.append({**di, "ingredient_id": picked["id"]})
+            dishes.append({
+                "id": f"bench_{role}_{i:04d}",
+                "name": base["name"] if rounds == 0 else f"{base['name']}{rounds + 1}",
+                "role": role,
+                "cuisine": base.get("cuisine"),
+                "meat_type": base.get("meat_type"),
+                "tags": list(base.get("tags") or []),
+                "ingredients": items,
+            })
+
+    base_prices = {p["ingredient_id"]: p for p in template.get("prices") or []}
+    prices: List[Dict[str, Any]] = []
+    for base_id, group in variants.items():
+        found = base_prices.get(base_id)
+        for ing in group:
+            unit = (found or {}).get("unit") or ing["default_unit"]
+            price = float((found or {}).get("price_per_unit") or CATEGORY_PRICE.get(ing["category"], 0.05))
+            price *= rng.uniform(0.8, 1.2)
+            for d in range(spec.price_days, 0, -1):
+                price *= rng.uniform(0.97, 1.03)
+                prices.append({
+                    "ingredient_id": ing["id"],
+                    "price_date": (start - timedelta(days=d)).isoformat(),
+                    "price_per_unit": round(price, 5),
+                    "unit": unit,
+                })
+
+    inventory: List[Dict[str, Any]] = []
+    for ing in ingredients:
+        if rng.random() >= spec.inventory_density:
+            continue
+        inventory.append({
+            "ingredient_id": ing["id"],
+            "qty_on_hand": rng.randint(1, 20) * (1 if ing["default_unit"] == "piece" else 500),
+            "unit": ing["default_unit"],
+            "updated_at": (start - timedelta(days=1)).isoformat(),
+            "expiry_date": (start + timedelta(days=rng.randint(1, 21))).isoformat(),
+        })
+
+    return {
+        "meta": {**(template.get("meta") or {}), "dataset_name": f"bench_{spec.label()}", "spec": asdict(spec)},
+        "unit_conversions": list(template.get("unit_conversions") or []),
+        "ingredients": ingredients,
+        "dishes": dishes,
+        "prices": prices,
+        "inventory": inventory,
+    }
+
+
+def write_catalog_db(dataset: Dict[str, Any], db_path: Path) -> Path:
+    """寫成新的 SQLite 檔（已存在時覆寫）。"""
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    db_path.unlink(missing_ok=True)
+    conn = sqlite3.connect(str(db_path))
+    try:
+        with conn:
+            conn.executescript(DDL)
+            conn.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [(k, json.dumps(v, ensure_ascii=False)) for k, v in (dataset.get("meta") or {}).items()],
+            )
+            conn.executemany(
+                "INSERT INTO unit_conversions VALUES (?, ?, ?)",
+                [(c["from_unit"], c["to_unit"], c["factor"]) for c in dataset["unit_conversions"]],
+            )
+            conn.executemany(
+                "INSERT INTO ingredients VALUES (?, ?, ?, ?, ?)",
+                [(i["id"], i["name"], i["category"], i.get("protein_group"), i["default_unit"]) for i in dataset["ingredients"]],
+            )
+            conn.executemany(
+                "INSERT INTO dishes (id, name, role, cuisine, meat_type, tags_json) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (d["id"], d["name"], d["role"], d.get("cuisine"), d.get("meat_type"), json.dumps(d["tags"], ensure_ascii=False))
+                    for d in dataset["dishes"]
+                ],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO dish_ingredients VALUES (?, ?, ?, ?)",
+                [(d["id"], di["ingredient_id"], di["qty"], di["unit"]) for d in dataset["dishes"] for di in d["ingredients"]],
+            )
+            conn.executemany(
+                "INSERT INTO ingredient_prices VALUES (?, ?, ?, ?)",
+                [(p["ingredient_id"], p["price_date"], p["price_per_unit"], p["unit"]) for p in dataset["prices"]],
+            )
+            conn.executemany(
+                "INSERT INTO inventory VALUES (?, ?, ?, ?, ?)",
+                [
+                    (v["ingredient_id"], v["qty_on_hand"], v["unit"], v["updated_at"], v["expiry_date"])
+                    for v in dataset["inventory"]
+                ],
+            )
+    finally:
+        conn.close()
+    return db_path
+
+
+def build_catalog_db(spec: CatalogSpec, db_path: Path, template: Optional[Dict[str, Any]] = None) -> Path:
+    return write_catalog_db(generate_dataset(template or load_template(), spec), db_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="產生放大規模的合成目錄 SQLite（排餐效能測試用）")
+    parser.add_argument("output_db", type=str)
+    parser.add_argument("--template", type=str, default=str(DEFAULT_TEMPLATE))
+    parser.add_argument("--dishes-per-role", type=int, default=CatalogSpec.dishes_per_role)
+    parser.add_argument("--ingredients", type=int, default=CatalogSpec.ingredients)
+    parser.add_argument("--price-days", type=int, default=CatalogSpec.price_days)
+    parser.add_argument("--inventory-density", type=float, default=CatalogSpec.inventory_density)
+    parser.add_argument("--link-seasonings", action="store_true", help="保留樣板菜色的調味料連結")
+    parser.add_argument("--start-date", type=str, default=CatalogSpec.start_date)
+    parser.add_argument("--seed", type=int, default=CatalogSpec.seed)
+    args = parser.parse_args()
+
+    spec = CatalogSpec(
+        dishes_per_role=args.dishes_per_role,
+        ingredients=args.ingredients,
+        price_days=args.price_days,
+        inventory_density=args.inventory_density,
+        link_seasonings=args.link_seasonings,
+        start_date=args.start_date,
+        seed=args.seed,
+    )
+    path = build_catalog_db(spec, Path(args.output_db), load_template(Path(args.template)))
+    print(f"Generated: {path} ({spec.label()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# benchmarks/plan_bench.py
+"""
+plan_month 效能測試：在合成目錄上依情境（天數、beam 寬度、每日道數、限制鬆緊）計時各階段，
+結果寫成 JSON，並可與保存的 baseline 比較，超過門檻即以非 0 結束。
+
+  python -m benchmarks.plan_bench --suite quick
+  python -m benchmarks.plan_bench --suite quick --baseline benchmarks/baselines/quick.json
+  python -m benchmarks.plan_bench --suite full --only h360,h720 --repeat 1
+
+各階段時間來自 result["debug"]["perf"]（見 src/menu_planner/engine/perf.py）。
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.catalog_generator import CatalogSpec, build_catalog_db  # noqa: E402
+from src.menu_planner.config.loader import load_defaults  # noqa: E402
+from src.menu_planner.db.repo import SQLiteRepo  # noqa: E402
+from src.menu_planner.engine.planner import plan_month  # noqa: E402
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+BASELINES_DIR = ROOT / "benchmarks" / "baselines"
+
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA_MS = 25.0
+DEFAULT_REPEAT = 3
+SEED = 7
+
+# 每日道數：default 沿用 defaults.json（含週三加麵）；其餘不分星期
+ROLE_PRESETS: Dict[str, Optional[Dict[str, int]]] = {
+    "light": {"main": 1, "noodle": 0, "side": 1, "veg": 0, "soup": 1, "fruit": 1},
+    "default": None,
+    "heavy": {"main": 1, "noodle": 1, "side": 3, "veg": 1, "soup": 1, "fruit": 1},
+}
+
+# 重複限制鬆緊：覆寫 hard.repeat_limits
+TIGHTNESS_PRESETS: Dict[str, Dict[str, int]] = {
+    "loose": {
+        "max_same_side_in_7_days": 2,
+        "max_same_veg_in_7_days": 2,
+        "max_same_soup_in_7_days": 2,
+        "max_same_fruit_in_7_days": 2,
+        "ingredient_repeat_window_days": 3,
+        "max_same_ingredient_in_window_days": 3,
+    },
+    "default": {},
+    "tight": {
+        "ingredient_repeat_window_days": 7,
+        "max_same_ingredient_in_window_days": 2,
+        "max_consecutive_ingredient_days": 2,
+    },
+}
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    horizon_days: int
+    beam_width: int = 12
+    roles: str = "default"
+    tightness: str = "default"
+
+    def cfg(self, start_date: str) -> Dict[str, Any]:
+        cfg = copy.deepcopy(load_defaults())
+        cfg["horizon_days"] = self.horizon_days
+        cfg["start_date"] = start_date
+        cfg["seed"] = SEED
+        cfg["search"]["backtracking"]["beam_width"] = self.beam_width
+        roles = ROLE_PRESETS[self.roles]
+        if roles is not None:
+            cfg["per_day_roles"] = dict(roles)
+            cfg["per_weekday_roles"] = {}
+        cfg["hard"]["repeat_limits"].update(TIGHTNESS_PRESETS[self.tightness])
+        return cfg
+
+
+@dataclass(frozen=True)
+class Suite:
+    catalog: CatalogSpec
+    scenarios: Tuple[Scenario, ...] = field(default_factory=tuple)
+
+
+def _matrix(main_horizon: int, horizons: Tuple[int, ...], beams: Tuple[int, ...]) -> Tuple[Scenario, ...]:
+    out = [Scenario(f"h{h}", h) for h in horizons]
+    out += [Scenario(f"h{main_horizon}-beam{b}", main_horizon, beam_width=b) for b in beams]
+    out += [Scenario(f"h{main_horizon}-roles-{r}", main_horizon, roles=r) for r in ROLE_PRESETS if r != "default"]
+    out += [Scenario(f"h{main_horizon}-{t}", main_horizon, tightness=t) for t in TIGHTNESS_PRESETS if t != "default"]
+    return tuple(out)
+
+
+SUITES: Dict[str, Suite] = {
+    # 開發中快速確認（約 1 分鐘）
+    "quick": Suite(
+        catalog=CatalogSpec(dishes_per_role=100, ingredients=500, price_days=60),
+        scenarios=_matrix(30, (30, 90), (4, 24)),
+    ),
+    # 接近正式資料庫規模（主菜 154、配菜 358、食材 825）；720 天單次約 1 分鐘
+    "full": Suite(
+        catalog=CatalogSpec(dishes_per_role=150, ingredients=800, price_days=180),
+        scenarios=_matrix(90, (30, 90, 360, 720), (4, 24)),
+    ),
+}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10, check=True
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _median_spans(runs: List[Dict[str, Any]]) -> Dict[str, float]:
+    names = sorted({name for perf in runs for name in (perf.get("spans") or {})})
+    return {
+        name: round(statistics.median((perf.get("spans") or {}).get(name, {}).get("wall_ms", 0.0) for perf in runs), 3)
+        for name in names
+    }
+
+
+def run_scenario(db_path: str, scenario: Scenario, start_date: str, repeat: int) -> Dict[str, Any]:
+    cfg = scenario.cfg(start_date)
+    perfs: List[Dict[str, Any]] = []
+    result: Dict[str, Any] = {}
+    for _ in range(max(1, repeat)):
+        # 引擎會 print 候選數量，效能測試時不輸出
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = plan_month(db_path, cfg)
+        perfs.append(result["debug"]["perf"])
+    totals = [float(p["total_ms"]) for p in perfs]
+    return {
+        "params": {k: v for k, v in asdict(scenario).items() if k != "name"},
+        "ok": bool(result.get("ok")),
+        "days": len(result.get("days") or []),
+        "errors": len(result.get("errors") or []),
+        "total_ms": {"median": round(statistics.median(totals), 3), "min": round(min(totals), 3), "runs": totals},
+        "spans": _median_spans(perfs),
+        "counters": perfs[-1].get("counters") or {},
+    }
+
+
+def run_suite(
+    name: str,
+    suite: Suite,
+    repeat: int = DEFAULT_REPEAT,
+    only: Optional[List[str]] = None,
+    work_dir: Optional[Path] = None,
+    log=print,
+) -> Dict[str, Any]:
+    scenarios = [s for s in suite.scenarios if not only or s.name in only]
+    with tempfile.TemporaryDirectory(prefix="menu-bench-") as tmp:
+        db_path = Path(work_dir or tmp) / f"bench_{suite.catalog.label()}.db"
+        started = time.perf_counter()
+        build_catalog_db(suite.catalog, db_path)
+        build_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        SQLiteRepo(str(db_path)).fetch_catalog_snapshot()
+        load_ms = (time.perf_counter() - started) * 1000
+        # 先排 1 天讓 process 內的目錄快取就緒，各情境都以熱快取計時（冷載入時間看 catalog_load_ms）
+        run_scenario(str(db_path), Scenario("warmup", 1), suite.catalog.start_date, 1)
+
+        out: Dict[str, Any] = {
+            "meta": {
+                "suite": name,
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "repeat": repeat,
+                "catalog": asdict(suite.catalog),
+                "catalog_build_ms": round(build_ms, 3),
+                "catalog_load_ms": round(load_ms, 3),
+            },
+            "scenarios": {},
+        }
+        for scenario in scenarios:
+            res = run_scenario(str(db_path), scenario, suite.catalog.start_date, repeat)
+            out["scenarios"][scenario.name] = res
+            log(
+                f"{scenario.name:<24} {res['total_ms']['median']:>10.1f} ms  "
+                f"days={res['days']} errors={res['errors']}  "
+                + " ".join(f"{k}={v:.0f}" for k, v in res["spans"].items())
+            )
+    return out
+
+
+def compare_results(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+    min_delta_ms: float = DEFAULT_MIN_DELTA_MS,
+) -> List[Dict[str, Any]]:
+    """
+    回傳退步項目：總時間或任一階段的中位數比 baseline 慢超過 threshold（比例）且多於 min_delta_ms，
+    或排不出的天數（errors）變多。兩邊都有的情境才比較。
+    """
+    regressions: List[Dict[str, Any]] = []
+    for name, cur in (current.get("scenarios") or {}).items():
+        base = (baseline.get("scenarios") or {}).get(name)
+        if base is None:
+            continue
+        pairs = [("total", base["total_ms"]["median"], cur["total_ms"]["median"])]
+        pairs += [
+            (f"span:{span}", base["spans"][span], ms)
+            for span, ms in cur.get("spans", {}).items()
+            if span in (base.get("spans") or {})
+        ]
+        for metric, base_ms, cur_ms in pairs:
+            if cur_ms - base_ms > min_delta_ms and cur_ms > base_ms * (1 + threshold):
+                regressions.append({
+                    "scenario": name,
+                    "metric": metric,
+                    "baseline_ms": base_ms,
+                    "current_ms": cur_ms,
+                    "ratio": round(cur_ms / base_ms, 3) if base_ms else None,
+                })
+        if cur.get("errors", 0) > base.get("errors", 0):
+            regressions.append({
+                "scenario": name,
+                "metric": "errors",
+                "baseline": base.get("errors", 0),
+                "current": cur.get("errors", 0),
+            })
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="plan_month 效能測試")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--only", type=str, default="", help="只跑指定情境（逗號分隔，例如 h30,h90-tight）")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每個情境執行次數（取中位數）")
+    parser.add_argument("--out", type=str, default="", help="結果 JSON（預設 benchmarks/results/<suite>_<時間>.json）")
+    parser.add_argument("--baseline", type=str, default="", help="比較用 baseline JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="退步門檻（比例，預設 0.25）")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS)
+    parser.add_argument("--save-baseline", action="store_true", help="結果另存為 benchmarks/baselines/<suite>.json")
+    parser.add_argument("--list", action="store_true", help="列出情境後結束")
+    args = parser.parse_args(argv)
+
+    suite = SUITES[args.suite]
+    if args.list:
+        for s in suite.scenarios:
+            print(f"{s.name:<24} {json.dumps({k: v for k, v in asdict(s).items() if k != 'name'})}")
+        return 0
+
+    only = [x.strip() for x in args.only.split(",") if x.strip()] or None
+    results = run_suite(args.suite, suite, repeat=args.repeat, only=only)
+
+    out_path = Path(args.out) if args.out else RESULTS_DIR / f"{args.suite}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(results, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print(f"Results: {out_path}")
+    if args.save_baseline:
+        base_path = BASELINES_DIR / f"{args.suite}.json"
+        base_path.parent.mkdir(parents=True, exist_ok=True)
+        base_path.write_text(json.dumps(results, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline: {base_path}")
+
+    if not args.baseline:
+        return 0
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    if baseline.get("meta", {}).get("machine") != results["meta"]["machine"]:
+        print("注意：baseline 來自不同機器架構，時間差異可能不是程式造成的。")
+    regressions = compare_results(results, baseline, threshold=args.threshold, min_delta_ms=args.min_delta_ms)
+    for r in regressions:
+        if r["metric"] == "errors":
+            print(f"REGRESSION {r['scenario']}: errors {r['baseline']} -> {r['current']}")
+        else:
+            print(f"REGRESSION {r['scenario']} {r['metric']}: {r['baseline_ms']:.1f} -> {r['current_ms']:.1f} ms (x{r['ratio']})")
+    print(f"{len(regressions)} regression(s) against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,6 +10,7 @@ from pathlib import Path
 from threading import RLock
 from typing import Any
 
+from ..metrics import record_auth_store
 from .auth_support import (
     AUTH_BACKUP_LIMIT,
     AUTH_STORE_BACKUP_LIMIT,
@@ -47,6 +48,7 @@ class AuthStoreFiles:
         self.write(normalize_auth_store_data({"users": {}, "created_at": _utc_now(), "updated_at": _utc_now()}))
 
     def read(self) -> dict[str, Any]:
+        record_auth_store("read")
         with self._lock:
             try:
                 with self.path.open("r", encoding="utf-8") as f:
@@ -61,6 +63,7 @@ class AuthStoreFiles:
             return normalize_auth_store_data(data)
 
     def write(self, data: dict[str, Any]) -> None:
+        record_auth_store("write")
         with self._lock:
             data = normalize_auth_store_data(data)
             data["updated_at"] = _utc_now()
@@ -0,0 +1,131 @@
+# src/menu_planner/api/catalog_changes.py
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..db.repo import CatalogSnapshot
+from ..env import env_int
+from .conditional import catalog_revision_tag
+from .json_response import encode_json
+
+DEFAULT_MAX_REVISIONS = 16
+
+
+def ingredient_rows(snapshot: CatalogSnapshot) -> List[Dict[str, Any]]:
+    """與 GET /catalog/ingredients 相同的列格式與順序。"""
+    return [dict(v.__dict__) for v in snapshot.ingredients.values()]
+
+
+def dish_rows(snapshot: CatalogSnapshot) -> List[Dict[str, Any]]:
+    """與 GET /catalog/dishes（不指定 role）相同的列格式與順序。"""
+    return [dict(d.__dict__) for d in snapshot.dishes]
+
+
+def _row_digests(rows: List[Dict[str, Any]]) -> Dict[str, str]:
+    return {row["id"]: hashlib.blake2b(encode_json(row), digest_size=8).hexdigest() for row in rows}
+
+
+@dataclass(frozen=True)
+class _RevisionRows:
+    ingredients: Dict[str, str]
+    dishes: Dict[str, str]
+
+
+def _table_changes(
+    rows: List[Dict[str, Any]], current: Dict[str, str], previous: Dict[str, str]
+) -> Tuple[List[Dict[str, Any]], List[str], Optional[List[str]]]:
+    upserts = [row for row in rows if previous.get(row["id"]) != current[row["id"]]]
+    deleted = [rid for rid in previous if rid not in current]
+    # 有異動時附上完整 id 順序，前端合併後與完整查詢的排序一致
+    order = [row["id"] for row in rows] if upserts or deleted else None
+    return upserts, deleted, order
+
+
+class CatalogChangeLog:
+    """
+    記錄最近幾個目錄快照 revision 的每列內容雜湊，回答「某 revision 之後哪些食材 / 菜色有異動」。
+
+    - 只在單一 process 內有效：revision 字串帶 process 隨機值，重啟後或超出保留數的 since 一律回完整資料（reset）
+    - 以 (db 檔案, revision) 為 key，LRU 上限 max_revisions
+    """
+
+    def __init__(self, max_revisions: Optional[int] = None):
+        self.max_revisions = (
+            env_int("MENU_CATALOG_CHANGES_MAX_REVISIONS", DEFAULT_MAX_REVISIONS, minimum=1)
+            if max_revisions is None
+            else max(1, int(max_revisions))
+        )
+        self._revisions: "OrderedDict[Tuple[str, str], _RevisionRows]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: Tuple[str, str]) -> Optional[_RevisionRows]:
+        with self._lock:
+            found = self._revisions.get(key)
+            if found is not None:
+                self._revisions.move_to_end(key)
+            return found
+
+    def _remember(self, key: Tuple[str, str], rows: _RevisionRows) -> None:
+        with self._lock:
+            self._revisions[key] = rows
+            self._revisions.move_to_end(key)
+            while len(self._revisions) > self.max_revisions:
+                self._revisions.popitem(last=False)
+
+    def changes(self, snapshot: CatalogSnapshot, since: Optional[str] = None) -> Dict[str, Any]:
+        if not snapshot.revision:
+            # 快照快取停用時沒有 revision，每次都回完整資料
+            return {
+                "revision": "",
+                "reset": True,
+                "ingredients": ingredient_rows(snapshot),
+                "dishes": dish_rows(snapshot),
+            }
+
+        db_key = os.path.realpath(snapshot.db_path)
+        revision = catalog_revision_tag(snapshot.revision)
+        if since == revision and self._lookup((db_key, revision)) is not None:
+            # 最常見的情況：前端快取已是最新，不需建立任何列
+            return {
+                "revision": revision,
+                "reset": False,
+                "ingredients": [],
+                "dishes": [],
+                "deleted_ingredients": [],
+                "deleted_dishes": [],
+            }
+
+        ingredients = ingredient_rows(snapshot)
+        dishes = dish_rows(snapshot)
+        current = self._lookup((db_key, revision))
+        if current is None:
+            current = _RevisionRows(ingredients=_row_digests(ingredients), dishes=_row_digests(dishes))
+            self._remember((db_key, revision), current)
+
+        previous = self._lookup((db_key, since)) if since else None
+        if previous is None:
+            return {"revision": revision, "reset": True, "ingredients": ingredients, "dishes": dishes}
+
+        ing_upserts, ing_deleted, ing_order = _table_changes(ingredients, current.ingredients, previous.ingredients)
+        dish_upserts, dish_deleted, dish_order = _table_changes(dishes, current.dishes, previous.dishes)
+        out: Dict[str, Any] = {
+            "revision": revision,
+            "reset": False,
+            "ingredients": ing_upserts,
+            "dishes": dish_upserts,
+            "deleted_ingredients": ing_deleted,
+            "deleted_dishes": dish_deleted,
+        }
+        if ing_order is not None:
+            out["ingredient_order"] = ing_order
+        if dish_order is not None:
+            out["dish_order"] = dish_order
+        return out
+
+
+CATALOG_CHANGES = CatalogChangeLog()
@@ -0,0 +1,113 @@
+# src/menu_planner/api/conditional.py
+from __future__ import annotations
+
+import secrets
+from dataclasses import dataclass
+from datetime import date
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Query, Request, Response
+
+from ..config.loader import defaults_source
+from ..db.catalog_cache import get_catalog_snapshot
+from ..env import DEFAULT_DB_PATH
+
+
+# revision 只在單一 process 內遞增：加上啟動時的隨機值，重啟後舊的 ETag 不會誤判為相符
+_PROCESS_TAG = secrets.token_hex(4)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 的弱比較（忽略 W/ 前綴，支援多值與 *）。"""
+    if not if_none_match:
+        return False
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for raw in if_none_match.split(","):
+        tag = raw.strip()
+        if tag == "*":
+            return True
+        if (tag[2:] if tag.startswith("W/") else tag) == wanted:
+            return True
+    return False
+
+
+@dataclass(frozen=True)
+class Validators:
+    etag: str
+    modified_at: Optional[float] = None
+
+    def headers(self) -> Dict[str, str]:
+        # no-cache：瀏覽器可存但每次都要帶 If-None-Match 回來驗證，目錄異動後不會讀到舊資料
+        out = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.modified_at:
+            out["Last-Modified"] = formatdate(self.modified_at, usegmt=True)
+        return out
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        # 有 If-None-Match 時忽略 If-Modified-Since（RFC 9110 13.2.2）
+        if if_none_match:
+            return etag_matches(if_none_match, self.etag)
+        if not if_modified_since or not self.modified_at:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(self.modified_at) <= since
+
+
+def catalog_revision_tag(revision: int) -> str:
+    """目錄快照 revision 對外的識別字串（ETag 與 /catalog/changes 共用）。"""
+    return f"c{revision}-{_PROCESS_TAG}"
+
+
+def catalog_validators(db_path: str, as_of: Optional[date] = None) -> Optional[Validators]:
+    """
+    目錄快照 revision 對應的驗證器；快取停用或無法讀取時回傳 None（不做條件式回應）。
+    as_of：回應內容還取決於當天日期時傳入，ETag 會帶上日期且不送 Last-Modified（換日不會改變 DB 檔案時間）。
+    """
+    try:
+        snapshot = get_catalog_snapshot(db_path)
+    except Exception:
+        return None
+    if not snapshot.revision:
+        return None
+    tag = catalog_revision_tag(snapshot.revision)
+    if as_of is not None:
+        return Validators(etag=f'W/"{tag}-d{as_of:%Y%m%d}"')
+    return Validators(etag=f'W/"{tag}"', modified_at=snapshot.modified_at)
+
+
+def defaults_validators() -> Validators:
+    source = defaults_source()
+    return Validators(etag=f'"{source.etag}"', modified_at=source.modified_at)
+
+
+def apply_conditional(validators: Optional[Validators], request: Request, response: Response) -> None:
+    """相符時以 304 結束請求；否則把驗證器標頭加到端點的回應上。"""
+    if validators is None:
+        return
+    headers = validators.headers()
+    if validators.not_modified(request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+
+def catalog_conditional(request: Request, response: Response, db_path: str = Query(default=DEFAULT_DB_PATH)) -> None:
+    """
+    目錄讀取端點的條件式 GET（掛在 route 的 dependencies）。
+    在端點讀資料之前取 revision：讀取期間有新寫入時，回應標的是較舊的 revision，下次請求會再取得新資料。
+    """
+    apply_conditional(catalog_validators(db_path), request, response)
+
+
+def catalog_summary_conditional(
+    request: Request, response: Response, db_path: str = Query(default=DEFAULT_DB_PATH)
+) -> None:
+    """/catalog/summary 的有效庫存以 date.today() 計算：換日後即使目錄未異動也不能回 304。"""
+    apply_conditional(catalog_validators(db_path, as_of=date.today()), request, response)
+
+
+def defaults_conditional(request: Request, response: Response) -> None:
+    apply_conditional(defaults_validators(), request, response)
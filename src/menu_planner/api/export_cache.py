@@ -0,0 +1,229 @@
+# src/menu_planner/api/export_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+
+from ..config.loader import config_hash
+from ..env import env_int
+from .export_excel import EXPORTER_VERSION
+
+EXPORT_HIT = "hit"
+EXPORT_SHARED = "shared"
+EXPORT_MISS = "miss"
+EXPORT_BYPASS = "bypass"
+
+EXPORT_CACHE_HEADER = "X-Export-Cache"
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_WORKERS = 2
+DEFAULT_DIR = str(Path(tempfile.gettempdir()) / "menu-planner-export-cache")
+ARTIFACT_SUFFIX = ".xlsx"
+
+
+def export_cache_key(cfg: Dict[str, Any], result: Dict[str, Any], catalog_hash: str) -> str:
+    """
+    (排餐結果雜湊, cfg 雜湊, 目錄內容雜湊, 匯出器版本) 的穩定 key。
+    result 為附採購明細之前的內容：採購明細由這三者算出，命中或回 304 時不必先重算。
+    """
+    debug = result.get("debug")
+    if isinstance(debug, dict) and "perf" in debug:
+        # 計時每次都不同、也不會寫進 Excel，不納入 key
+        result = {**result, "debug": {k: v for k, v in debug.items() if k != "perf"}}
+    days = result.get("days")
+    if isinstance(days, list) and any(isinstance(day, dict) and "procurement" in day for day in days):
+        # 用戶端送回已附採購明細的結果時，舊的明細匯出前會重算，不納入 key
+        result = {**result, "days": [
+            {k: v for k, v in day.items() if k != "procurement"} if isinstance(day, dict) else day for day in days
+        ]}
+    canonical = json.dumps(result, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    result_hash = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return hashlib.sha256(
+        f"{result_hash}:{config_hash(cfg)}:{catalog_hash}:{EXPORTER_VERSION}".encode("utf-8")
+    ).hexdigest()
+
+
+def export_etag(key: str) -> str:
+    # openpyxl 會寫入建檔時間，同一 key 重建的位元組不同，因此用弱 ETag
+    return f'W/"{key[:32]}"'
+
+
+@dataclass(frozen=True)
+class ExportArtifact:
+    key: str
+    status: str
+    fileobj: IO[bytes]
+    size: int
+
+    @property
+    def etag(self) -> str:
+        return export_etag(self.key)
+
+
+class ExportArtifactCache:
+    """
+    Excel 匯出檔的內容定址快取：同一份 (result, cfg, 目錄內容, 匯出器版本) 只產生一次 xlsx，存在磁碟目錄。
+
+    - 產生工作交給背景執行緒；同一 key 同時有多個請求時共用同一個工作（不重複跑 openpyxl）
+    - 寫暫存檔後 rename，讀者不會看到寫一半的檔案
+    - 以位元組數設上限，超過時淘汰最久未用（命中時更新 mtime）；max_bytes 設 0 即停用
+    - 回傳已開啟的檔案：之後被淘汰刪除也不影響正在送出的回應
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        workers: Optional[int] = None,
+    ):
+        self.directory = directory or (os.getenv("MENU_EXPORT_CACHE_DIR") or "").strip() or DEFAULT_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else env_int(
+            "MENU_EXPORT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES
+        )
+        self.workers = workers if workers is not None else env_int(
+            "MENU_EXPORT_CACHE_WORKERS", DEFAULT_WORKERS, minimum=1
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {EXPORT_HIT: 0, EXPORT_SHARED: 0, EXPORT_MISS: 0, EXPORT_BYPASS: 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _count(self, status: str) -> None:
+        with self._lock:
+            self._counts[status] = self._counts.get(status, 0) + 1
+
+    def _path(self, key: str) -> Path:
+        return Path(self.directory) / f"{key}{ARTIFACT_SUFFIX}"
+
+    def _open(self, key: str) -> Optional[Tuple[IO[bytes], int]]:
+        path = self._path(key)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return f, os.fstat(f.fileno()).st_size
+
+    def get_or_build(self, key: str, write: Callable[[IO[bytes]], None], bypass: bool = False) -> ExportArtifact:
+        """
+        取得 key 對應的匯出檔；不存在時以 write(fileobj) 在背景產生後存入快取。
+        停用或目錄無法寫入時退回寫進暫存檔（status = bypass）。
+        bypass=True 時不讀寫快取，直接在呼叫端執行緒寫進暫存檔（剖析匯出時用）。
+        """
+        if bypass or not self.enabled:
+            self._count(EXPORT_BYPASS)
+            return self._build_uncached(key, write)
+
+        found = self._open(key)
+        if found is not None:
+            self._count(EXPORT_HIT)
+            return ExportArtifact(key=key, status=EXPORT_HIT, fileobj=found[0], size=found[1])
+
+        with self._lock:
+            future = self._inflight.get(key)
+            status = EXPORT_SHARED if future is not None else EXPORT_MISS
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export")
+                future = self._executor.submit(self._build, key, write)
+                self._inflight[key] = future
+        if status == EXPORT_MISS:
+            # 鎖外註冊：工作已完成時 callback 會在本執行緒立即執行
+            future.add_done_callback(lambda _f: self._forget(key))
+
+        stored = future.result()
+        found = self._open(key) if stored else None
+        if found is None:
+            # 寫不進快取目錄（唯讀檔案系統）或剛好被淘汰
+            self._count(EXPORT_BYPASS)
+            return self._build_uncached(key, write)
+        self._count(status)
+        return ExportArtifact(key=key, status=status, fileobj=found[0], size=found[1])
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _build(self, key: str, write: Callable[[IO[bytes]], None]) -> bool:
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=str(path.parent), suffix=".tmp")
+        except OSError:
+            return False
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+        except OSError:
+            Path(tmp).unlink(missing_ok=True)
+            return False
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self._evict(keep=path)
+        return True
+
+    def _build_uncached(self, key: str, write: Callable[[IO[bytes]], None]) -> ExportArtifact:
+        f = tempfile.TemporaryFile()
+        try:
+            write(f)
+            size = f.tell()
+            f.seek(0)
+        except BaseException:
+            f.close()
+            raise
+        return ExportArtifact(key=key, status=EXPORT_BYPASS, fileobj=f, size=size)
+
+    def _files(self) -> List[Tuple[float, int, Path]]:
+        out: List[Tuple[float, int, Path]] = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(ARTIFACT_SUFFIX):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, Path(entry.path)))
+        return out
+
+    def _evict(self, keep: Optional[Path] = None) -> None:
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        if os.path.isdir(self.directory):
+            for _, _, path in self._files():
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "inflight": len(self._inflight),
+                "lookups": dict(self._counts),
+            }
+
+
+EXPORT_CACHE = ExportArtifactCache()
@@ -3,20 +3,26 @@ from __future__ import annotations
 
 import io
 import json
+import tempfile
 from datetime import datetime, date
-from typing import Any, Dict, Iterable
+from typing import IO, Any, Dict, Iterable, Iterator, Optional
 
 from openpyxl import Workbook
 from openpyxl.styles import Alignment, Font, PatternFill
 
 from ..engine.roles import ROLE_LABELS, ROLE_ORDER, ROLE_PLURALS
+from ..env import env_int
 from .export_excel_breakdown import build_human_breakdown
+from .procurement_rollup import build_procurement_rollup
 from .export_excel_sheets import (
     append_config_sheet,
     append_procurement_sheet,
+    append_procurement_rollup_sheet,
     append_procurement_summary_sheet,
     append_summary_sheet,
-    auto_fit_columns,
+    Styled,
+    styled_row,
+    write_sheet,
 )
 
 
@@ -29,6 +35,13 @@ def _to_float_or_none(value: Any) -> float | None:
         return None
 
 
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# 匯出內容或格式有變動時遞增，讓快取的舊匯出檔失效（見 export_cache.py）
+EXPORTER_VERSION = "3"
+DEFAULT_SPOOL_MAX_BYTES = 4 * 1024 * 1024
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
 ROLE_EXPORT_ORDER = ROLE_ORDER
 METRIC_HEADERS = ["成本", "目標匹配度", "分數拆解(JSON)", "分數拆解(易讀)"]
 WEEKDAY_SHORT_LABELS = {
@@ -225,52 +238,77 @@ def _compute_plan_totals(days: list[Dict[str, Any]]) -> tuple[float, float, int]
     return total_cost, total_fitness, fitness_count
 
 
-def build_plan_workbook(cfg: Dict[str, Any], result: Dict[str, Any]) -> bytes:
+def _menu_rows(cfg: Dict[str, Any], days: list[Dict[str, Any]], header: list[str], role_slots: Dict[str, int]) -> Iterator[list[Any]]:
+    yield styled_row(header, font=Font(bold=True), alignment=Alignment(vertical="center"))
+
+    weekend_offday_fill = PatternFill(fill_type="solid", fgColor=WEEKEND_OFFDAY_FILL)
+    wrap = Alignment(vertical="top", wrap_text=True)
+    for day_index, day in enumerate(days):
+        values = _extract_menu_row(cfg, day, role_slots, day_index)
+        fill = weekend_offday_fill if _is_weekend_offday(day) else None
+        row: list[Any] = styled_row(values[:-1], fill=fill) if fill is not None else values[:-1]
+        # 最後一欄（分數拆解易讀版）自動換行
+        row.append(Styled(values[-1], fill=fill, alignment=wrap))
+        yield row
+
+
+def write_plan_workbook(cfg: Dict[str, Any], result: Dict[str, Any], fileobj: IO[bytes]) -> None:
     """
-    result 格式：engine/explain.py build_explanations 的輸出
+    result 格式：engine/explain.py build_explanations 的輸出。
+    以 openpyxl write-only 模式逐表寫入 fileobj：各表的列邊產生邊寫出（欄寬先掃一遍計算），
+    峰值記憶體不隨天數成長。
     """
-    wb = Workbook()
+    wb = Workbook(write_only=True)
 
-    ws = wb.active
-    ws.title = "菜單"
     days = result.get("days", []) or []
     role_slots = _compute_role_slots(cfg, days)
     header = ["日期", "週幾", "人數", *_role_headers(role_slots), *METRIC_HEADERS]
-    ws.append(header)
-
-    bold = Font(bold=True)
-    for col in range(1, len(header) + 1):
-        cell = ws.cell(row=1, column=col)
-        cell.font = bold
-        cell.alignment = Alignment(vertical="center")
-
-    weekend_offday_fill = PatternFill(fill_type="solid", fgColor=WEEKEND_OFFDAY_FILL)
-    for day_index, day in enumerate(days):
-        ws.append(_extract_menu_row(cfg, day, role_slots, day_index))
-        if _is_weekend_offday(day):
-            for cell in ws[ws.max_row]:
-                cell.fill = weekend_offday_fill
+    write_sheet(wb, "菜單", lambda: _menu_rows(cfg, days, header, role_slots), max_width=80, freeze_panes="A2")
 
     total_cost, total_fitness, fitness_count = _compute_plan_totals(days)
-
-    ws.freeze_panes = "A2"
-    auto_fit_columns(ws, max_width=80)
-
-    wrap = Alignment(vertical="top", wrap_text=True)
-    human_col = len(header)
-    for row in range(2, ws.max_row + 1):
-        ws.cell(row=row, column=human_col).alignment = wrap
-
     append_summary_sheet(wb, cfg, result, days, total_cost, total_fitness, fitness_count)
     append_config_sheet(wb, cfg)
     append_procurement_sheet(wb, result)
-    append_procurement_summary_sheet(wb, result)
+    rollup = build_procurement_rollup(result)
+    append_procurement_summary_sheet(wb, result, rollup)
+    append_procurement_rollup_sheet(wb, rollup)
+
+    wb.save(fileobj)
 
+
+def build_plan_workbook(cfg: Dict[str, Any], result: Dict[str, Any]) -> bytes:
     bio = io.BytesIO()
-    wb.save(bio)
+    write_plan_workbook(cfg, result, bio)
     return bio.getvalue()
 
 
+def spool_plan_workbook(cfg: Dict[str, Any], result: Dict[str, Any], max_size: Optional[int] = None) -> IO[bytes]:
+    """
+    寫進 SpooledTemporaryFile：小檔留在記憶體，超過 max_size 自動轉存暫存檔。
+    回傳已移到開頭的檔案，呼叫端讀完負責關閉（iter_file_chunks 會關閉）。
+    """
+    if max_size is None:
+        max_size = env_int("MENU_EXPORT_SPOOL_MAX_BYTES", DEFAULT_SPOOL_MAX_BYTES)
+    spool = tempfile.SpooledTemporaryFile(max_size=max_size)
+    try:
+        write_plan_workbook(cfg, result, spool)
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    return spool
+
+
+def iter_file_chunks(fileobj: IO[bytes], chunk_size: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
 
 def build_filename(prefix: str = "menu_plan") -> str:
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -2,19 +2,23 @@ from __future__ import annotations
 
 import json
 import unicodedata
-from typing import Any, Dict, Tuple
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
 
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
 from openpyxl.utils import get_column_letter
 
 from ..engine.roles import ROLE_LABELS
-from .export_excel_breakdown import num
+from .procurement_rollup import build_procurement_rollup
 
 DAILY_SUBTOTAL_FILL = PatternFill(fill_type="solid", fgColor="FFFDE68A")
 WEEKLY_SUBTOTAL_FILL = PatternFill(fill_type="solid", fgColor="FFBFDBFE")
 DAILY_SUBTOTAL_FONT = Font(color="FF92400E", bold=True)
 WEEKLY_SUBTOTAL_FONT = Font(color="FF1E3A8A", bold=True)
+HEADER_FONT = Font(bold=True)
 
 
 def set_col_width(ws, widths: Dict[int, float]) -> None:
@@ -22,14 +26,13 @@ def set_col_width(ws, widths: Dict[int, float]) -> None:
         ws.column_dimensions[get_column_letter(col_idx)].width = width
 
 
-def _display_width(value: Any) -> int:
-    if value is None:
-        return 0
-    text = str(value)
-    if not text:
-        return 0
+@lru_cache(maxsize=8192)
+def _text_width(text: str) -> int:
     widths = []
     for line in text.splitlines() or [text]:
+        if line.isascii():
+            widths.append(len(line))
+            continue
         width = 0
         for ch in line:
             width += 2 if unicodedata.east_asian_width(ch) in {"F", "W"} else 1
@@ -37,28 +40,98 @@ def _display_width(value: Any) -> int:
     return max(widths, default=0)
 
 
-def auto_fit_columns(ws, min_width: float = 4, max_width: float = 80, padding: float = 2) -> None:
-    for col_idx in range(1, ws.max_column + 1):
-        best = 0
-        for row in range(1, ws.max_row + 1):
-            best = max(best, _display_width(ws.cell(row=row, column=col_idx).value))
-        ws.column_dimensions[get_column_letter(col_idx)].width = max(
-            min_width,
-            min(max_width, best + padding),
-        )
+def _display_width(value: Any) -> int:
+    if value is None:
+        return 0
+    text = str(value)
+    if not text:
+        return 0
+    # 同一張表的值大量重複（日期、食材名稱），寬度依字串快取
+    return _text_width(text)
 
 
-def append_procurement_sheet(wb: Workbook, result: Dict[str, Any]) -> None:
-    ws = wb.create_sheet("採買明細")
-    header = [
+@dataclass(frozen=True)
+class Styled:
+    """write-only 模式下帶樣式的儲存格值（寫入時才轉成 WriteOnlyCell）。"""
+
+    value: Any
+    font: Optional[Font] = None
+    fill: Optional[PatternFill] = None
+    alignment: Optional[Alignment] = None
+
+
+def styled_row(
+    values: Sequence[Any],
+    font: Optional[Font] = None,
+    fill: Optional[PatternFill] = None,
+    alignment: Optional[Alignment] = None,
+) -> List[Styled]:
+    return [Styled(value, font=font, fill=fill, alignment=alignment) for value in values]
+
+
+RowFactory = Callable[[], Iterable[Sequence[Any]]]
+
+
+def _raw_value(value: Any) -> Any:
+    return value.value if isinstance(value, Styled) else value
+
+
+def _column_widths(rows: Iterable[Sequence[Any]], min_width: float, max_width: float, padding: float) -> Dict[int, float]:
+    best: Dict[int, int] = {}
+    for row in rows:
+        for col_idx, value in enumerate(row, 1):
+            width = _display_width(_raw_value(value))
+            if width > best.get(col_idx, -1):
+                best[col_idx] = width
+    return {col_idx: max(min_width, min(max_width, width + padding)) for col_idx, width in best.items()}
+
+
+def _write_cell(ws, value: Any) -> Any:
+    if not isinstance(value, Styled):
+        return value
+    cell = WriteOnlyCell(ws, value=value.value)
+    if value.font is not None:
+        cell.font = value.font
+    if value.fill is not None:
+        cell.fill = value.fill
+    if value.alignment is not None:
+        cell.alignment = value.alignment
+    return cell
+
+
+def write_sheet(
+    wb: Workbook,
+    title: str,
+    rows: RowFactory,
+    min_width: float = 4,
+    max_width: float = 80,
+    padding: float = 2,
+    freeze_panes: Optional[str] = None,
+    auto_filter: bool = False,
+) -> None:
+    """
+    以 write-only 模式寫一張工作表。欄寬必須在第一列寫出前決定，所以 rows 為可重複呼叫的產生器：
+    先走一遍只記錄各欄最大顯示寬度，再走一遍逐列寫出；整張表不會留在記憶體。
+    """
+    widths = _column_widths(rows(), min_width=min_width, max_width=max_width, padding=padding)
+    ws = wb.create_sheet(title)
+    set_col_width(ws, widths)
+    if freeze_panes:
+        ws.freeze_panes = freeze_panes
+
+    row_count = 0
+    for row in rows():
+        ws.append([_write_cell(ws, value) for value in row])
+        row_count += 1
+    if auto_filter and widths and row_count:
+        ws.auto_filter.ref = f"A1:{get_column_letter(max(widths))}{row_count}"
+
+
+def _procurement_rows(result: Dict[str, Any]) -> Iterator[Sequence[Any]]:
+    yield styled_row([
         "日期", "角色", "菜名", "食材", "每人用量", "人數", "需求量", "需求單位",
         "單價", "單價單位", "小計", "價格日期",
-    ]
-    ws.append(header)
-
-    bold = Font(bold=True)
-    for col in range(1, len(header) + 1):
-        ws.cell(row=1, column=col).font = bold
+    ], font=HEADER_FONT)
 
     for day in (result.get("days") or []):
         procurement = day.get("procurement") or {}
@@ -68,7 +141,7 @@ def append_procurement_sheet(wb: Workbook, result: Dict[str, Any]) -> None:
             role = dish.get("role", "")
             dish_name = dish.get("dish_name", "")
             for ingredient in (dish.get("ingredients") or []):
-                ws.append([
+                yield [
                     date_text,
                     ROLE_LABELS.get(role, role),
                     dish_name,
@@ -81,85 +154,87 @@ def append_procurement_sheet(wb: Workbook, result: Dict[str, Any]) -> None:
                     ingredient.get("unit_price_unit", ""),
                     ingredient.get("line_total", ""),
                     ingredient.get("price_date", ""),
-                ])
+                ]
 
-    ws.freeze_panes = "A2"
-    auto_fit_columns(ws)
 
+def append_procurement_sheet(wb: Workbook, result: Dict[str, Any]) -> None:
+    write_sheet(wb, "採買明細", lambda: _procurement_rows(result), freeze_panes="A2")
 
-def append_procurement_summary_sheet(wb: Workbook, result: Dict[str, Any]) -> None:
-    ws = wb.create_sheet("採買彙總")
-    header = ["週次", "日期", "食材", "單價", "單價單位", "總量", "需求單位", "總價格", "備註"]
-    ws.append(header)
 
-    bold = Font(bold=True)
-    for col in range(1, len(header) + 1):
-        ws.cell(row=1, column=col).font = bold
+def _procurement_summary_rows(rollup: Dict[str, Any]) -> Iterator[Sequence[Any]]:
+    yield styled_row(["週次", "日期", "食材", "單價", "單價單位", "總量", "需求單位", "總價格", "備註"], font=HEADER_FONT)
 
     grand_total = 0.0
     week_total = 0.0
     week_index = 1
-    valid_days = [day for day in (result.get("days") or []) if day.get("procurement")]
+    days = rollup.get("days") or []
 
-    for day_idx, day in enumerate(valid_days):
-        procurement = day.get("procurement") or {}
+    for day_idx, day in enumerate(days):
         date_text = day.get("date", "")
-        people = procurement.get("people", "")
-        agg: Dict[Tuple[str, str, str, float], Dict[str, Any]] = {}
-
-        for dish in (procurement.get("dishes") or []):
-            for ingredient in (dish.get("ingredients") or []):
-                unit_price = num(ingredient.get("unit_price"), 0.0)
-                key = (
-                    str(ingredient.get("ingredient_name", "")),
-                    str(ingredient.get("qty_unit", "")),
-                    str(ingredient.get("unit_price_unit", "")),
-                    unit_price,
-                )
-                bucket = agg.setdefault(key, {"qty": 0.0, "total": 0.0})
-                bucket["qty"] += num(ingredient.get("qty_for_people"), 0.0)
-                bucket["total"] += num(ingredient.get("line_total"), 0.0)
+        people = day.get("people", "")
 
         day_total = 0.0
-        for (name, qty_unit, price_unit, unit_price), value in sorted(agg.items(), key=lambda kv: kv[0][0]):
-            total = round(value["total"], 2)
+        for line in day.get("lines") or []:
+            total = line["total"]
             day_total += total
-            ws.append([
+            yield [
                 f"第{week_index}週",
                 date_text,
-                name,
-                round(unit_price, 4) if unit_price else "",
-                price_unit,
-                round(value["qty"], 4),
-                qty_unit,
+                line["ingredient_name"],
+                line["unit_price"] if line["unit_price"] else "",
+                line["unit_price_unit"],
+                line["qty"],
+                line["qty_unit"],
                 total,
                 f"人數={people}",
-            ])
-
-        ws.append([f"第{week_index}週", date_text, "每日小計", "", "", "", "", round(day_total, 2), ""])
-        daily_row = ws.max_row
-        for col in range(1, len(header) + 1):
-            cell = ws.cell(row=daily_row, column=col)
-            cell.fill = DAILY_SUBTOTAL_FILL
-            cell.font = DAILY_SUBTOTAL_FONT
+            ]
+
+        yield styled_row(
+            [f"第{week_index}週", date_text, "每日小計", "", "", "", "", round(day_total, 2), ""],
+            font=DAILY_SUBTOTAL_FONT,
+            fill=DAILY_SUBTOTAL_FILL,
+        )
         week_total += day_total
         grand_total += day_total
 
-        week_done = ((day_idx + 1) % 7 == 0) or (day_idx == len(valid_days) - 1)
+        week_done = ((day_idx + 1) % 7 == 0) or (day_idx == len(days) - 1)
         if week_done:
-            ws.append([f"第{week_index}週", "", "每週小計", "", "", "", "", round(week_total, 2), ""])
-            weekly_row = ws.max_row
-            for col in range(1, len(header) + 1):
-                cell = ws.cell(row=weekly_row, column=col)
-                cell.fill = WEEKLY_SUBTOTAL_FILL
-                cell.font = WEEKLY_SUBTOTAL_FONT
+            yield styled_row(
+                [f"第{week_index}週", "", "每週小計", "", "", "", "", round(week_total, 2), ""],
+                font=WEEKLY_SUBTOTAL_FONT,
+                fill=WEEKLY_SUBTOTAL_FILL,
+            )
             week_index += 1
             week_total = 0.0
 
-    ws.append(["", "", "全部合計", "", "", "", "", round(grand_total, 2), ""])
-    ws.freeze_panes = "A2"
-    ws.auto_filter.ref = f"A1:I{ws.max_row}"
-    auto_fit_columns(ws)
+    yield ["", "", "全部合計", "", "", "", "", round(grand_total, 2), ""]
+
+
+def append_procurement_summary_sheet(
+    wb: Workbook,
+    result: Dict[str, Any],
+    rollup: Optional[Dict[str, Any]] = None,
+) -> None:
+    rollup = rollup if rollup is not None else build_procurement_rollup(result)
+    write_sheet(wb, "採買彙總", lambda: _procurement_summary_rows(rollup), freeze_panes="A2", auto_filter=True)
+
+
+def _procurement_rollup_rows(rollup: Dict[str, Any]) -> Iterator[Sequence[Any]]:
+    yield styled_row(["週次", "期間", "食材", "總量", "需求單位", "總價格"], font=HEADER_FONT)
+
+    for week in rollup.get("weeks") or []:
+        label = f"第{week['week']}週"
+        span = f"{week['start_date']} ~ {week['end_date']}"
+        for line in week.get("lines") or []:
+            yield [label, span, line["ingredient_name"], line["qty"], line["qty_unit"], line["total"]]
+        yield styled_row([label, span, "每週小計", "", "", week["total"]], font=WEEKLY_SUBTOTAL_FONT, fill=WEEKLY_SUBTOTAL_FILL)
+
+    yield ["", "", "全部合計", "", "", rollup.get("grand_total", 0.0)]
+
+
+def append_procurement_rollup_sheet(wb: Workbook, rollup: Dict[str, Any]) -> None:
+    """每週依食材合併的採買總量（叫貨用），每週一列小計。"""
+    write_sheet(wb, "採買週彙總", lambda: _procurement_rollup_rows(rollup), freeze_panes="A2", auto_filter=True)
 
 
 def append_summary_sheet(
@@ -171,33 +246,27 @@ def append_summary_sheet(
     total_fitness: float,
     fitness_count: int,
 ) -> None:
-    ws = wb.create_sheet("摘要")
     summary = result.get("summary", {}) or {}
     days_n = int(summary.get("days") or len(days) or 0)
-
-    bold = Font(bold=True)
-    ws.append(["項目", "值"])
-    ws["A1"].font = bold
-    ws["B1"].font = bold
-    ws.append(["天數", days_n])
-    ws.append(["人數", int((cfg or {}).get("people", 250) or 250)])
-    ws.append(["總成本", round(total_cost, 2)])
-    ws.append(["平均/日", round(total_cost / max(days_n, 1), 2)])
-    ws.append(["總目標匹配度", round(total_fitness, 2)])
-    ws.append(["平均目標匹配度/日", round(total_fitness / max(fitness_count, 1), 2)])
-    ws.append(["說明", "目標匹配度越高越好；若未提供 score_fitness，則使用 -原始分數 當目標匹配度。"])
-
-    auto_fit_columns(ws, max_width=80)
+    rows = [
+        styled_row(["項目", "值"], font=HEADER_FONT),
+        ["天數", days_n],
+        ["人數", int((cfg or {}).get("people", 250) or 250)],
+        ["總成本", round(total_cost, 2)],
+        ["平均/日", round(total_cost / max(days_n, 1), 2)],
+        ["總目標匹配度", round(total_fitness, 2)],
+        ["平均目標匹配度/日", round(total_fitness / max(fitness_count, 1), 2)],
+        ["說明", "目標匹配度越高越好；若未提供 score_fitness，則使用 -原始分數 當目標匹配度。"],
+    ]
+    write_sheet(wb, "摘要", lambda: rows, max_width=80)
 
 
 def append_config_sheet(wb: Workbook, cfg: Dict[str, Any]) -> None:
-    ws = wb.create_sheet("設定")
-    bold = Font(bold=True)
-    ws.append(["constraints.json"])
-    ws["A1"].font = bold
+    cfg_lines = json.dumps(cfg, ensure_ascii=False, indent=2).splitlines()
 
-    cfg_str = json.dumps(cfg, ensure_ascii=False, indent=2)
-    for line in cfg_str.splitlines():
-        ws.append([line])
+    def rows() -> Iterator[Sequence[Any]]:
+        yield styled_row(["constraints.json"], font=HEADER_FONT)
+        for line in cfg_lines:
+            yield [line]
 
-    auto_fit_columns(ws, max_width=120)
+    write_sheet(wb, "設定", rows, max_width=120)
@@ -0,0 +1,127 @@
+# src/menu_planner/api/json_response.py
+from __future__ import annotations
+
+import json
+import math
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from ..env import env_int
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - requirements.txt 已列 orjson；未安裝時用標準庫，輸出相同
+    orjson = None
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+DEFAULT_STREAM_MIN_BYTES = 1024 * 1024
+# 大於 GZipMiddleware 的 thread_minimum_size（128KB），每塊壓縮仍在背景執行緒
+RESPONSE_CHUNK_BYTES = 256 * 1024
+
+
+def _finite(value: Any) -> Any:
+    # NaN / Infinity 不是合法 JSON：與 orjson 一致輸出 null
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _finite(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(v) for v in value]
+    return value
+
+
+def _fallback(value: Any) -> Any:
+    # 排餐結果本身只有 JSON 型別；其他型別（date、set…）才交給 FastAPI 的通用轉換
+    return _finite(jsonable_encoder(value))
+
+
+def _dumps_stdlib(payload: Any) -> bytes:
+    try:
+        text = json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_fallback)
+    except ValueError:
+        # 只有含 NaN / Infinity 時才走這裡，不影響一般結果的速度
+        text = json.dumps(_finite(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_fallback)
+    return text.encode("utf-8")
+
+
+def encode_json(payload: Any) -> bytes:
+    """
+    序列化成 UTF-8 JSON（與 JSONResponse 相同的緊湊格式）；有安裝 orjson 時使用。
+    兩種路徑輸出相同，NaN / Infinity 都輸出 null。
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=_fallback, option=orjson.OPT_NON_STR_KEYS)
+    return _dumps_stdlib(payload)
+
+
+class SerializationStats:
+    """各端點回應序列化的次數、累計時間、最大時間與位元組數。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, float]] = {}
+
+    def record(self, endpoint: str, seconds: float, size: int) -> None:
+        with self._lock:
+            entry = self._endpoints.setdefault(endpoint, {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes": 0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["bytes"] += size
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._endpoints.items()}
+
+
+SERIALIZATION_STATS = SerializationStats()
+
+
+class PreserializedJSONResponse(Response):
+    """
+    在建立回應時（同步端點的 threadpool 內）就序列化，不經 FastAPI 的 jsonable_encoder 逐層轉換。
+
+    - 序列化耗時記入 SERIALIZATION_STATS，並以 Server-Timing: serialize;dur=<ms> 回給呼叫端
+    - 大於 stream_min_bytes 的內容分塊送出，不一次把整份 body 交給 ASGI server / gzip
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        endpoint: str = "",
+        stream_min_bytes: Optional[int] = None,
+    ) -> None:
+        started = time.perf_counter()
+        body = encode_json(content)
+        elapsed = time.perf_counter() - started
+        SERIALIZATION_STATS.record(endpoint, elapsed, len(body))
+
+        self.stream_min_bytes = stream_min_bytes if stream_min_bytes is not None else env_int(
+            "MENU_JSON_STREAM_MIN_BYTES", DEFAULT_STREAM_MIN_BYTES
+        )
+        self.serialize_seconds = elapsed
+        super().__init__(content=body, status_code=status_code, headers=headers)
+        self.headers[SERVER_TIMING_HEADER] = f"serialize;dur={elapsed * 1000:.1f}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if len(self.body) < self.stream_min_bytes:
+            await super().__call__(scope, receive, send)
+            return
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        view = memoryview(self.body)
+        for start in range(0, len(view), RESPONSE_CHUNK_BYTES):
+            chunk = bytes(view[start:start + RESPONSE_CHUNK_BYTES])
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
@@ -1,39 +1,74 @@
 # src/menu_planner/api/main.py
 from __future__ import annotations
 
-import io
+import copy
 import re
 import traceback
-from datetime import date, datetime
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Annotated, Any, Dict, Optional, Tuple
 
-from fastapi import Body, Depends, FastAPI, HTTPException, Query
-from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse
+from fastapi import Body, Depends, FastAPI, Header, HTTPException, Query, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES
 
 from ..config.loader import load_defaults, validate_config
+from ..db.catalog_cache import CachedSQLiteRepo, get_catalog_snapshot
 from ..db.repo import SQLiteRepo
-from ..engine.constraints import PlanDay
 from ..engine.errors import PlanError
-from ..engine.features import build_dish_features
-from ..engine.local_search import compute_total_score
 from ..engine.planner import plan_month
+from ..env import DEFAULT_DB_PATH
+from . import catalog_changes, export_cache, plan_cache, plan_scheduler
 from .auth import router as auth_router
-from .export_excel import build_filename, build_plan_workbook
+from .conditional import catalog_conditional, catalog_summary_conditional, defaults_conditional, etag_matches
+from .export_cache import EXPORT_CACHE_HEADER, export_cache_key, export_etag
+from .export_excel import XLSX_MEDIA_TYPE, build_filename, iter_file_chunks, write_plan_workbook
+from .json_response import PreserializedJSONResponse
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS, MetricsMiddleware, observe_plan_perf
+from .plan_cache import PlanCacheLookup
+from .plan_scheduler import PlanSchedulerBusy, enrich_task, plan_task, planning_client, unwrap_task_result
 from .procurement import attach_procurement_details
+from .profiling import PROFILE_ARTIFACT_HEADER, ProfileSession, profile_session_for
+from .result_compact import FORMAT_COMPACT, FORMAT_FULL, compact_days, compact_result, expand_result, parse_result_format
+from .result_enrich import parse_result_changes, patch_result, recompute_scores_for_result
+from .result_store import RESULT_STORE
 from .routes.admin_catalog import router as admin_catalog_router
+from .routes.plan_batch import router as plan_batch_router
+from .routes.plan_jobs import router as plan_jobs_router
+from .routes.plan_replan import router as plan_replan_router
+from .routes.plan_stream import router as plan_stream_router
+from .routes.procurement import router as procurement_router
+from .routes.profiles import router as profiles_router
 
 APP_DIR = Path(__file__).resolve().parent
 PKG_DIR = APP_DIR.parent
 UI_DIR = PKG_DIR / "ui_static"
 
-DEFAULT_DB_PATH = str((Path.cwd() / "data" / "menu.db").resolve())
-
 app = FastAPI(title="Menu Planner", version="0.1.0")
+# 依 Accept-Encoding 壓縮回應；xlsx 本身是 zip 不再壓縮，NDJSON 串流每塊各自 flush 不影響即時性
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=1024,
+    compresslevel=6,
+    exclude_content_types=(*DEFAULT_EXCLUDED_CONTENT_TYPES, XLSX_MEDIA_TYPE),
+)
+# 最外層：請求時間含壓縮與串流送出（/metrics 輸出見 api/metrics.py）
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth_router)
 app.include_router(admin_catalog_router)
+app.include_router(plan_jobs_router)
+app.include_router(plan_stream_router)
+app.include_router(plan_batch_router)
+app.include_router(plan_replan_router)
+app.include_router(procurement_router)
+app.include_router(profiles_router)
+
+
+# 舊名稱保留給既有呼叫端（已移至 result_enrich.py）
+_recompute_scores_for_result = recompute_scores_for_result
 
 
 def _error_response(errors: list[Any]) -> Dict[str, Any]:
@@ -44,13 +79,36 @@ def _raise_api_error(status_code: int, errors: list[Any]) -> None:
     raise HTTPException(status_code=status_code, detail=_error_response(errors))
 
 
-def _run_plan_or_raise(cfg: Dict[str, Any], db_path: str) -> Dict[str, Any]:
+def _raise_busy(e: PlanSchedulerBusy) -> None:
+    raise HTTPException(
+        status_code=e.status_code,
+        detail=_error_response([e.to_dict()]),
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def _run_plan_or_raise(
+    cfg: Dict[str, Any], db_path: str, client: str, in_thread: bool = False
+) -> Tuple[Dict[str, Any], PlanCacheLookup]:
     ok, errs = validate_config(cfg)
     if not ok:
         _raise_api_error(400, errs)
 
     try:
-        return plan_month(db_path=db_path, cfg=cfg)
+        if in_thread:
+            # 剖析用：在本執行緒內排餐（仍佔用排程器名額），不讀寫排餐結果快取
+            with plan_scheduler.PLAN_SCHEDULER.slot(client):
+                result = plan_month(db_path=db_path, cfg=cfg)
+            return result, PlanCacheLookup(key=None, status=plan_cache.CACHE_BYPASS)
+        cached = plan_cache.PLAN_CACHE.lookup(db_path, cfg)
+        if cached.result is not None:
+            return cached.result, cached
+        result = unwrap_task_result(plan_scheduler.PLAN_SCHEDULER.run(client, plan_task, db_path, cfg))
+        observe_plan_perf(result)
+        plan_cache.PLAN_CACHE.store(cached.key, result)
+        return result, cached
+    except PlanSchedulerBusy as e:
+        _raise_busy(e)
     except PlanError as e:
         _raise_api_error(400, [e.to_dict()])
     except Exception as e:  # pragma: no cover - defensive API boundary
@@ -66,123 +124,20 @@ def _run_plan_or_raise(cfg: Dict[str, Any], db_path: str) -> Dict[str, Any]:
         )
 
 
-def _resolve_start_date(cfg: Dict[str, Any], result: Dict[str, Any]) -> date:
-    start_date_raw = cfg.get("start_date")
-    if isinstance(start_date_raw, str) and start_date_raw.strip():
-        return datetime.strptime(start_date_raw.strip(), "%Y-%m-%d").date()
-    first_day = (result.get("days") or [{}])[0]
-    first_day_date = first_day.get("date")
-    if isinstance(first_day_date, str) and first_day_date.strip():
-        return datetime.strptime(first_day_date.strip(), "%Y-%m-%d").date()
-    return date.today()
-
-
-def _recompute_scores_for_result(cfg: Dict[str, Any], result: Dict[str, Any], repo: SQLiteRepo) -> None:
-    days = result.get("days") or []
-    if not days:
-        return
-
-    hard = (cfg.get("hard") or {}) if isinstance(cfg, dict) else {}
-    soft = (cfg.get("soft") or {}) if isinstance(cfg, dict) else {}
-    weights = (cfg.get("weights") or {}) if isinstance(cfg, dict) else {}
-    start_date = _resolve_start_date(cfg, result)
-
-    all_dishes = repo.fetch_dishes()
-    catalog_rules = {}
-    for dish in all_dishes:
-        weekdays = list(getattr(dish, "allowed_weekdays", []) or [])
-        if 0 < len(weekdays) < 7 and dish.id not in (hard.get("dish_allowed_weekdays") or {}):
-            catalog_rules[dish.id] = weekdays
-    if catalog_rules:
-        hard["dish_allowed_weekdays"] = {**catalog_rules, **(hard.get("dish_allowed_weekdays") or {})}
-    ingredients = repo.fetch_ingredients()
-    dish_ingredients = repo.fetch_dish_ingredients()
-    inventory = repo.fetch_inventory()
-    prices = repo.fetch_latest_prices()
-    unit_conversions = repo.fetch_unit_conversions()
-    feat = build_dish_features(
-        dishes=all_dishes,
-        dish_ingredients=dish_ingredients,
-        ingredients=ingredients,
-        prices=prices,
-        inventory=inventory,
-        conv=unit_conversions,
-        today=start_date,
-    )
+# ?format=compact：菜色 / 採購明細去重的精簡格式（見 result_compact.py）；預設仍回完整結果
+ResultFormat = Annotated[str, Query(alias="format")]
 
-    plan_days = []
-    for day in days:
-        items = day.get("items") or {}
-        def role_ids(role: str) -> list[str]:
-            plural = f"{role}s"
-            values = items.get(plural)
-            if isinstance(values, list):
-                ids = [x.get("id") for x in values if isinstance(x, dict) and x.get("id")]
-                if ids:
-                    return ids
-            one = (items.get(role) or {}).get("id")
-            return [one] if one else []
-
-        sides = [s.get("id") for s in (items.get("sides") or []) if isinstance(s, dict) and s.get("id")]
-        mains = role_ids("main")
-        noodles = role_ids("noodle")
-        vegs = role_ids("veg")
-        soups = role_ids("soup")
-        fruits = role_ids("fruit")
-        plan_days.append(
-            PlanDay(
-                main=mains[0] if mains else "",
-                sides=sides,
-                veg=vegs[0] if vegs else "",
-                soup=soups[0] if soups else "",
-                fruit=fruits[0] if fruits else "",
-                noodle=noodles[0] if noodles else "",
-                mains=mains,
-                noodles=noodles,
-                vegs=vegs,
-                soups=soups,
-                fruits=fruits,
-            )
-        )
 
-    _, details = compute_total_score(
-        plan_days=plan_days,
-        feat=feat,
-        hard=hard,
-        weights=weights,
-        soft=soft,
-        start_date=start_date,
-    )
-    detail_by_index = {d.get("day_index"): d for d in details if d.get("day_index") is not None}
-
-    total_score = 0.0
-    total_fitness = 0.0
-    for idx, day in enumerate(days):
-        detail = detail_by_index.get(idx)
-        if detail is None:
-            continue
-
-        raw = round(float(detail.get("score") or 0.0), 2)
-        breakdown = detail.get("score_breakdown") or {}
-        bonus = round(sum(-float(v) for v in breakdown.values() if float(v) < 0), 2)
-        penalty = round(sum(float(v) for v in breakdown.values() if float(v) > 0), 2)
-        fitness = round(-raw, 2)
-
-        day["score"] = raw
-        day["score_breakdown"] = breakdown
-        day["score_fitness"] = fitness
-        day["score_summary"] = {
-            "bonus": bonus,
-            "penalty": penalty,
-            "raw": raw,
-            "fitness": fitness,
-        }
-        total_score += raw
-        total_fitness += fitness
-
-    summary = result.setdefault("summary", {})
-    summary["total_score"] = round(total_score, 2)
-    summary["total_fitness"] = round(total_fitness, 2)
+# ?profile=cprofile|tracemalloc：資料庫操作者以上才能使用（見 profiling.py）；直接呼叫端點函式時預設不剖析
+PlanProfile = Annotated[Optional[ProfileSession], Depends(profile_session_for("plan"))]
+ExportProfile = Annotated[Optional[ProfileSession], Depends(profile_session_for("export_excel"))]
+
+
+def _result_format_or_raise(raw: Any) -> str:
+    result_format, errs = parse_result_format(raw)
+    if errs:
+        _raise_api_error(400, errs)
+    return result_format
 
 
 def get_db_path(db_path: str = Query(default=DEFAULT_DB_PATH)) -> str:
@@ -190,10 +145,16 @@ def get_db_path(db_path: str = Query(default=DEFAULT_DB_PATH)) -> str:
 
 
 def get_repo(db_path: str = Depends(get_db_path)) -> SQLiteRepo:
-    return SQLiteRepo(db_path)
+    return CachedSQLiteRepo(db_path)
+
+
+def _profile_headers(headers: Dict[str, str], profile: Optional[ProfileSession]) -> Dict[str, str]:
+    if profile is not None and profile.report and profile.report.get("artifact"):
+        headers[PROFILE_ARTIFACT_HEADER] = profile.report["artifact"]
+    return headers
 
 
-@app.get("/config/default")
+@app.get("/config/default", dependencies=[Depends(defaults_conditional)])
 def get_default_config():
     return load_defaults()
 
@@ -204,68 +165,155 @@ def post_validate_config(cfg: Dict[str, Any] = Body(...)):
     return {"ok": ok, "errors": errs}
 
 
-@app.get("/catalog/dishes")
+@app.get("/catalog/dishes", dependencies=[Depends(catalog_conditional)])
 def get_dishes(role: Optional[str] = Query(default=None), repo: SQLiteRepo = Depends(get_repo)):
     dishes = repo.fetch_dishes(role=role)
     return [d.__dict__ for d in dishes]
 
 
-@app.get("/catalog/ingredients")
+@app.get("/catalog/ingredients", dependencies=[Depends(catalog_conditional)])
 def get_ingredients(repo: SQLiteRepo = Depends(get_repo)):
     ings = repo.fetch_ingredients()
     return [v.__dict__ for v in ings.values()]
 
 
-@app.get("/catalog/summary")
+@app.get("/catalog/summary", dependencies=[Depends(catalog_summary_conditional)])
 def get_catalog_summary(repo: SQLiteRepo = Depends(get_repo)):
     return repo.fetch_catalog_summary()
 
 
+@app.get("/catalog/changes")
+def get_catalog_changes(since: Optional[str] = Query(default=None), db_path: str = Depends(get_db_path)):
+    """
+    前端持久化目錄快取的增量同步：回傳 since 之後有異動的食材 / 菜色列與刪除的 id。
+    since 為空、已過期或來自其他 process 時 reset=true 並回傳完整資料。
+    """
+    changes = catalog_changes.CATALOG_CHANGES.changes(get_catalog_snapshot(db_path), since)
+    return PreserializedJSONResponse(changes, headers={"Cache-Control": "no-store"}, endpoint="catalog_changes")
+
+
 @app.post("/plan")
 def post_plan(
     cfg: Dict[str, Any] = Body(...),
     db_path: str = Depends(get_db_path),
+    client: str = Depends(planning_client),
+    result_format: ResultFormat = FORMAT_FULL,
+    profile: PlanProfile = None,
 ):
-    result = _run_plan_or_raise(cfg=cfg, db_path=db_path)
-    enriched = attach_procurement_details(result=result, cfg=cfg, repo=SQLiteRepo(db_path))
-    return {"ok": True, "result": enriched}
+    result_format = _result_format_or_raise(result_format)
+    # ?profile=cprofile|tracemalloc（資料庫操作者以上）：排餐與採購明細在本執行緒剖析，結果附在 profile
+    with profile.active() if profile is not None else nullcontext():
+        result, cached = _run_plan_or_raise(cfg=cfg, db_path=db_path, client=client, in_thread=profile is not None)
+        enriched = attach_procurement_details(result=result, cfg=cfg, repo=CachedSQLiteRepo(db_path))
+    out = {"ok": True, "result": compact_result(enriched) if result_format == FORMAT_COMPACT else enriched}
+    if profile is not None:
+        out["profile"] = profile.report
+    return PreserializedJSONResponse(out, headers=_profile_headers(cached.headers(), profile), endpoint="plan")
 
 
 @app.post("/result/enrich")
 def post_enrich_result(
     payload: Dict[str, Any] = Body(...),
     db_path: str = Depends(get_db_path),
+    client: str = Depends(planning_client),
+    result_format: ResultFormat = FORMAT_FULL,
 ):
+    result_format = _result_format_or_raise(result_format)
     cfg = payload.get("cfg") if isinstance(payload.get("cfg"), dict) else {}
-    result = payload.get("result") if isinstance(payload.get("result"), dict) else {}
-    repo = SQLiteRepo(db_path)
-    enriched = attach_procurement_details(result=result, cfg=cfg, repo=repo)
-    _recompute_scores_for_result(cfg=cfg, result=enriched, repo=repo)
-    return {"ok": True, "result": enriched}
+    result = expand_result(payload.get("result")) if isinstance(payload.get("result"), dict) else {}
+    try:
+        enriched = unwrap_task_result(plan_scheduler.PLAN_SCHEDULER.run(client, enrich_task, db_path, cfg, result))
+    except PlanSchedulerBusy as e:
+        _raise_busy(e)
+    token = RESULT_STORE.put(cfg, enriched)
+    if result_format == FORMAT_COMPACT:
+        enriched = compact_result(enriched)
+    return PreserializedJSONResponse({"ok": True, "result": enriched, "result_token": token}, endpoint="result_enrich")
+
+
+@app.post("/result/enrich/patch")
+def post_enrich_result_patch(
+    payload: Dict[str, Any] = Body(...),
+    db_path: str = Depends(get_db_path),
+    result_format: ResultFormat = FORMAT_FULL,
+):
+    """
+    局部 enrich：payload = {"result_token" 或 "result", "cfg"?, "changes": {day_index: {role: [dish ids]}}}。
+    只重算改到的日子與其後一個排餐日，回傳這些日子、更新後的 summary 與新的 result_token。
+    token 過期時回 404，前端改呼叫 /result/enrich 重新取得。
+    """
+    result_format = _result_format_or_raise(result_format)
+    token = payload.get("result_token")
+    stored = RESULT_STORE.get(token) if isinstance(token, str) and token else None
+    if token and stored is None:
+        _raise_api_error(404, [{"code": "RESULT_TOKEN_EXPIRED", "message": "暫存的排餐結果已過期，請重新同步整份結果。"}])
+    cfg = payload.get("cfg") if isinstance(payload.get("cfg"), dict) else (stored.cfg if stored else {})
+    result = stored.result if stored else expand_result(payload.get("result"))
+    if not isinstance(result, dict) or not isinstance(result.get("days"), list):
+        _raise_api_error(400, [{"code": "RESULT_PATCH_INVALID", "message": "需提供 result_token 或 result（含 days）。"}])
+
+    changes, errs = parse_result_changes(payload.get("changes"), len(result["days"]))
+    if errs:
+        _raise_api_error(400, errs)
+    patched, indices = patch_result(db_path=db_path, cfg=cfg, result=result, changes=changes)
+    days = [patched["days"][i] for i in indices]
+    out = {"ok": True, "result_token": RESULT_STORE.put(cfg, patched), "days": days, "summary": patched["summary"]}
+    if result_format == FORMAT_COMPACT:
+        out.update(compact_days(days), format=FORMAT_COMPACT)
+    return PreserializedJSONResponse(out, endpoint="result_enrich_patch")
 
 
 @app.post("/export/excel")
 def post_export_excel(
     payload: Dict[str, Any] = Body(...),
     db_path: str = Depends(get_db_path),
+    client: str = Depends(planning_client),
+    if_none_match: Optional[str] = Header(default=None),
+    profile: ExportProfile = None,
 ):
     cfg = payload.get("cfg") if isinstance(payload.get("cfg"), dict) else payload
-    result = payload.get("result") if isinstance(payload.get("result"), dict) else None
-
-    if result is None:
-        # backward-compatible: old clients only pass cfg, still allow export
-        result = _run_plan_or_raise(cfg=cfg, db_path=db_path)
-
-    enriched = attach_procurement_details(result=result, cfg=cfg, repo=SQLiteRepo(db_path))
-    content = build_plan_workbook(cfg=cfg, result=enriched)
+    result = expand_result(payload.get("result")) if isinstance(payload.get("result"), dict) else None
+
+    headers: Dict[str, str] = {}
+    # 剖析時不讀匯出快取、不回 304，xlsx 在本執行緒產生；熱點存成檔案，檔名放在 X-Profile-Artifact
+    with profile.active() if profile is not None else nullcontext():
+        if result is None:
+            # backward-compatible: old clients only pass cfg, still allow export
+            result, cached = _run_plan_or_raise(cfg=cfg, db_path=db_path, client=client, in_thread=profile is not None)
+            headers.update(cached.headers())
+
+        # 匯出檔依 (結果, cfg, 目錄內容, 匯出器版本) 內容定址：同一份結果只跑一次採購明細與 openpyxl
+        key = export_cache_key(cfg, result, get_catalog_snapshot(db_path).content_hash())
+        etag = export_etag(key)
+        headers.update({"ETag": etag, "Cache-Control": "private, no-cache"})
+        if profile is None and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        def write(f: Any) -> None:
+            # 只在未命中時附採購明細（可能在匯出快取的背景執行緒執行，repo 在這裡建立）；
+            # 附在複本上，算 key 用的結果維持原樣
+            enriched = attach_procurement_details(result=copy.deepcopy(result), cfg=cfg, repo=CachedSQLiteRepo(db_path))
+            write_plan_workbook(cfg, enriched, f)
+
+        artifact = export_cache.EXPORT_CACHE.get_or_build(key, write, bypass=profile is not None)
+    _profile_headers(headers, profile)
+    headers[EXPORT_CACHE_HEADER] = artifact.status
+    headers["Content-Length"] = str(artifact.size)
     filename = build_filename("menu_plan")
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
     return StreamingResponse(
-        io.BytesIO(content),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        iter_file_chunks(artifact.fileobj),
+        media_type=XLSX_MEDIA_TYPE,
+        headers=headers,
     )
 
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus 文字格式（各 worker process 各自一份；多 process 部署需逐一抓取）。"""
+    return PlainTextResponse(METRICS.render(), media_type=METRICS_CONTENT_TYPE, headers={"Cache-Control": "no-store"})
+
+
 @app.get("/admin")
 def get_admin_page():
     admin_html_path = UI_DIR / "admin.html"
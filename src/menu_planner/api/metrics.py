@@ -0,0 +1,343 @@
+# src/menu_planner/api/metrics.py
+from __future__ import annotations
+
+import bisect
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:  # Windows 沒有 resource 模組
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 一般 API 請求（秒）
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 排餐各階段：360 天排餐可達數十秒
+PLAN_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+BACKUP_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 沒有對應 route 的請求（靜態檔、404）合併成同一個標籤，避免任意路徑撐大標籤數
+ROUTE_UNMATCHED = "<static>"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: Iterable[Tuple[str, str]]) -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in key]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """累積型直方圖（Prometheus histogram 格式），每組標籤各自一份 bucket 計數。"""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = HTTP_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._lock = threading.Lock()
+        self._series: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # 每個 bucket 的非累積計數 + [+Inf, sum]
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[idx] += 1
+            series[-1] += value
+
+    def snapshot(self) -> Dict[LabelKey, Dict[str, Any]]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        out: Dict[LabelKey, Dict[str, Any]] = {}
+        for key, series in items:
+            counts = series[:-1]
+            out[key] = {"count": int(sum(counts)), "sum": series[-1], "buckets": counts}
+        return out
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, data in sorted(self.snapshot().items()):
+            cumulative = 0.0
+            for bound, n in zip((*self.buckets, math.inf), data["buckets"]):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels((*key, ('le', _format_value(bound))))} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(data['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {data['count']}")
+        return lines
+
+
+class Counter:
+    """只增不減的計數器（依標籤分組）。"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, n: float = 1, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + n
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(key)} {_format_value(v)}" for key, v in items)
+        return lines
+
+
+Sample = Tuple[Dict[str, Any], float]
+
+
+class MetricsRegistry:
+    """
+    /metrics 的指標集合。
+
+    - Histogram / Counter 由請求或排餐結果即時更新
+    - 快取、排程器等既有的 stats() 在輸出時才讀取（collector），平常不多做事
+    """
+
+    def __init__(self) -> None:
+        self._metrics: List[Any] = []
+        self._collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = HTTP_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, name: str, kind: str, help_text: str, fn: Callable[[], Iterable[Sample]]) -> None:
+        self._collectors.append((name, kind, help_text, fn))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, kind, help_text, fn in self._collectors:
+            try:
+                samples = list(fn())
+            except Exception:
+                # 單一來源讀取失敗不影響其他指標
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_format_labels(_label_key(labels))} {_format_value(v)}" for labels, v in samples)
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+HTTP_REQUESTS = METRICS.counter("menu_http_requests_total", "HTTP 請求數（依 route 樣板、方法、狀態碼）")
+HTTP_DURATION = METRICS.histogram(
+    "menu_http_request_duration_seconds", "HTTP 請求處理時間（含串流回應送完）", HTTP_BUCKETS
+)
+PLAN_DURATION = METRICS.histogram("menu_plan_duration_seconds", "單次排餐總時間（debug.perf.total_ms）", PLAN_BUCKETS)
+PLAN_STAGE_DURATION = METRICS.histogram(
+    "menu_plan_stage_duration_seconds", "排餐各階段 wall time（debug.perf.spans）", PLAN_BUCKETS
+)
+PLAN_ENGINE_EVENTS = METRICS.counter("menu_plan_engine_events_total", "排餐引擎計數（debug.perf.counters）")
+SQLITE_LOCK_ERRORS = METRICS.counter(
+    "menu_sqlite_lock_errors_total", "busy_timeout 用盡後仍回報 database is locked / busy 的請求數"
+)
+BACKUP_DURATION = METRICS.histogram("menu_db_backup_duration_seconds", "資料庫備份時間（快照 + 背景寫檔）", BACKUP_BUCKETS)
+BACKUP_COALESCED = METRICS.counter("menu_db_backup_coalesced_total", "併入同一合併期間快照、未另建備份的修改次數")
+AUTH_STORE_OPS = METRICS.counter("menu_auth_store_operations_total", "帳號檔讀寫次數")
+
+
+def observe_plan_perf(result: Any) -> None:
+    """把排餐結果的 debug.perf 記到直方圖；只在結果實際由引擎產生時呼叫（快取命中不算）。"""
+    perf = ((result or {}).get("debug") or {}).get("perf") if isinstance(result, dict) else None
+    if not isinstance(perf, dict):
+        return
+    PLAN_DURATION.observe(float(perf.get("total_ms") or 0.0) / 1000)
+    for stage, v in (perf.get("spans") or {}).items():
+        PLAN_STAGE_DURATION.observe(float(v.get("wall_ms") or 0.0) / 1000, stage=stage)
+    for event, n in (perf.get("counters") or {}).items():
+        PLAN_ENGINE_EVENTS.inc(n, event=event)
+
+
+def is_sqlite_lock_error(exc: BaseException) -> bool:
+    if not isinstance(exc, sqlite3.OperationalError):
+        return False
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message
+
+
+def record_auth_store(op: str) -> None:
+    AUTH_STORE_OPS.inc(op=op)
+
+
+class MetricsMiddleware:
+    """ASGI middleware：以 route 樣板（/plan/jobs/{job_id}）為標籤記錄請求數與處理時間。"""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            if is_sqlite_lock_error(exc):
+                SQLITE_LOCK_ERRORS.inc()
+            raise
+        finally:
+            # route 在路由比對時寫入 scope（FastAPI APIRoute）；靜態檔與 404 沒有
+            route = getattr(scope.get("route"), "path", None) or ROUTE_UNMATCHED
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(route=route, method=method, status=status["code"])
+            HTTP_DURATION.observe(time.perf_counter() - started, route=route, method=method)
+
+
+# ---- 輸出時才讀取的來源 ----
+
+
+def _process_samples() -> Iterable[Sample]:
+    rss = _current_rss_bytes()
+    if rss is not None:
+        yield {"kind": "rss"}, rss
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB 為單位，macOS 為 bytes
+        yield {"kind": "peak_rss"}, peak if sys.platform == "darwin" else peak * 1024
+
+
+def _current_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/status", encoding="ascii", errors="ignore") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _process_cpu_samples() -> Iterable[Sample]:
+    times = os.times()
+    yield {}, times.user + times.system
+
+
+def _scheduler_samples() -> Iterable[Sample]:
+    from . import plan_scheduler
+
+    stats = plan_scheduler.PLAN_SCHEDULER.stats()
+    yield {"state": "active"}, stats["active"]
+    yield {"state": "waiting"}, stats["waiting"]
+
+
+def _scheduler_totals() -> Iterable[Sample]:
+    from . import plan_scheduler
+
+    stats = plan_scheduler.PLAN_SCHEDULER.stats()
+    yield {"outcome": "completed"}, stats["completed"]
+    yield {"outcome": "rejected"}, stats["rejected"]
+
+
+def _job_samples() -> Iterable[Sample]:
+    from .plan_jobs import FINISHED_STATUSES, JOB_QUEUED, JOB_RUNNING, PLAN_JOBS
+
+    counts = PLAN_JOBS.stats()["jobs"]
+    for status in (JOB_QUEUED, JOB_RUNNING, *sorted(FINISHED_STATUSES)):
+        yield {"status": status}, counts.get(status, 0)
+
+
+def _cache_lookups() -> Dict[str, Dict[str, float]]:
+    """各快取的查詢結果計數：{cache: {result: n}}。"""
+    from ..db import catalog_cache
+    from . import export_cache, plan_cache
+
+    catalog = catalog_cache.CATALOG_CACHE.stats()
+    out: Dict[str, Dict[str, float]] = {
+        "catalog": {"hit": catalog["hits"], "miss": catalog["misses"]},
+        "plan_result": dict(plan_cache.PLAN_CACHE.stats()["lookups"]),
+        "export": dict(export_cache.EXPORT_CACHE.stats()["lookups"]),
+        # 菜色特徵在 worker process 內建立，由排餐結果的 debug.perf 帶回
+        "features": {
+            "hit": PLAN_ENGINE_EVENTS.value(event="features.cache_hit"),
+            "miss": PLAN_ENGINE_EVENTS.value(event="features.cache_miss"),
+        },
+    }
+    return out
+
+
+def _cache_lookup_samples() -> Iterable[Sample]:
+    for cache, counts in _cache_lookups().items():
+        for result, n in sorted(counts.items()):
+            yield {"cache": cache, "result": result}, n
+
+
+def _cache_hit_ratio_samples() -> Iterable[Sample]:
+    for cache, counts in _cache_lookups().items():
+        # bypass（不可快取的請求）不計入分母
+        hits = sum(n for result, n in counts.items() if result.startswith("hit") or result == "shared")
+        misses = counts.get("miss", 0)
+        if hits + misses:
+            yield {"cache": cache}, hits / (hits + misses)
+
+
+def _serialization_samples() -> Iterable[Sample]:
+    from .json_response import SERIALIZATION_STATS
+
+    for endpoint, entry in sorted(SERIALIZATION_STATS.stats().items()):
+        yield {"endpoint": endpoint}, entry["seconds"]
+
+
+METRICS.collector("menu_process_memory_bytes", "gauge", "process 記憶體（rss：目前；peak_rss：最高）", _process_samples)
+METRICS.collector("menu_process_cpu_seconds_total", "counter", "process 使用的 CPU 時間（user + system）", _process_cpu_samples)
+METRICS.collector("menu_plan_scheduler_slots", "gauge", "排餐排程器執行中 / 排隊中的請求數", _scheduler_samples)
+METRICS.collector("menu_plan_scheduler_requests_total", "counter", "排餐排程器完成 / 拒絕（429）的請求數", _scheduler_totals)
+METRICS.collector("menu_plan_jobs", "gauge", "背景排餐工作數（依狀態，含保留中的已結束工作）", _job_samples)
+METRICS.collector("menu_cache_lookups_total", "counter", "快取查詢結果計數", _cache_lookup_samples)
+METRICS.collector("menu_cache_hit_ratio", "gauge", "快取命中率（不含 bypass）", _cache_hit_ratio_samples)
+METRICS.collector(
+    "menu_response_serialization_seconds_total", "counter", "回應 JSON 序列化累計時間", _serialization_samples
+)
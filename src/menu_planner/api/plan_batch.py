@@ -0,0 +1,208 @@
+# src/menu_planner/api/plan_batch.py
+from __future__ import annotations
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config.loader import compile_plan_config, merge_plan_hard, validate_config
+from ..db.catalog_cache import CachedSQLiteRepo
+from ..engine.errors import PlanError
+from ..engine.planner import INGREDIENT_KEY_SETTINGS, SharedPlanInputs, plan_month
+from ..env import env_int
+from .metrics import observe_plan_perf
+from .plan_cache import PlanCacheLookup, PlanResultCache
+from .plan_scheduler import PlanScheduler, PlanSchedulerBusy, unwrap_task_result
+from .procurement import attach_procurement_details
+
+DEFAULT_MAX_VARIANTS = 8
+
+
+def max_batch_variants() -> int:
+    return env_int("MENU_PLAN_BATCH_MAX_VARIANTS", DEFAULT_MAX_VARIANTS, minimum=1)
+
+
+def parse_batch_variants(payload: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    payload = {"variants": [{"label": "...", "cfg": {...}}, ...]}；回傳 (variants, errors)。
+    label 省略時用「方案 N」；每組 cfg 各自驗證，錯誤的 details 帶 variant 索引。
+    """
+    raw = payload.get("variants")
+    if not isinstance(raw, list) or not raw:
+        return [], [{"code": "BATCH_EMPTY", "message": "variants 必須是非空陣列。"}]
+    limit = max_batch_variants()
+    if len(raw) > limit:
+        return [], [{
+            "code": "BATCH_TOO_LARGE",
+            "message": f"一次最多比較 {limit} 組方案。",
+            "details": {"count": len(raw), "max_variants": limit},
+        }]
+
+    variants: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    for i, item in enumerate(raw):
+        cfg = item.get("cfg") if isinstance(item, dict) else None
+        if not isinstance(cfg, dict):
+            errors.append({"code": "BATCH_VARIANT_INVALID", "message": "每組方案需提供 cfg 物件。", "details": {"variant": i}})
+            continue
+        ok, errs = validate_config(cfg)
+        if not ok:
+            errors.extend({**e, "details": {**(e.get("details") or {}), "variant": i}} for e in errs)
+            continue
+        label = str(item.get("label") or "").strip() or f"方案 {i + 1}"
+        variants.append({"label": label, "cfg": cfg})
+    return variants, errors
+
+
+def _sharing_key(cfg: Dict[str, Any]) -> Tuple[str, str]:
+    # 同一 start_date 共用菜色特徵、同樣的食材 key 設定共用重複判斷 key：排在一起分到同一批
+    start_date = compile_plan_config(cfg).start_date or date.today()
+    hard = merge_plan_hard(cfg)
+    return start_date.isoformat(), repr([hard.get(name) for name in INGREDIENT_KEY_SETTINGS])
+
+
+def chunk_by_sharing(indexed_cfgs: List[Tuple[int, Dict[str, Any]]], chunks: int) -> List[List[Tuple[int, Dict[str, Any]]]]:
+    """依共用輸入排序後切成最多 chunks 段連續區塊，讓可共用的 cfg 盡量落在同一個 worker。"""
+    if not indexed_cfgs:
+        return []
+    ordered = sorted(indexed_cfgs, key=lambda item: (_sharing_key(item[1]), item[0]))
+    size = int(math.ceil(len(ordered) / max(1, chunks)))
+    return [ordered[i:i + size] for i in range(0, len(ordered), size)]
+
+
+def plan_batch_task(db_path: str, cfgs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    在 worker process 內依序排多組 cfg，共用一份 SharedPlanInputs；每組結果格式同 plan_task。
+    非 PlanError 的例外也轉成該組的 INTERNAL_ERROR，不影響同一批的其他 cfg。
+    """
+    shared = SharedPlanInputs.from_db(db_path)
+    out: List[Dict[str, Any]] = []
+    for cfg in cfgs:
+        try:
+            out.append({"ok": True, "value": plan_month(db_path=db_path, cfg=cfg, shared=shared)})
+        except PlanError as e:
+            out.append({"ok": False, "error": e.to_dict()})
+        except Exception as e:
+            out.append({"ok": False, "error": _internal_error(e)})
+    return out
+
+
+def _internal_error(e: Exception) -> Dict[str, Any]:
+    return {"code": "INTERNAL_ERROR", "message": str(e) or type(e).__name__}
+
+
+def summarize_variant(label: str, result: Optional[Dict[str, Any]], errors: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if result is None:
+        return {"label": label, "ok": False, "total_cost": None, "avg_cost_per_day": None,
+                "score": None, "failed_days": [], "failed_day_count": None, "error_count": len(errors)}
+    summary = result.get("summary") or {}
+    debug = result.get("debug") or {}
+    failed_days = list(debug.get("failed_days") or [])
+    return {
+        "label": label,
+        "ok": bool(result.get("ok")),
+        "total_cost": summary.get("total_cost"),
+        "avg_cost_per_day": summary.get("avg_cost_per_day"),
+        "score": debug.get("final_score"),
+        "failed_days": failed_days,
+        "failed_day_count": len(failed_days),
+        "error_count": len(result.get("errors") or []),
+    }
+
+
+def compare_variants(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    比較表：各方案相對第一組的差值，以及成本最低 / 分數最佳（越低越好）/ 失敗日最少的方案索引。
+    只比較有排出結果的方案。
+    """
+    base = rows[0] if rows else {}
+
+    def delta(row: Dict[str, Any], field: str) -> Optional[float]:
+        if row.get(field) is None or base.get(field) is None:
+            return None
+        return round(float(row[field]) - float(base[field]), 2)
+
+    for row in rows:
+        row["vs_first"] = {
+            "total_cost": delta(row, "total_cost"),
+            "score": delta(row, "score"),
+            "failed_day_count": delta(row, "failed_day_count"),
+        }
+
+    def best(field: str) -> Optional[int]:
+        candidates = [(row[field], i) for i, row in enumerate(rows) if row.get(field) is not None]
+        return min(candidates)[1] if candidates else None
+
+    return {
+        "rows": rows,
+        "lowest_cost": best("total_cost"),
+        "best_score": best("score"),
+        "fewest_failed_days": best("failed_day_count"),
+    }
+
+
+def run_plan_batch(
+    db_path: str,
+    variants: List[Dict[str, Any]],
+    client: str,
+    scheduler: PlanScheduler,
+    cache: PlanResultCache,
+    include_results: bool = True,
+) -> Dict[str, Any]:
+    """
+    先查排餐結果快取，未命中的 cfg 依共用輸入分組後分成最多 max_concurrency 批
+    （且不超過每位使用者可排隊的件數，避免自己的批次互相擠出佇列），
+    每批各佔一個排程名額在 process pool 平行執行。
+
+    名額不足（或 worker 異常結束）時丟 PlanSchedulerBusy；已完成的批次仍先寫入快取，重送時不必重算。
+    其他例外只讓該批的方案各自帶 INTERNAL_ERROR，其餘批次照常回傳。
+    """
+    lookups: List[PlanCacheLookup] = [cache.lookup(db_path, v["cfg"]) for v in variants]
+    results: List[Optional[Dict[str, Any]]] = [lk.result for lk in lookups]
+    errors: List[List[Dict[str, Any]]] = [[] for _ in variants]
+
+    misses = [(i, v["cfg"]) for i, v in enumerate(variants) if results[i] is None]
+    chunks = chunk_by_sharing(misses, min(scheduler.max_concurrency, scheduler.max_queued_per_client))
+
+    def run_chunk(chunk: List[Tuple[int, Dict[str, Any]]]) -> Any:
+        # 例外當成值回傳：一批失敗時 pool.map 仍會收齊其他批的結果
+        try:
+            return scheduler.run(client, plan_batch_task, db_path, [cfg for _, cfg in chunk])
+        except Exception as e:
+            return e
+
+    busy: Optional[PlanSchedulerBusy] = None
+    if chunks:
+        with ThreadPoolExecutor(max_workers=len(chunks), thread_name_prefix="plan-batch") as pool:
+            outcomes = list(pool.map(run_chunk, chunks))
+        for chunk, chunk_outcomes in zip(chunks, outcomes):
+            if isinstance(chunk_outcomes, PlanSchedulerBusy):
+                busy = busy or chunk_outcomes
+                continue
+            if isinstance(chunk_outcomes, Exception):
+                for i, _ in chunk:
+                    errors[i].append(_internal_error(chunk_outcomes))
+                continue
+            for (i, _), outcome in zip(chunk, chunk_outcomes):
+                try:
+                    results[i] = unwrap_task_result(outcome)
+                    observe_plan_perf(results[i])
+                    cache.store(lookups[i].key, results[i])
+                except PlanError as e:
+                    errors[i].append(e.to_dict())
+    if busy is not None:
+        raise busy
+
+    repo = CachedSQLiteRepo(db_path)
+    rows: List[Dict[str, Any]] = []
+    items: List[Dict[str, Any]] = []
+    for i, variant in enumerate(variants):
+        result = results[i]
+        rows.append({**summarize_variant(variant["label"], result, errors[i]), "cache": lookups[i].status})
+        item: Dict[str, Any] = {"label": variant["label"], "errors": errors[i]}
+        if include_results and result is not None:
+            item["result"] = attach_procurement_details(result=result, cfg=variant["cfg"], repo=repo)
+        items.append(item)
+
+    return {"comparison": compare_variants(rows), "variants": items}
@@ -0,0 +1,260 @@
+# src/menu_planner/api/plan_cache.py
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config.loader import compile_plan_config, config_hash
+from ..db.catalog_cache import get_catalog_snapshot
+from ..engine.planner import resolve_seed
+from ..env import env_int
+
+CACHE_HIT_MEMORY = "hit-memory"
+CACHE_HIT_DISK = "hit-disk"
+CACHE_MISS = "miss"
+CACHE_BYPASS = "bypass"
+
+CACHE_STATUS_HEADER = "X-Plan-Cache"
+CACHE_KEY_HEADER = "X-Plan-Cache-Key"
+
+# 這兩種 seed 每次結果都不同，快取沒有意義
+NON_DETERMINISTIC_SEEDS = {"random", "time"}
+
+DEFAULT_MEMORY_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_DISK_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_DISK_DIR = str(Path(tempfile.gettempdir()) / "menu-planner-plan-cache")
+
+
+def is_deterministic_seed(cfg: Dict[str, Any]) -> bool:
+    seed = cfg.get("seed", 7)
+    return not (isinstance(seed, str) and seed.strip().lower() in NON_DETERMINISTIC_SEEDS)
+
+
+def plan_cache_key(db_path: str, cfg: Dict[str, Any]) -> Optional[str]:
+    """
+    cfg（seed / start_date 皆解析為實際值）+ 目錄內容雜湊 的穩定 key；不可快取時回傳 None。
+
+    目錄改用內容雜湊而非 CatalogSnapshotCache 的 revision：revision 只在單一 process 內遞增，
+    重啟後會重複，不能當磁碟快取 key。內容雜湊每份快照只算一次。
+    """
+    if not is_deterministic_seed(cfg):
+        return None
+    start_date = compile_plan_config(cfg).start_date or date.today()
+    resolved = {**cfg, "seed": resolve_seed(cfg, start_date), "start_date": start_date.isoformat()}
+    catalog = get_catalog_snapshot(db_path).content_hash()
+    return config_hash({"cfg": resolved, "catalog": catalog})
+
+
+@dataclass
+class PlanCacheLookup:
+    key: Optional[str]
+    status: str
+    result: Optional[Dict[str, Any]] = None
+
+    def headers(self) -> Dict[str, str]:
+        out = {CACHE_STATUS_HEADER: self.status}
+        if self.key:
+            out[CACHE_KEY_HEADER] = self.key[:16]
+        return out
+
+
+@dataclass
+class _MemoryEntry:
+    created_at: float
+    payload: bytes
+
+
+class PlanResultCache:
+    """
+    排餐結果（plan_month 輸出、尚未附採購明細）的兩層快取：記憶體 LRU + 磁碟 gzip 檔。
+
+    - 以位元組數設上限（max_memory_bytes / max_disk_bytes），超過時淘汰最久未用（記憶體）/ 最舊（磁碟）
+    - ttl_seconds 後過期；任一上限設 0 即停用該層
+    - 存放序列化後的 JSON：命中時重新 loads，呼叫端可自由修改回傳值
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: Optional[int] = None,
+        max_disk_bytes: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        disk_dir: Optional[str] = None,
+    ):
+        self.max_memory_bytes = max_memory_bytes if max_memory_bytes is not None else env_int(
+            "MENU_PLAN_CACHE_MAX_BYTES", DEFAULT_MEMORY_MAX_BYTES
+        )
+        self.max_disk_bytes = max_disk_bytes if max_disk_bytes is not None else env_int(
+            "MENU_PLAN_CACHE_DISK_MAX_BYTES", DEFAULT_DISK_MAX_BYTES
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else env_int(
+            "MENU_PLAN_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS
+        )
+        self.disk_dir = disk_dir or (os.getenv("MENU_PLAN_CACHE_DIR") or "").strip() or DEFAULT_DISK_DIR
+        self._memory: "OrderedDict[str, _MemoryEntry]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {CACHE_HIT_MEMORY: 0, CACHE_HIT_DISK: 0, CACHE_MISS: 0, CACHE_BYPASS: 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_memory_bytes > 0 or self.max_disk_bytes > 0
+
+    def _count(self, status: str) -> None:
+        with self._lock:
+            self._counts[status] = self._counts.get(status, 0) + 1
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and (time.time() - created_at) > self.ttl_seconds
+
+    def lookup(self, db_path: str, cfg: Dict[str, Any]) -> PlanCacheLookup:
+        key = plan_cache_key(db_path, cfg) if self.enabled else None
+        if key is None:
+            self._count(CACHE_BYPASS)
+            return PlanCacheLookup(key=None, status=CACHE_BYPASS)
+
+        payload = self._memory_get(key)
+        status = CACHE_HIT_MEMORY
+        if payload is None:
+            status = CACHE_HIT_DISK
+            found = self._disk_get(key)
+            if found is not None:
+                payload, created_at = found
+                self._memory_put(key, payload, created_at=created_at)
+        if payload is None:
+            self._count(CACHE_MISS)
+            return PlanCacheLookup(key=key, status=CACHE_MISS)
+
+        self._count(status)
+        return PlanCacheLookup(key=key, status=status, result=json.loads(payload))
+
+    def store(self, key: Optional[str], result: Dict[str, Any]) -> None:
+        if key is None or not self.enabled:
+            return
+        debug = result.get("debug")
+        if isinstance(debug, dict) and "perf" in debug:
+            # 計時屬於產生結果的那次排餐：命中時不回傳舊的耗時，也避免採購明細的 span 疊在舊數字上
+            result = {**result, "debug": {k: v for k, v in debug.items() if k != "perf"}}
+        try:
+            payload = json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        except (TypeError, ValueError):
+            return
+        now = time.time()
+        self._memory_put(key, payload, created_at=now)
+        self._disk_put(key, payload)
+
+    # ---- 記憶體層 ----
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry.created_at):
+                self._memory_bytes -= len(entry.payload)
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry.payload
+
+    def _memory_put(self, key: str, payload: bytes, created_at: float) -> None:
+        if len(payload) > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old.payload)
+            self._memory[key] = _MemoryEntry(created_at=created_at, payload=payload)
+            self._memory_bytes += len(payload)
+            while self._memory_bytes > self.max_memory_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted.payload)
+
+    # ---- 磁碟層（檔案 mtime 即建立時間）----
+
+    def _disk_path(self, key: str) -> Path:
+        return Path(self.disk_dir) / f"{key}.json.gz"
+
+    def _disk_get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        if self.max_disk_bytes <= 0:
+            return None
+        path = self._disk_path(key)
+        try:
+            created_at = path.stat().st_mtime
+            if self._expired(created_at):
+                path.unlink(missing_ok=True)
+                return None
+            with gzip.open(path, "rb") as f:
+                return f.read(), created_at
+        except (OSError, EOFError):
+            return None
+
+    def _disk_put(self, key: str, payload: bytes) -> None:
+        if self.max_disk_bytes <= 0:
+            return
+        path = self._disk_path(key)
+        tmp: Optional[str] = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=str(path.parent), suffix=".tmp")
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+                f.write(payload)
+            os.replace(tmp, path)
+            tmp = None
+            self._disk_evict()
+        except OSError:
+            # 唯讀檔案系統（例如 serverless）只用記憶體層
+            if tmp is not None:
+                Path(tmp).unlink(missing_ok=True)
+
+    def _disk_files(self) -> List[Tuple[float, int, Path]]:
+        out: List[Tuple[float, int, Path]] = []
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith(".json.gz"):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, Path(entry.path)))
+        return out
+
+    def _disk_evict(self) -> None:
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            if total <= self.max_disk_bytes and not self._expired(mtime):
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if os.path.isdir(self.disk_dir):
+            for _, _, path in self._disk_files():
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "lookups": dict(self._counts),
+            }
+
+
+PLAN_CACHE = PlanResultCache()
@@ -0,0 +1,298 @@
+# src/menu_planner/api/plan_jobs.py
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from ..db.catalog_cache import CachedSQLiteRepo
+from ..engine.errors import PlanCancelled, PlanError
+from ..engine.planner import plan_month
+from ..engine.progress import STAGE_CONTEXT
+from ..env import env_int
+from . import plan_scheduler
+from .metrics import observe_plan_perf
+from .plan_scheduler import PlanScheduler, PlanWorkerCrashed
+from .procurement import attach_procurement_details
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATUSES = {JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED}
+
+STAGE_PROCUREMENT = "procurement"
+
+# 背景工作在 PlanScheduler 上共用同一個輪替名額，互動式請求不會被大量背景工作擠掉
+JOB_CLIENT = "plan-jobs"
+
+DEFAULT_JOB_TTL_SECONDS = 3600
+DEFAULT_MAX_PENDING_JOBS = 16
+RETRY_AFTER_SECONDS = 5
+
+
+def default_job_workers() -> int:
+    # 同時佔用（或等待）排程器名額的背景工作數；預設一半核心，其餘名額留給 /plan 等同步請求
+    return env_int("MENU_PLAN_JOB_WORKERS", max(1, (os.cpu_count() or 2) // 2), minimum=1)
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts is not None else None
+
+
+class PlanJobQueueFull(Exception):
+    """等待/執行中的工作已達上限。"""
+
+
+def run_plan_job(db_path: str, cfg: Dict[str, Any], state: Any, cancel_event: Any) -> Dict[str, Any]:
+    """
+    在 worker process 內執行一次排餐 + 採購明細。
+
+    state / cancel_event 為 multiprocessing.Manager 的 dict / Event proxy；
+    PlanError 是 dataclass 例外無法跨 process pickle，因此一律轉成 dict 回傳。
+    """
+
+    def progress(stage: str, day_index: Optional[int]) -> None:
+        if cancel_event.is_set():
+            raise PlanCancelled(day_index=day_index)
+        state.update({"stage": stage, "day_index": day_index})
+
+    state.update({"status": JOB_RUNNING, "started_at": time.time(), "stage": STAGE_CONTEXT, "day_index": None})
+    try:
+        result = plan_month(db_path=db_path, cfg=cfg, progress=progress)
+        progress(STAGE_PROCUREMENT, None)
+        enriched = attach_procurement_details(result=result, cfg=cfg, repo=CachedSQLiteRepo(db_path))
+    except PlanCancelled as e:
+        return {"ok": False, "cancelled": True, "errors": [e.to_dict()]}
+    except PlanError as e:
+        return {"ok": False, "errors": [e.to_dict()]}
+    except Exception as e:  # pragma: no cover - defensive worker boundary
+        return {
+            "ok": False,
+            "errors": [{"code": "INTERNAL_ERROR", "message": str(e), "details": {"trace": traceback.format_exc()}}],
+        }
+    return {"ok": True, "result": enriched}
+
+
+@dataclass
+class PlanJob:
+    id: str
+    db_path: str
+    horizon_days: int
+    created_at: float
+    state: Any
+    cancel_event: Any
+    future: Optional[Future] = None
+    status: str = JOB_QUEUED
+    cancel_requested: bool = False
+    progress: Optional[Dict[str, Any]] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    outcome: Optional[Dict[str, Any]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def refresh(self) -> None:
+        proxy = self.state
+        if self.finished or proxy is None:
+            return
+        try:
+            state = proxy.copy()
+        except Exception:
+            # Manager 已關閉（例如程序結束中），保留最後一次讀到的進度
+            return
+        if state.get("status") == JOB_RUNNING and self.status == JOB_QUEUED:
+            self.status = JOB_RUNNING
+        self.started_at = state.get("started_at", self.started_at)
+        self.progress = {"stage": state.get("stage"), "day_index": state.get("day_index")}
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "id": self.id,
+            "status": self.status,
+            "cancel_requested": self.cancel_requested,
+            "progress": {**(self.progress or {"stage": None, "day_index": None}), "horizon_days": self.horizon_days},
+            "created_at": _iso(self.created_at),
+            "started_at": _iso(self.started_at),
+            "finished_at": _iso(self.finished_at),
+        }
+        if self.outcome is not None:
+            if self.outcome.get("errors"):
+                out["errors"] = self.outcome["errors"]
+            if include_result and self.outcome.get("ok"):
+                out["result"] = self.outcome.get("result")
+        return out
+
+
+class PlanJobManager:
+    """
+    背景排餐工作：run_plan_job 在 PlanScheduler 的 process pool 執行並佔用排程器名額，結果保留 ttl_seconds 後淘汰。
+
+    - 最多 max_workers 件工作同時佔用或等待名額，其餘在本地佇列；與 /plan 等請求共用同時執行上限
+    - 取消為合作式：設定 cancel_event，引擎下一次回報進度時丟出 PlanCancelled；尚未開始的工作直接移出佇列
+    - scheduler / sync_factory 可替換（測試用 thread pool 排程器 + 一般 dict/Event）
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        scheduler: Optional[PlanScheduler] = None,
+        sync_factory: Optional[Callable[[], Any]] = None,
+        runner: Callable[..., Dict[str, Any]] = run_plan_job,
+    ):
+        self.max_workers = max_workers if max_workers is not None else default_job_workers()
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else env_int(
+            "MENU_PLAN_JOB_TTL_SECONDS", DEFAULT_JOB_TTL_SECONDS
+        )
+        self.max_pending = max_pending if max_pending is not None else env_int(
+            "MENU_PLAN_JOB_MAX_PENDING", DEFAULT_MAX_PENDING_JOBS, minimum=1
+        )
+        self._scheduler = scheduler
+        self._sync_factory = sync_factory or self._default_sync
+        self._runner = runner
+        self._executor: Optional[Executor] = None
+        self._sync: Any = None
+        self._jobs: Dict[str, PlanJob] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def scheduler(self) -> PlanScheduler:
+        return self._scheduler or plan_scheduler.PLAN_SCHEDULER
+
+    @staticmethod
+    def _default_sync() -> Any:
+        return multiprocessing.get_context("spawn").Manager()
+
+    def _ensure_started(self) -> None:
+        if self._sync is None:
+            self._sync = self._sync_factory()
+        if self._executor is None:
+            # 只負責等名額與等結果；實際排餐在排程器的 process pool
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="plan-job")
+
+    def _run(self, db_path: str, cfg: Dict[str, Any], state: Any, cancel_event: Any) -> Dict[str, Any]:
+        scheduler = self.scheduler
+        try:
+            with scheduler.slot(JOB_CLIENT, background=True, cancel_event=cancel_event):
+                if cancel_event.is_set():
+                    return {"ok": False, "cancelled": True, "errors": [PlanCancelled().to_dict()]}
+                return scheduler.execute(self._runner, db_path, cfg, state, cancel_event)
+        except PlanCancelled as e:
+            return {"ok": False, "cancelled": True, "errors": [e.to_dict()]}
+        except PlanWorkerCrashed as e:
+            return {"ok": False, "errors": [e.to_dict()]}
+
+    def submit(self, db_path: str, cfg: Dict[str, Any]) -> PlanJob:
+        with self._lock:
+            self._evict_expired_locked()
+            pending = sum(1 for job in self._jobs.values() if not job.finished)
+            if pending >= self.max_pending:
+                raise PlanJobQueueFull(f"排餐工作已達上限 {self.max_pending} 件，請稍後再試。")
+            self._ensure_started()
+            job = PlanJob(
+                id=uuid.uuid4().hex,
+                db_path=db_path,
+                horizon_days=int(cfg.get("horizon_days", 30)),
+                created_at=time.time(),
+                state=self._sync.dict(),
+                cancel_event=self._sync.Event(),
+            )
+            self._jobs[job.id] = job
+            future = self._executor.submit(self._run, db_path, cfg, job.state, job.cancel_event)
+            job.future = future
+        future.add_done_callback(lambda fut, job_id=job.id: self._on_done(job_id, fut))
+        return job
+
+    def _on_done(self, job_id: str, fut: Future) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return
+            job.refresh()
+            if fut.cancelled():
+                outcome = {"ok": False, "cancelled": True, "errors": [PlanCancelled().to_dict()]}
+            else:
+                exc = fut.exception()
+                if exc is not None:
+                    outcome = {"ok": False, "errors": [{"code": "INTERNAL_ERROR", "message": str(exc)}]}
+                else:
+                    outcome = fut.result()
+            job.outcome = outcome
+            if outcome.get("cancelled"):
+                job.status = JOB_CANCELLED
+            elif outcome.get("ok"):
+                job.status = JOB_SUCCEEDED
+                observe_plan_perf(outcome.get("result"))
+            else:
+                job.status = JOB_FAILED
+            job.finished_at = time.time()
+            # 結束後釋放 Manager 端的 proxy 物件
+            job.state = None
+            job.cancel_event = None
+            job.future = None
+
+    def get(self, job_id: str) -> Optional[PlanJob]:
+        with self._lock:
+            self._evict_expired_locked()
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job.refresh()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[PlanJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            job.cancel_requested = True
+            job.cancel_event.set()
+            future = job.future
+        if future is not None:
+            # 尚未開始的工作可直接取消；已在執行中則等引擎回報進度時中止
+            future.cancel()
+        job.refresh()
+        return job
+
+    def _evict_expired_locked(self) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        expired = [jid for jid, job in self._jobs.items() if job.finished and (job.finished_at or 0) < cutoff]
+        for jid in expired:
+            del self._jobs[jid]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {"workers": self.max_workers, "max_pending": self.max_pending, "jobs": counts}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, sync = self._executor, self._sync
+            self._executor = None
+            self._sync = None
+            pending: List[PlanJob] = [job for job in self._jobs.values() if not job.finished]
+        for job in pending:
+            if job.cancel_event is not None:
+                job.cancel_event.set()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if sync is not None and hasattr(sync, "shutdown"):
+            sync.shutdown()
+
+
+PLAN_JOBS = PlanJobManager()
@@ -0,0 +1,80 @@
+# src/menu_planner/api/plan_replan.py
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config.loader import validate_config
+from ..engine.errors import PlanError
+from ..engine.replan import replan_month
+from .result_compact import expand_result
+from .result_enrich import resolve_result_start_date
+
+
+def _parse_date(raw: Any) -> Optional[date]:
+    if not isinstance(raw, str) or not raw.strip():
+        return None
+    try:
+        return datetime.strptime(raw.strip(), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def parse_replan_payload(payload: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    payload = {"cfg": {...}, "result": {...}, "range": {"start": "YYYY-MM-DD", "end": "YYYY-MM-DD"},
+               "locked_dates": ["YYYY-MM-DD", ...]}
+    日期換算成相對原結果第一天的 day_index；cfg 缺 start_date / horizon_days 時以原結果補上。
+    result 可為精簡格式（?format=compact 的回應），先展開。回傳 (task 參數, errors)。
+    """
+    cfg = payload.get("cfg")
+    result = expand_result(payload.get("result"))
+    if not isinstance(cfg, dict) or not isinstance(result, dict) or not isinstance(result.get("days"), list):
+        return None, [{"code": "REPLAN_INVALID", "message": "需提供 cfg 與原排餐結果 result（含 days）。"}]
+
+    start_date = resolve_result_start_date(cfg, result)
+    cfg = {**cfg, "start_date": start_date.isoformat()}
+    cfg.setdefault("horizon_days", len(result["days"]))
+    ok, errs = validate_config(cfg)
+    if not ok:
+        return None, errs
+
+    span = payload.get("range") if isinstance(payload.get("range"), dict) else {}
+    range_start, range_end = _parse_date(span.get("start")), _parse_date(span.get("end"))
+    if range_start is None or range_end is None or range_end < range_start:
+        return None, [{
+            "code": "REPLAN_RANGE_INVALID",
+            "message": "range.start / range.end 必須是 YYYY-MM-DD，且 end 不早於 start。",
+            "details": {"range": span},
+        }]
+
+    locked: List[int] = []
+    for raw in payload.get("locked_dates") or []:
+        d = _parse_date(raw)
+        if d is None:
+            return None, [{"code": "REPLAN_LOCKED_DATE_INVALID", "message": "locked_dates 必須是 YYYY-MM-DD。", "details": {"value": raw}}]
+        locked.append((d - start_date).days)
+
+    return {
+        "cfg": cfg,
+        "result": result,
+        "start_index": (range_start - start_date).days,
+        "end_index": (range_end - start_date).days,
+        "locked_indices": locked,
+    }, []
+
+
+def replan_task(db_path: str, request: Dict[str, Any]) -> Dict[str, Any]:
+    """在 worker process 內執行局部重排；回傳格式同 plan_task。"""
+    try:
+        value = replan_month(
+            db_path=db_path,
+            cfg=request["cfg"],
+            base_result=request["result"],
+            start_index=request["start_index"],
+            end_index=request["end_index"],
+            locked_indices=request["locked_indices"],
+        )
+        return {"ok": True, "value": value}
+    except PlanError as e:
+        return {"ok": False, "error": e.to_dict()}
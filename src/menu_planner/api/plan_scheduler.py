@@ -0,0 +1,301 @@
+# src/menu_planner/api/plan_scheduler.py
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from fastapi import Header, Request
+
+from ..engine.errors import PlanCancelled, PlanError
+from ..engine.planner import plan_month
+from ..env import env_int
+from .auth.auth_tokens import parse_token
+from .result_enrich import enrich_result
+
+DEFAULT_MAX_QUEUE = 32
+DEFAULT_MAX_QUEUED_PER_CLIENT = 4
+DEFAULT_QUEUE_TIMEOUT_SECONDS = 120
+# 尚無執行紀錄時估計 Retry-After 用
+DEFAULT_EXPECTED_RUN_SECONDS = 5.0
+# 背景工作等待名額時檢查取消的間隔
+BACKGROUND_POLL_SECONDS = 0.5
+
+
+def default_max_concurrency() -> int:
+    return env_int("MENU_PLAN_MAX_CONCURRENCY", os.cpu_count() or 1, minimum=1)
+
+
+class PlanSchedulerBusy(Exception):
+    """等待佇列已滿或等待逾時；API 回 429 + Retry-After。"""
+
+    status_code = 429
+    code = "PLAN_BUSY"
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"code": self.code, "message": self.message, "details": {"retry_after": self.retry_after}}
+
+
+class PlanWorkerCrashed(PlanSchedulerBusy):
+    """排餐 worker process 異常結束（OOM、segfault 等），process pool 已換新；API 回 503 + Retry-After。"""
+
+    status_code = 503
+    code = "PLAN_WORKER_CRASHED"
+
+
+class _Ticket:
+    __slots__ = ("client", "granted")
+
+    def __init__(self, client: str):
+        self.client = client
+        self.granted = False
+
+
+def planning_client(request: Request, authorization: Optional[str] = Header(default=None)) -> str:
+    """
+    公平排隊用的使用者識別：有合法 token 用帳號，否則用來源 IP。
+    只驗簽章、不查帳號狀態（授權仍由各端點自行處理）。
+    """
+    if authorization and authorization.lower().startswith("bearer "):
+        payload = parse_token(authorization.split(" ", 1)[1].strip())
+        if payload and payload.get("sub"):
+            return f"user:{payload['sub']}"
+    host = request.client.host if request.client else ""
+    return f"ip:{host or 'unknown'}"
+
+
+class PlanScheduler:
+    """
+    排餐類 CPU-bound 工作的准入控制。
+
+    - 同時執行上限 max_concurrency（預設 CPU 核心數），超過的請求進入等待佇列
+    - 佇列總長 max_queue、每位使用者 max_queued_per_client；超過或等待逾時丟 PlanSchedulerBusy
+    - 有空位時依使用者輪流放行（round-robin），單一使用者大量送出不會餓死其他人
+    - run() 把工作送進 process pool，API 執行緒只等待結果，不與 auth/admin 請求搶 GIL
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_queued_per_client: Optional[int] = None,
+        queue_timeout_seconds: Optional[float] = None,
+        executor_factory: Optional[Callable[[int], Executor]] = None,
+    ):
+        self.max_concurrency = max_concurrency if max_concurrency is not None else default_max_concurrency()
+        self.max_queue = max_queue if max_queue is not None else env_int("MENU_PLAN_MAX_QUEUE", DEFAULT_MAX_QUEUE)
+        self.max_queued_per_client = max_queued_per_client if max_queued_per_client is not None else env_int(
+            "MENU_PLAN_MAX_QUEUED_PER_CLIENT", DEFAULT_MAX_QUEUED_PER_CLIENT, minimum=1
+        )
+        self.queue_timeout_seconds = queue_timeout_seconds if queue_timeout_seconds is not None else env_int(
+            "MENU_PLAN_QUEUE_TIMEOUT_SECONDS", DEFAULT_QUEUE_TIMEOUT_SECONDS, minimum=1
+        )
+        self._executor_factory = executor_factory or self._default_executor
+        self._executor: Optional[Executor] = None
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting: Dict[str, Deque[_Ticket]] = {}
+        self._rotation: Deque[str] = deque()
+        self._waiting_total = 0
+        self._avg_run_seconds: Optional[float] = None
+        self._rejected = 0
+        self._completed = 0
+
+    @staticmethod
+    def _default_executor(max_workers: int) -> Executor:
+        # spawn：API 程序有多條執行緒，fork 可能複製到被鎖住的 lock
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def retry_after_seconds(self) -> int:
+        with self._cond:
+            return self._retry_after_locked()
+
+    def _retry_after_locked(self) -> int:
+        per_run = self._avg_run_seconds if self._avg_run_seconds is not None else DEFAULT_EXPECTED_RUN_SECONDS
+        rounds = (self._waiting_total + 1) / max(self.max_concurrency, 1)
+        return max(1, int(math.ceil(per_run * rounds)))
+
+    def _busy_locked(self, message: str) -> PlanSchedulerBusy:
+        self._rejected += 1
+        return PlanSchedulerBusy(message, retry_after=self._retry_after_locked())
+
+    def _check_admission_locked(self, client: str) -> None:
+        if self._waiting_total >= self.max_queue:
+            raise self._busy_locked(f"排餐請求過多（等待中 {self._waiting_total} 件），請稍後再試。")
+        if len(self._waiting.get(client, ())) >= self.max_queued_per_client:
+            raise self._busy_locked(f"您已有 {self.max_queued_per_client} 件排餐請求在等待，請稍後再試。")
+
+    def check_admission(self, client: str) -> None:
+        """不佔位的預先檢查：串流端點在開始回應前先判斷是否該回 429。"""
+        with self._cond:
+            if self._active < self.max_concurrency and not self._waiting_total:
+                return
+            self._check_admission_locked(client)
+
+    def _grant_locked(self) -> None:
+        while self._active < self.max_concurrency and self._rotation:
+            client = self._rotation.popleft()
+            queue = self._waiting[client]
+            ticket = queue.popleft()
+            ticket.granted = True
+            self._active += 1
+            self._waiting_total -= 1
+            if queue:
+                self._rotation.append(client)
+            else:
+                del self._waiting[client]
+        self._cond.notify_all()
+
+    def _withdraw_locked(self, ticket: _Ticket) -> None:
+        queue = self._waiting.get(ticket.client)
+        if queue is None or ticket not in queue:
+            return
+        queue.remove(ticket)
+        self._waiting_total -= 1
+        if not queue:
+            del self._waiting[ticket.client]
+            self._rotation.remove(ticket.client)
+
+    def _acquire(self, client: str, background: bool = False, cancel_event: Any = None) -> None:
+        with self._cond:
+            if self._active < self.max_concurrency and not self._waiting_total:
+                self._active += 1
+                return
+            if not background:
+                self._check_admission_locked(client)
+            ticket = _Ticket(client)
+            if client not in self._waiting:
+                self._waiting[client] = deque()
+                self._rotation.append(client)
+            self._waiting[client].append(ticket)
+            self._waiting_total += 1
+
+            # 背景工作（/plan/jobs）由呼叫端自行限制數量，不受佇列上限與等待逾時限制
+            deadline = None if background else time.monotonic() + self.queue_timeout_seconds
+            while not ticket.granted:
+                if deadline is None:
+                    if cancel_event is not None and cancel_event.is_set():
+                        self._withdraw_locked(ticket)
+                        raise PlanCancelled()
+                    self._cond.wait(BACKGROUND_POLL_SECONDS)
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._withdraw_locked(ticket)
+                    raise self._busy_locked("排餐等待逾時，請稍後再試。")
+                self._cond.wait(remaining)
+
+    def _release(self, elapsed: float) -> None:
+        with self._cond:
+            self._active -= 1
+            self._completed += 1
+            # 指數移動平均，用來估計 Retry-After
+            if self._avg_run_seconds is None:
+                self._avg_run_seconds = elapsed
+            else:
+                self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * elapsed
+            self._grant_locked()
+
+    @contextmanager
+    def slot(self, client: str, background: bool = False, cancel_event: Any = None) -> Iterator[None]:
+        """
+        佔用一個執行名額（在呼叫端執行緒內執行，例如需要即時回呼的串流端點）。
+        background=True 時一直等到有名額為止，不檢查佇列上限；等待中 cancel_event 被設定則丟 PlanCancelled。
+        """
+        self._acquire(client, background=background, cancel_event=cancel_event)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    def executor(self) -> Executor:
+        """共用的 process pool（大小同 max_concurrency）；送出工作請在 slot() 內呼叫 execute()，才不會超過同時執行上限。"""
+        with self._cond:
+            if self._executor is None:
+                self._executor = self._executor_factory(self.max_concurrency)
+            return self._executor
+
+    def _discard_executor(self, executor: Executor) -> None:
+        # 只丟棄仍是目前這個的 pool：同時失敗的其他請求不會把別人剛建好的新 pool 也關掉
+        with self._cond:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def execute(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        在 process pool 執行 fn(*args) 並等待結果；須在 slot() 內呼叫。
+        worker 異常結束時 pool 會整個失效（BrokenProcessPool），丟棄後下一次呼叫重建，本次丟 PlanWorkerCrashed。
+        """
+        executor = self.executor()
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise PlanWorkerCrashed("排餐程序異常結束，請稍後再試。", retry_after=self.retry_after_seconds())
+
+    def run(self, client: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """排隊取得名額後在 process pool 執行 fn(*args)，阻塞直到完成。"""
+        with self.slot(client):
+            return self.execute(fn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "max_queued_per_client": self.max_queued_per_client,
+                "active": self._active,
+                "waiting": self._waiting_total,
+                "waiting_clients": len(self._waiting),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_run_seconds": round(self._avg_run_seconds, 3) if self._avg_run_seconds is not None else None,
+            }
+
+    def shutdown(self) -> None:
+        with self._cond:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# ---- 在 worker process 內執行的工作（須為模組層級函式才能 pickle）----
+
+
+def _capture_plan_error(fn: Callable[[], Any]) -> Dict[str, Any]:
+    # PlanError 是 dataclass 例外無法跨 process pickle，轉成 dict 回傳後再於 API 端還原
+    try:
+        return {"ok": True, "value": fn()}
+    except PlanError as e:
+        return {"ok": False, "error": e.to_dict()}
+
+
+def plan_task(db_path: str, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    return _capture_plan_error(lambda: plan_month(db_path=db_path, cfg=cfg))
+
+
+def enrich_task(db_path: str, cfg: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    return _capture_plan_error(lambda: enrich_result(db_path=db_path, cfg=cfg, result=result))
+
+
+def unwrap_task_result(outcome: Dict[str, Any]) -> Any:
+    if not outcome.get("ok"):
+        raise PlanError(**outcome["error"])
+    return outcome["value"]
+
+
+PLAN_SCHEDULER = PlanScheduler()
@@ -0,0 +1,100 @@
+# src/menu_planner/api/plan_stream.py
+from __future__ import annotations
+
+import queue
+import threading
+import traceback
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from ..db.catalog_cache import CachedSQLiteRepo
+from ..engine.errors import PlanCancelled, PlanError
+from ..engine.planner import plan_month
+from ..engine.progress import EVENT_DAY
+from .json_response import encode_json
+from .metrics import observe_plan_perf
+from .procurement import ProcurementPricer, attach_procurement_details, cfg_date_range
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+EVENT_STAGE = "stage"
+EVENT_RESULT = "result"
+EVENT_ERROR = "error"
+
+_DONE = object()
+
+
+def encode_event(kind: str, payload: Dict[str, Any]) -> bytes:
+    return encode_json({"event": kind, **payload}) + b"\n"
+
+
+def stream_plan_events(
+    db_path: str,
+    cfg: Dict[str, Any],
+    runner: Callable[..., Dict[str, Any]] = plan_month,
+) -> Iterator[bytes]:
+    """
+    以 NDJSON 逐行輸出排餐過程：stage → mains → day（暫定，含採購明細）… → result / error。
+
+    排餐在背景執行緒跑，事件經 queue 交給呼叫端迭代；day 事件為回溯填菜當下的結果，
+    local search 之後可能再調整，最終以 result 事件（與 POST /plan 相同的 payload）為準。
+    迭代端提前關閉（用戶端斷線）時設定 cancel，引擎下一次回報進度即丟出 PlanCancelled 中止。
+    """
+    events: "queue.Queue[Any]" = queue.Queue()
+    cancel = threading.Event()
+    repo = CachedSQLiteRepo(db_path)
+    pricer_box: Dict[str, Optional[ProcurementPricer]] = {"pricer": None}
+    last_stage = {"stage": None}
+
+    def put(kind: str, payload: Dict[str, Any]) -> None:
+        events.put((kind, payload))
+
+    def progress(stage: str, day_index: Optional[int]) -> None:
+        if cancel.is_set():
+            raise PlanCancelled(day_index=day_index)
+        # 只在階段切換時送出，逐日進度由 day 事件表達
+        if stage != last_stage["stage"]:
+            last_stage["stage"] = stage
+            put(EVENT_STAGE, {"stage": stage})
+
+    def on_event(kind: str, payload: Dict[str, Any]) -> None:
+        if kind == EVENT_DAY:
+            if pricer_box["pricer"] is None:
+                pricer_box["pricer"] = ProcurementPricer.from_repo(cfg, repo, date_range=cfg_date_range(cfg))
+            payload["day"]["procurement"] = pricer_box["pricer"].day_details(payload["day"])
+        put(kind, payload)
+
+    def work() -> None:
+        try:
+            result = runner(db_path=db_path, cfg=cfg, progress=progress, on_event=on_event)
+            enriched = attach_procurement_details(result=result, cfg=cfg, repo=repo)
+            observe_plan_perf(enriched)
+            put(EVENT_RESULT, {"ok": True, "result": enriched})
+        except PlanCancelled:
+            pass
+        except PlanError as e:
+            put(EVENT_ERROR, {"ok": False, "errors": [e.to_dict()]})
+        except Exception as e:  # pragma: no cover - defensive worker boundary
+            put(EVENT_ERROR, {
+                "ok": False,
+                "errors": [{"code": "INTERNAL_ERROR", "message": str(e), "details": {"trace": traceback.format_exc()}}],
+            })
+        finally:
+            events.put(_DONE)
+
+    worker = threading.Thread(target=work, name="plan-stream", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = events.get()
+            if item is _DONE:
+                break
+            kind, payload = item
+            yield encode_event(kind, payload)
+    finally:
+        cancel.set()
+
+
+def cached_result_events(db_path: str, cfg: Dict[str, Any], result: Dict[str, Any]) -> Iterator[bytes]:
+    """排餐結果快取命中時直接送出最終 result 事件（沒有中間過程）。"""
+    enriched = attach_procurement_details(result=result, cfg=cfg, repo=CachedSQLiteRepo(db_path))
+    yield encode_event(EVENT_RESULT, {"ok": True, "result": enriched})
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import bisect
 from collections import defaultdict
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 from ..db.repo import DishIngredient, Ingredient, PriceItem, SQLiteRepo
+from ..db.units import UnitConverter
+from ..engine.perf import PerfRecorder
 from ..engine.roles import ROLE_ORDER, ROLE_PLURALS
 
 
@@ -14,18 +19,6 @@ def _to_float(value: Any, default: float = 0.0) -> float:
         return float(default)
 
 
-def _convert_unit(qty: float, from_unit: str, to_unit: str, conv: Dict[Tuple[str, str], float]) -> Optional[float]:
-    if from_unit == to_unit:
-        return qty
-    factor = conv.get((from_unit, to_unit))
-    if factor is not None:
-        return qty * factor
-    inverse = conv.get((to_unit, from_unit))
-    if inverse is not None and float(inverse) != 0:
-        return qty / float(inverse)
-    return None
-
-
 def _iter_day_dishes(day: Dict[str, Any]) -> Iterable[Tuple[str, Dict[str, Any]]]:
     items = day.get("items") or {}
     if not isinstance(items, dict):
@@ -60,6 +53,105 @@ def _resolve_day_people(
         return default_people
 
 
+DishLines = Dict[str, List[Tuple[DishIngredient, Optional[PriceItem], Optional[float]]]]
+
+
+def index_dish_lines(
+    dish_ingredients: List[DishIngredient],
+    prices: Dict[str, PriceItem],
+    unit_conversions: Union[UnitConverter, Dict[Tuple[str, str], float]],
+) -> DishLines:
+    # 每條菜色食材行只換算一次 factor（食材單位 -> 價格單位），逐日只需乘上人數
+    converter = UnitConverter.coerce(unit_conversions)
+    line_prices = [prices.get(di.ingredient_id) for di in dish_ingredients]
+    line_factors = converter.unit_factors(
+        [di.unit for di in dish_ingredients],
+        [p.unit if p else None for p in line_prices],
+    )
+    by_dish: DishLines = defaultdict(list)
+    for di, price, factor in zip(dish_ingredients, line_prices, line_factors):
+        by_dish[di.dish_id].append((di, price, factor))
+    return by_dish
+
+
+IngredientRows = Tuple[List[Dict[str, Any]], float]
+
+
+def _dish_ingredient_rows(
+    dish_id: str,
+    people: int,
+    lines_by_dish: DishLines,
+    ingredients: Dict[str, Ingredient],
+) -> IngredientRows:
+    ingredient_rows: List[Dict[str, Any]] = []
+    dish_total = 0.0
+    for di, price, factor in lines_by_dish.get(dish_id, []):
+        ing = ingredients.get(di.ingredient_id)
+        ingredient_name = ing.name if ing else di.ingredient_id
+
+        qty_for_people = round(di.qty * people, 4)
+
+        unit_price = None
+        unit_price_unit = None
+        line_total = None
+        price_date = None
+
+        if price and factor is not None:
+            qty_in_price_unit = qty_for_people * factor
+            unit_price = round(float(price.price_per_unit), 4)
+            unit_price_unit = price.unit
+            line_total = round(float(qty_in_price_unit) * float(price.price_per_unit), 2)
+            price_date = price.price_date
+            dish_total += line_total
+
+        ingredient_rows.append({
+            "ingredient_id": di.ingredient_id,
+            "ingredient_name": ingredient_name,
+            "qty_per_person": round(di.qty, 4),
+            "qty_for_people": qty_for_people,
+            "qty_unit": di.unit,
+            "unit_price": unit_price,
+            "unit_price_unit": unit_price_unit,
+            "line_total": line_total,
+            "price_date": price_date,
+        })
+    return ingredient_rows, dish_total
+
+
+def _procurement_day(
+    day: Dict[str, Any],
+    people: int,
+    dish_rows_for: Callable[[str, int], IngredientRows],
+) -> Dict[str, Any]:
+    # dish_rows_for 通常有快取：同一道菜在同樣人數（與價格）下的食材行只算一次，
+    # 共用的 ingredients 列表在不同日子間是同一個物件，呼叫端應視為唯讀
+    dish_rows: List[Dict[str, Any]] = []
+    day_total = 0.0
+
+    for role, dish in _iter_day_dishes(day):
+        dish_id = dish.get("id")
+        if not dish_id:
+            continue
+
+        ingredient_rows, dish_total = dish_rows_for(dish_id, people)
+        dish_rows.append({
+            "role": role,
+            "dish_id": dish_id,
+            "dish_name": dish.get("name") or dish_id,
+            "ingredients": ingredient_rows,
+            "dish_total": round(dish_total, 2),
+        })
+        day_total += dish_total
+
+    return {
+        "date": day.get("date"),
+        "day_index": day.get("day_index"),
+        "people": people,
+        "dishes": dish_rows,
+        "day_total": round(day_total, 2),
+    }
+
+
 def build_procurement_days(
     result: Dict[str, Any],
     default_people: int,
@@ -67,84 +159,160 @@ def build_procurement_days(
     dish_ingredients: List[DishIngredient],
     ingredients: Dict[str, Ingredient],
     prices: Dict[str, PriceItem],
-    unit_conversions: Dict[Tuple[str, str], float],
+    unit_conversions: Union[UnitConverter, Dict[Tuple[str, str], float]],
 ) -> List[Dict[str, Any]]:
-    by_dish: Dict[str, List[DishIngredient]] = defaultdict(list)
-    for di in dish_ingredients:
-        by_dish[di.dish_id].append(di)
-
-    out_days: List[Dict[str, Any]] = []
+    """以固定一組價格計算每天的採購明細。"""
+    lines_by_dish = index_dish_lines(dish_ingredients, prices, unit_conversions)
     override_map = people_overrides or {}
-    for day in (result.get("days") or []):
-        people = _resolve_day_people(day, default_people=default_people, people_overrides=override_map)
-        dish_rows: List[Dict[str, Any]] = []
-        day_total = 0.0
+    memo: Dict[Tuple[str, int], IngredientRows] = {}
 
-        for role, dish in _iter_day_dishes(day):
-            dish_id = dish.get("id")
-            if not dish_id:
-                continue
+    def dish_rows_for(dish_id: str, people: int) -> IngredientRows:
+        key = (dish_id, people)
+        if key not in memo:
+            memo[key] = _dish_ingredient_rows(dish_id, people, lines_by_dish, ingredients)
+        return memo[key]
 
-            ingredient_rows: List[Dict[str, Any]] = []
-            dish_total = 0.0
-            for di in by_dish.get(dish_id, []):
-                ing = ingredients.get(di.ingredient_id)
-                ingredient_name = ing.name if ing else di.ingredient_id
-
-                qty_for_people = round(di.qty * people, 4)
-                price = prices.get(di.ingredient_id)
-
-                unit_price = None
-                unit_price_unit = None
-                line_total = None
-                price_date = None
-
-                if price:
-                    qty_in_price_unit = _convert_unit(qty_for_people, di.unit, price.unit, unit_conversions)
-                    if qty_in_price_unit is not None:
-                        unit_price = round(float(price.price_per_unit), 4)
-                        unit_price_unit = price.unit
-                        line_total = round(float(qty_in_price_unit) * float(price.price_per_unit), 2)
-                        price_date = price.price_date
-                        dish_total += line_total
-
-                ingredient_rows.append({
-                    "ingredient_id": di.ingredient_id,
-                    "ingredient_name": ingredient_name,
-                    "qty_per_person": round(di.qty, 4),
-                    "qty_for_people": qty_for_people,
-                    "qty_unit": di.unit,
-                    "unit_price": unit_price,
-                    "unit_price_unit": unit_price_unit,
-                    "line_total": line_total,
-                    "price_date": price_date,
-                })
-
-            dish_rows.append({
-                "role": role,
-                "dish_id": dish_id,
-                "dish_name": dish.get("name") or dish_id,
-                "ingredients": ingredient_rows,
-                "dish_total": round(dish_total, 2),
-            })
-            day_total += dish_total
-
-        out_days.append({
-            "date": day.get("date"),
-            "day_index": day.get("day_index"),
-            "people": people,
-            "dishes": dish_rows,
-            "day_total": round(day_total, 2),
-        })
+    return [
+        _procurement_day(
+            day,
+            people=_resolve_day_people(day, default_people=default_people, people_overrides=override_map),
+            dish_rows_for=dish_rows_for,
+        )
+        for day in (result.get("days") or [])
+    ]
 
-    return out_days
 
+def procurement_date_range(days: Iterable[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+    """結果中日期的 (最早, 最晚)；有任何一天沒有日期時回 None（該天以最新價格計價，需要完整價格歷史）。"""
+    dates = [day.get("date") for day in days]
+    if not dates or not all(isinstance(d, str) and d for d in dates):
+        return None
+    return min(dates), max(dates)
 
-def attach_procurement_details(result: Dict[str, Any], cfg: Dict[str, Any], repo: SQLiteRepo) -> Dict[str, Any]:
+
+def cfg_date_range(cfg: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+    """排餐設定涵蓋的 (起日, 迄日)；缺 start_date 或格式不對時回 None。"""
+    try:
+        start = date.fromisoformat(str((cfg or {}).get("start_date") or ""))
+        horizon = max(1, int((cfg or {}).get("horizon_days") or 1))
+    except (TypeError, ValueError):
+        return None
+    return start.isoformat(), (start + timedelta(days=horizon - 1)).isoformat()
+
+
+def _cfg_people(cfg: Optional[Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
     people = max(1, int(_to_float((cfg or {}).get("people"), 250)))
     schedule = (cfg or {}).get("schedule") or {}
     people_overrides = schedule.get("people_overrides") if isinstance(schedule, dict) else {}
+    return people, people_overrides or {}
+
+
+class PriceBook:
+    """
+    食材價格歷史的 as-of 查詢：每天以當日(含)之前最新一筆價格計價，當日之前還沒有價格時用最早一筆；
+    沒有日期的日子用最新價格。
+    """
+
+    def __init__(self, price_history: Dict[str, List[PriceItem]]):
+        self.price_history = {k: v for k, v in price_history.items() if v}
+        self._dates = {k: [p.price_date for p in v] for k, v in self.price_history.items()}
+
+    def change_dates(self, ingredient_ids: Iterable[str]) -> List[str]:
+        """這些食材的所有價格異動日（排序、去重）；同一區段內它們的價格都不變。"""
+        return sorted({d for ingredient_id in ingredient_ids for d in self._dates.get(ingredient_id, [])})
+
+    def price_as_of(self, ingredient_id: str, date_text: str) -> Optional[PriceItem]:
+        history = self.price_history.get(ingredient_id)
+        if not history:
+            return None
+        pos = bisect.bisect_right(self._dates[ingredient_id], date_text)
+        return history[pos - 1] if pos > 0 else history[0]
+
+
+@dataclass(frozen=True)
+class ProcurementPricer:
+    """
+    預先載入價格/換算後逐日計算採購明細（串流端點每填好一天就計算一次）。
+    每天以 PriceBook 取當日有效價格；每道菜依其食材的價格異動日切成區段，
+    食材明細依 (菜色, 區段, 人數) 快取，長期間內只有價格真的變動時才重算。
+    """
+
+    default_people: int
+    people_overrides: Dict[str, Any]
+    ingredients: Dict[str, Ingredient]
+    dish_lines: Dict[str, List[DishIngredient]]
+    price_book: PriceBook
+    converter: UnitConverter
+    _segments: Dict[str, List[str]] = field(default_factory=dict, repr=False, compare=False)
+    _lines: Dict[Tuple[str, int], DishLines] = field(default_factory=dict, repr=False, compare=False)
+    _memo: Dict[Tuple[str, int, int], IngredientRows] = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def from_repo(
+        cls,
+        cfg: Optional[Dict[str, Any]],
+        repo: SQLiteRepo,
+        dish_ids: Optional[List[str]] = None,
+        date_range: Optional[Tuple[str, str]] = None,
+    ) -> "ProcurementPricer":
+        people, people_overrides = _cfg_people(cfg)
+        # 只載入被引用菜色的食材行、用到的食材與期間內用得到的價格歷史
+        inputs = repo.fetch_procurement_inputs(dish_ids, date_range)
+        dish_lines: Dict[str, List[DishIngredient]] = defaultdict(list)
+        for di in inputs.dish_ingredients:
+            dish_lines[di.dish_id].append(di)
+        return cls(
+            default_people=people,
+            people_overrides=people_overrides,
+            ingredients=inputs.ingredients,
+            dish_lines=dict(dish_lines),
+            price_book=PriceBook(inputs.price_history),
+            converter=repo.fetch_unit_converter(),
+        )
+
+    def _dish_segment(self, dish_id: str, date_text: Any) -> Tuple[int, str]:
+        """(區段編號, 區段起始的價格異動日)；沒有日期時視為最後一段，區段 0 的起始日為空字串。"""
+        dates = self._segments.get(dish_id)
+        if dates is None:
+            dates = self.price_book.change_dates(di.ingredient_id for di in self.dish_lines.get(dish_id, []))
+            self._segments[dish_id] = dates
+        if not isinstance(date_text, str) or not date_text:
+            segment = len(dates)
+        else:
+            segment = bisect.bisect_right(dates, date_text)
+        return segment, (dates[segment - 1] if segment > 0 else "")
 
+    def dish_rows(self, dish_id: str, people: int, date_text: Any) -> IngredientRows:
+        segment, as_of = self._dish_segment(dish_id, date_text)
+        key = (dish_id, segment, people)
+        cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+        lines = self._lines.get((dish_id, segment))
+        if lines is None:
+            dish_ingredients = self.dish_lines.get(dish_id, [])
+            prices: Dict[str, PriceItem] = {}
+            for di in dish_ingredients:
+                price = self.price_book.price_as_of(di.ingredient_id, as_of)
+                if price is not None:
+                    prices[di.ingredient_id] = price
+            lines = index_dish_lines(dish_ingredients, prices, self.converter)
+            self._lines[(dish_id, segment)] = lines
+        cached = _dish_ingredient_rows(dish_id, people, lines, self.ingredients)
+        self._memo[key] = cached
+        return cached
+
+    def day_details(self, day: Dict[str, Any]) -> Dict[str, Any]:
+        people = _resolve_day_people(day, default_people=self.default_people, people_overrides=self.people_overrides)
+        date_text = day.get("date")
+        return _procurement_day(
+            day,
+            people=people,
+            dish_rows_for=lambda dish_id, dish_people: self.dish_rows(dish_id, dish_people, date_text),
+        )
+
+
+def attach_procurement_details(result: Dict[str, Any], cfg: Dict[str, Any], repo: SQLiteRepo) -> Dict[str, Any]:
     dish_ids: List[str] = []
     for day in (result.get("days") or []):
         for _, dish in _iter_day_dishes(day):
@@ -152,25 +320,92 @@ def attach_procurement_details(result: Dict[str, Any], cfg: Dict[str, Any], repo
                 dish_ids.append(dish["id"])
     dish_ids = sorted(set(dish_ids))
 
-    dish_ingredients = repo.fetch_dish_ingredients(dish_ids)
-    ingredients = repo.fetch_ingredients()
-    prices = repo.fetch_latest_prices()
-    unit_conversions = repo.fetch_unit_conversions()
-
-    procurement_days = build_procurement_days(
-        result=result,
-        default_people=people,
-        people_overrides=people_overrides,
-        dish_ingredients=dish_ingredients,
-        ingredients=ingredients,
-        prices=prices,
-        unit_conversions=unit_conversions,
-    )
-
-    for day, detail in zip((result.get("days") or []), procurement_days):
-        day["procurement"] = detail
+    recorder = PerfRecorder()
+    with recorder.span("procurement"):
+        pricer = ProcurementPricer.from_repo(cfg, repo, dish_ids, procurement_date_range(result.get("days") or []))
+        for day in (result.get("days") or []):
+            day["procurement"] = pricer.day_details(day)
 
     summary = result.setdefault("summary", {})
-    summary["people"] = people
-    summary["people_overrides"] = people_overrides or {}
+    summary["people"] = pricer.default_people
+    summary["people_overrides"] = pricer.people_overrides
+    # 排餐產生的結果才有 debug.perf；使用者上傳的結果不另外加 debug 欄位
+    if isinstance(result.get("debug"), dict) and "perf" in result["debug"]:
+        recorder.merge_into(result)
     return result
+
+
+class ProcurementTable:
+    """
+    逐日採購明細攤平成欄位陣列（每列一條食材行），彙總時依指定欄位一次分組加總，
+    不必逐日重建巢狀 dict。day_pos 為有採購明細的日子的序號，week 為 day_pos // 7；
+    period 為距第一天的天數 // period_days（供應商叫貨週期），日期無法解析時改以 day_pos 計算。
+    """
+
+    KEY_COLUMNS = (
+        "day_pos", "week", "period", "ingredient_id", "ingredient_name", "qty_unit", "unit_price_unit", "unit_price",
+    )
+
+    def __init__(self) -> None:
+        self.day_pos: List[int] = []
+        self.week: List[int] = []
+        self.period: List[int] = []
+        self.ingredient_id: List[str] = []
+        self.ingredient_name: List[str] = []
+        self.qty_unit: List[str] = []
+        self.unit_price_unit: List[str] = []
+        self.unit_price: List[float] = []
+        self.qty: List[float] = []
+        self.total: List[float] = []
+        # 每個 day_pos 一筆：日期、人數與叫貨週期（沒有食材行的日子也要有小計列）
+        self.day_dates: List[Any] = []
+        self.day_people: List[Any] = []
+        self.day_periods: List[int] = []
+
+    @classmethod
+    def from_days(cls, days: Iterable[Dict[str, Any]], period_days: int = 7) -> "ProcurementTable":
+        table = cls()
+        period_days = max(1, int(period_days))
+        first_date: Optional[date] = None
+        for day in days:
+            procurement = day.get("procurement")
+            if not procurement:
+                continue
+            pos = len(table.day_dates)
+            try:
+                current = date.fromisoformat(str(day.get("date") or ""))
+            except ValueError:
+                current = None
+            if pos == 0:
+                first_date = current
+            offset = (current - first_date).days if current and first_date else pos
+            period = max(0, offset) // period_days
+            table.day_dates.append(day.get("date", ""))
+            table.day_people.append(procurement.get("people", ""))
+            table.day_periods.append(period)
+            for dish in (procurement.get("dishes") or []):
+                for ingredient in (dish.get("ingredients") or []):
+                    table.day_pos.append(pos)
+                    table.week.append(pos // 7)
+                    table.period.append(period)
+                    table.ingredient_id.append(str(ingredient.get("ingredient_id", "")))
+                    table.ingredient_name.append(str(ingredient.get("ingredient_name", "")))
+                    table.qty_unit.append(str(ingredient.get("qty_unit", "")))
+                    table.unit_price_unit.append(str(ingredient.get("unit_price_unit", "")))
+                    table.unit_price.append(_to_float(ingredient.get("unit_price"), 0.0))
+                    table.qty.append(_to_float(ingredient.get("qty_for_people"), 0.0))
+                    table.total.append(_to_float(ingredient.get("line_total"), 0.0))
+        return table
+
+    def __len__(self) -> int:
+        return len(self.day_pos)
+
+    def group_sum(self, keys: Iterable[str]) -> Dict[Tuple[Any, ...], Tuple[float, float]]:
+        """依 keys（KEY_COLUMNS 的子集）分組加總 (總量, 總價)；分組依第一次出現的順序。"""
+        columns = [getattr(self, key) for key in keys]
+        qty: Dict[Tuple[Any, ...], float] = {}
+        total: Dict[Tuple[Any, ...], float] = {}
+        for group, q, t in zip(zip(*columns), self.qty, self.total):
+            qty[group] = qty.get(group, 0.0) + q
+            total[group] = total.get(group, 0.0) + t
+        return {group: (qty[group], total[group]) for group in qty}
@@ -0,0 +1,111 @@
+# src/menu_planner/api/procurement_rollup.py
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from .procurement import ProcurementTable
+
+DEFAULT_PERIOD_DAYS = 7
+MAX_PERIOD_DAYS = 62
+
+
+def parse_period_days(raw: Any) -> Tuple[Optional[int], List[Dict[str, Any]]]:
+    """叫貨週期天數（1..MAX_PERIOD_DAYS）；未指定時為 DEFAULT_PERIOD_DAYS。回傳 (天數, errors)。"""
+    if raw is None or raw == "":
+        return DEFAULT_PERIOD_DAYS, []
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        value = 0
+    if not 1 <= value <= MAX_PERIOD_DAYS:
+        return None, [{
+            "code": "PROCUREMENT_PERIOD_INVALID",
+            "message": f"period_days 必須是 1~{MAX_PERIOD_DAYS} 的整數。",
+            "details": {"value": raw},
+        }]
+    return value, []
+
+
+def _ingredient_lines(groups: Dict[Tuple[Any, ...], Tuple[float, float]]) -> Dict[Any, List[Dict[str, Any]]]:
+    """(bucket, ingredient_id, ingredient_name, qty_unit) 分組結果 → 每個 bucket 依食材名稱排序的明細列。"""
+    out: Dict[Any, List[Dict[str, Any]]] = {}
+    for (bucket, ingredient_id, name, qty_unit), (qty, total) in groups.items():
+        out.setdefault(bucket, []).append({
+            "ingredient_id": ingredient_id,
+            "ingredient_name": name,
+            "qty": round(qty, 4),
+            "qty_unit": qty_unit,
+            "total": round(total, 2),
+        })
+    for lines in out.values():
+        lines.sort(key=lambda line: line["ingredient_name"])
+    return out
+
+
+def _buckets(
+    key: str,
+    day_buckets: List[int],
+    days: List[Dict[str, Any]],
+    lines: Dict[Any, List[Dict[str, Any]]],
+) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for bucket, day in zip(day_buckets, days):
+        if not out or out[-1][key] != bucket + 1:
+            out.append({key: bucket + 1, "start_date": day["date"], "end_date": day["date"], "total": 0.0,
+                        "lines": lines.get(bucket, [])})
+        entry = out[-1]
+        entry["end_date"] = day["date"]
+        entry["total"] += day["total"]
+    for entry in out:
+        entry["total"] = round(entry["total"], 2)
+    return out
+
+
+def build_procurement_rollup(result: Dict[str, Any], period_days: int = DEFAULT_PERIOD_DAYS) -> Dict[str, Any]:
+    """
+    整段期間的採購彙總（結果需已附 procurement）：
+    - days：每日依 (食材, 需求單位, 單價單位, 單價) 合併的明細，依食材名稱排序
+    - weeks：每 7 個排餐日一週、periods：每 period_days 天一個叫貨週期，各自依食材合併總量與總價
+    - ingredients：整段期間每種食材的總量與總價
+    小計一律為四捨五入到分的明細加總，Excel 匯出與 API 共用同一份結果。
+    """
+    table = ProcurementTable.from_days(result.get("days") or [], period_days=period_days)
+
+    by_day: Dict[int, List[Dict[str, Any]]] = {}
+    groups = table.group_sum(("day_pos", "ingredient_name", "qty_unit", "unit_price_unit", "unit_price"))
+    for (pos, name, qty_unit, price_unit, unit_price), (qty, total) in groups.items():
+        by_day.setdefault(pos, []).append({
+            "ingredient_name": name,
+            "qty": round(qty, 4),
+            "qty_unit": qty_unit,
+            "unit_price": round(unit_price, 4) if unit_price else None,
+            "unit_price_unit": price_unit,
+            "total": round(total, 2),
+        })
+
+    days: List[Dict[str, Any]] = []
+    for pos, date_text in enumerate(table.day_dates):
+        lines = sorted(by_day.get(pos, []), key=lambda line: line["ingredient_name"])
+        days.append({
+            "date": date_text,
+            "people": table.day_people[pos],
+            "week": pos // 7 + 1,
+            "period": table.day_periods[pos] + 1,
+            "lines": lines,
+            "total": round(sum(line["total"] for line in lines), 2),
+        })
+
+    identity = ("ingredient_id", "ingredient_name", "qty_unit")
+    week_lines = _ingredient_lines(table.group_sum(("week", *identity)))
+    period_lines = _ingredient_lines(table.group_sum(("period", *identity)))
+    horizon = {(0, *key): value for key, value in table.group_sum(identity).items()}
+    horizon_lines = _ingredient_lines(horizon).get(0, [])
+
+    return {
+        "period_days": period_days,
+        "days": days,
+        "weeks": _buckets("week", [pos // 7 for pos in range(len(days))], days, week_lines),
+        "periods": _buckets("period", list(table.day_periods), days, period_lines),
+        "ingredients": horizon_lines,
+        "grand_total": round(sum(day["total"] for day in days), 2),
+    }
@@ -0,0 +1,270 @@
+# src/menu_planner/api/profiling.py
+from __future__ import annotations
+
+import cProfile
+import json
+import marshal
+import os
+import pstats
+import re
+import secrets
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import Header, HTTPException, Query
+
+from ..env import env_int
+from .auth import require_db_operator
+from .auth.dependencies import current_user
+
+PROFILE_CPROFILE = "cprofile"
+PROFILE_TRACEMALLOC = "tracemalloc"
+PROFILE_MODES = (PROFILE_CPROFILE, PROFILE_TRACEMALLOC)
+
+PROFILE_ARTIFACT_HEADER = "X-Profile-Artifact"
+
+DEFAULT_TOP_N = 30
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_DIR = str(Path(tempfile.gettempdir()) / "menu-planner-profiles")
+TRACEMALLOC_FRAMES = 16
+BUSY_RETRY_AFTER_SECONDS = 10
+
+_ARTIFACT_NAME = re.compile(r"^[A-Za-z0-9_-]+\.(prof|json)$")
+
+# cProfile（3.12 起同時只能有一個）與 tracemalloc 都是整個 process 共用，一次只允許一個剖析請求
+_ACTIVE = threading.Lock()
+
+
+def parse_profile_mode(raw: Any) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """剖析模式（cprofile / tracemalloc）；未指定時為 None。回傳 (模式, errors)。"""
+    value = str(raw or "").strip().lower()
+    if not value:
+        return None, []
+    if value not in PROFILE_MODES:
+        return None, [{
+            "code": "PROFILE_MODE_INVALID",
+            "message": f"profile 必須是 {' / '.join(PROFILE_MODES)}。",
+            "details": {"value": raw},
+        }]
+    return value, []
+
+
+class ProfileArtifactStore:
+    """
+    剖析結果檔（.prof / .json）的目錄，以位元組數設上限，超過時刪除最舊的檔案；max_bytes 設 0 即不保存。
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.directory = directory or (os.getenv("MENU_PROFILE_DIR") or "").strip() or DEFAULT_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else env_int("MENU_PROFILE_MAX_BYTES", DEFAULT_MAX_BYTES)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def save(self, prefix: str, suffix: str, data: bytes) -> Optional[str]:
+        if not self.enabled or len(data) > self.max_bytes:
+            return None
+        name = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(3)}{suffix}"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(prefix=".profile.", dir=self.directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                path = Path(self.directory) / name
+                os.replace(tmp_name, path)
+            finally:
+                if os.path.exists(tmp_name):
+                    os.unlink(tmp_name)
+            self._evict(keep=path)
+        return name
+
+    def path(self, name: str) -> Optional[Path]:
+        """檔名不合格式（含路徑分隔字元）或不存在時回傳 None。"""
+        if not _ARTIFACT_NAME.match(name):
+            return None
+        path = Path(self.directory) / name
+        return path if path.is_file() else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [
+            {"name": path.name, "size_bytes": size, "created_at": datetime.fromtimestamp(mtime).isoformat()}
+            for mtime, size, path in sorted(self._files(), reverse=True)
+        ]
+
+    def _files(self) -> List[Tuple[float, int, Path]]:
+        if not os.path.isdir(self.directory):
+            return []
+        out: List[Tuple[float, int, Path]] = []
+        for entry in os.scandir(self.directory):
+            if not _ARTIFACT_NAME.match(entry.name):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, Path(entry.path)))
+        return out
+
+    def _evict(self, keep: Optional[Path] = None) -> None:
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+PROFILE_STORE = ProfileArtifactStore()
+
+
+def _cprofile_hotspots(stats: Dict[Any, Any], top_n: int) -> List[Dict[str, Any]]:
+    # pstats 格式：{(file, line, name): (primitive_calls, calls, self_sec, cumulative_sec, callers)}
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top_n]
+    return [
+        {
+            "function": pstats.func_std_string(func),
+            "calls": nc,
+            "primitive_calls": cc,
+            "self_ms": round(tt * 1000, 3),
+            "cumulative_ms": round(ct * 1000, 3),
+        }
+        for func, (cc, nc, tt, ct, _) in rows
+    ]
+
+
+def _tracemalloc_hotspots(snapshot: tracemalloc.Snapshot, key_type: str, top_n: int) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for stat in snapshot.statistics(key_type)[:top_n]:
+        frames = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+        row: Dict[str, Any] = {"size_kb": round(stat.size / 1024, 1), "count": stat.count}
+        if key_type == "traceback":
+            row["traceback"] = frames
+        else:
+            row["location"] = frames[0]
+        out.append(row)
+    return out
+
+
+class ProfileSession:
+    """
+    單一請求的剖析：在 active() 區塊內以 cProfile 或 tracemalloc 執行，結束後產生 report。
+
+    - 只剖析呼叫端執行緒（cProfile）；tracemalloc 記錄整個 process 的配置，同時段其他請求也會算進去
+    - report 含前 N 個熱點，完整結果另存到 PROFILE_STORE（.prof 可用 pstats / snakeviz 開啟）
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        endpoint: str,
+        top_n: Optional[int] = None,
+        store: Optional[ProfileArtifactStore] = None,
+    ):
+        self.mode = mode
+        self.endpoint = endpoint
+        self.top_n = top_n if top_n is not None else env_int("MENU_PROFILE_TOP_N", DEFAULT_TOP_N, minimum=1)
+        self.store = store or PROFILE_STORE
+        self.report: Optional[Dict[str, Any]] = None
+
+    @contextmanager
+    def active(self) -> Iterator["ProfileSession"]:
+        if not _ACTIVE.acquire(blocking=False):
+            raise HTTPException(
+                status_code=429,
+                detail={"ok": False, "errors": [{"code": "PROFILE_BUSY", "message": "已有剖析中的請求，請稍後再試。"}]},
+                headers={"Retry-After": str(BUSY_RETRY_AFTER_SECONDS)},
+            )
+        try:
+            runner = self._cprofile if self.mode == PROFILE_CPROFILE else self._tracemalloc
+            with runner():
+                yield self
+        finally:
+            _ACTIVE.release()
+
+    @contextmanager
+    def _cprofile(self) -> Iterator[None]:
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            wall_ms = (time.perf_counter() - started) * 1000
+            stats = pstats.Stats(profiler).stats  # type: ignore[attr-defined]
+            self._finish(
+                wall_ms,
+                {"hotspots": _cprofile_hotspots(stats, self.top_n)},
+                ".prof",
+                marshal.dumps(stats),
+            )
+
+    @contextmanager
+    def _tracemalloc(self) -> Iterator[None]:
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_ms = (time.perf_counter() - started) * 1000
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            ))
+            if started_here:
+                tracemalloc.stop()
+            summary = {
+                "peak_kb": round((peak - baseline) / 1024, 1),
+                "retained_kb": round((current - baseline) / 1024, 1),
+                "hotspots": _tracemalloc_hotspots(snapshot, "lineno", self.top_n),
+            }
+            artifact = {**summary, "tracebacks": _tracemalloc_hotspots(snapshot, "traceback", self.top_n)}
+            self._finish(wall_ms, summary, ".json", json.dumps(artifact, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    def _finish(self, wall_ms: float, summary: Dict[str, Any], suffix: str, data: bytes) -> None:
+        self.report = {
+            "mode": self.mode,
+            "endpoint": self.endpoint,
+            "wall_ms": round(wall_ms, 3),
+            **summary,
+            "artifact": self.store.save(f"{self.endpoint}_{self.mode}", suffix, data),
+        }
+
+
+def profile_session_for(endpoint: str):
+    """
+    route 參數用的 dependency：?profile=cprofile|tracemalloc 時驗證權限（資料庫操作者以上）並回傳 ProfileSession；
+    未指定時回傳 None，不需登入。
+    """
+
+    def dependency(
+        profile: Optional[str] = Query(default=None),
+        authorization: Optional[str] = Header(default=None),
+    ) -> Optional[ProfileSession]:
+        mode, errs = parse_profile_mode(profile)
+        if errs:
+            raise HTTPException(status_code=400, detail={"ok": False, "errors": errs})
+        if mode is None:
+            return None
+        require_db_operator(current_user(authorization))
+        return ProfileSession(mode, endpoint)
+
+    return dependency
@@ -0,0 +1,135 @@
+# src/menu_planner/api/result_compact.py
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+FORMAT_FULL = "full"
+FORMAT_COMPACT = "compact"
+RESULT_FORMATS = (FORMAT_FULL, FORMAT_COMPACT)
+
+
+def parse_result_format(raw: Any) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """回應格式（full / compact）；未指定時為 full。回傳 (格式, errors)。"""
+    value = str(raw or FORMAT_FULL).strip().lower()
+    if value not in RESULT_FORMATS:
+        return None, [{
+            "code": "RESULT_FORMAT_INVALID",
+            "message": f"format 必須是 {' / '.join(RESULT_FORMATS)}。",
+            "details": {"value": raw},
+        }]
+    return value, []
+
+
+class _CompactEncoder:
+    """逐日把菜色紀錄換成 id、採購食材明細換成 procurement_rows 的索引；同一份紀錄只留一份。"""
+
+    def __init__(self) -> None:
+        self.dishes: Dict[str, Dict[str, Any]] = {}
+        self.rows: List[List[Dict[str, Any]]] = []
+        self._row_index: Dict[Any, int] = {}
+
+    def dish(self, record: Any) -> Any:
+        if not isinstance(record, dict) or not isinstance(record.get("id"), str):
+            return record
+        did = record["id"]
+        known = self.dishes.get(did)
+        if known is None:
+            self.dishes[did] = record
+            return did
+        # 同 id 但內容不同（例如使用者上傳的結果）時保留完整紀錄，確保可還原
+        return did if known is record or known == record else record
+
+    def row(self, lines: Any) -> Any:
+        if not isinstance(lines, list):
+            return lines
+        try:
+            key = tuple(tuple(line.items()) for line in lines)
+            index = self._row_index.get(key)
+        except (AttributeError, TypeError):
+            return lines
+        if index is None:
+            index = self._row_index[key] = len(self.rows)
+            self.rows.append(lines)
+        return index
+
+    def day(self, day: Any) -> Any:
+        if not isinstance(day, dict):
+            return day
+        out = dict(day)
+        items = day.get("items")
+        if isinstance(items, dict):
+            out["items"] = {
+                slot: [self.dish(x) for x in value] if isinstance(value, list) else self.dish(value)
+                for slot, value in items.items()
+            }
+        procurement = day.get("procurement")
+        if isinstance(procurement, dict) and isinstance(procurement.get("dishes"), list):
+            out["procurement"] = {
+                **procurement,
+                "dishes": [
+                    {**d, "ingredients": self.row(d.get("ingredients"))} if isinstance(d, dict) else d
+                    for d in procurement["dishes"]
+                ],
+            }
+        return out
+
+
+def compact_days(days: List[Any]) -> Dict[str, Any]:
+    """只壓縮部分日子（局部 enrich 的回應）：回傳 {"days", "dishes", "procurement_rows"}。"""
+    encoder = _CompactEncoder()
+    out_days = [encoder.day(day) for day in days]
+    return {"days": out_days, "dishes": encoder.dishes, "procurement_rows": encoder.rows}
+
+
+def compact_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    排餐結果的精簡格式：菜色紀錄收到頂層 dishes（以 id 為 key），各日 items 只放 id；
+    採購食材明細收到頂層 procurement_rows，各日只放索引。不修改傳入的結果，expand_result 可完整還原。
+    """
+    out = {k: v for k, v in result.items() if k != "days"}
+    out.update(compact_days(result.get("days") or []))
+    out["format"] = FORMAT_COMPACT
+    return out
+
+
+def expand_days(days: List[Any], dishes: Dict[str, Any], rows: List[Any]) -> List[Any]:
+    def dish(value: Any) -> Any:
+        return dishes.get(value, value) if isinstance(value, str) else value
+
+    def row(value: Any) -> Any:
+        return rows[value] if isinstance(value, int) and 0 <= value < len(rows) else value
+
+    out: List[Any] = []
+    for day in days:
+        if not isinstance(day, dict):
+            out.append(day)
+            continue
+        day = dict(day)
+        items = day.get("items")
+        if isinstance(items, dict):
+            day["items"] = {
+                slot: [dish(x) for x in value] if isinstance(value, list) else dish(value)
+                for slot, value in items.items()
+            }
+        procurement = day.get("procurement")
+        if isinstance(procurement, dict) and isinstance(procurement.get("dishes"), list):
+            day["procurement"] = {
+                **procurement,
+                "dishes": [
+                    {**d, "ingredients": row(d.get("ingredients"))} if isinstance(d, dict) else d
+                    for d in procurement["dishes"]
+                ],
+            }
+        out.append(day)
+    return out
+
+
+def expand_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """compact_result 的反向；不是精簡格式時原樣回傳。展開後共用的菜色 / 明細紀錄視為唯讀。"""
+    if not isinstance(result, dict) or result.get("format") != FORMAT_COMPACT:
+        return result
+    dishes = result.get("dishes") if isinstance(result.get("dishes"), dict) else {}
+    rows = result.get("procurement_rows") if isinstance(result.get("procurement_rows"), list) else []
+    out = {k: v for k, v in result.items() if k not in ("format", "dishes", "procurement_rows", "days")}
+    out["days"] = expand_days(result.get("days") or [], dishes, rows)
+    return out
@@ -0,0 +1,258 @@
+# src/menu_planner/api/result_enrich.py
+from __future__ import annotations
+
+import copy
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..db.catalog_cache import CachedSQLiteRepo
+from ..db.repo import Dish, SQLiteRepo
+from ..engine.constraints import PlanDay
+from ..engine.explain import build_summary, dish_info, plan_day_from_output
+from ..engine.features import DishFeatures, build_dish_features
+from ..engine.local_search import compute_total_score
+from ..engine.roles import ROLE_PLURALS
+from .procurement import ProcurementPricer, attach_procurement_details, procurement_date_range
+
+
+def resolve_result_start_date(cfg: Dict[str, Any], result: Dict[str, Any]) -> date:
+    start_date_raw = cfg.get("start_date")
+    if isinstance(start_date_raw, str) and start_date_raw.strip():
+        return datetime.strptime(start_date_raw.strip(), "%Y-%m-%d").date()
+    first_day = (result.get("days") or [{}])[0]
+    first_day_date = first_day.get("date")
+    if isinstance(first_day_date, str) and first_day_date.strip():
+        return datetime.strptime(first_day_date.strip(), "%Y-%m-%d").date()
+    return date.today()
+
+
+def _scoring_hard(cfg: Dict[str, Any], all_dishes: List[Dish]) -> Dict[str, Any]:
+    # 複製一份：cfg 可能是 RESULT_STORE 保存的原始設定，目錄的星期規則不能寫回去
+    hard = dict((cfg.get("hard") or {}) if isinstance(cfg, dict) else {})
+    catalog_rules = {}
+    for dish in all_dishes:
+        weekdays = list(getattr(dish, "allowed_weekdays", []) or [])
+        if 0 < len(weekdays) < 7 and dish.id not in (hard.get("dish_allowed_weekdays") or {}):
+            catalog_rules[dish.id] = weekdays
+    if catalog_rules:
+        hard["dish_allowed_weekdays"] = {**catalog_rules, **(hard.get("dish_allowed_weekdays") or {})}
+    return hard
+
+
+def _dish_features(repo: SQLiteRepo, dishes: List[Dish], start_date: date, dish_ids: Optional[List[str]] = None) -> Dict[str, DishFeatures]:
+    return build_dish_features(
+        dishes=dishes,
+        dish_ingredients=repo.fetch_dish_ingredients(dish_ids) if dish_ids is not None else repo.fetch_dish_ingredients(),
+        ingredients=repo.fetch_ingredients(),
+        prices=repo.fetch_latest_prices(),
+        inventory=repo.fetch_inventory(),
+        conv=repo.fetch_unit_conversions(),
+        today=start_date,
+    )
+
+
+def _apply_day_score(day: Dict[str, Any], detail: Dict[str, Any]) -> None:
+    raw = round(float(detail.get("score") or 0.0), 2)
+    breakdown = detail.get("score_breakdown") or {}
+    bonus = round(sum(-float(v) for v in breakdown.values() if float(v) < 0), 2)
+    penalty = round(sum(float(v) for v in breakdown.values() if float(v) > 0), 2)
+    fitness = round(-raw, 2)
+
+    day["score"] = raw
+    day["score_breakdown"] = breakdown
+    day["score_fitness"] = fitness
+    day["score_summary"] = {
+        "bonus": bonus,
+        "penalty": penalty,
+        "raw": raw,
+        "fitness": fitness,
+    }
+
+
+def recompute_scores_for_result(cfg: Dict[str, Any], result: Dict[str, Any], repo: SQLiteRepo) -> None:
+    days = result.get("days") or []
+    if not days:
+        return
+
+    soft = (cfg.get("soft") or {}) if isinstance(cfg, dict) else {}
+    weights = (cfg.get("weights") or {}) if isinstance(cfg, dict) else {}
+    start_date = resolve_result_start_date(cfg, result)
+
+    all_dishes = repo.fetch_dishes()
+    hard = _scoring_hard(cfg, all_dishes)
+    feat = _dish_features(repo, all_dishes, start_date)
+
+    plan_days = [plan_day_from_output(day) for day in days]
+
+    _, details = compute_total_score(
+        plan_days=plan_days,
+        feat=feat,
+        hard=hard,
+        weights=weights,
+        soft=soft,
+        start_date=start_date,
+    )
+    detail_by_index = {d.get("day_index"): d for d in details if d.get("day_index") is not None}
+
+    total_score = 0.0
+    total_fitness = 0.0
+    for idx, day in enumerate(days):
+        detail = detail_by_index.get(idx)
+        if detail is None:
+            continue
+        _apply_day_score(day, detail)
+        total_score += day["score"]
+        total_fitness += day["score_fitness"]
+
+    summary = result.setdefault("summary", {})
+    summary["total_score"] = round(total_score, 2)
+    summary["total_fitness"] = round(total_fitness, 2)
+
+
+def enrich_result(db_path: str, cfg: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    """使用者手動編輯菜單後：重算採購明細與每日分數（POST /result/enrich）。"""
+    repo = CachedSQLiteRepo(db_path)
+    enriched = attach_procurement_details(result=result, cfg=cfg, repo=repo)
+    recompute_scores_for_result(cfg=cfg, result=enriched, repo=repo)
+    return enriched
+
+
+def parse_result_changes(changes: Any, horizon_days: int) -> Tuple[Dict[int, Dict[str, List[str]]], List[Dict[str, Any]]]:
+    """
+    changes = {"<day_index>": {"main": ["m1"], "side": ["s1", "s2"], ...}}（角色用單數，值為該角色整組菜色 id）。
+    回傳 (day_index -> role -> ids, errors)；未列出的角色維持原樣。
+    """
+    if not isinstance(changes, dict) or not changes:
+        return {}, [{"code": "RESULT_PATCH_INVALID", "message": "changes 必須是非空物件。"}]
+    out: Dict[int, Dict[str, List[str]]] = {}
+    for raw_index, roles in changes.items():
+        try:
+            index = int(raw_index)
+        except (TypeError, ValueError):
+            index = -1
+        if not (0 <= index < horizon_days) or not isinstance(roles, dict):
+            return {}, [{"code": "RESULT_PATCH_INVALID", "message": "changes 的日子超出排餐期間或格式錯誤。", "details": {"day_index": raw_index}}]
+        for role, ids in roles.items():
+            if role not in ROLE_PLURALS or not isinstance(ids, list) or not all(isinstance(x, str) for x in ids):
+                return {}, [{
+                    "code": "RESULT_PATCH_INVALID",
+                    "message": "changes 的角色不存在，或菜色不是 id 陣列。",
+                    "details": {"day_index": index, "role": role},
+                }]
+        out[index] = {role: [x for x in ids if x] for role, ids in roles.items()}
+    return out, []
+
+
+def _next_scheduled_index(plan_days: List[PlanDay], index: int) -> Optional[int]:
+    for j in range(index + 1, len(plan_days)):
+        if plan_days[j].main:
+            return j
+    return None
+
+
+def _prev_scheduled_index(plan_days: List[PlanDay], index: int) -> int:
+    for j in range(index - 1, -1, -1):
+        if plan_days[j].main:
+            return j
+    return index
+
+
+def patch_result(
+    db_path: str,
+    cfg: Dict[str, Any],
+    result: Dict[str, Any],
+    changes: Dict[int, Dict[str, List[str]]],
+) -> Tuple[Dict[str, Any], List[int]]:
+    """
+    只套用 changes 並重算受影響的日子：被改的日子重算菜色資訊、成本、採購明細與分數；
+    其後第一個排餐日的分數依賴前一天主菜的肉類 / 菜系，只重算分數。
+    不修改傳入的 result：回傳新的 result（未受影響的日子與原物件共用）與重算過的 day_index。
+
+    分數以「前一個排餐日 ~ 該日」的片段計算，等同整份重算時該日的結果。
+    整份重算只要有任何一天不符 compute_total_score 的格式或成本範圍就整體放棄；
+    這裡只看片段，片段不合格時該日分數維持原值。
+    """
+    days = list(result.get("days") or [])
+    soft = (cfg.get("soft") or {}) if isinstance(cfg, dict) else {}
+    weights = (cfg.get("weights") or {}) if isinstance(cfg, dict) else {}
+    start_date = resolve_result_start_date(cfg, result)
+    repo = CachedSQLiteRepo(db_path)
+
+    for index in changes:
+        days[index] = copy.deepcopy(days[index])
+    plan_days = [plan_day_from_output(day) for day in days]
+    for index, roles in changes.items():
+        plan_days[index] = _replace_roles(plan_days[index], roles)
+
+    affected = set(changes)
+    for index in changes:
+        nxt = _next_scheduled_index(plan_days, index)
+        if nxt is not None and nxt not in affected:
+            days[nxt] = copy.deepcopy(days[nxt])
+            affected.add(nxt)
+    windows = {i: (_prev_scheduled_index(plan_days, i), i) for i in affected}
+
+    dish_ids = sorted({
+        x for lo, hi in windows.values() for d in plan_days[lo:hi + 1]
+        for x in [*d.mains, *d.noodles, *d.sides, *d.vegs, *d.soups, *d.fruits] if x
+    })
+    all_dishes = repo.fetch_dishes()
+    dishes_by_id = {d.id: d for d in all_dishes}
+    hard = _scoring_hard(cfg, all_dishes)
+    feat = _dish_features(repo, [dishes_by_id[x] for x in dish_ids if x in dishes_by_id], start_date, dish_ids)
+
+    pricer = ProcurementPricer.from_repo(cfg, repo, dish_ids, procurement_date_range(days[i] for i in changes))
+    for index in sorted(changes):
+        day, d = days[index], plan_days[index]
+        items = day.setdefault("items", {})
+        for role in changes[index]:
+            ids = [*getattr(d, ROLE_PLURALS[role])]
+            infos = [dish_info(x, dishes_by_id, feat) for x in ids]
+            items[ROLE_PLURALS[role]] = infos
+            if role != "side":
+                items[role] = infos[0] if infos else dish_info("", dishes_by_id, feat)
+        day["day_cost"] = round(sum(
+            feat[x].cost_per_serving for x in [*d.mains, *d.noodles, *d.sides, *d.vegs, *d.soups, *d.fruits] if x in feat
+        ), 2)
+        day["manual_adjusted"] = True
+        day["procurement"] = pricer.day_details(day)
+
+    for index in sorted(affected):
+        lo, hi = windows[index]
+        _, details = compute_total_score(
+            plan_days=plan_days[lo:hi + 1],
+            feat=feat,
+            hard=hard,
+            weights=weights,
+            soft=soft,
+            start_date=start_date + timedelta(days=lo),
+        )
+        if details:
+            _apply_day_score(days[index], details[-1])
+
+    patched = {**result, "days": days, "summary": {**(result.get("summary") or {}), **_totals(days)}}
+    return patched, sorted(affected)
+
+
+def _replace_roles(day: PlanDay, roles: Dict[str, List[str]]) -> PlanDay:
+    lists = {plural: list(getattr(day, plural)) for plural in ROLE_PLURALS.values()}
+    for role, ids in roles.items():
+        lists[ROLE_PLURALS[role]] = list(ids)
+    return PlanDay(
+        main=(lists["mains"] or [""])[0],
+        sides=lists["sides"],
+        veg=(lists["vegs"] or [""])[0],
+        soup=(lists["soups"] or [""])[0],
+        fruit=(lists["fruits"] or [""])[0],
+        noodle=(lists["noodles"] or [""])[0],
+        mains=lists["mains"],
+        noodles=lists["noodles"],
+        vegs=lists["vegs"],
+        soups=lists["soups"],
+        fruits=lists["fruits"],
+    )
+
+
+def _totals(days: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = build_summary(days)
+    return {k: summary[k] for k in ("total_cost", "avg_cost_per_day", "total_score", "total_fitness")}
@@ -0,0 +1,67 @@
+# src/menu_planner/api/result_store.py
+from __future__ import annotations
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from ..env import env_int
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_TTL_SECONDS = 4 * 3600
+
+
+@dataclass(frozen=True)
+class StoredResult:
+    cfg: Dict[str, Any]
+    result: Dict[str, Any]
+    created_at: float
+
+
+class ResultStore:
+    """
+    已附採購明細 / 分數的排餐結果暫存，以 result_token 取回，讓局部 enrich 不必每次上傳整份結果。
+
+    - 存放的結果視為不可變：局部 enrich 產生新版本（只複製改到的日子）並發新 token，舊版本不受影響
+    - 最多 max_entries 筆（LRU），ttl_seconds 後過期；只在單一 process 記憶體內，重啟即失效
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else env_int(
+            "MENU_RESULT_STORE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else env_int(
+            "MENU_RESULT_STORE_TTL_SECONDS", DEFAULT_TTL_SECONDS
+        )
+        self._items: "OrderedDict[str, StoredResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, cfg: Dict[str, Any], result: Dict[str, Any]) -> Optional[str]:
+        if self.max_entries <= 0:
+            return None
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._items[token] = StoredResult(cfg=cfg, result=result, created_at=time.time())
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return token
+
+    def get(self, token: str) -> Optional[StoredResult]:
+        with self._lock:
+            item = self._items.get(token)
+            if item is None:
+                return None
+            if self.ttl_seconds > 0 and time.time() - item.created_at > self.ttl_seconds:
+                del self._items[token]
+                return None
+            self._items.move_to_end(token)
+            return item
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+RESULT_STORE = ResultStore()
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import sqlite3
 import shutil
+import time
 from datetime import date, datetime
 from io import BytesIO
 from pathlib import Path
@@ -16,20 +17,28 @@ from openpyxl.utils import get_column_letter
 from pydantic import BaseModel, Field, field_validator
 
 from ..auth import require_data_editor, require_db_operator
+from ..conditional import catalog_conditional
+from ..metrics import BACKUP_COALESCED, BACKUP_DURATION
 from ...db.admin_repo import SQLiteAdminRepo
+from ...db.catalog_cache import notify_catalog_changed
 from ...db.backup import (
     BACKUP_REASON_DEFAULT,
-    create_db_backup,
+    CoalescedBackupScheduler,
     get_backup_metadata_map,
     remove_backup_metadata,
     upsert_backup_metadata,
 )
+from ...env import DEFAULT_DB_PATH
 
-DEFAULT_DB_PATH = str((__import__("pathlib").Path.cwd() / "data" / "menu.db").resolve())
 
 router = APIRouter(prefix="/admin/catalog", tags=["admin-catalog"])
 BACKUP_WARNING_THRESHOLD_BYTES = 500 * 1024 * 1024
 
+# 修改前備份：同一個資料庫在 MENU_BACKUP_COALESCE_MINUTES（預設 10）分鐘內只建立一份快照，檔案在背景寫入
+PRE_MODIFY_BACKUPS = CoalescedBackupScheduler(
+    observer=lambda seconds, outcome: BACKUP_DURATION.observe(seconds, outcome=outcome),
+)
+
 
 def _timestamp_for_filename() -> str:
     return datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -63,13 +72,27 @@ def backup_before_modify(
     db_path: str,
     reason: str = BACKUP_REASON_DEFAULT,
     comment: str = "",
+    coalesce: bool = True,
 ) -> None:
+    """
+    修改前的快照在本執行緒完成（記憶體內），備份檔在背景寫入；合併期間內的後續修改不再備份。
+    coalesce=False（手動備份、還原前快照）時一定新建，並等備份檔寫完。
+    """
+    started = time.perf_counter()
     try:
-        create_db_backup(db_path, reason=reason, comment=comment)
+        window, created = PRE_MODIFY_BACKUPS.request(db_path, reason=reason, comment=comment, coalesce=coalesce)
     except FileNotFoundError:
         raise HTTPException(status_code=500, detail=f"資料庫檔案不存在：{db_path}")
     except Exception as e:
+        BACKUP_DURATION.observe(time.perf_counter() - started, outcome="error")
         raise HTTPException(status_code=500, detail=f"建立資料庫備份失敗：{e}")
+    if not created:
+        BACKUP_COALESCED.inc()
+    if coalesce:
+        return
+    window.wait()
+    if window.error is not None:
+        raise HTTPException(status_code=500, detail=f"建立資料庫備份失敗：{window.error}")
 
 
 def repo_with_backup(
@@ -179,7 +202,7 @@ class EntityDeleteIn(BaseModel):
     id: str = Field(min_length=1)
 
 
-@router.get("/ingredients")
+@router.get("/ingredients", dependencies=[Depends(catalog_conditional)])
 def list_ingredients(
     q: Optional[str] = Query(default=None),
     page: int = Query(default=1, ge=1),
@@ -190,7 +213,7 @@ def list_ingredients(
     return repo.list_ingredients(q=q, page=page, page_size=page_size)
 
 
-@router.get("/dishes")
+@router.get("/dishes", dependencies=[Depends(catalog_conditional)])
 def list_dishes(
     q: Optional[str] = Query(default=None),
     role: Optional[str] = Query(default=None),
@@ -300,7 +323,7 @@ class IngredientRenameIn(IngredientUpsert):
     target_id: str = Field(min_length=1)
 
 
-@router.get("/ingredients/{ingredient_id}/prices")
+@router.get("/ingredients/{ingredient_id}/prices", dependencies=[Depends(catalog_conditional)])
 def list_prices(
     ingredient_id: str,
     limit: int = Query(default=30, ge=1, le=365),
@@ -350,7 +373,7 @@ def delete_price(
     return {"ok": True}
 
 
-@router.get("/ingredients/{ingredient_id}/inventory")
+@router.get("/ingredients/{ingredient_id}/inventory", dependencies=[Depends(catalog_conditional)])
 def get_inventory(
     ingredient_id: str,
     db_path: str = Query(default=DEFAULT_DB_PATH),
@@ -378,7 +401,7 @@ def upsert_inventory(
     return {"ok": True}
 
 
-@router.get("/inventory/summary")
+@router.get("/inventory/summary", dependencies=[Depends(catalog_conditional)])
 def list_inventory_summary(
     q: Optional[str] = Query(default=None),
     only_in_stock: bool = Query(default=False),
@@ -388,7 +411,7 @@ def list_inventory_summary(
     return repo.list_inventory_summary(q=q, only_in_stock=only_in_stock)
 
 
-@router.get("/unit-conversions")
+@router.get("/unit-conversions", dependencies=[Depends(catalog_conditional)])
 def list_unit_conversions(
     db_path: str = Query(default=DEFAULT_DB_PATH),
 ):
@@ -515,7 +538,7 @@ def create_manual_db_backup(
 ):
     reason = str(body.reason or "admin_manual_snapshot").strip() or "admin_manual_snapshot"
     comment = str(body.comment or "").strip()
-    backup_before_modify(db_path, reason=reason, comment=comment)
+    backup_before_modify(db_path, reason=reason, comment=comment, coalesce=False)
     return {"ok": True, "reason": reason, "comment": comment}
 
 
@@ -540,11 +563,16 @@ def restore_db_backup(
         str(db_file),
         reason="admin_restore_pre_snapshot",
         comment=_auto_backup_comment("還原前快照備份", restore_from=backup_name),
+        coalesce=False,
     )
     try:
         shutil.copy2(src, db_file)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"還原備份失敗：{e}")
+    finally:
+        # 還原後的第一次修改要有自己的修改前快照
+        PRE_MODIFY_BACKUPS.reset(str(db_file))
+        notify_catalog_changed(str(db_file))
     return {"ok": True, "restored_from": backup_name}
 
 
@@ -838,7 +866,7 @@ def rename_dish(
     return {"ok": True, **result}
 
 
-@router.get("/dishes/{dish_id}/ingredients")
+@router.get("/dishes/{dish_id}/ingredients", dependencies=[Depends(catalog_conditional)])
 def get_dish_ingredients(
     dish_id: str,
     db_path: str = Query(default=DEFAULT_DB_PATH),
@@ -879,7 +907,7 @@ def dish_cost_preview(
     return repo.preview_dish_cost([x.model_dump() for x in body.items], servings=body.servings)
 
 
-@router.get("/dishes/cost-preview")
+@router.get("/dishes/cost-preview", dependencies=[Depends(catalog_conditional)])
 def list_dish_cost_preview(
     dish_id: List[str] = Query(default=[]),
     db_path: str = Query(default=DEFAULT_DB_PATH),
@@ -0,0 +1,43 @@
+# src/menu_planner/api/routes/plan_batch.py
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+
+from ...env import DEFAULT_DB_PATH
+from .. import plan_cache, plan_scheduler
+from ..json_response import PreserializedJSONResponse
+from ..plan_batch import parse_batch_variants, run_plan_batch
+from ..plan_scheduler import PlanSchedulerBusy, planning_client
+
+
+router = APIRouter(prefix="/plan", tags=["plan-batch"])
+
+
+@router.post("/batch")
+def post_plan_batch(
+    payload: Dict[str, Any] = Body(...),
+    db_path: str = Query(default=DEFAULT_DB_PATH),
+    include_results: bool = Query(default=True),
+    client: str = Depends(planning_client),
+):
+    variants, errs = parse_batch_variants(payload)
+    if errs:
+        raise HTTPException(status_code=400, detail={"ok": False, "errors": errs})
+    try:
+        out = run_plan_batch(
+            db_path=db_path,
+            variants=variants,
+            client=client,
+            scheduler=plan_scheduler.PLAN_SCHEDULER,
+            cache=plan_cache.PLAN_CACHE,
+            include_results=include_results,
+        )
+    except PlanSchedulerBusy as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail={"ok": False, "errors": [e.to_dict()]},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    return PreserializedJSONResponse({"ok": True, **out}, endpoint="plan_batch")
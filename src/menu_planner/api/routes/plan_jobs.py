@@ -0,0 +1,57 @@
+# src/menu_planner/api/routes/plan_jobs.py
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, Body, HTTPException, Query
+
+from ...config.loader import validate_config
+from ...env import DEFAULT_DB_PATH
+from .. import plan_jobs
+from ..json_response import PreserializedJSONResponse
+from ..plan_jobs import RETRY_AFTER_SECONDS, PlanJobQueueFull
+
+
+router = APIRouter(prefix="/plan/jobs", tags=["plan-jobs"])
+
+
+def _job_not_found(job_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=404,
+        detail={"ok": False, "errors": [{"code": "JOB_NOT_FOUND", "message": f"找不到排餐工作：{job_id}"}]},
+    )
+
+
+@router.post("")
+def submit_plan_job(
+    cfg: Dict[str, Any] = Body(...),
+    db_path: str = Query(default=DEFAULT_DB_PATH),
+):
+    ok, errs = validate_config(cfg)
+    if not ok:
+        raise HTTPException(status_code=400, detail={"ok": False, "errors": errs})
+    try:
+        job = plan_jobs.PLAN_JOBS.submit(db_path=db_path, cfg=cfg)
+    except PlanJobQueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail={"ok": False, "errors": [{"code": "PLAN_JOBS_FULL", "message": str(e)}]},
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    return {"ok": True, "job": job.to_dict(include_result=False)}
+
+
+@router.get("/{job_id}")
+def get_plan_job(job_id: str, include_result: bool = Query(default=True)):
+    job = plan_jobs.PLAN_JOBS.get(job_id)
+    if job is None:
+        raise _job_not_found(job_id)
+    return PreserializedJSONResponse({"ok": True, "job": job.to_dict(include_result=include_result)}, endpoint="plan_job")
+
+
+@router.delete("/{job_id}")
+def cancel_plan_job(job_id: str):
+    job = plan_jobs.PLAN_JOBS.cancel(job_id)
+    if job is None:
+        raise _job_not_found(job_id)
+    return {"ok": True, "job": job.to_dict(include_result=False)}
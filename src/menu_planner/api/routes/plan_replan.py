@@ -0,0 +1,41 @@
+# src/menu_planner/api/routes/plan_replan.py
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+
+from ...db.catalog_cache import CachedSQLiteRepo
+from ...engine.errors import PlanError
+from ...env import DEFAULT_DB_PATH
+from .. import plan_scheduler
+from ..json_response import PreserializedJSONResponse
+from ..plan_replan import parse_replan_payload, replan_task
+from ..plan_scheduler import PlanSchedulerBusy, planning_client, unwrap_task_result
+from ..procurement import attach_procurement_details
+
+
+router = APIRouter(prefix="/plan", tags=["plan-replan"])
+
+
+@router.post("/replan")
+def post_plan_replan(
+    payload: Dict[str, Any] = Body(...),
+    db_path: str = Query(default=DEFAULT_DB_PATH),
+    client: str = Depends(planning_client),
+):
+    request, errs = parse_replan_payload(payload)
+    if errs:
+        raise HTTPException(status_code=400, detail={"ok": False, "errors": errs})
+    try:
+        result = unwrap_task_result(plan_scheduler.PLAN_SCHEDULER.run(client, replan_task, db_path, request))
+    except PlanSchedulerBusy as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail={"ok": False, "errors": [e.to_dict()]},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except PlanError as e:
+        raise HTTPException(status_code=400, detail={"ok": False, "errors": [e.to_dict()]})
+    enriched = attach_procurement_details(result=result, cfg=request["cfg"], repo=CachedSQLiteRepo(db_path))
+    return PreserializedJSONResponse({"ok": True, "result": enriched}, endpoint="plan_replan")
@@ -0,0 +1,67 @@
+# src/menu_planner/api/routes/plan_stream.py
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from ...config.loader import validate_config
+from ...engine.errors import PlanError
+from ...engine.planner import plan_month
+from ...env import DEFAULT_DB_PATH
+from .. import plan_cache, plan_scheduler
+from ..plan_cache import CACHE_BYPASS, PlanCacheLookup
+from ..plan_scheduler import PlanSchedulerBusy, planning_client
+from ..plan_stream import NDJSON_MEDIA_TYPE, cached_result_events, stream_plan_events
+
+
+router = APIRouter(prefix="/plan", tags=["plan-stream"])
+
+
+@router.post("/stream")
+def stream_plan(
+    cfg: Dict[str, Any] = Body(...),
+    db_path: str = Query(default=DEFAULT_DB_PATH),
+    client: str = Depends(planning_client),
+):
+    ok, errs = validate_config(cfg)
+    if not ok:
+        raise HTTPException(status_code=400, detail={"ok": False, "errors": errs})
+    try:
+        cached = plan_cache.PLAN_CACHE.lookup(db_path, cfg)
+    except Exception:
+        # 例如資料庫無法讀取：交給串流以 error 事件回報
+        cached = PlanCacheLookup(key=None, status=CACHE_BYPASS)
+
+    if cached.result is not None:
+        events = cached_result_events(db_path=db_path, cfg=cfg, result=cached.result)
+    else:
+        scheduler = plan_scheduler.PLAN_SCHEDULER
+        try:
+            scheduler.check_admission(client)
+        except PlanSchedulerBusy as e:
+            raise HTTPException(
+                status_code=429,
+                detail={"ok": False, "errors": [e.to_dict()]},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+
+        def runner(**kwargs: Any) -> Dict[str, Any]:
+            # 串流需要即時回呼，在本執行緒內執行；仍佔用排程器名額以限制同時排餐數
+            try:
+                with scheduler.slot(client):
+                    result = plan_month(**kwargs)
+            except PlanSchedulerBusy as e:
+                raise PlanError(**e.to_dict())
+            plan_cache.PLAN_CACHE.store(cached.key, result)
+            return result
+
+        events = stream_plan_events(db_path=db_path, cfg=cfg, runner=runner)
+
+    return StreamingResponse(
+        events,
+        media_type=NDJSON_MEDIA_TYPE,
+        # 關閉反向代理緩衝，讓每一行即時送達瀏覽器
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **cached.headers()},
+    )
@@ -0,0 +1,47 @@
+# src/menu_planner/api/routes/procurement.py
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, Body, HTTPException, Query
+
+from ...db.catalog_cache import CachedSQLiteRepo
+from ...env import DEFAULT_DB_PATH
+from ..procurement import attach_procurement_details
+from ..procurement_rollup import build_procurement_rollup, parse_period_days
+from ..result_compact import expand_result
+from ..result_store import RESULT_STORE
+
+
+router = APIRouter(prefix="/procurement", tags=["procurement"])
+
+
+@router.post("/rollup")
+def post_procurement_rollup(
+    payload: Dict[str, Any] = Body(...),
+    db_path: str = Query(default=DEFAULT_DB_PATH),
+):
+    """
+    整段期間的採購彙總：payload = {"result_token" 或 "result", "cfg"?, "period_days"?}。
+    暫存結果已附採購明細直接彙總；上傳的 result 缺採購明細時先依 cfg（人數）以當日價格計算。
+    """
+    period_days, errs = parse_period_days(payload.get("period_days"))
+    if errs:
+        raise HTTPException(status_code=400, detail={"ok": False, "errors": errs})
+
+    token = payload.get("result_token")
+    stored = RESULT_STORE.get(token) if isinstance(token, str) and token else None
+    if token and stored is None:
+        raise HTTPException(status_code=404, detail={"ok": False, "errors": [
+            {"code": "RESULT_TOKEN_EXPIRED", "message": "暫存的排餐結果已過期，請重新同步整份結果。"}
+        ]})
+    result = stored.result if stored else expand_result(payload.get("result"))
+    if not isinstance(result, dict) or not isinstance(result.get("days"), list):
+        raise HTTPException(status_code=400, detail={"ok": False, "errors": [
+            {"code": "PROCUREMENT_ROLLUP_INVALID", "message": "需提供 result_token 或 result（含 days）。"}
+        ]})
+
+    if not stored and any(not day.get("procurement") for day in result["days"]):
+        cfg = payload.get("cfg") if isinstance(payload.get("cfg"), dict) else {}
+        result = attach_procurement_details(result=result, cfg=cfg, repo=CachedSQLiteRepo(db_path))
+    return {"ok": True, "rollup": build_procurement_rollup(result, period_days=period_days)}
@@ -0,0 +1,29 @@
+# src/menu_planner/api/routes/profiles.py
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from .. import profiling
+from ..auth import require_db_operator
+
+router = APIRouter(prefix="/profiles", tags=["profiles"], dependencies=[Depends(require_db_operator)])
+
+
+@router.get("")
+def list_profile_artifacts():
+    """?profile= 請求保存的剖析結果檔（新到舊）。"""
+    store = profiling.PROFILE_STORE
+    return {"ok": True, "max_bytes": store.max_bytes, "items": store.list()}
+
+
+@router.get("/{name}")
+def download_profile_artifact(name: str):
+    path = profiling.PROFILE_STORE.path(name)
+    if path is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"ok": False, "errors": [{"code": "PROFILE_NOT_FOUND", "message": f"找不到剖析結果檔：{name}"}]},
+        )
+    media_type = "application/json" if path.suffix == ".json" else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=name)
@@ -1,19 +1,45 @@
 # src/menu_planner/config/loader.py
 from __future__ import annotations
 
+import hashlib
 import json
-from datetime import datetime
+from dataclasses import dataclass, replace
+from datetime import date, datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple, Union
+
+from ..engine.roles import counts_for_weekday
 
 
 ALLOWED_MEAT_TYPES = {"chicken", "pork", "beef", "fish", "seafood", "noodles", "vegetarian"}
 ALLOWED_ROLES = {"main", "noodle", "side", "veg", "soup", "fruit"}
 
 
+DEFAULTS_PATH = Path(__file__).resolve().parent / "defaults.json"
+
+
+@dataclass(frozen=True)
+class DefaultsSource:
+    text: str
+    etag: str
+    modified_at: float
+
+
+@lru_cache(maxsize=1)
+def defaults_source() -> DefaultsSource:
+    """defaults.json 只讀一次（隨套件部署、執行期間不變）；etag 為內容雜湊。"""
+    text = DEFAULTS_PATH.read_text(encoding="utf-8")
+    return DefaultsSource(
+        text=text,
+        etag=hashlib.sha256(text.encode("utf-8")).hexdigest()[:32],
+        modified_at=DEFAULTS_PATH.stat().st_mtime,
+    )
+
+
 def load_defaults() -> Dict[str, Any]:
-    p = Path(__file__).resolve().parent / "defaults.json"
-    return json.loads(p.read_text(encoding="utf-8"))
+    # 每次由快取的文字重新解析：呼叫端常直接修改回傳的 cfg，不能共用同一份 dict
+    return json.loads(defaults_source().text)
 
 
 def validate_config(cfg: Dict[str, Any]) -> Tuple[bool, List[str]]:
@@ -206,3 +232,368 @@ def validate_config(cfg: Dict[str, Any]) -> Tuple[bool, List[str]]:
                 errs.append("no_same_ingredient_family_within_day 需為非空字串陣列")
 
     return (len(errs) == 0), errs
+
+
+# ===== 編譯後的排餐設定（引擎熱迴圈直接讀取型別化欄位，不再反覆 dict.get / int() / set()）=====
+
+ALL_WEEKDAYS: FrozenSet[int] = frozenset(range(1, 8))
+UNLIMITED = 10**9
+
+
+def _canonical(value: Any) -> Any:
+    # JSON 物件 key 一律轉字串（weekday 可能混用 3 / "3"），集合排序後輸出
+    if isinstance(value, Mapping):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=repr)
+    return value
+
+
+def config_hash(cfg: Mapping[str, Any]) -> str:
+    """cfg 的穩定雜湊（key 排序後的 canonical JSON），可作為方案/特徵快取 key。"""
+    canonical = json.dumps(
+        _canonical(cfg), sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _str_set(values: Any) -> FrozenSet[str]:
+    return frozenset(str(x).strip() for x in (values or []) if x is not None and str(x).strip())
+
+
+def _optional_int(value: Any) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+def _weekday_rule(rules: Mapping[Any, Any], weekday: int) -> Any:
+    return rules.get(weekday) or rules.get(str(weekday))
+
+
+def normalize_fixed_meat_rule(rule: Any) -> Optional[FrozenSet[str]]:
+    """hard.fixed_main_meat_by_weekday 的單一規則：str 或 list[str]；空值回傳 None。"""
+    if isinstance(rule, str):
+        r = rule.strip()
+        return frozenset({r}) if r else None
+    if isinstance(rule, list):
+        s = _str_set(rule)
+        return s if s else None
+    return None
+
+
+def single_fixed_meat(rule: Any) -> Optional[str]:
+    """只在規則是單一肉類時回傳字串；多選（list>1）就回傳 None（不做保留）。"""
+    if isinstance(rule, str):
+        r = rule.strip()
+        return r if r else None
+    if isinstance(rule, list):
+        xs = [str(x).strip() for x in rule if x is not None and str(x).strip()]
+        return xs[0] if len(xs) == 1 else None
+    return None
+
+
+def normalize_weekday_set(value: Any) -> FrozenSet[int]:
+    if not isinstance(value, list):
+        return ALL_WEEKDAYS
+    out = set()
+    for x in value:
+        try:
+            wd = int(x)
+        except Exception:
+            continue
+        if 1 <= wd <= 7:
+            out.add(wd)
+    return frozenset(out) if out else ALL_WEEKDAYS
+
+
+def _limits_by_weekday(base: Any, overrides: Any, fallback: int) -> Tuple[int, ...]:
+    out: List[int] = []
+    for weekday in range(1, 8):
+        value = base
+        if isinstance(overrides, dict):
+            value = overrides.get(weekday, overrides.get(str(weekday), base))
+        try:
+            out.append(max(0, int(value)))
+        except Exception:
+            out.append(fallback)
+    return tuple(out)
+
+
+@dataclass(frozen=True)
+class CompiledRepeatLimits:
+    max_same_main_in_30_days: Optional[int]
+    max_same_side_in_7_days: int
+    max_same_veg_in_7_days: int
+    max_same_soup_in_7_days: int
+    max_same_fruit_in_7_days: int
+    max_same_noodle_in_7_days: int
+    max_same_noodle_in_30_days: int
+    max_same_ingredient_in_window_days: int
+    ingredient_repeat_window_days: int
+    max_consecutive_ingredient_days: Optional[int]
+
+    @classmethod
+    def from_dict(cls, rep: Mapping[str, Any]) -> "CompiledRepeatLimits":
+        rep = rep or {}
+        max_side_7 = int(rep.get("max_same_side_in_7_days", 1))
+        return cls(
+            max_same_main_in_30_days=_optional_int(rep.get("max_same_main_in_30_days")),
+            max_same_side_in_7_days=max_side_7,
+            max_same_veg_in_7_days=int(rep.get("max_same_veg_in_7_days", max_side_7)),
+            max_same_soup_in_7_days=int(rep.get("max_same_soup_in_7_days", 1)),
+            max_same_fruit_in_7_days=int(rep.get("max_same_fruit_in_7_days", UNLIMITED)),
+            max_same_noodle_in_7_days=int(rep.get("max_same_noodle_in_7_days", 1)),
+            max_same_noodle_in_30_days=int(rep.get("max_same_noodle_in_30_days", 2)),
+            max_same_ingredient_in_window_days=int(
+                rep.get("max_same_ingredient_in_window_days", rep.get("max_same_ingredient_in_7_days", UNLIMITED))
+            ),
+            ingredient_repeat_window_days=int(rep.get("ingredient_repeat_window_days", 4)),
+            max_consecutive_ingredient_days=_optional_int(rep.get("max_consecutive_ingredient_days")),
+        )
+
+
+@dataclass(frozen=True)
+class CompiledHardConstraints:
+    allowed_main_meat_types: FrozenSet[str]
+    exclude_dish_ids: FrozenSet[str]
+    no_consecutive_same_main_meat: bool
+    weekly_max_main_meat: Dict[str, int]
+    # ISO weekday -> 允許的主菜肉類；未設定的 weekday 不在 dict 內
+    fixed_main_meats_by_weekday: Dict[int, FrozenSet[str]]
+    # 單一肉類的固定日（肉類 -> weekday 列表），用來保留同週配額
+    fixed_single_meat_weekdays: Dict[str, Tuple[int, ...]]
+    cost_min: Optional[float]
+    cost_max: Optional[float]
+    repeat: CompiledRepeatLimits
+    no_same_ingredient_family_within_day: FrozenSet[str]
+    dish_allowed_weekdays: Dict[str, FrozenSet[int]]
+    # index = ISO weekday - 1
+    prep_limit_by_weekday: Tuple[int, ...]
+    side_soup_meat_limit_by_weekday: Tuple[int, ...]
+    seed: int
+
+    @classmethod
+    def from_dict(cls, hard: Mapping[str, Any]) -> "CompiledHardConstraints":
+        hard = hard or {}
+        fixed = hard.get("fixed_main_meat_by_weekday") or {}
+        fixed_by_weekday: Dict[int, FrozenSet[str]] = {}
+        fixed_single: Dict[str, List[int]] = {}
+        if isinstance(fixed, dict):
+            for weekday in range(1, 8):
+                allowed = normalize_fixed_meat_rule(_weekday_rule(fixed, weekday))
+                if allowed is not None:
+                    fixed_by_weekday[weekday] = allowed
+            for k, rule in fixed.items():
+                try:
+                    wd = int(k)
+                except Exception:
+                    continue
+                meat = single_fixed_meat(rule)
+                if meat:
+                    fixed_single.setdefault(meat, []).append(wd)
+
+        cr = hard.get("cost_range_per_person_per_day") or {}
+        cost_min = cr.get("min")
+        cost_max = cr.get("max")
+
+        weekly_max = hard.get("weekly_max_main_meat", {}) or {}
+        rules = hard.get("dish_allowed_weekdays") or {}
+
+        return cls(
+            allowed_main_meat_types=frozenset(hard.get("allowed_main_meat_types", []) or []),
+            exclude_dish_ids=frozenset(hard.get("exclude_dish_ids", []) or []),
+            no_consecutive_same_main_meat=bool(hard.get("no_consecutive_same_main_meat", False)),
+            weekly_max_main_meat={k: int(v) for k, v in weekly_max.items() if v is not None},
+            fixed_main_meats_by_weekday=fixed_by_weekday,
+            fixed_single_meat_weekdays={k: tuple(v) for k, v in fixed_single.items()},
+            cost_min=None if cost_min is None else float(cost_min),
+            cost_max=None if cost_max is None else float(cost_max),
+            repeat=CompiledRepeatLimits.from_dict(hard.get("repeat_limits", {}) or {}),
+            no_same_ingredient_family_within_day=_str_set(hard.get("no_same_ingredient_family_within_day")),
+            dish_allowed_weekdays={
+                dish_id: normalize_weekday_set(v) for dish_id, v in rules.items()
+            } if isinstance(rules, dict) else {},
+            prep_limit_by_weekday=_limits_by_weekday(
+                hard.get("prep_time_limit_minutes", 90),
+                hard.get("per_weekday_prep_time_limit_minutes") or {},
+                90,
+            ),
+            side_soup_meat_limit_by_weekday=_limits_by_weekday(
+                hard.get("side_soup_meat_limit", hard.get("side_soup_protein_limit", 2)),
+                hard.get("per_weekday_side_soup_meat_limit", hard.get("per_weekday_side_soup_protein_limit")) or {},
+                2,
+            ),
+            seed=int(hard.get("seed", 7)),
+        )
+
+    @classmethod
+    def coerce(cls, hard: "HardConfig") -> "CompiledHardConstraints":
+        if isinstance(hard, CompiledHardConstraints):
+            return hard
+        return cls.from_dict(hard or {})
+
+    def fixed_meats_for_weekday(self, weekday: int) -> Optional[FrozenSet[str]]:
+        return self.fixed_main_meats_by_weekday.get(weekday)
+
+    def dish_allowed_on_weekday(self, dish_id: str, weekday: int) -> bool:
+        return weekday in self.dish_allowed_weekdays.get(dish_id, ALL_WEEKDAYS)
+
+    def prep_limit_for_weekday(self, weekday: int) -> int:
+        return self.prep_limit_by_weekday[weekday - 1]
+
+    def side_soup_meat_limit_for_weekday(self, weekday: int) -> int:
+        return self.side_soup_meat_limit_by_weekday[weekday - 1]
+
+
+@dataclass(frozen=True)
+class CompiledWeights:
+    cost_over_max_penalty: float = 0.0
+    cost_under_min_penalty: float = 0.0
+    consecutive_same_meat_penalty: float = 0.0
+    cuisine_consecutive_penalty: float = 0.0
+    use_inventory_bonus: float = 0.0
+    near_expiry_bonus: float = 0.0
+    repeat_penalty_main: float = 0.0
+    repeat_penalty_soup: float = 0.0
+    repeat_penalty_side: float = 0.0
+    repeat_penalty_fruit: float = 0.0
+
+    @classmethod
+    def from_dict(cls, weights: Mapping[str, Any]) -> "CompiledWeights":
+        weights = weights or {}
+        return cls(**{name: float(weights.get(name, 0)) for name in cls.__dataclass_fields__})
+
+    @classmethod
+    def coerce(cls, weights: "WeightsConfig") -> "CompiledWeights":
+        if isinstance(weights, CompiledWeights):
+            return weights
+        return cls.from_dict(weights or {})
+
+
+@dataclass(frozen=True)
+class CompiledSoftPreferences:
+    prefer_use_inventory: bool = False
+    prefer_near_expiry: bool = False
+    inventory_prefer_ingredient_ids: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def from_dict(cls, soft: Mapping[str, Any]) -> "CompiledSoftPreferences":
+        soft = soft or {}
+        return cls(
+            prefer_use_inventory=bool(soft.get("prefer_use_inventory", False)),
+            prefer_near_expiry=bool(soft.get("prefer_near_expiry", False)),
+            inventory_prefer_ingredient_ids=_str_set(soft.get("inventory_prefer_ingredient_ids")),
+        )
+
+    @classmethod
+    def coerce(cls, soft: "SoftConfig") -> "CompiledSoftPreferences":
+        if isinstance(soft, CompiledSoftPreferences):
+            return soft
+        return cls.from_dict(soft or {})
+
+
+@dataclass(frozen=True)
+class CompiledSearchSettings:
+    beam_width: int = 12
+    main_candidate_limit: int = 25
+    local_search_enabled: bool = True
+    local_search_iterations: int = 800
+    accept_worse_probability: float = 0.03
+
+    @classmethod
+    def from_dict(cls, search: Mapping[str, Any]) -> "CompiledSearchSettings":
+        search = search or {}
+        bt = search.get("backtracking") or {}
+        ls = search.get("local_search") or {}
+        return cls(
+            beam_width=int(bt.get("beam_width", 12)),
+            main_candidate_limit=int((bt.get("candidate_limit_per_role") or {}).get("main", 25)),
+            local_search_enabled=bool(ls.get("enabled", True)),
+            local_search_iterations=int(ls.get("iterations", 800)),
+            accept_worse_probability=float(ls.get("accept_worse_probability", 0.03)),
+        )
+
+
+@dataclass(frozen=True)
+class CompiledPlanConfig:
+    """
+    validate_config 通過後的 cfg 編譯結果（不可變）。
+
+    - 數值皆已 parse、集合已預先建立、週幾覆寫（角色數量/備菜時間/含肉上限）已展開成 1..7
+    - config_hash 為原始 cfg 的穩定雜湊，可作為快取 key
+    """
+
+    horizon_days: int
+    start_date: Optional[date]
+    schedule_weekdays: FrozenSet[int]
+    force_include_dates: FrozenSet[str]
+    force_exclude_dates: FrozenSet[str]
+    # index = ISO weekday - 1
+    role_counts_by_weekday: Tuple[Dict[str, int], ...]
+    hard: CompiledHardConstraints
+    soft: CompiledSoftPreferences
+    weights: CompiledWeights
+    search: CompiledSearchSettings
+    seed_spec: Any
+    config_hash: str
+
+    def role_counts_for_weekday(self, weekday: int) -> Dict[str, int]:
+        return dict(self.role_counts_by_weekday[weekday - 1])
+
+    def with_hard(self, hard: Mapping[str, Any]) -> "CompiledPlanConfig":
+        """hard 被引擎調整（放寬、合併目錄週幾規則、seed）後重新編譯 hard 部分。"""
+        return replace(self, hard=CompiledHardConstraints.from_dict(hard))
+
+
+def merge_plan_hard(cfg: Mapping[str, Any]) -> Dict[str, Any]:
+    """把 cfg 頂層的備菜時間/含肉上限設定併入 hard（頂層優先，支援舊 protein 命名）。"""
+    hard = dict(cfg.get("hard", {}) or {})
+    hard["prep_time_limit_minutes"] = cfg.get("prep_time_limit_minutes", hard.get("prep_time_limit_minutes", 90))
+    hard["per_weekday_prep_time_limit_minutes"] = cfg.get(
+        "per_weekday_prep_time_limit_minutes",
+        hard.get("per_weekday_prep_time_limit_minutes", {}),
+    )
+    hard["side_soup_meat_limit"] = cfg.get(
+        "side_soup_meat_limit",
+        cfg.get(
+            "side_soup_protein_limit",
+            hard.get("side_soup_meat_limit", hard.get("side_soup_protein_limit", 2)),
+        ),
+    )
+    hard["per_weekday_side_soup_meat_limit"] = cfg.get(
+        "per_weekday_side_soup_meat_limit",
+        cfg.get(
+            "per_weekday_side_soup_protein_limit",
+            hard.get(
+                "per_weekday_side_soup_meat_limit",
+                hard.get("per_weekday_side_soup_protein_limit", {}),
+            ),
+        ),
+    )
+    return hard
+
+
+def compile_plan_config(cfg: Mapping[str, Any]) -> CompiledPlanConfig:
+    schedule = cfg.get("schedule") or {}
+    start_raw = cfg.get("start_date")
+    hard = merge_plan_hard(cfg)
+    return CompiledPlanConfig(
+        horizon_days=int(cfg.get("horizon_days", 30)),
+        start_date=datetime.strptime(start_raw, "%Y-%m-%d").date() if start_raw else None,
+        schedule_weekdays=frozenset(int(x) for x in (schedule.get("weekdays") or [1, 2, 3, 4, 5])),
+        force_include_dates=_str_set(schedule.get("force_include_dates")),
+        force_exclude_dates=_str_set(schedule.get("force_exclude_dates")),
+        role_counts_by_weekday=tuple(counts_for_weekday(dict(cfg), wd) for wd in range(1, 8)),
+        hard=CompiledHardConstraints.from_dict(hard),
+        soft=CompiledSoftPreferences.from_dict(cfg.get("soft", {}) or {}),
+        weights=CompiledWeights.from_dict(cfg.get("weights", {}) or {}),
+        search=CompiledSearchSettings.from_dict(cfg.get("search", {}) or {}),
+        seed_spec=cfg.get("seed", 7),
+        config_hash=config_hash(cfg),
+    )
+
+
+HardConfig = Union[Mapping[str, Any], CompiledHardConstraints]
+WeightsConfig = Union[Mapping[str, Any], CompiledWeights]
+SoftConfig = Union[Mapping[str, Any], CompiledSoftPreferences]
@@ -1,28 +1,9 @@
 from __future__ import annotations
 
 import sqlite3
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-
-def _convert_qty(
-    qty: float,
-    source_unit: Optional[str],
-    target_unit: Optional[str],
-    conv: Dict[Tuple[str, str], float],
-) -> Optional[float]:
-    src = str(source_unit or "").strip()
-    tgt = str(target_unit or "").strip()
-    if src == tgt:
-        return float(qty)
-    if not src or not tgt:
-        return None
-    factor = conv.get((src, tgt))
-    if factor is not None:
-        return float(qty) * float(factor)
-    inverse = conv.get((tgt, src))
-    if inverse is not None and float(inverse) != 0:
-        return float(qty) / float(inverse)
-    return None
+from .units import UnitConverter
 
 
 def fetch_latest_prices(conn: sqlite3.Connection, ingredient_ids: List[str]) -> Dict[str, Dict[str, Any]]:
@@ -102,8 +83,9 @@ def build_cost_preview_rows(
     items: List[Dict[str, Any]],
     ingredient_names: Dict[str, str],
     prices: Dict[str, Dict[str, Any]],
-    conv: Dict[Tuple[str, str], float],
+    conv: Union[UnitConverter, Dict[Tuple[str, str], float]],
 ) -> Dict[str, Any]:
+    converter = UnitConverter.coerce(conv)
     total = 0.0
     rows: List[Dict[str, Any]] = []
     for x in items:
@@ -136,7 +118,7 @@ def build_cost_preview_rows(
             continue
 
         price_unit = p["unit"]
-        qty_in_price_unit = _convert_qty(qty, unit, price_unit, conv)
+        qty_in_price_unit = converter.convert_one(qty, unit, price_unit)
         if qty_in_price_unit is None:
             row["status"] = "warning"
             row["reason"] = "unit_mismatch"
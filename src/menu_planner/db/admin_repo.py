@@ -4,7 +4,7 @@ from __future__ import annotations
 import json
 import sqlite3
 from datetime import date
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from .admin_cost_preview import (
     build_cost_preview_rows,
@@ -12,13 +12,29 @@ from .admin_cost_preview import (
     fetch_ingredient_names,
     fetch_latest_prices,
 )
+from .catalog_cache import notify_catalog_changed
+from .units import UnitConverter
+
+
+class _AdminConnection(sqlite3.Connection):
+    """`with conn:` 成功 commit 且有異動時，通知目錄快照快取失效。"""
+
+    db_path = ""
+
+    def __exit__(self, exc_type, exc, tb):
+        result = super().__exit__(exc_type, exc, tb)
+        if exc_type is None and self.total_changes > 0:
+            notify_catalog_changed(self.db_path)
+        return result
+
 
 class SQLiteAdminRepo:
     def __init__(self, db_path: str):
         self.db_path = db_path
 
     def _conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path, factory=_AdminConnection)
+        conn.db_path = self.db_path
         conn.execute("PRAGMA foreign_keys = ON;")
         conn.execute("PRAGMA busy_timeout = 5000;")
         return conn
@@ -283,7 +299,7 @@ class SQLiteAdminRepo:
             if not tgt_exists:
                 raise ValueError(f"找不到目標食材：{target_id}")
 
-            conv_map = self._fetch_unit_conversions_conn(conn)
+            converter = UnitConverter(self._fetch_unit_conversions_conn(conn))
 
             source_rows = conn.execute(
                 """
@@ -319,7 +335,7 @@ class SQLiteAdminRepo:
 
                 tgt_qty = float(existing[0] or 0)
                 tgt_unit = existing[1]
-                converted_qty = self._convert_qty(src_qty, src_unit, tgt_unit, conv_map)
+                converted_qty = converter.convert_one(src_qty, src_unit, tgt_unit)
                 if converted_qty is None:
                     raise ValueError(
                         f"菜色 {dish_id} 的食材單位無法合併：{source_id}({src_unit}) -> {target_id}({tgt_unit})"
@@ -404,7 +420,7 @@ class SQLiteAdminRepo:
                 tgt_updated_at = tgt_inv[2]
                 tgt_expiry = tgt_inv[3]
 
-                converted_qty = self._convert_qty(src_qty, src_unit, tgt_unit, conv_map)
+                converted_qty = converter.convert_one(src_qty, src_unit, tgt_unit)
                 if converted_qty is None:
                     raise ValueError(f"庫存單位無法合併：{source_id}({src_unit}) -> {target_id}({tgt_unit})")
 
@@ -941,26 +957,8 @@ class SQLiteAdminRepo:
             rows = conn.execute("SELECT from_unit, to_unit, factor FROM unit_conversions").fetchall()
         return {(r[0], r[1]): float(r[2]) for r in rows}
 
-    @staticmethod
-    def _convert_qty(
-        qty: float,
-        source_unit: Optional[str],
-        target_unit: Optional[str],
-        conv_map: Dict[Tuple[str, str], float],
-    ) -> Optional[float]:
-        src = str(source_unit or "").strip()
-        tgt = str(target_unit or "").strip()
-        if src == tgt:
-            return float(qty)
-        if not src or not tgt:
-            return None
-        factor = conv_map.get((src, tgt))
-        if factor is not None:
-            return float(qty) * float(factor)
-        inverse = conv_map.get((tgt, src))
-        if inverse is not None and float(inverse) != 0:
-            return float(qty) / float(inverse)
-        return None
+    def _fetch_unit_converter(self) -> UnitConverter:
+        return UnitConverter(self._fetch_unit_conversions())
 
     @staticmethod
     def _earliest_date(d1: Optional[str], d2: Optional[str]) -> Optional[str]:
@@ -991,7 +989,7 @@ class SQLiteAdminRepo:
         items: List[Dict[str, Any]],
         ingredient_names: Dict[str, str],
         prices: Dict[str, Dict[str, Any]],
-        conv: Dict[Tuple[str, str], float],
+        conv: Union[UnitConverter, Dict[Tuple[str, str], float]],
     ) -> Dict[str, Any]:
         return build_cost_preview_rows(items, ingredient_names, prices, conv)
 
@@ -999,7 +997,7 @@ class SQLiteAdminRepo:
         ingredient_ids = [str(x["ingredient_id"]) for x in items if x.get("ingredient_id")]
         ingredient_names = self._fetch_ingredient_names(ingredient_ids)
         prices = self._fetch_latest_prices(ingredient_ids)
-        conv = self._fetch_unit_conversions()
+        conv = self._fetch_unit_converter()
 
         preview = self._build_cost_preview_rows(items, ingredient_names, prices, conv)
         per_serving = preview["per_serving_cost"]
@@ -1027,7 +1025,7 @@ class SQLiteAdminRepo:
         ingredient_ids = sorted(set(ingredient_ids))
         ingredient_names = self._fetch_ingredient_names(ingredient_ids)
         prices = self._fetch_latest_prices(ingredient_ids)
-        conv = self._fetch_unit_conversions()
+        conv = self._fetch_unit_converter()
 
         out: List[Dict[str, Any]] = []
         for dish_id, items in grouped.items():
@@ -1,23 +1,102 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from datetime import datetime
 import json
+import logging
+import os
 from pathlib import Path
 import shutil
-from typing import Dict, List
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..env import env_int
+
+logger = logging.getLogger(__name__)
 
 DAILY_BACKUP_LIMIT = 50
 BACKUP_REASON_DEFAULT = "admin_modify_before_change"
 
+DEFAULT_STEP_PAGES = 256
+DEFAULT_COALESCE_MINUTES = 10
+
+_SQLITE_HEADER = b"SQLite format 3\x00"
+
+
+def _is_sqlite_file(path: Path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(_SQLITE_HEADER)) == _SQLITE_HEADER
+    except OSError:
+        return False
+
+
+def stage_db_snapshot(db_path: str, step_pages: int = DEFAULT_STEP_PAGES) -> Optional[sqlite3.Connection]:
+    """
+    以 SQLite online backup API 把資料庫分段（每次 step_pages 頁）複製到記憶體，回傳可跨執行緒使用的連線。
+
+    分段之間會釋放讀取鎖，其他連線寫入時 SQLite 會重新開始複製，結果一定是某個 commit 之後的完整狀態。
+    不是 SQLite 格式的檔案回傳 None（由 create_db_backup 直接複製檔案）。
+    """
+    src_path = Path(db_path).resolve()
+    if not src_path.exists():
+        raise FileNotFoundError(f"database file not found: {src_path}")
+    if not _is_sqlite_file(src_path):
+        return None
+    snapshot = sqlite3.connect(":memory:", check_same_thread=False)
+    src = sqlite3.connect(str(src_path))
+    try:
+        src.backup(snapshot, pages=step_pages)
+    except Exception:
+        snapshot.close()
+        raise
+    finally:
+        src.close()
+    return snapshot
+
+
+def _write_backup_file(
+    src: Path,
+    dst: Path,
+    snapshot: Optional[sqlite3.Connection],
+    step_pages: int,
+) -> None:
+    # 先寫到暫存檔再改名，列表與每日保留數量不會看到寫到一半的備份
+    tmp = dst.with_name(f".{dst.name}.partial")
+    tmp.unlink(missing_ok=True)
+    try:
+        if snapshot is None and not _is_sqlite_file(src):
+            shutil.copy2(src, tmp)
+        else:
+            source = snapshot if snapshot is not None else sqlite3.connect(str(src))
+            target = sqlite3.connect(str(tmp))
+            try:
+                source.backup(target, pages=step_pages)
+            finally:
+                target.close()
+                if snapshot is None:
+                    source.close()
+        os.replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+
 
 def create_db_backup(
     db_path: str,
     keep_latest_per_day: int = DAILY_BACKUP_LIMIT,
     reason: str = BACKUP_REASON_DEFAULT,
     comment: str = "",
+    snapshot: Optional[sqlite3.Connection] = None,
+    step_pages: int = DEFAULT_STEP_PAGES,
 ) -> Path:
     """
-    Copy sqlite db to sibling backups dir and keep only latest N backups for same day.
+    Back up sqlite db to sibling backups dir and keep only latest N backups for same day.
+
+    Uses the SQLite online backup API (page-stepped), so a writer mid-transaction
+    never produces a torn copy. When `snapshot` (from stage_db_snapshot) is given,
+    it is written instead of the live database. Non-SQLite files are copied as-is.
 
     Backup path format:
       <db_dir>/backups/<db_stem>_YYYYMMDD_HHMMSS_microseconds.db
@@ -34,7 +113,7 @@ def create_db_backup(
     backup_dir.mkdir(parents=True, exist_ok=True)
 
     dst = backup_dir / f"{src.stem}_{ts}{src.suffix or '.db'}"
-    shutil.copy2(src, dst)
+    _write_backup_file(src, dst, snapshot, step_pages)
     upsert_backup_metadata(
         db_path=db_path,
         backup_filename=dst.name,
@@ -144,3 +223,106 @@ def _prune_daily_backups(
         p.unlink(missing_ok=True)
 
     return to_remove
+
+
+@dataclass
+class BackupWindow:
+    """一個合併期間：期間內第一次修改前的快照，之後的修改都併入這份備份。"""
+
+    db_path: str
+    reason: str
+    comment: str
+    opened_at: float
+    joined: int = 0
+    path: Optional[Path] = None
+    error: Optional[str] = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Path]:
+        """等背景寫入完成並回傳備份檔；逾時或失敗時回傳 None。"""
+        self.done.wait(timeout)
+        return self.path
+
+
+class CoalescedBackupScheduler:
+    """
+    修改前備份：同一個資料庫在 window_seconds 內只建立一份快照。
+
+    - 請求執行緒只做記憶體快照（stage_db_snapshot），確保備份是修改前的狀態
+    - 寫檔、metadata 與每日保留數量在背景執行緒完成，admin 請求不等檔案複製
+    - 背景寫入失敗時該期間作廢，下一次修改重新建立快照
+    - observer(seconds, outcome) 在每次背景寫入結束時呼叫（outcome 為 ok / error）
+    """
+
+    def __init__(
+        self,
+        window_seconds: Optional[float] = None,
+        step_pages: Optional[int] = None,
+        observer: Optional[Callable[[float, str], None]] = None,
+    ):
+        if window_seconds is None:
+            window_seconds = env_int("MENU_BACKUP_COALESCE_MINUTES", DEFAULT_COALESCE_MINUTES) * 60
+        self.window_seconds = float(window_seconds)
+        self.step_pages = step_pages if step_pages is not None else env_int(
+            "MENU_BACKUP_STEP_PAGES", DEFAULT_STEP_PAGES, minimum=1
+        )
+        self.observer = observer
+        self._lock = threading.Lock()
+        self._windows: Dict[str, BackupWindow] = {}
+
+    def request(
+        self,
+        db_path: str,
+        reason: str = BACKUP_REASON_DEFAULT,
+        comment: str = "",
+        coalesce: bool = True,
+    ) -> Tuple[BackupWindow, bool]:
+        """回傳 (期間, 是否新建快照)；coalesce=False 時一定新建（手動備份、還原前快照）。"""
+        key = str(Path(db_path).resolve())
+        with self._lock:
+            now = time.monotonic()
+            window = self._windows.get(key)
+            if (
+                coalesce
+                and window is not None
+                and window.error is None
+                and now - window.opened_at < self.window_seconds
+            ):
+                window.joined += 1
+                return window, False
+            started = time.perf_counter()
+            snapshot = stage_db_snapshot(key, self.step_pages)
+            window = BackupWindow(db_path=key, reason=reason, comment=comment, opened_at=now)
+            self._windows[key] = window
+        threading.Thread(
+            target=self._write,
+            args=(window, snapshot, started),
+            name="db-backup",
+        ).start()
+        return window, True
+
+    def reset(self, db_path: str) -> None:
+        """結束目前的合併期間（例如還原後），下一次修改重新建立快照。"""
+        with self._lock:
+            self._windows.pop(str(Path(db_path).resolve()), None)
+
+    def _write(self, window: BackupWindow, snapshot: Optional[sqlite3.Connection], started: float) -> None:
+        outcome = "ok"
+        try:
+            window.path = create_db_backup(
+                window.db_path,
+                reason=window.reason,
+                comment=window.comment,
+                snapshot=snapshot,
+                step_pages=self.step_pages,
+            )
+        except Exception as e:
+            outcome = "error"
+            window.error = str(e) or e.__class__.__name__
+            logger.exception("background db backup failed: %s", window.db_path)
+        finally:
+            if snapshot is not None:
+                snapshot.close()
+            window.done.set()
+        if self.observer is not None:
+            self.observer(time.perf_counter() - started, outcome)
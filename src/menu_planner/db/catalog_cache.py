@@ -0,0 +1,257 @@
+# src/menu_planner/db/catalog_cache.py
+from __future__ import annotations
+
+import itertools
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..env import env_int
+from .repo import (
+    CatalogSnapshot,
+    Dish,
+    DishIngredient,
+    Ingredient,
+    InventoryItem,
+    PriceItem,
+    ProcurementInputs,
+    SQLiteRepo,
+)
+from .units import UnitConverter
+
+DEFAULT_MAX_CACHED_DBS = 4
+
+FileSignature = Tuple[Tuple[int, int], ...]
+
+# 跨 db_path 單調遞增；每次重新載入快照都取新的 revision
+_REVISION_COUNTER = itertools.count(1)
+
+
+def _cache_key(db_path: str) -> str:
+    return os.path.realpath(db_path)
+
+
+def _max_cached_dbs_from_env() -> int:
+    return env_int("MENU_CATALOG_CACHE_MAX_DBS", DEFAULT_MAX_CACHED_DBS)
+
+
+def _file_signature(path: str) -> FileSignature:
+    # WAL 模式下 commit 只會寫 -wal，主檔 mtime/size 不一定變動，因此一併納入
+    out: List[Tuple[int, int]] = []
+    for p in (path, f"{path}-wal"):
+        try:
+            st = os.stat(p)
+        except FileNotFoundError:
+            out.append((-1, -1))
+            continue
+        out.append((st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+@dataclass
+class _CacheEntry:
+    snapshot: CatalogSnapshot
+    signature: FileSignature
+    watch_conn: Optional[sqlite3.Connection]
+    data_version: Optional[int]
+    conn_lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def read_data_version(self) -> Optional[int]:
+        with self.conn_lock:
+            if self.watch_conn is None:
+                return None
+            return _read_data_version(self.watch_conn)
+
+    def close(self) -> None:
+        with self.conn_lock:
+            if self.watch_conn is not None:
+                try:
+                    self.watch_conn.close()
+                except sqlite3.Error:
+                    pass
+                self.watch_conn = None
+
+
+def _read_data_version(conn: sqlite3.Connection) -> Optional[int]:
+    try:
+        return int(conn.execute("PRAGMA data_version").fetchone()[0])
+    except sqlite3.Error:
+        return None
+
+
+class CatalogSnapshotCache:
+    """
+    Process-wide 目錄快照快取（每個 db_path 一份，LRU 上限 max_entries）。
+
+    失效條件（任一成立即重新載入）：
+    - 主檔或 -wal 檔 mtime/size 改變（外部程序、備份還原）
+    - 常駐監看連線的 PRAGMA data_version 改變（其他連線 commit）
+    - SQLiteAdminRepo 寫入後呼叫 invalidate()（見 notify_catalog_changed）
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = _max_cached_dbs_from_env() if max_entries is None else max(0, int(max_entries))
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._path_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _path_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            lock = self._path_locks.get(key)
+            if lock is None:
+                lock = self._path_locks[key] = threading.Lock()
+            return lock
+
+    def _is_fresh(self, key: str, entry: _CacheEntry) -> bool:
+        if entry.signature != _file_signature(key):
+            return False
+        current = entry.read_data_version()
+        return current is not None and current == entry.data_version
+
+    def get(self, db_path: str) -> CatalogSnapshot:
+        key = _cache_key(db_path)
+        if self.max_entries <= 0 or not os.path.exists(key):
+            # 停用快取或檔案不存在時維持原本直接讀取（含原本的錯誤行為）
+            return SQLiteRepo(db_path).fetch_catalog_snapshot()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and self._is_fresh(key, entry):
+            with self._lock:
+                self.hits += 1
+            return entry.snapshot
+
+        with self._path_lock(key):
+            # 等待鎖期間可能已被其他執行緒重新載入
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and self._is_fresh(key, entry):
+                with self._lock:
+                    self.hits += 1
+                return entry.snapshot
+            return self._load(key, db_path, entry)
+
+    def _load(self, key: str, db_path: str, previous: Optional[_CacheEntry]) -> CatalogSnapshot:
+        if previous is not None:
+            previous.close()
+
+        # 先記錄版本再讀資料：讀取期間若有新寫入，下次 get 會再重新載入
+        watch_conn = sqlite3.connect(key, check_same_thread=False)
+        signature = _file_signature(key)
+        data_version = _read_data_version(watch_conn)
+        snapshot = SQLiteRepo(db_path).fetch_catalog_snapshot()
+        entry = _CacheEntry(
+            snapshot=replace(
+                snapshot,
+                revision=next(_REVISION_COUNTER),
+                modified_at=max(mtime_ns for mtime_ns, _ in signature) / 1e9,
+            ),
+            signature=signature,
+            watch_conn=watch_conn,
+            data_version=data_version,
+        )
+
+        evicted: List[_CacheEntry] = []
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                old_key, old_entry = self._entries.popitem(last=False)
+                self._path_locks.pop(old_key, None)
+                evicted.append(old_entry)
+        for old_entry in evicted:
+            old_entry.close()
+        return entry.snapshot
+
+    def invalidate(self, db_path: Optional[str] = None) -> None:
+        with self._lock:
+            if db_path is None:
+                removed = list(self._entries.values())
+                self._entries.clear()
+            else:
+                one = self._entries.pop(_cache_key(db_path), None)
+                removed = [one] if one is not None else []
+        for entry in removed:
+            entry.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "cached_dbs": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+CATALOG_CACHE = CatalogSnapshotCache()
+
+
+def get_catalog_snapshot(db_path: str) -> CatalogSnapshot:
+    return CATALOG_CACHE.get(db_path)
+
+
+def notify_catalog_changed(db_path: str) -> None:
+    CATALOG_CACHE.invalidate(db_path)
+
+
+class CachedSQLiteRepo(SQLiteRepo):
+    """
+    讀取走 process-wide 快照快取的 SQLiteRepo；回傳值為淺拷貝，呼叫端可自由修改。
+    fetch_catalog_summary 依當日日期統計庫存，仍直接查詢 SQLite。
+    """
+
+    def _snapshot(self) -> CatalogSnapshot:
+        return get_catalog_snapshot(self.db_path)
+
+    def fetch_catalog_snapshot(self) -> CatalogSnapshot:
+        return self._snapshot()
+
+    def fetch_ingredients(self) -> Dict[str, Ingredient]:
+        return dict(self._snapshot().ingredients)
+
+    def fetch_dishes(self, role: Optional[str] = None) -> List[Dish]:
+        return self._snapshot().dishes_by_role(role)
+
+    def fetch_dish_ingredients(self, dish_ids: Optional[List[str]] = None) -> List[DishIngredient]:
+        rows = self._snapshot().dish_ingredients
+        if not dish_ids:
+            return list(rows)
+        wanted = set(dish_ids)
+        return [di for di in rows if di.dish_id in wanted]
+
+    def fetch_inventory(self) -> Dict[str, InventoryItem]:
+        return dict(self._snapshot().inventory)
+
+    def fetch_unit_conversions(self) -> Dict[Tuple[str, str], float]:
+        return dict(self._snapshot().unit_conversions)
+
+    def fetch_unit_converter(self) -> UnitConverter:
+        return self._snapshot().unit_converter
+
+    def fetch_latest_prices(self, price_date: Optional[str] = None) -> Dict[str, PriceItem]:
+        return dict(self._snapshot().latest_prices(price_date))
+
+    def fetch_procurement_inputs(
+        self,
+        dish_ids: Optional[List[str]] = None,
+        date_range: Optional[Tuple[str, str]] = None,
+    ) -> ProcurementInputs:
+        snapshot = self._snapshot()
+        rows = self.fetch_dish_ingredients(dish_ids)
+        wanted = {di.ingredient_id for di in rows}
+        history = snapshot.price_window(wanted, date_range)
+        return ProcurementInputs(
+            dish_ingredients=rows,
+            ingredients={k: v for k, v in snapshot.ingredients.items() if k in wanted},
+            prices={k: v[-1] for k, v in history.items()},
+            price_history=history,
+        )
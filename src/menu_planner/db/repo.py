@@ -1,11 +1,18 @@
 # src/menu_planner/db/repo.py
 from __future__ import annotations
 
+import bisect
+import hashlib
 import json
+import os
 import sqlite3
+import threading
+from contextlib import closing
 from dataclasses import dataclass, field
 from datetime import date
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+
+from .units import UnitConverter
 
 
 SQL_FETCH_INGREDIENTS = """
@@ -14,15 +21,6 @@ FROM ingredients
 """
 
 SQL_FETCH_DISHES_COLUMNS = "id, name, role, cuisine, meat_type, tags_json"
-SQL_FETCH_DISHES_COLUMNS_WITH_ALLOWED_WEEKDAYS = (
-    "id, name, role, cuisine, meat_type, tags_json, allowed_weekdays_json"
-)
-SQL_FETCH_DISHES_COLUMNS_WITH_PREP = (
-    "id, name, role, cuisine, meat_type, tags_json, prep_minutes"
-)
-SQL_FETCH_DISHES_COLUMNS_WITH_ALLOWED_WEEKDAYS_AND_PREP = (
-    "id, name, role, cuisine, meat_type, tags_json, allowed_weekdays_json, prep_minutes"
-)
 
 SQL_FETCH_DISH_INGREDIENTS_BASE = """
 SELECT dish_id, ingredient_id, qty, unit
@@ -61,6 +59,20 @@ JOIN (
 ) x ON p.ingredient_id = x.ingredient_id AND p.price_date = x.max_date
 """
 
+SQL_FETCH_PRICE_HISTORY = """
+SELECT ingredient_id, price_date, price_per_unit, unit
+FROM ingredient_prices
+ORDER BY ingredient_id, price_date
+"""
+
+SQL_FETCH_SCHEMA_VERSION = "PRAGMA schema_version"
+
+SQL_FETCH_DISH_COLUMN_NAMES = "SELECT name FROM pragma_table_info('dishes')"
+
+SQL_HAS_UNIT_CONVERSIONS_TABLE = """
+SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'unit_conversions'
+"""
+
 SQL_FETCH_LATEST_PRICES = """
 SELECT p.ingredient_id, p.price_date, p.price_per_unit, p.unit
 FROM ingredient_prices p
@@ -71,6 +83,41 @@ JOIN (
 ) x ON p.ingredient_id = x.ingredient_id AND p.price_date = x.max_date
 """
 
+# 採購明細用：指定菜色的食材行 + 食材，一次查回
+SQL_FETCH_PROCUREMENT_LINES = """
+SELECT di.dish_id, di.ingredient_id, di.qty, di.unit,
+       i.id AS ing_id, i.name, i.category, i.protein_group, i.default_unit
+FROM dish_ingredients di
+LEFT JOIN ingredients i ON i.id = di.ingredient_id
+"""
+
+# {lines} 為上面 SQL 的 WHERE 子句（同一組 dish_id 參數），只取用到的食材的價格歷史
+SQL_FETCH_PROCUREMENT_PRICE_HISTORY = """
+SELECT p.ingredient_id, p.price_date, p.price_per_unit, p.unit
+FROM ingredient_prices p
+WHERE p.ingredient_id IN (SELECT di.ingredient_id FROM dish_ingredients di {lines})
+ORDER BY p.ingredient_id, p.price_date
+"""
+
+# 同上，但只取 (起日, 迄日) 期間 as-of 計價會用到的價格：起日當時有效的一筆、期間內的異動，
+# 以及最早一筆（起日前沒有價格時的後備）；參數為 dish_id..., 起日, 迄日
+SQL_FETCH_PROCUREMENT_PRICE_WINDOW = """
+WITH wanted(ingredient_id) AS (SELECT DISTINCT di.ingredient_id FROM dish_ingredients di {lines}),
+bounds AS (
+  SELECT w.ingredient_id,
+         COALESCE((SELECT MAX(q.price_date) FROM ingredient_prices q
+                   WHERE q.ingredient_id = w.ingredient_id AND q.price_date <= ?), '') AS lo,
+         (SELECT MIN(q.price_date) FROM ingredient_prices q WHERE q.ingredient_id = w.ingredient_id) AS first
+  FROM wanted w
+)
+SELECT p.ingredient_id, p.price_date, p.price_per_unit, p.unit
+FROM bounds b JOIN ingredient_prices p ON p.ingredient_id = b.ingredient_id AND p.price_date BETWEEN b.lo AND ?
+UNION
+SELECT p.ingredient_id, p.price_date, p.price_per_unit, p.unit
+FROM bounds b JOIN ingredient_prices p ON p.ingredient_id = b.ingredient_id AND p.price_date = b.first
+ORDER BY 1, 2
+"""
+
 
 @dataclass(frozen=True)
 class Ingredient:
@@ -118,6 +165,153 @@ class PriceItem:
     unit: str
 
 
+@dataclass(frozen=True)
+class ProcurementInputs:
+    """
+    採購明細所需的資料，只含被引用到的菜色 / 食材。
+    price_history 依日期排序（指定期間時只含期間內用得到的幾筆），prices 為其中各食材最後一筆。
+    """
+
+    dish_ingredients: List["DishIngredient"]
+    ingredients: Dict[str, "Ingredient"]
+    prices: Dict[str, "PriceItem"]
+    price_history: Dict[str, List["PriceItem"]]
+
+
+@dataclass(frozen=True)
+class CatalogSchemaFlags:
+    has_allowed_weekdays: bool
+    has_prep_minutes: bool
+    has_unit_conversions: bool
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    同一個 read transaction 內讀出的整份目錄資料，避免 admin 同時編輯時各表不一致。
+    價格保留完整歷史（依日期排序），latest_prices(price_date) 以 as-of 方式查詢。
+    """
+    db_path: str
+    schema: CatalogSchemaFlags
+    ingredients: Dict[str, Ingredient]
+    dishes: List[Dish]
+    dish_ingredients: List[DishIngredient]
+    inventory: Dict[str, InventoryItem]
+    unit_conversions: Dict[Tuple[str, str], float]
+    unit_converter: UnitConverter
+    price_history: Dict[str, List[PriceItem]]
+    # 由 CatalogSnapshotCache 指派；直接由 SQLiteRepo 讀出的快照為 0
+    revision: int = 0
+    # 載入時主檔 / -wal 檔的最新 mtime（epoch 秒），供 Last-Modified 使用；同樣只有快取快照才有
+    modified_at: float = 0.0
+    _latest_prices_memo: Dict[Optional[str], Dict[str, PriceItem]] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+    _content_hash_memo: List[str] = field(default_factory=list, repr=False, compare=False)
+
+    def content_hash(self) -> str:
+        """
+        目錄內容的穩定雜湊（不含 db_path / revision）：跨 process 仍一致，可作為持久化快取 key。
+        每份快照只計算一次。
+        """
+        if self._content_hash_memo:
+            return self._content_hash_memo[0]
+        h = hashlib.sha256()
+        parts = (
+            self.schema,
+            sorted(self.ingredients.items()),
+            self.dishes,
+            self.dish_ingredients,
+            sorted(self.inventory.items()),
+            sorted(self.unit_conversions.items()),
+            sorted(self.price_history.items()),
+        )
+        for part in parts:
+            h.update(repr(part).encode("utf-8"))
+            h.update(b"\0")
+        self._content_hash_memo.append(h.hexdigest())
+        return self._content_hash_memo[0]
+
+    def latest_prices(self, price_date: Optional[str] = None) -> Dict[str, PriceItem]:
+        """語意同 SQLiteRepo.fetch_latest_prices：指定 price_date 時取該日(含)之前最新一筆。"""
+        memo = self._latest_prices_memo.get(price_date)
+        if memo is not None:
+            return memo
+
+        out: Dict[str, PriceItem] = {}
+        for ingredient_id, history in self.price_history.items():
+            if price_date is None:
+                out[ingredient_id] = history[-1]
+                continue
+            pos = bisect.bisect_right([p.price_date for p in history], price_date)
+            if pos > 0:
+                out[ingredient_id] = history[pos - 1]
+        self._latest_prices_memo[price_date] = out
+        return out
+
+    def price_window(
+        self,
+        ingredient_ids: Iterable[str],
+        date_range: Optional[Tuple[str, str]] = None,
+    ) -> Dict[str, List[PriceItem]]:
+        """語意同 SQLiteRepo.fetch_procurement_inputs 的價格歷史：指定期間時只取 as-of 計價會用到的幾筆。"""
+        out: Dict[str, List[PriceItem]] = {}
+        for ingredient_id in ingredient_ids:
+            history = self.price_history.get(ingredient_id)
+            if not history:
+                continue
+            if date_range is None:
+                out[ingredient_id] = list(history)
+                continue
+            start, end = date_range
+            dates = [p.price_date for p in history]
+            lo = max(0, bisect.bisect_right(dates, start) - 1)
+            hi = bisect.bisect_right(dates, end)
+            picked = history[lo:hi]
+            if lo > 0 or not picked:
+                picked = [history[0]] + picked
+            out[ingredient_id] = picked
+        return out
+
+    def dishes_by_role(self, role: Optional[str] = None) -> List[Dish]:
+        if not role:
+            return list(self.dishes)
+        return [d for d in self.dishes if d.role == role]
+
+
+# schema 旗標依 (db 檔案, schema_version) 快取；ALTER TABLE 等 schema 變更會讓 schema_version 遞增
+_SCHEMA_FLAGS_CACHE: Dict[Tuple[str, int], CatalogSchemaFlags] = {}
+_SCHEMA_FLAGS_LOCK = threading.Lock()
+
+
+def _read_schema_flags(conn: sqlite3.Connection, db_path: str) -> CatalogSchemaFlags:
+    schema_version = int(conn.execute(SQL_FETCH_SCHEMA_VERSION).fetchone()[0])
+    key = (os.path.abspath(db_path), schema_version)
+    with _SCHEMA_FLAGS_LOCK:
+        cached = _SCHEMA_FLAGS_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    dish_columns = {str(r[0]) for r in conn.execute(SQL_FETCH_DISH_COLUMN_NAMES).fetchall()}
+    flags = CatalogSchemaFlags(
+        has_allowed_weekdays="allowed_weekdays_json" in dish_columns,
+        has_prep_minutes="prep_minutes" in dish_columns,
+        has_unit_conversions=conn.execute(SQL_HAS_UNIT_CONVERSIONS_TABLE).fetchone() is not None,
+    )
+    with _SCHEMA_FLAGS_LOCK:
+        # 同一個檔案只保留最新 schema_version 的旗標
+        for stale in [k for k in _SCHEMA_FLAGS_CACHE if k[0] == key[0]]:
+            _SCHEMA_FLAGS_CACHE.pop(stale, None)
+        _SCHEMA_FLAGS_CACHE[key] = flags
+    return flags
+
+
+def _dish_select_sql(flags: CatalogSchemaFlags) -> str:
+    allowed_expr = "allowed_weekdays_json" if flags.has_allowed_weekdays else "NULL AS allowed_weekdays_json"
+    prep_expr = "prep_minutes" if flags.has_prep_minutes else "0 AS prep_minutes"
+    return f"SELECT {SQL_FETCH_DISHES_COLUMNS}, {allowed_expr}, {prep_expr} FROM dishes"
+
+
 def _parse_json_list(raw_json: Optional[str]) -> List[str]:
     try:
         return json.loads(raw_json or "[]")
@@ -205,10 +399,6 @@ class SQLiteRepo:
         conn.execute("PRAGMA foreign_keys = ON;")
         return conn
 
-    def _has_column(self, conn: sqlite3.Connection, table: str, column: str) -> bool:
-        rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
-        return any(str(r[1]) == column for r in rows)
-
     # ---------- basic fetch ----------
     def fetch_ingredients(self) -> Dict[str, Ingredient]:
         with self.connect() as conn:
@@ -218,17 +408,7 @@ class SQLiteRepo:
     def fetch_dishes(self, role: Optional[str] = None) -> List[Dish]:
         params: List[Any] = []
         with self.connect() as conn:
-            has_allowed_weekdays = self._has_column(conn, "dishes", "allowed_weekdays_json")
-            has_prep = self._has_column(conn, "dishes", "prep_minutes")
-            if has_allowed_weekdays and has_prep:
-                columns = SQL_FETCH_DISHES_COLUMNS_WITH_ALLOWED_WEEKDAYS_AND_PREP
-            elif has_allowed_weekdays:
-                columns = SQL_FETCH_DISHES_COLUMNS_WITH_ALLOWED_WEEKDAYS
-            elif has_prep:
-                columns = SQL_FETCH_DISHES_COLUMNS_WITH_PREP
-            else:
-                columns = SQL_FETCH_DISHES_COLUMNS
-            sql = f"SELECT {columns} FROM dishes"
+            sql = _dish_select_sql(_read_schema_flags(conn, self.db_path))
             if role:
                 sql += " WHERE role = ?"
                 params.append(role)
@@ -261,6 +441,10 @@ class SQLiteRepo:
             rows = conn.execute(SQL_FETCH_UNIT_CONVERSIONS).fetchall()
         return {(r["from_unit"], r["to_unit"]): float(r["factor"]) for r in rows}
 
+    def fetch_unit_converter(self) -> UnitConverter:
+        """載入 unit_conversions 並預先建立遞移閉包的換算矩陣。"""
+        return UnitConverter(self.fetch_unit_conversions())
+
     # ---------- prices ----------
     def fetch_latest_prices(self, price_date: Optional[str] = None) -> Dict[str, PriceItem]:
         """
@@ -275,6 +459,108 @@ class SQLiteRepo:
 
         return {r["ingredient_id"]: _map_price_item(r) for r in rows}
 
+    def fetch_procurement_inputs(
+        self,
+        dish_ids: Optional[List[str]] = None,
+        date_range: Optional[Tuple[str, str]] = None,
+    ) -> ProcurementInputs:
+        """
+        指定菜色的食材行、用到的食材與其價格歷史（同一連線兩次查詢）；dish_ids 為空時取全部。
+        date_range=(起日, 迄日) 時價格歷史只取 as-of 計價會用到的部分。
+        """
+        where = ""
+        params: List[Any] = []
+        if dish_ids:
+            placeholders = ",".join(["?"] * len(dish_ids))
+            where = f"WHERE di.dish_id IN ({placeholders})"
+            params.extend(dish_ids)
+        order = " ORDER BY di.dish_id, di.ingredient_id" if dish_ids else " ORDER BY di.rowid"
+        price_sql = SQL_FETCH_PROCUREMENT_PRICE_WINDOW if date_range else SQL_FETCH_PROCUREMENT_PRICE_HISTORY
+        price_params = params + list(date_range or ())
+
+        with self.connect() as conn:
+            rows = conn.execute(f"{SQL_FETCH_PROCUREMENT_LINES} {where}{order}", params).fetchall()
+            price_rows = conn.execute(
+                price_sql.format(lines=where), price_params
+            ).fetchall()
+
+        ingredients: Dict[str, Ingredient] = {}
+        for r in rows:
+            ing_id = r["ingredient_id"]
+            if r["ing_id"] is not None and ing_id not in ingredients:
+                ingredients[ing_id] = Ingredient(
+                    id=ing_id,
+                    name=r["name"],
+                    category=r["category"],
+                    protein_group=r["protein_group"],
+                    default_unit=r["default_unit"],
+                )
+        price_history: Dict[str, List[PriceItem]] = {}
+        for r in price_rows:
+            price_history.setdefault(r[0], []).append(PriceItem(r[0], r[1], float(r[2]), r[3]))
+        return ProcurementInputs(
+            dish_ingredients=[_map_dish_ingredient(r) for r in rows],
+            ingredients=ingredients,
+            prices={k: history[-1] for k, history in price_history.items()},
+            price_history=price_history,
+        )
+
+    # ---------- snapshot ----------
+    def fetch_catalog_snapshot(self) -> CatalogSnapshot:
+        """
+        以單一連線、單一 read transaction 讀出規劃所需的整份目錄資料。
+        唯讀：unit_conversions 不存在時回傳空換算表，不會在讀取路徑上建表。
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with closing(conn):
+            conn.execute("BEGIN")
+            try:
+                flags = _read_schema_flags(conn, self.db_path)
+                ingredient_rows = conn.execute(SQL_FETCH_INGREDIENTS).fetchall()
+                dish_rows = conn.execute(_dish_select_sql(flags) + " ORDER BY role, name").fetchall()
+                dish_ingredient_rows = conn.execute(SQL_FETCH_DISH_INGREDIENTS_BASE).fetchall()
+                inventory_rows = conn.execute(SQL_FETCH_INVENTORY).fetchall()
+                conversion_rows = (
+                    conn.execute(SQL_FETCH_UNIT_CONVERSIONS).fetchall() if flags.has_unit_conversions else []
+                )
+                price_rows = conn.execute(SQL_FETCH_PRICE_HISTORY).fetchall()
+            finally:
+                conn.rollback()
+
+        # 欄位順序固定（見 SQL 常數），直接以位置參數批次建立 dataclass
+        ingredients = {r[0]: Ingredient(r[0], r[1], r[2], r[3], r[4]) for r in ingredient_rows}
+        dishes = [
+            Dish(
+                id=r[0],
+                name=r[1],
+                role=r[2],
+                cuisine=r[3],
+                meat_type=r[4],
+                tags=_parse_json_list(r[5]),
+                allowed_weekdays=_parse_allowed_weekdays(r[6]),
+                prep_minutes=max(0, int(r[7] or 0)),
+            )
+            for r in dish_rows
+        ]
+        dish_ingredients = [DishIngredient(r[0], r[1], float(r[2]), r[3]) for r in dish_ingredient_rows]
+        inventory = {r[0]: InventoryItem(r[0], float(r[1]), r[2], r[3], r[4]) for r in inventory_rows}
+        unit_conversions = {(r[0], r[1]): float(r[2]) for r in conversion_rows}
+        price_history: Dict[str, List[PriceItem]] = {}
+        for r in price_rows:
+            price_history.setdefault(r[0], []).append(PriceItem(r[0], r[1], float(r[2]), r[3]))
+
+        return CatalogSnapshot(
+            db_path=self.db_path,
+            schema=flags,
+            ingredients=ingredients,
+            dishes=dishes,
+            dish_ingredients=dish_ingredients,
+            inventory=inventory,
+            unit_conversions=unit_conversions,
+            unit_converter=UnitConverter(unit_conversions),
+            price_history=price_history,
+        )
+
     def fetch_catalog_summary(self) -> Dict[str, Any]:
         """
         彙整右欄可顯示的資料庫資訊：
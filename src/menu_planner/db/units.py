@@ -0,0 +1,140 @@
+# src/menu_planner/db/units.py
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+UNKNOWN_UNIT_CODE = -1
+
+ConversionPairs = Mapping[Tuple[str, str], float]
+
+
+def _normalize_unit(unit: Optional[str]) -> str:
+    return str(unit or "").strip()
+
+
+class UnitConverter:
+    """
+    單位換算引擎：由 unit_conversions 的 (from_unit, to_unit) -> factor 建立完整遞移閉包。
+
+    - factor 語意與資料表一致：qty_in_to = qty_in_from * factor
+    - 直接換算優先，其次反向（1 / factor），再其次多段路徑（例：斤 -> g -> kg）
+    - 單位先編碼成整數 code，換算時只做矩陣查表 + 乘法
+    """
+
+    def __init__(self, pairs: Optional[ConversionPairs] = None):
+        direct: Dict[str, Dict[str, float]] = {}
+        for (src_raw, tgt_raw), factor_raw in (pairs or {}).items():
+            src = _normalize_unit(src_raw)
+            tgt = _normalize_unit(tgt_raw)
+            try:
+                factor = float(factor_raw)
+            except (TypeError, ValueError):
+                continue
+            if not src or not tgt or src == tgt or factor == 0:
+                continue
+            direct.setdefault(src, {})[tgt] = factor
+
+        # 反向邊只在沒有直接定義時補上，保留舊版「直接優先」行為
+        edges: Dict[str, Dict[str, float]] = {u: dict(nbrs) for u, nbrs in direct.items()}
+        for src, nbrs in direct.items():
+            for tgt, factor in nbrs.items():
+                edges.setdefault(tgt, {}).setdefault(src, 1.0 / factor)
+
+        self.units: List[str] = sorted(edges.keys())
+        self._codes: Dict[str, int] = {u: i for i, u in enumerate(self.units)}
+        self._matrix: List[List[Optional[float]]] = [self._closure_row(u, edges) for u in self.units]
+
+    def _closure_row(self, source: str, edges: Dict[str, Dict[str, float]]) -> List[Optional[float]]:
+        # BFS：最短路徑優先，確保直接/反向換算不會被多段路徑覆蓋
+        row: List[Optional[float]] = [None] * len(self.units)
+        row[self._codes[source]] = 1.0
+        queue = deque([(source, 1.0)])
+        while queue:
+            unit, acc = queue.popleft()
+            for nxt, factor in edges.get(unit, {}).items():
+                code = self._codes[nxt]
+                if row[code] is not None:
+                    continue
+                row[code] = acc * factor
+                queue.append((nxt, acc * factor))
+        return row
+
+    @classmethod
+    def coerce(cls, conv: Union["UnitConverter", ConversionPairs, None]) -> "UnitConverter":
+        if isinstance(conv, UnitConverter):
+            return conv
+        return cls(conv or {})
+
+    def code(self, unit: Optional[str]) -> int:
+        return self._codes.get(_normalize_unit(unit), UNKNOWN_UNIT_CODE)
+
+    def codes(self, units: Iterable[Optional[str]]) -> List[int]:
+        lookup = self._codes
+        return [lookup.get(_normalize_unit(u), UNKNOWN_UNIT_CODE) for u in units]
+
+    def factor(self, from_unit: Optional[str], to_unit: Optional[str]) -> Optional[float]:
+        src = _normalize_unit(from_unit)
+        tgt = _normalize_unit(to_unit)
+        if src == tgt:
+            return 1.0
+        return self._factor_by_code(self._codes.get(src, UNKNOWN_UNIT_CODE), self._codes.get(tgt, UNKNOWN_UNIT_CODE))
+
+    def _factor_by_code(self, from_code: int, to_code: int) -> Optional[float]:
+        if from_code < 0 or to_code < 0:
+            return None
+        return self._matrix[from_code][to_code]
+
+    def factors(self, from_codes: Sequence[int], to_codes: Sequence[int]) -> List[Optional[float]]:
+        matrix = self._matrix
+        out: List[Optional[float]] = []
+        for f, t in zip(from_codes, to_codes):
+            if f < 0 or t < 0:
+                out.append(None)
+            else:
+                out.append(matrix[f][t])
+        return out
+
+    def convert(
+        self,
+        qty_array: Sequence[float],
+        from_codes: Sequence[int],
+        to_codes: Sequence[int],
+    ) -> List[Optional[float]]:
+        """
+        批次換算：qty_array[i] 由 from_codes[i] 換到 to_codes[i]；無法換算者回傳 None。
+        未登錄單位（code = -1）一律視為無法換算，同名但未登錄的單位請改用 convert_units。
+        """
+        out: List[Optional[float]] = []
+        for qty, factor in zip(qty_array, self.factors(from_codes, to_codes)):
+            out.append(None if factor is None else float(qty) * factor)
+        return out
+
+    def convert_one(self, qty: float, from_unit: Optional[str], to_unit: Optional[str]) -> Optional[float]:
+        factor = self.factor(from_unit, to_unit)
+        if factor is None:
+            return None
+        return float(qty) * factor
+
+    def unit_factors(
+        self,
+        from_units: Sequence[Optional[str]],
+        to_units: Sequence[Optional[str]],
+    ) -> List[Optional[float]]:
+        """以單位字串批次取得 factor，同名單位（包含未登錄於換算表者）直接視為 1。"""
+        out = self.factors(self.codes(from_units), self.codes(to_units))
+        for i, value in enumerate(out):
+            if value is None and _normalize_unit(from_units[i]) == _normalize_unit(to_units[i]):
+                out[i] = 1.0
+        return out
+
+    def convert_units(
+        self,
+        qty_array: Sequence[float],
+        from_units: Sequence[Optional[str]],
+        to_units: Sequence[Optional[str]],
+    ) -> List[Optional[float]]:
+        out: List[Optional[float]] = []
+        for qty, factor in zip(qty_array, self.unit_factors(from_units, to_units)):
+            out.append(None if factor is None else float(qty) * factor)
+        return out
@@ -4,9 +4,17 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import date
 from datetime import timedelta
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 import random
 
+from ..config.loader import (
+    CompiledHardConstraints,
+    CompiledSoftPreferences,
+    CompiledWeights,
+    HardConfig,
+    SoftConfig,
+    WeightsConfig,
+)
 from ..db.repo import Dish
 from .features import DishFeatures
 from .constraints import PlanDay, check_main_hard 
@@ -14,7 +22,9 @@ from .constraints import check_cost_range, check_noodle_window_repeat, check_sou
 from .roles import DEFAULT_ROLE_COUNTS
 from .scoring import score_day
 
+from . import perf
 from .errors import PlanError
+from .progress import STAGE_FILL, STAGE_MAINS, ProgressCallback, report_progress
 
 from .backtracking_selection import (
     analyze_soup_rejections,
@@ -26,16 +36,9 @@ from .backtracking_selection import (
 
 
 
-def _side_soup_meat_limit_for_day(day_idx: int, start_date: Optional[date], hard: Dict) -> int:
-    base = hard.get("side_soup_meat_limit", hard.get("side_soup_protein_limit", 2))
-    overrides = hard.get("per_weekday_side_soup_meat_limit", hard.get("per_weekday_side_soup_protein_limit")) or {}
+def _side_soup_meat_limit_for_day(day_idx: int, start_date: Optional[date], hard: HardConfig) -> int:
     weekday = _weekday_for_day(day_idx, start_date)
-    if isinstance(overrides, dict):
-        base = overrides.get(weekday, overrides.get(str(weekday), base))
-    try:
-        return max(0, int(base))
-    except Exception:
-        return 2
+    return CompiledHardConstraints.coerce(hard).side_soup_meat_limit_for_weekday(weekday)
 
 
 def _meat_count(dish_ids: List[str], dish_has_meat: Dict[str, bool]) -> int:
@@ -63,16 +66,9 @@ def _meat_limit_error(day: int, total: int, limit: int, side_ids: List[str], sou
     )
 
 
-def _prep_minutes_for_day(day_idx: int, start_date: Optional[date], hard: Dict) -> int:
-    base = hard.get("prep_time_limit_minutes", 90)
-    overrides = hard.get("per_weekday_prep_time_limit_minutes") or {}
+def _prep_minutes_for_day(day_idx: int, start_date: Optional[date], hard: HardConfig) -> int:
     weekday = _weekday_for_day(day_idx, start_date)
-    if isinstance(overrides, dict):
-        base = overrides.get(weekday, overrides.get(str(weekday), base))
-    try:
-        return max(0, int(base))
-    except Exception:
-        return 90
+    return CompiledHardConstraints.coerce(hard).prep_limit_for_weekday(weekday)
 
 
 def _dish_prep_minutes(dish: Optional[Dish]) -> int:
@@ -118,26 +114,9 @@ def _weekday_for_day(day_idx: int, start_date: Optional[date]) -> int:
     return (day_idx % 7) + 1
 
 
-def _normalize_weekday_set(value) -> Set[int]:
-    if value is None:
-        return {1, 2, 3, 4, 5, 6, 7}
-    if not isinstance(value, list):
-        return {1, 2, 3, 4, 5, 6, 7}
-    out: Set[int] = set()
-    for x in value:
-        try:
-            wd = int(x)
-        except Exception:
-            continue
-        if 1 <= wd <= 7:
-            out.add(wd)
-    return out or {1, 2, 3, 4, 5, 6, 7}
-
-
-def _dish_allowed_on_day(dish: Dish, day_idx: int, start_date: Optional[date], hard: Dict) -> bool:
-    rules = (hard.get("dish_allowed_weekdays") or {}) if isinstance(hard, dict) else {}
-    allowed = _normalize_weekday_set(rules.get(dish.id))
-    return _weekday_for_day(day_idx, start_date) in allowed
+def _dish_allowed_on_day(dish: Dish, day_idx: int, start_date: Optional[date], hard: HardConfig) -> bool:
+    hc = CompiledHardConstraints.coerce(hard)
+    return hc.dish_allowed_on_weekday(dish.id, _weekday_for_day(day_idx, start_date))
 
 
 def _failed_day_explanation(
@@ -175,15 +154,26 @@ def plan_mains_beam(
     horizon_days: int,
     mains: List[Dish],
     feat: Dict[str, DishFeatures],
-    hard: Dict,
+    hard: HardConfig,
     beam_width: int,
     candidate_limit: int,
     seed: int = 7,
     start_date: Optional[date] = None,
     active_mask: Optional[List[bool]] = None,
     role_counts_by_day: Optional[List[Dict[str, int]]] = None,
+    progress: Optional[ProgressCallback] = None,
+    fixed_main_ids: Optional[Dict[int, str]] = None,
+    blocked_by_day: Optional[Dict[int, Set[str]]] = None,
 ) -> List[str]:
+    """
+    fixed_main_ids（day_index -> 主菜 id，"" 表示當天無主菜）供局部重排：
+    固定日不搜尋，只從第一個到最後一個非固定日之間跑 beam；
+    候選主菜另需通過對之後固定日的檢查（連續同肉、同週配額、30 天重複）。
+    blocked_by_day 為各日不可選的主菜 id。
+    """
     rng = random.Random(seed)
+    hard = CompiledHardConstraints.coerce(hard)
+    fixed = fixed_main_ids or {}
 
     # 候選先隨機打散，再用成本/庫存等排序
     main_by_id = {d.id: d for d in mains}
@@ -200,16 +190,42 @@ def plan_mains_beam(
     main_ids.sort(key=base_key)
     #main_ids = main_ids[:max(candidate_limit, 100)]
 
-    states: List[BeamState] = [
-        BeamState(main_ids=[], main_meats=[], weekly_meat_counts={}, score=0.0)
-    ]
-
     # active_mask 長度防呆：不足就視為全 active
     use_mask = active_mask if (active_mask and len(active_mask) >= horizon_days) else None
 
-    for day in range(horizon_days):
+    free_days = [day for day in range(horizon_days) if day not in fixed]
+    first_day = free_days[0] if free_days else horizon_days
+    last_day = free_days[-1] if free_days else horizon_days - 1
+
+    states: List[BeamState] = [
+        _fixed_prefix_state(fixed, first_day, feat, start_date)
+    ]
+
+    for day in range(first_day, last_day + 1):
+        report_progress(progress, STAGE_MAINS, day)
         new_states: List[BeamState] = []
 
+        if day in fixed:
+            did = fixed[day]
+            meat = _fixed_main_meat(did, feat)
+            week_key = _main_week_key(day, start_date)
+            for st in states:
+                new_week_counts = st.weekly_meat_counts
+                if meat:
+                    new_week_counts = {k: dict(v) for k, v in st.weekly_meat_counts.items()}
+                    new_week_counts.setdefault(week_key, {})
+                    new_week_counts[week_key][meat] = new_week_counts[week_key].get(meat, 0) + 1
+                new_states.append(
+                    BeamState(
+                        main_ids=st.main_ids + [did],
+                        main_meats=st.main_meats + [meat],
+                        weekly_meat_counts=new_week_counts,
+                        score=st.score,
+                    )
+                )
+            states = new_states[:beam_width]
+            continue
+
         counts = (role_counts_by_day[day] if role_counts_by_day and day < len(role_counts_by_day) else DEFAULT_ROLE_COUNTS)
         is_active = (True if use_mask is None else bool(use_mask[day])) and int(counts.get("main", 1) or 0) > 0
 
@@ -228,14 +244,15 @@ def plan_mains_beam(
             continue
 
         # ✅ 排程日：計算 week_key（用真實日期的 ISO week）
-        if start_date is None:
-            week_key = day // 7
-        else:
-            iso = (start_date + timedelta(days=day)).isocalendar()
-            week_key = iso.year * 100 + iso.week  # 例如 202605
+        week_key = _main_week_key(day, start_date)
+        ahead = _FixedMainsAhead(day, fixed, feat, hard, start_date, horizon_days, week_key) if fixed else None
 
+        blocked = (blocked_by_day or {}).get(day) or ()
         for st in states:
+            check_counts = ahead.weekly_counts(st.weekly_meat_counts) if ahead else st.weekly_meat_counts
             for did in main_ids:
+                if did in blocked:
+                    continue
                 dish = main_by_id.get(did)
                 if dish is not None and not _dish_allowed_on_day(dish, day, start_date, hard):
                     continue
@@ -247,12 +264,14 @@ def plan_mains_beam(
                     main_meat_type=meat,
                     plan_main_ids=st.main_ids,
                     plan_main_meats=st.main_meats,
-                    weekly_meat_counts=st.weekly_meat_counts,
+                    weekly_meat_counts=check_counts,
                     hard=hard,
                     week_key=week_key,  # ✅ 關鍵：把真實週傳進去
                     start_date=start_date,   # ✅ 新增這行
                 ):
                     continue
+                if ahead is not None and not ahead.allows(did, meat, st.main_ids):
+                    continue
 
                 # 新狀態：週計數也用同一個 week_key
                 new_week_counts = {k: dict(v) for k, v in st.weekly_meat_counts.items()}
@@ -280,6 +299,7 @@ def plan_mains_beam(
                     )
                 )
 
+        perf.count("beam.expansions", len(new_states))
         new_states.sort(key=lambda x: x.score)
         states = new_states[:beam_width]
         #print("states",states)
@@ -287,7 +307,7 @@ def plan_mains_beam(
         if not states:
             cur_date = start_date + timedelta(days=day)
             print("NO SOLUTION AT:", day+1, cur_date.isoformat(), "weekday", cur_date.isoweekday())
-            print("fixed rule:", (hard.get("fixed_main_meat_by_weekday") or {}).get(str(cur_date.isoweekday())))
+            print("fixed rule:", hard.fixed_meats_for_weekday(cur_date.isoweekday()))
             raise PlanError(
                 code="MAIN_BEAM_NO_SOLUTION",
                 day_index=day,
@@ -299,7 +319,105 @@ def plan_mains_beam(
                 }
             )
 
-    return states[0].main_ids
+    return states[0].main_ids + [fixed[day] for day in range(last_day + 1, horizon_days)]
+
+
+def _main_week_key(day: int, start_date: Optional[date]) -> int:
+    if start_date is None:
+        return day // 7
+    iso = (start_date + timedelta(days=day)).isocalendar()
+    return iso.year * 100 + iso.week  # 例如 202605
+
+
+def _fixed_main_meat(did: str, feat: Dict[str, DishFeatures]) -> Optional[str]:
+    return feat[did].meat_type if did and did in feat else None
+
+
+def _fixed_prefix_state(
+    fixed: Dict[int, str],
+    first_day: int,
+    feat: Dict[str, DishFeatures],
+    start_date: Optional[date],
+) -> BeamState:
+    """第一個非固定日之前的固定主菜直接組成起始狀態（含週配額計數）。"""
+    main_ids: List[str] = []
+    main_meats: List[Optional[str]] = []
+    weekly: Dict[int, Dict[str, int]] = {}
+    for day in range(first_day):
+        did = fixed[day]
+        meat = _fixed_main_meat(did, feat)
+        main_ids.append(did)
+        main_meats.append(meat)
+        if meat:
+            week = weekly.setdefault(_main_week_key(day, start_date), {})
+            week[meat] = week.get(meat, 0) + 1
+    return BeamState(main_ids=main_ids, main_meats=main_meats, weekly_meat_counts=weekly, score=0.0)
+
+
+class _FixedMainsAhead:
+    """
+    局部重排時，某個非固定日之後的固定主菜對候選的限制（check_main_hard 只往回看）：
+    - 隔天固定主菜與候選同肉 → 違反連續同肉
+    - 同 ISO 週之後的固定主菜計入週配額（已由固定肉類週幾保留名額者不重複計）
+    - 之後 30 天內固定日有同一道主菜 → 以該固定日的視角重算 30 天重複
+    """
+
+    def __init__(
+        self,
+        day: int,
+        fixed: Dict[int, str],
+        feat: Dict[str, DishFeatures],
+        hard: CompiledHardConstraints,
+        start_date: Optional[date],
+        horizon_days: int,
+        week_key: int,
+    ):
+        self.day = day
+        self.fixed = fixed
+        self.week_key = week_key
+        self.max_same_main = hard.repeat.max_same_main_in_30_days
+
+        next_id = fixed.get(day + 1)
+        self.check_next_meat = bool(hard.no_consecutive_same_main_meat and next_id)
+        self.next_meat = _fixed_main_meat(next_id, feat) if next_id else None
+
+        self.week_extra: Dict[str, int] = {}
+        for k in range(day + 1, min(day + 7, horizon_days)):
+            did = fixed.get(k)
+            meat = _fixed_main_meat(did, feat) if did else None
+            if not meat or _main_week_key(k, start_date) != week_key:
+                continue
+            reserved = hard.fixed_single_meat_weekdays.get(meat) or ()
+            if start_date is not None and (start_date + timedelta(days=k)).isoweekday() in reserved:
+                continue
+            self.week_extra[meat] = self.week_extra.get(meat, 0) + 1
+
+        self.repeat_days: Dict[str, List[int]] = {}
+        if self.max_same_main is not None:
+            for k in range(day + 1, min(day + 31, horizon_days)):
+                did = fixed.get(k)
+                if did:
+                    self.repeat_days.setdefault(did, []).append(k)
+
+    def weekly_counts(self, counts: Dict[int, Dict[str, int]]) -> Dict[int, Dict[str, int]]:
+        if not self.week_extra:
+            return counts
+        week = dict(counts.get(self.week_key, {}))
+        for meat, n in self.week_extra.items():
+            week[meat] = week.get(meat, 0) + n
+        return {**counts, self.week_key: week}
+
+    def allows(self, did: str, meat: Optional[str], prev_main_ids: List[str]) -> bool:
+        if self.check_next_meat and self.next_meat == meat:
+            return False
+        for later in self.repeat_days.get(did, ()):
+            # 同 check_main_hard：固定日 later 的前 30 天（含本日候選）已出現次數 + 1 不得超過上限
+            lo = max(0, later - 30)
+            used = sum(1 for mid in prev_main_ids[lo:self.day] if mid == did) + 1
+            used += sum(1 for k in range(self.day + 1, later) if self.fixed.get(k) == did)
+            if used + 1 > self.max_same_main:
+                return False
+        return True
 
 
 # Backward-compatible aliases for tests/internal imports.
@@ -317,9 +435,9 @@ def fill_days_after_mains(
     soups: List[Dish],
     fruits: List[Dish],
     feat: Dict[str, DishFeatures],
-    hard: Dict,
-    weights: Dict,
-    soft: Dict,
+    hard: HardConfig,
+    weights: WeightsConfig,
+    soft: SoftConfig,
     dish_ingredient_ids: Optional[Dict[str, Set[str]]] = None,
     dish_has_meat: Optional[Dict[str, bool]] = None,
     dish_has_protein: Optional[Dict[str, bool]] = None,
@@ -328,7 +446,18 @@ def fill_days_after_mains(
     role_counts_by_day: Optional[List[Dict[str, int]]] = None,
     noodles: Optional[List[Dish]] = None,
     mains: Optional[List[Dish]] = None,
+    progress: Optional[ProgressCallback] = None,
+    on_day: Optional[Callable[[int, PlanDay, Dict], None]] = None,
+    fixed_days: Optional[Dict[int, PlanDay]] = None,
+    blocked_by_day: Optional[Dict[int, Set[str]]] = None,
 ) -> Tuple[List[PlanDay], float, List[Dict], List[Dict]]:
+    """
+    on_day(day_index, plan_day, day_detail)：每天定案後呼叫一次（串流端點逐日輸出用）。
+    fixed_days 供局部重排：固定日原樣保留（明細只有 {"day_index", "locked": True}、不計分），
+    其餘日照常填菜並以固定日為重複限制的歷史；blocked_by_day 為各日盡量避開的菜色 id（整類都被封鎖時不套用）。
+    """
+    fixed_days = fixed_days or {}
+    blocked_by_day = blocked_by_day or {}
     plan_days: List[PlanDay] = []
     total_score = 0.0
     explanations: List[Dict] = []
@@ -337,15 +466,18 @@ def fill_days_after_mains(
     prev_meat = None
     prev_cuisine = None
 
-    rep = hard.get("repeat_limits", {}) or {}
-    max_soup_7 = int(rep.get("max_same_soup_in_7_days", 1))
-    max_side_7 = int(rep.get("max_same_side_in_7_days", 1))
-    max_noodle_7 = int(rep.get("max_same_noodle_in_7_days", 1))
-    max_noodle_30 = int(rep.get("max_same_noodle_in_30_days", 2))
+    hard = CompiledHardConstraints.coerce(hard)
+    weights = CompiledWeights.coerce(weights)
+    soft = CompiledSoftPreferences.coerce(soft)
+
+    rep = hard.repeat
+    max_soup_7 = rep.max_same_soup_in_7_days
+    max_side_7 = rep.max_same_side_in_7_days
+    max_noodle_7 = rep.max_same_noodle_in_7_days
+    max_noodle_30 = rep.max_same_noodle_in_30_days
 
-    cr = (hard.get("cost_range_per_person_per_day") or {})
-    cost_min = float(cr.get("min", 0))
-    cost_max = float(cr.get("max", 10**18))
+    cost_min = hard.cost_min if hard.cost_min is not None else 0.0
+    cost_max = hard.cost_max if hard.cost_max is not None else float(10**18)
 
     side_pool0  = [d for d in sides  if d.id in feat]
     veg_pool0   = [d for d in vegs   if d.id in feat]
@@ -396,7 +528,24 @@ def fill_days_after_mains(
                 break
         return chosen
 
+    def commit_day(day_idx: int) -> None:
+        if on_day is None or day_idx < 0 or day_idx >= len(plan_days):
+            return
+        detail = explanations[-1] if explanations and explanations[-1].get("day_index") == day_idx else {}
+        on_day(day_idx, plan_days[day_idx], detail)
+
     for day in range(horizon_days):
+        # 各分支皆以 append + continue 結束，因此在下一天開始時回報前一天
+        commit_day(day - 1)
+        if day in fixed_days:
+            fixed_day = fixed_days[day]
+            plan_days.append(fixed_day)
+            explanations.append({"day_index": day, "locked": True})
+            if fixed_day.main and fixed_day.main in feat:
+                prev_meat = feat[fixed_day.main].meat_type
+                prev_cuisine = feat[fixed_day.main].cuisine
+            continue
+        report_progress(progress, STAGE_FILL, day)
         counts = (role_counts_by_day[day] if role_counts_by_day and day < len(role_counts_by_day) else DEFAULT_ROLE_COUNTS)
         main_count = int(counts.get("main", 1) or 0)
         noodle_count = int(counts.get("noodle", 0) or 0)
@@ -427,7 +576,7 @@ def fill_days_after_mains(
             })
             continue
         
-        seed0 = int(hard.get("seed", 7))  # 或改成 cfg seed 傳進來
+        seed0 = hard.seed  # 或改成 cfg seed 傳進來
         rng = random.Random(seed0 + day * 10007)
         
         # 只拿可用候選（在 feat 裡），並套用單一道菜允許供應週幾。
@@ -437,6 +586,12 @@ def fill_days_after_mains(
         soup_pool  = [d for d in soup_pool0 if _dish_allowed_on_day(d, day, start_date, hard)]
         side_pool  = [d for d in side_pool0 if _dish_allowed_on_day(d, day, start_date, hard)]
         veg_pool   = [d for d in veg_pool0 if _dish_allowed_on_day(d, day, start_date, hard)]
+        blocked = blocked_by_day.get(day)
+        if blocked:
+            main_pool, noodle_pool, fruit_pool, soup_pool, side_pool, veg_pool = (
+                [d for d in pool if d.id not in blocked] or pool
+                for pool in (main_pool, noodle_pool, fruit_pool, soup_pool, side_pool, veg_pool)
+            )
         
         rng.shuffle(main_pool)
         rng.shuffle(noodle_pool)
@@ -723,7 +878,7 @@ def fill_days_after_mains(
                 day_index=day,
                 message=f"第 {day+1} 天找不到符合重複限制的蔬菜。",
                 details={
-                    "max_same_veg_in_7_days": int(rep.get("max_same_veg_in_7_days", max_side_7)),
+                    "max_same_veg_in_7_days": rep.max_same_veg_in_7_days,
                     "candidate_count": len([d.id for d in vegs if d.id in feat]),
                     "hint": "可放寬 veg 7 天重複限制（或沿用 side 限制），或增加 veg 候選。"
                 }
@@ -876,9 +1031,9 @@ def fill_days_after_mains(
         ctx = {
             "prev_main_meat": prev_meat,
             "prev_main_cuisine": prev_cuisine,
-            "prefer_use_inventory": bool(soft.get("prefer_use_inventory", False)),
-            "prefer_near_expiry": bool(soft.get("prefer_near_expiry", False)),
-            "inventory_prefer_ingredient_ids": soft.get("inventory_prefer_ingredient_ids") or [],
+            "prefer_use_inventory": soft.prefer_use_inventory,
+            "prefer_near_expiry": soft.prefer_near_expiry,
+            "inventory_prefer_ingredient_ids": soft.inventory_prefer_ingredient_ids,
             "plan_date": (start_date + timedelta(days=day)).isoformat(),
         }
         
@@ -961,4 +1116,5 @@ def fill_days_after_mains(
         prev_meat = chosen["main"].meat_type if main_id else prev_meat
         prev_cuisine = chosen["main"].cuisine if main_id else prev_cuisine
 
+    commit_day(horizon_days - 1)
     return plan_days, round(total_score, 2), explanations, errors
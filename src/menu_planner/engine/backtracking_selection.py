@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import random
-from typing import Dict, List, Optional, Set
+from typing import Dict, FrozenSet, List, Optional, Set
 
+from ..config.loader import CompiledHardConstraints, HardConfig
 from ..db.repo import Dish
 from .constraints import (
     PlanDay,
@@ -12,27 +13,19 @@ from .constraints import (
     check_soup_window_repeat,
     check_veg_window_repeat,
 )
+from . import perf
 from .errors import PlanError
 from .features import DishFeatures
 
 
-def _repeat_limits(hard: Dict) -> Dict:
-    return hard.get("repeat_limits", {}) or {}
-
-
-def _ingredient_guardrails(hard: Dict) -> tuple[int, int, Optional[int], Set[str]]:
-    rep = _repeat_limits(hard)
-    max_ing_limit = int(
-        rep.get("max_same_ingredient_in_window_days", rep.get("max_same_ingredient_in_7_days", 10**9))
+def _ingredient_guardrails(hc: CompiledHardConstraints) -> tuple[int, int, Optional[int], FrozenSet[str]]:
+    rep = hc.repeat
+    return (
+        rep.max_same_ingredient_in_window_days,
+        rep.ingredient_repeat_window_days,
+        rep.max_consecutive_ingredient_days,
+        hc.no_same_ingredient_family_within_day,
     )
-    ing_window_days = int(rep.get("ingredient_repeat_window_days", 4))
-    max_ing_consec = rep.get("max_consecutive_ingredient_days")
-    no_same_within_day = {
-        str(x).strip()
-        for x in (hard.get("no_same_ingredient_family_within_day") or [])
-        if str(x).strip()
-    }
-    return max_ing_limit, ing_window_days, max_ing_consec, no_same_within_day
 
 
 def pick_fruit(
@@ -40,13 +33,13 @@ def pick_fruit(
     day_idx: int,
     plan_days: List[PlanDay],
     feat: Dict[str, DishFeatures],
-    hard: Dict,
+    hard: HardConfig,
     dish_ingredient_ids: Optional[Dict[str, Set[str]]] = None,
     selected_dish_ids: Optional[List[str]] = None,
 ) -> str:
-    rep = _repeat_limits(hard)
-    max_fruit_7 = int(rep.get("max_same_fruit_in_7_days", 10**9))
-    max_ing_limit, ing_window_days, max_ing_consec, no_same_within_day = _ingredient_guardrails(hard)
+    hc = CompiledHardConstraints.coerce(hard)
+    max_fruit_7 = hc.repeat.max_same_fruit_in_7_days
+    max_ing_limit, ing_window_days, max_ing_consec, no_same_within_day = _ingredient_guardrails(hc)
 
     fruit_ids = [d.id for d in fruits if d.id in feat]
     if not fruit_ids:
@@ -77,7 +70,7 @@ def choose_soup(
     soups: List[Dish],
     plan_days: List[PlanDay],
     feat: Dict[str, DishFeatures],
-    hard: Dict,
+    hard: HardConfig,
     main_id: str,
     dish_ingredient_ids: Optional[Dict[str, Set[str]]] = None,
     dish_has_meat: Optional[Dict[str, bool]] = None,
@@ -86,9 +79,9 @@ def choose_soup(
     rng: Optional[random.Random] = None,
     topk: int = 25,
 ) -> Optional[str]:
-    rep = _repeat_limits(hard)
-    max_soup_7 = int(rep.get("max_same_soup_in_7_days", 1))
-    max_ing_limit, ing_window_days, max_ing_consec, no_same_within_day = _ingredient_guardrails(hard)
+    hc = CompiledHardConstraints.coerce(hard)
+    max_soup_7 = hc.repeat.max_same_soup_in_7_days
+    max_ing_limit, ing_window_days, max_ing_consec, no_same_within_day = _ingredient_guardrails(hc)
     soup_ids = [d.id for d in soups if d.id in feat]
 
     soup_ids.sort(
@@ -130,13 +123,13 @@ def analyze_soup_rejections(
     soups: List[Dish],
     plan_days: List[PlanDay],
     feat: Dict[str, DishFeatures],
-    hard: Dict,
+    hard: HardConfig,
     main_id: str,
     dish_ingredient_ids: Optional[Dict[str, Set[str]]] = None,
 ) -> Dict[str, int]:
-    rep = _repeat_limits(hard)
-    max_soup_7 = int(rep.get("max_same_soup_in_7_days", 1))
-    max_ing_limit, ing_window_days, max_ing_consec, no_same_within_day = _ingredient_guardrails(hard)
+    hc = CompiledHardConstraints.coerce(hard)
+    max_soup_7 = hc.repeat.max_same_soup_in_7_days
+    max_ing_limit, ing_window_days, max_ing_consec, no_same_within_day = _ingredient_guardrails(hc)
 
     soup_ids = [d.id for d in soups if d.id in feat]
     blocked_by_ingredient = 0
@@ -183,7 +176,7 @@ def choose_sides_backtrack(
     sides: List[Dish],
     plan_days: List[PlanDay],
     feat: Dict[str, DishFeatures],
-    hard: Dict,
+    hard: HardConfig,
     main_id: str,
     soup_id: str,
     fruit_id: str,
@@ -195,9 +188,9 @@ def choose_sides_backtrack(
     topk: int = 120,
     pick_count: int = 2,
 ) -> Optional[List[str]]:
-    rep = _repeat_limits(hard)
-    max_side_7 = int(rep.get("max_same_side_in_7_days", 1))
-    max_ing_limit, ing_window_days, max_ing_consec, no_same_within_day = _ingredient_guardrails(hard)
+    hc = CompiledHardConstraints.coerce(hard)
+    max_side_7 = hc.repeat.max_same_side_in_7_days
+    max_ing_limit, ing_window_days, max_ing_consec, no_same_within_day = _ingredient_guardrails(hc)
     side_ids = [d.id for d in sides if d.id in feat]
 
     side_ids.sort(
@@ -217,6 +210,7 @@ def choose_sides_backtrack(
 
     def dfs(start_idx: int) -> Optional[List[str]]:
         if len(chosen) == pick_count:
+            perf.count("dfs.leaves")
             if side_soup_meat_limit is not None and dish_has_meat is not None:
                 meat_count = sum(
                     1
@@ -259,15 +253,15 @@ def choose_veg(
     vegs: List[Dish],
     plan_days: List[PlanDay],
     feat: Dict[str, DishFeatures],
-    hard: Dict,
+    hard: HardConfig,
     selected_dish_ids: List[str],
     dish_ingredient_ids: Optional[Dict[str, Set[str]]] = None,
     rng: Optional[random.Random] = None,
     topk: int = 80,
 ) -> Optional[str]:
-    rep = _repeat_limits(hard)
-    max_veg_7 = int(rep.get("max_same_veg_in_7_days", rep.get("max_same_side_in_7_days", 1)))
-    max_ing_limit, ing_window_days, max_ing_consec, no_same_within_day = _ingredient_guardrails(hard)
+    hc = CompiledHardConstraints.coerce(hard)
+    max_veg_7 = hc.repeat.max_same_veg_in_7_days
+    max_ing_limit, ing_window_days, max_ing_consec, no_same_within_day = _ingredient_guardrails(hc)
     veg_ids = [d.id for d in vegs if d.id in feat]
 
     veg_ids.sort(
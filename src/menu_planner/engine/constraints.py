@@ -2,9 +2,12 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 from datetime import date, timedelta   # ✅ 改這行
 
+from ..config.loader import CompiledHardConstraints, HardConfig, single_fixed_meat
+from . import perf
+
 
 @dataclass
 class PlanDay:
@@ -74,49 +77,31 @@ def _iter_prev_active_indices(day_idx: int, plan_days: List[PlanDay], window_act
         
 def _fixed_main_allowed_meats(
     day_idx: int,
-    hard: Dict,
+    hard: HardConfig,
     start_date: Optional[date],
-) -> Optional[set]:
+) -> Optional[FrozenSet[str]]:
     """
     hard.fixed_main_meat_by_weekday:
       - key: ISO weekday (1..7) 可用 int 或 str
       - value: str 或 list[str]
     """
-    fixed = (hard.get("fixed_main_meat_by_weekday") or {})
-    if not fixed or start_date is None:
+    if start_date is None:
         return None
-
-    wd = (start_date + timedelta(days=day_idx)).isoweekday()  # 1..7
-    rule = fixed.get(wd) or fixed.get(str(wd))
-    if not rule:
+    hc = CompiledHardConstraints.coerce(hard)
+    if not hc.fixed_main_meats_by_weekday:
         return None
+    wd = (start_date + timedelta(days=day_idx)).isoweekday()  # 1..7
+    return hc.fixed_meats_for_weekday(wd)
 
-    if isinstance(rule, str):
-        r = rule.strip()
-        return {r} if r else None
-
-    if isinstance(rule, list):
-        s = {str(x).strip() for x in rule if x is not None and str(x).strip()}
-        return s if s else None
-
-    return None
 
-def _as_single_meat(rule) -> Optional[str]:
-    """只在規則是單一肉類時回傳字串；多選（list>1）就回傳 None（不做保留）。"""
-    if isinstance(rule, str):
-        r = rule.strip()
-        return r if r else None
-    if isinstance(rule, list):
-        xs = [str(x).strip() for x in rule if x is not None and str(x).strip()]
-        return xs[0] if len(xs) == 1 else None
-    return None
+_as_single_meat = single_fixed_meat
 
 
 def _reserve_future_fixed_slots_in_same_iso_week(
     *,
     day_idx: int,
     start_date: Optional[date],
-    hard: Dict,
+    hard: HardConfig,
     target_meat: str,
 ) -> int:
     """
@@ -126,24 +111,15 @@ def _reserve_future_fixed_slots_in_same_iso_week(
     if start_date is None:
         return 0
 
-    fixed = (hard.get("fixed_main_meat_by_weekday") or {})
-    if not fixed:
+    weekdays = CompiledHardConstraints.coerce(hard).fixed_single_meat_weekdays.get(target_meat)
+    if not weekdays:
         return 0
 
     today = start_date + timedelta(days=day_idx)
     week_start = today - timedelta(days=today.isoweekday() - 1)  # 週一
 
     reserve = 0
-    for k, rule in fixed.items():
-        try:
-            wd = int(k)  # 1..7
-        except Exception:
-            continue
-
-        mt = _as_single_meat(rule)
-        if not mt or mt != target_meat:
-            continue
-
+    for wd in weekdays:
         fixed_date = week_start + timedelta(days=wd - 1)
         fixed_idx = (fixed_date - start_date).days
 
@@ -160,33 +136,35 @@ def check_main_hard(
     plan_main_ids: List[str],
     plan_main_meats: List[Optional[str]],
     weekly_meat_counts: Dict[int, Dict[str, int]],
-    hard: Dict,
+    hard: HardConfig,
     week_key: Optional[int] = None,
     start_date: Optional[date] = None,   # ✅ 新增
 ) -> bool:
+    perf.count("check.main_hard")
+    hc = CompiledHardConstraints.coerce(hard)
+
     # ✅ 1) 固定星期幾的主菜肉類（若有設定就必須符合）
-    fixed_allowed = _fixed_main_allowed_meats(day_idx, hard, start_date)
+    fixed_allowed = _fixed_main_allowed_meats(day_idx, hc, start_date)
     if fixed_allowed is not None:
         if (main_meat_type or "") not in fixed_allowed:
             return False
 
     # ✅ 2) 原本 allowed_main_meat_types
-    allowed = set(hard.get("allowed_main_meat_types", []))
+    allowed = hc.allowed_main_meat_types
     if allowed and (main_meat_type not in allowed):
         return False
 
     # ✅ 3) 連續同肉
-    if hard.get("no_consecutive_same_main_meat", False):
+    if hc.no_consecutive_same_main_meat:
         if day_idx > 0 and plan_main_meats and plan_main_meats[-1] == main_meat_type:
             return False
 
     # ✅ 4) 週配額
-    weekly_max = hard.get("weekly_max_main_meat", {}) or {}
     w = week_key if week_key is not None else (day_idx // 7)
 
     counts = weekly_meat_counts.get(w, {})
     if main_meat_type:
-        max_allowed = weekly_max.get(main_meat_type)
+        max_allowed = hc.weekly_max_main_meat.get(main_meat_type)
         if max_allowed is not None:
             cur = counts.get(main_meat_type, 0)
     
@@ -194,16 +172,15 @@ def check_main_hard(
             reserve = _reserve_future_fixed_slots_in_same_iso_week(
                 day_idx=day_idx,
                 start_date=start_date,
-                hard=hard,
+                hard=hc,
                 target_meat=main_meat_type,
             )
     
-            if cur + 1 + reserve > int(max_allowed):
+            if cur + 1 + reserve > max_allowed:
                 return False
 
     # ✅ 5) 30 天內同主菜重複（rolling window：最近 30 天）
-    rep = hard.get("repeat_limits", {}) or {}
-    max_same_main = rep.get("max_same_main_in_30_days")
+    max_same_main = hc.repeat.max_same_main_in_30_days
     if max_same_main is not None:
         window_days = 30
         start = max(0, day_idx - window_days)  # 取「前 30 天」：day_idx-30 ~ day_idx-1
@@ -212,11 +189,11 @@ def check_main_hard(
         for mid in plan_main_ids[start:day_idx]:
             if mid and mid == main_id:
                 used += 1
-        if used + 1 > int(max_same_main):
+        if used + 1 > max_same_main:
             return False
 
     # ✅ 6) exclude dish
-    if main_id in set(hard.get("exclude_dish_ids", []) or []):
+    if main_id in hc.exclude_dish_ids:
         return False
 
     return True
@@ -229,6 +206,7 @@ def check_noodle_window_repeat(
     max_repeat: int,
     window_days: int,
 ) -> bool:
+    perf.count("check.noodle_window_repeat")
     # Treat noodle repeat limits as calendar-day windows including today.
     # For example, a 7-day limit checks the previous 6 days, so a weekly
     # noodle day exactly 7 days apart is allowed when the 7-day limit is 1.
@@ -262,6 +240,7 @@ def check_side_window_repeat(
     plan_days: List[PlanDay],
     max_repeat_in_7: int,
 ) -> bool:
+    perf.count("check.side_window_repeat")
     # ✅ 改成：最近 7 個「有排餐日」內，同一道 side 出現次數 <= max_repeat_in_7
     window_active_days = 7
 
@@ -281,6 +260,7 @@ def check_soup_window_repeat(
     plan_days: List[PlanDay],
     max_repeat_in_7: int,
 ) -> bool:
+    perf.count("check.soup_window_repeat")
     # ✅ 改成：最近 7 個「有排餐日」內，同一道 soup 出現次數 <= max_repeat_in_7
     window_active_days = 7
 
@@ -298,6 +278,7 @@ def check_fruit_window_repeat(
     plan_days: List[PlanDay],
     max_repeat_in_7: int,
 ) -> bool:
+    perf.count("check.fruit_window_repeat")
     window_active_days = 7
 
     cnt = 0
@@ -315,6 +296,7 @@ def check_veg_window_repeat(
     plan_days: List[PlanDay],
     max_repeat_in_7: int,
 ) -> bool:
+    perf.count("check.veg_window_repeat")
     window_active_days = 7
 
     cnt = 0
@@ -358,6 +340,7 @@ def check_ingredient_window_repeat(
     最近 window_active_days 個「有排餐日」內，同一食材出現天數 <= max_repeat_in_window。
     計數單位是「天」：同一天即使多道菜都有豆腐，也只記 1 次。
     """
+    perf.count("check.ingredient_window_repeat")
     repeat_limit = max_repeat_in_window if max_repeat_in_window is not None else max_repeat_in_7
     if repeat_limit is None:
         repeat_limit = 10**9
@@ -407,15 +390,12 @@ def check_ingredient_window_repeat(
 
 def check_cost_range(
     total_cost: float,
-    hard: Dict
+    hard: HardConfig
 ) -> bool:
-    cr = hard.get("cost_range_per_person_per_day")
-    if not cr:
-        return True
-    minv = cr.get("min")
-    maxv = cr.get("max")
-    if minv is not None and total_cost < float(minv):
+    perf.count("check.cost_range")
+    hc = CompiledHardConstraints.coerce(hard)
+    if hc.cost_min is not None and total_cost < hc.cost_min:
         return False
-    if maxv is not None and total_cost > float(maxv):
+    if hc.cost_max is not None and total_cost > hc.cost_max:
         return False
     return True
@@ -18,3 +18,10 @@ class PlanError(Exception):
         if self.details:
             out["details"] = self.details
         return out
+
+
+class PlanCancelled(PlanError):
+    """排餐工作被取消；由 progress 回呼丟出，引擎不攔截。"""
+
+    def __init__(self, message: str = "排餐工作已取消。", day_index: Optional[int] = None):
+        super().__init__(code="PLAN_CANCELLED", message=message, day_index=day_index)
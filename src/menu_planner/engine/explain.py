@@ -9,6 +9,162 @@ from .constraints import PlanDay
 from .features import DishFeatures
 
 
+def _empty_dish(did: str = "") -> Dict:
+    return {
+        "id": did or "",
+        "name": "",
+        "role": "",
+        "meat_type": None,
+        "cuisine": None,
+        "cost": 0.0,
+        "inventory_hit_ratio": 0.0,
+        "near_expiry_days_min": None,
+        "used_inventory_ingredients": [],
+        "prep_minutes": 0,
+    }
+
+
+def dish_info(did: str, dishes_by_id: Dict[str, Dish], feat: Dict[str, DishFeatures]) -> Dict:
+    # ✅ 空值 / 缺資料都不要炸
+    if not did:
+        return _empty_dish("")
+    if did not in dishes_by_id or did not in feat:
+        return _empty_dish(did)
+
+    di = dishes_by_id[did]
+    f = feat[did]
+    return {
+        "id": did,
+        "name": di.name,
+        "role": di.role,
+        "meat_type": di.meat_type,
+        "cuisine": di.cuisine,
+        "cost": f.cost_per_serving,
+        "inventory_hit_ratio": f.inventory_hit_ratio,
+        "near_expiry_days_min": f.near_expiry_days_min,
+        "used_inventory_ingredients": f.used_inventory_ingredients,
+        "prep_minutes": max(0, int(getattr(di, "prep_minutes", 0) or 0)),
+    }
+
+
+def plan_day_from_output(day: Dict) -> PlanDay:
+    """explain_day 輸出（或使用者編輯後的同格式資料）還原成 PlanDay。"""
+    items = day.get("items") or {}
+
+    def role_ids(role: str) -> List[str]:
+        values = items.get(f"{role}s")
+        if isinstance(values, list):
+            ids = [x.get("id") for x in values if isinstance(x, dict) and x.get("id")]
+            if ids:
+                return ids
+        one = (items.get(role) or {}).get("id")
+        return [one] if one else []
+
+    sides = [s.get("id") for s in (items.get("sides") or []) if isinstance(s, dict) and s.get("id")]
+    mains = role_ids("main")
+    noodles = role_ids("noodle")
+    vegs = role_ids("veg")
+    soups = role_ids("soup")
+    fruits = role_ids("fruit")
+    return PlanDay(
+        main=mains[0] if mains else "",
+        sides=sides,
+        veg=vegs[0] if vegs else "",
+        soup=soups[0] if soups else "",
+        fruit=fruits[0] if fruits else "",
+        noodle=noodles[0] if noodles else "",
+        mains=mains,
+        noodles=noodles,
+        vegs=vegs,
+        soups=soups,
+        fruits=fruits,
+    )
+
+
+def explain_day(
+    start_date: date,
+    i: int,
+    d: PlanDay,
+    dishes_by_id: Dict[str, Dish],
+    feat: Dict[str, DishFeatures],
+    sd: Optional[Dict] = None,
+    active_mask: Optional[List[bool]] = None,
+    role_counts_by_day: Optional[List[Dict[str, int]]] = None,
+) -> Dict:
+    """單日輸出（build_explanations 與串流端點共用）；sd 為 fill_days_after_mains 的當日明細。"""
+    dt = start_date + timedelta(days=i)
+    sd = sd or {}
+    is_scheduled = True if active_mask is None else bool(active_mask[i])
+
+    def info(did: str) -> Dict:
+        return dish_info(did, dishes_by_id, feat)
+
+    # ✅ 成本：優先用 fill_days_after_mains() 提供的 cost（尤其失敗日/超出範圍日）
+    if sd.get("cost") is not None:
+        day_cost = float(sd["cost"])
+    else:
+        day_cost = 0.0
+        all_ids = (
+            list(getattr(d, "mains", None) or ([d.main] if d.main else []))
+            + list(getattr(d, "noodles", None) or ([d.noodle] if getattr(d, "noodle", "") else []))
+            + list(d.sides or [])
+            + list(getattr(d, "vegs", None) or ([d.veg] if d.veg else []))
+            + list(getattr(d, "soups", None) or ([d.soup] if d.soup else []))
+            + list(getattr(d, "fruits", None) or ([d.fruit] if d.fruit else []))
+        )
+        day_cost += sum(feat[x].cost_per_serving for x in all_ids if x and x in feat)
+
+    day_cost = round(day_cost, 2)
+
+    # ✅ sides 可能 None
+    mains_list = [x for x in (getattr(d, "mains", None) or ([d.main] if d.main else [])) if x]
+    noodles_list = [x for x in (getattr(d, "noodles", None) or ([d.noodle] if getattr(d, "noodle", "") else [])) if x]
+    sides_list = [x for x in (d.sides or []) if x]
+    vegs_list = [x for x in (getattr(d, "vegs", None) or ([d.veg] if d.veg else [])) if x]
+    soups_list = [x for x in (getattr(d, "soups", None) or ([d.soup] if d.soup else [])) if x]
+    fruits_list = [x for x in (getattr(d, "fruits", None) or ([d.fruit] if d.fruit else [])) if x]
+
+    return {
+        "date": dt.isoformat(),
+        "day_index": i,
+        "is_scheduled": is_scheduled,
+
+        # 失敗資訊透傳
+        "failed": bool(sd.get("failed", False)),
+        "reason_code": sd.get("reason_code"),
+        "message": sd.get("message"),
+        "details": sd.get("details"),
+
+        "items": {
+            "main": info(d.main),
+            "mains": [info(x) for x in mains_list],
+            "noodle": info(getattr(d, "noodle", "")),
+            "noodles": [info(x) for x in noodles_list],
+            "sides": [info(x) for x in sides_list],
+            "veg": info(d.veg),
+            "vegs": [info(x) for x in vegs_list],
+            "soup": info(d.soup),
+            "soups": [info(x) for x in soups_list],
+            "fruit": info(d.fruit),
+            "fruits": [info(x) for x in fruits_list],
+        },
+        "day_cost": day_cost,
+        "prep_minutes_total": sd.get("prep_minutes_total"),
+        "prep_minutes_limit": sd.get("prep_minutes_limit"),
+
+        # 原始分數（可能為負）
+        "score": sd.get("score"),
+        "score_breakdown": sd.get("score_breakdown"),
+
+        # ✅ 你新增的欄位
+        "score_bonus_total": sd.get("score_bonus_total"),
+        "score_penalty_total": sd.get("score_penalty_total"),
+        "score_fitness": sd.get("score_fitness"),
+        "score_summary": sd.get("score_summary"),
+        "role_counts": (role_counts_by_day[i] if role_counts_by_day and i < len(role_counts_by_day) else None),
+    }
+
+
 def build_explanations(
     start_date: date,
     plan_days: List[PlanDay],
@@ -23,146 +179,54 @@ def build_explanations(
     # day_scores 可能有缺 day_index 的資料，保守寫法
     score_map = {d.get("day_index"): d for d in (day_scores or []) if d.get("day_index") is not None}
 
-    def empty_dish(did: str = "") -> Dict:
-        return {
-            "id": did or "",
-            "name": "",
-            "role": "",
-            "meat_type": None,
-            "cuisine": None,
-            "cost": 0.0,
-            "inventory_hit_ratio": 0.0,
-            "near_expiry_days_min": None,
-            "used_inventory_ingredients": [],
-            "prep_minutes": 0,
-        }
-
-    def dish_info(did: str) -> Dict:
-        # ✅ 空值 / 缺資料都不要炸
-        if not did:
-            return empty_dish("")
-        if did not in dishes_by_id or did not in feat:
-            return empty_dish(did)
-
-        di = dishes_by_id[did]
-        f = feat[did]
-        return {
-            "id": did,
-            "name": di.name,
-            "role": di.role,
-            "meat_type": di.meat_type,
-            "cuisine": di.cuisine,
-            "cost": f.cost_per_serving,
-            "inventory_hit_ratio": f.inventory_hit_ratio,
-            "near_expiry_days_min": f.near_expiry_days_min,
-            "used_inventory_ingredients": f.used_inventory_ingredients,
-            "prep_minutes": max(0, int(getattr(di, "prep_minutes", 0) or 0)),
-        }
-
+    for i, d in enumerate(plan_days):
+        day_out = explain_day(
+            start_date=start_date,
+            i=i,
+            d=d,
+            dishes_by_id=dishes_by_id,
+            feat=feat,
+            sd=score_map.get(i, {}) or {},
+            active_mask=active_mask,
+            role_counts_by_day=role_counts_by_day,
+        )
+        out_days.append(day_out)
+
+    return {"summary": build_summary(out_days), "days": out_days}
+
+
+def build_summary(out_days: List[Dict]) -> Dict:
+    """由逐日輸出彙總 summary（build_explanations 與局部重排共用）。"""
     total_raw = 0.0
     total_fitness = 0.0
     total_cost = 0.0
-
-    for i, d in enumerate(plan_days):
-        dt = start_date + timedelta(days=i)
-        sd = score_map.get(i, {}) or {}
-        is_scheduled = True if active_mask is None else bool(active_mask[i])
-
-        # ✅ 成本：優先用 fill_days_after_mains() 提供的 cost（尤其失敗日/超出範圍日）
-        if sd.get("cost") is not None:
-            day_cost = float(sd["cost"])
-        else:
-            day_cost = 0.0
-            all_ids = (
-                list(getattr(d, "mains", None) or ([d.main] if d.main else []))
-                + list(getattr(d, "noodles", None) or ([d.noodle] if getattr(d, "noodle", "") else []))
-                + list(d.sides or [])
-                + list(getattr(d, "vegs", None) or ([d.veg] if d.veg else []))
-                + list(getattr(d, "soups", None) or ([d.soup] if d.soup else []))
-                + list(getattr(d, "fruits", None) or ([d.fruit] if d.fruit else []))
-            )
-            day_cost += sum(feat[x].cost_per_serving for x in all_ids if x and x in feat)
-
-        day_cost = round(day_cost, 2)
-
-        # ✅ sides 可能 None
-        mains_list = [x for x in (getattr(d, "mains", None) or ([d.main] if d.main else [])) if x]
-        noodles_list = [x for x in (getattr(d, "noodles", None) or ([d.noodle] if getattr(d, "noodle", "") else [])) if x]
-        sides_list = [x for x in (d.sides or []) if x]
-        vegs_list = [x for x in (getattr(d, "vegs", None) or ([d.veg] if d.veg else [])) if x]
-        soups_list = [x for x in (getattr(d, "soups", None) or ([d.soup] if d.soup else [])) if x]
-        fruits_list = [x for x in (getattr(d, "fruits", None) or ([d.fruit] if d.fruit else [])) if x]
-
-        raw = sd.get("score")
-        fitness = sd.get("score_fitness")
-
-        out_days.append({
-            "date": dt.isoformat(),
-            "day_index": i,
-            "is_scheduled": is_scheduled,
-
-            # 失敗資訊透傳
-            "failed": bool(sd.get("failed", False)),
-            "reason_code": sd.get("reason_code"),
-            "message": sd.get("message"),
-            "details": sd.get("details"),
-
-            "items": {
-                "main": dish_info(d.main),
-                "mains": [dish_info(x) for x in mains_list],
-                "noodle": dish_info(getattr(d, "noodle", "")),
-                "noodles": [dish_info(x) for x in noodles_list],
-                "sides": [dish_info(x) for x in sides_list],
-                "veg": dish_info(d.veg),
-                "vegs": [dish_info(x) for x in vegs_list],
-                "soup": dish_info(d.soup),
-                "soups": [dish_info(x) for x in soups_list],
-                "fruit": dish_info(d.fruit),
-                "fruits": [dish_info(x) for x in fruits_list],
-            },
-            "day_cost": day_cost,
-            "prep_minutes_total": sd.get("prep_minutes_total"),
-            "prep_minutes_limit": sd.get("prep_minutes_limit"),
-
-            # 原始分數（可能為負）
-            "score": raw,
-            "score_breakdown": sd.get("score_breakdown"),
-
-            # ✅ 你新增的欄位
-            "score_bonus_total": sd.get("score_bonus_total"),
-            "score_penalty_total": sd.get("score_penalty_total"),
-            "score_fitness": fitness,
-            "score_summary": sd.get("score_summary"),
-            "role_counts": (role_counts_by_day[i] if role_counts_by_day and i < len(role_counts_by_day) else None),
-        })
-
-        total_cost += day_cost
+    for day_out in out_days:
+        raw = day_out.get("score")
+        fitness = day_out.get("score_fitness")
+        total_cost += float(day_out.get("day_cost") or 0.0)
         if isinstance(raw, (int, float)):
             total_raw += float(raw)
         if isinstance(fitness, (int, float)):
             total_fitness += float(fitness)
 
     return {
-        "summary": {
-            "days": len(plan_days),
-            "total_cost": round(total_cost, 2),
-            "avg_cost_per_day": round(total_cost / max(len(plan_days), 1), 2),
-
-            # 原本的總分（raw，可能是負）
-            "total_score": round(total_raw, 2),
-
-            # ✅ 新增：總目標匹配度（正向）
-            "total_fitness": round(total_fitness, 2),
-
-            # ✅ 你加的說明（保留）
-            "score_legend": {
-                "rule": "原始分數越低（越負）代表越符合偏好；正分代表違反偏好或成本懲罰。",
-                "components": {
-                    "bonus": "加分項（以負數表示，例如用到庫存、接近到期）",
-                    "penalty": "扣分項（以正數表示，例如超出成本、連續同肉/同菜系）",
-                    "fitness": "目標匹配度＝-原始分數（越高越好）"
-                }
+        "days": len(out_days),
+        "total_cost": round(total_cost, 2),
+        "avg_cost_per_day": round(total_cost / max(len(out_days), 1), 2),
+
+        # 原本的總分（raw，可能是負）
+        "total_score": round(total_raw, 2),
+
+        # ✅ 新增：總目標匹配度（正向）
+        "total_fitness": round(total_fitness, 2),
+
+        # ✅ 你加的說明（保留）
+        "score_legend": {
+            "rule": "原始分數越低（越負）代表越符合偏好；正分代表違反偏好或成本懲罰。",
+            "components": {
+                "bonus": "加分項（以負數表示，例如用到庫存、接近到期）",
+                "penalty": "扣分項（以正數表示，例如超出成本、連續同肉/同菜系）",
+                "fitness": "目標匹配度＝-原始分數（越高越好）"
             }
-        },
-        "days": out_days
+        }
     }
@@ -3,9 +3,10 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from datetime import date, datetime
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
 
 from ..db.repo import Dish, DishIngredient, InventoryItem, PriceItem, Ingredient
+from ..db.units import UnitConverter
 
 import re
 
@@ -30,18 +31,6 @@ def _parse_ymd(s: Optional[str]) -> Optional[date]:
     return datetime.strptime(s, "%Y-%m-%d").date()
 
 
-def _convert_unit(qty: float, from_unit: str, to_unit: str, conv: Dict[Tuple[str, str], float]) -> Optional[float]:
-    if from_unit == to_unit:
-        return qty
-    factor = conv.get((from_unit, to_unit))
-    if factor is not None:
-        return qty * factor
-    inverse = conv.get((to_unit, from_unit))
-    if inverse is not None and float(inverse) != 0:
-        return qty / float(inverse)
-    return None
-
-
 def _normalize_meat_type(x: Optional[str]) -> Optional[str]:
     """
     統一 meat_type，避免 fish/seafood/shrimp 等分裂導致 weekly quota 失效。
@@ -88,13 +77,22 @@ def build_dish_features(
     ingredients: Dict[str, Ingredient],
     prices: Dict[str, PriceItem],
     inventory: Dict[str, InventoryItem],
-    conv: Dict[Tuple[str, str], float],
+    conv: Union[UnitConverter, Dict[Tuple[str, str], float]],
     today: date,
 ) -> Dict[str, DishFeatures]:
+    # 所有食材行一次換算到價格單位（無價格或無法換算者為 None），迴圈內只剩查表
+    converter = UnitConverter.coerce(conv)
+    line_prices = [prices.get(di.ingredient_id) for di in dish_ingredients]
+    line_costs = converter.convert_units(
+        [di.qty * p.price_per_unit if p else 0.0 for di, p in zip(dish_ingredients, line_prices)],
+        [di.unit for di in dish_ingredients],
+        [p.unit if p else None for p in line_prices],
+    )
+
     # group dish ingredients
-    di_map: Dict[str, List[DishIngredient]] = {}
-    for di in dish_ingredients:
-        di_map.setdefault(di.dish_id, []).append(di)
+    di_map: Dict[str, List[Tuple[DishIngredient, Optional[float]]]] = {}
+    for di, p, cost in zip(dish_ingredients, line_prices, line_costs):
+        di_map.setdefault(di.dish_id, []).append((di, cost if p else None))
 
     out: Dict[str, DishFeatures] = {}
 
@@ -107,18 +105,14 @@ def build_dish_features(
         expiry_days_list: List[int] = []
         inv_expiry_dates: Dict[str, Optional[str]] = {}
 
-        for di in dis:
+        for di, line_cost in dis:
             ing = ingredients.get(di.ingredient_id)
             if not ing:
                 continue
 
-            # price
-            p = prices.get(di.ingredient_id)
-            if p:
-                # convert di.qty di.unit -> p.unit if needed
-                qty_in_price_unit = _convert_unit(di.qty, di.unit, p.unit, conv)
-                if qty_in_price_unit is not None:
-                    total_cost += qty_in_price_unit * p.price_per_unit
+            # price（已換算成價格單位；無法換算者為 None，不計入成本）
+            if line_cost is not None:
+                total_cost += line_cost
 
             # inventory hit (by ingredient presence; 可再進一步檢查 qty)
             inv = inventory.get(di.ingredient_id)
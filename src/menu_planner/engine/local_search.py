@@ -2,10 +2,18 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, FrozenSet, List, Optional, Tuple
 import random
 from datetime import date, timedelta
 
+from ..config.loader import (
+    CompiledHardConstraints,
+    CompiledSoftPreferences,
+    CompiledWeights,
+    HardConfig,
+    SoftConfig,
+    WeightsConfig,
+)
 from ..db.repo import Dish
 from .constraints import (
     PlanDay,
@@ -16,7 +24,9 @@ from .constraints import (
     check_main_hard,
     check_ingredient_window_repeat,
 )
+from . import perf
 from .features import DishFeatures
+from .progress import LOCAL_SEARCH_REPORT_EVERY, STAGE_LOCAL_SEARCH, ProgressCallback, report_progress
 from .scoring import score_day
 
 def _week_key_of(day_idx: int, start_date: Optional[date]) -> int:
@@ -33,26 +43,9 @@ def _weekday_for_day(day_idx: int, start_date: Optional[date]) -> int:
     return (day_idx % 7) + 1
 
 
-def _normalize_weekday_set(value) -> set[int]:
-    if value is None:
-        return {1, 2, 3, 4, 5, 6, 7}
-    if not isinstance(value, list):
-        return {1, 2, 3, 4, 5, 6, 7}
-    out: set[int] = set()
-    for x in value:
-        try:
-            wd = int(x)
-        except Exception:
-            continue
-        if 1 <= wd <= 7:
-            out.add(wd)
-    return out or {1, 2, 3, 4, 5, 6, 7}
-
-
-def _dish_allowed_on_day(dish: Dish, day_idx: int, start_date: Optional[date], hard: Dict) -> bool:
-    rules = (hard.get("dish_allowed_weekdays") or {}) if isinstance(hard, dict) else {}
-    allowed = _normalize_weekday_set(rules.get(dish.id))
-    return _weekday_for_day(day_idx, start_date) in allowed
+def _dish_allowed_on_day(dish: Dish, day_idx: int, start_date: Optional[date], hard: HardConfig) -> bool:
+    hc = CompiledHardConstraints.coerce(hard)
+    return hc.dish_allowed_on_weekday(dish.id, _weekday_for_day(day_idx, start_date))
 
 
 def _dish_id_allowed_on_day(
@@ -60,7 +53,7 @@ def _dish_id_allowed_on_day(
     dish_by_id: Dict[str, Dish],
     day_idx: int,
     start_date: Optional[date],
-    hard: Dict,
+    hard: HardConfig,
 ) -> bool:
     dish = dish_by_id.get(dish_id)
     return True if dish is None else _dish_allowed_on_day(dish, day_idx, start_date, hard)
@@ -68,11 +61,14 @@ def _dish_id_allowed_on_day(
 def compute_total_score(
     plan_days: List[PlanDay],
     feat: Dict[str, DishFeatures],
-    hard: Dict,
-    weights: Dict,
-    soft: Dict,
+    hard: HardConfig,
+    weights: WeightsConfig,
+    soft: SoftConfig,
     start_date: Optional[date] = None,
 ) -> Tuple[float, List[Dict]]:
+    hard = CompiledHardConstraints.coerce(hard)
+    weights = CompiledWeights.coerce(weights)
+    soft = CompiledSoftPreferences.coerce(soft)
     total = 0.0
     day_details: List[Dict] = []
     prev_meat = None
@@ -119,9 +115,9 @@ def compute_total_score(
         ctx = {
             "prev_main_meat": prev_meat,
             "prev_main_cuisine": prev_cuisine,
-            "prefer_use_inventory": bool(soft.get("prefer_use_inventory", False)),
-            "prefer_near_expiry": bool(soft.get("prefer_near_expiry", False)),
-            "inventory_prefer_ingredient_ids": soft.get("inventory_prefer_ingredient_ids") or [],
+            "prefer_use_inventory": soft.prefer_use_inventory,
+            "prefer_near_expiry": soft.prefer_near_expiry,
+            "inventory_prefer_ingredient_ids": soft.inventory_prefer_ingredient_ids,
             "plan_date": (start_date + timedelta(days=day_idx)).isoformat() if start_date else None,
         }
         sb = score_day(day_cost, hard, weights, chosen, ctx)
@@ -145,11 +141,13 @@ def _hard_ok_for_plan(
     plan_days: List[PlanDay],
     mains: List[Dish],
     feat: Dict[str, DishFeatures],
-    hard: Dict,
+    hard: HardConfig,
     dish_ingredient_ids: Optional[Dict[str, set]] = None,
     start_date: Optional[date] = None,   # ✅ 新增
     dish_by_id: Optional[Dict[str, Dish]] = None,
 ) -> bool:
+    hard = CompiledHardConstraints.coerce(hard)
+
     # 重新走一次 main hard（週配額/連續肉/重複主菜）
     plan_main_ids: List[str] = []
     plan_main_meats: List[Optional[str]] = []
@@ -193,17 +191,13 @@ def _hard_ok_for_plan(
         plan_main_meats.append(meat)
 
     # side/soup window repeat
-    rep = hard.get("repeat_limits", {}) or {}
-    max_side_7 = int(rep.get("max_same_side_in_7_days", 1))
-    max_soup_7 = int(rep.get("max_same_soup_in_7_days", 1))
-    max_ing_limit = int(rep.get("max_same_ingredient_in_window_days", rep.get("max_same_ingredient_in_7_days", 10**9)))
-    ing_window_days = int(rep.get("ingredient_repeat_window_days", 4))
-    max_ing_consec = rep.get("max_consecutive_ingredient_days")
-    no_same_within_day = {
-        str(x).strip()
-        for x in (hard.get("no_same_ingredient_family_within_day") or [])
-        if str(x).strip()
-    }
+    rep = hard.repeat
+    max_side_7 = rep.max_same_side_in_7_days
+    max_soup_7 = rep.max_same_soup_in_7_days
+    max_ing_limit = rep.max_same_ingredient_in_window_days
+    ing_window_days = rep.ingredient_repeat_window_days
+    max_ing_consec = rep.max_consecutive_ingredient_days
+    no_same_within_day = hard.no_same_ingredient_family_within_day
 
     for day_idx, d in enumerate(plan_days):
         if not d.main:
@@ -248,17 +242,21 @@ def improve_by_local_search(
     soups: List[Dish],
     fruits: List[Dish],
     feat: Dict[str, DishFeatures],
-    hard: Dict,
-    weights: Dict,
-    soft: Dict,
+    hard: HardConfig,
+    weights: WeightsConfig,
+    soft: SoftConfig,
     iterations: int,
     accept_worse_probability: float,
     dish_ingredient_ids: Optional[Dict[str, set]] = None,
     seed: int = 7,
     start_date: Optional[date] = None,
     active_mask: Optional[List[bool]] = None,   # ✅ 新增：接住 planner.py 傳入
+    progress: Optional[ProgressCallback] = None,
 ) -> Tuple[List[PlanDay], float, List[Dict]]:
     rng = random.Random(seed)
+    hard = CompiledHardConstraints.coerce(hard)
+    weights = CompiledWeights.coerce(weights)
+    soft = CompiledSoftPreferences.coerce(soft)
 
     all_dishes = list(mains) + list(sides) + list(vegs) + list(soups) + list(fruits)
     dish_by_id = {d.id: d for d in all_dishes}
@@ -271,21 +269,10 @@ def improve_by_local_search(
     def _ids_allowed_today(ids: List[str], day_idx: int) -> List[str]:
         return [did for did in ids if _dish_id_allowed_on_day(did, dish_by_id, day_idx, start_date, hard)]
 
-    def _fixed_allowed_meats_set(day_idx: int) -> Optional[set]:
-        fixed = (hard.get("fixed_main_meat_by_weekday") or {})
-        if not fixed or start_date is None:
-            return None
-        wd = (start_date + timedelta(days=day_idx)).isoweekday()
-        rule = fixed.get(wd) or fixed.get(str(wd))
-        if not rule:
+    def _fixed_allowed_meats_set(day_idx: int) -> Optional[FrozenSet[str]]:
+        if start_date is None:
             return None
-        if isinstance(rule, str):
-            r = rule.strip()
-            return {r} if r else None
-        if isinstance(rule, list):
-            s = {str(x).strip() for x in rule if x is not None and str(x).strip()}
-            return s if s else None
-        return None
+        return hard.fixed_meats_for_weekday((start_date + timedelta(days=day_idx)).isoweekday())
     
     main_ids_by_meat: Dict[str, List[str]] = {}
     for did in main_ids_all:
@@ -309,8 +296,11 @@ def improve_by_local_search(
 
     cur_plan = [PlanDay(d.main, list(d.sides), d.veg, d.soup, d.fruit) for d in best_plan]
     cur_score = best_score
+    moves = {"accepted": 0, "accepted_worse": 0, "rejected": 0, "infeasible": 0}
 
-    for _ in range(iterations):
+    for it in range(iterations):
+        if it % LOCAL_SEARCH_REPORT_EVERY == 0:
+            report_progress(progress, STAGE_LOCAL_SEARCH)
         cand = [PlanDay(d.main, list(d.sides), d.veg, d.soup, d.fruit) for d in cur_plan]
         op = rng.choice(["swap_main", "replace_main", "replace_soup", "replace_side", "replace_veg"])
 
@@ -397,16 +387,24 @@ def improve_by_local_search(
             start_date=start_date,
             dish_by_id=dish_by_id,
         ):
+            moves["infeasible"] += 1
             continue
 
         cand_score, cand_details = compute_total_score(cand, feat, hard, weights, soft, start_date=start_date)
 
         if cand_score < cur_score:
+            moves["accepted"] += 1
             cur_plan, cur_score = cand, cand_score
             if cand_score < best_score:
                 best_plan, best_score, best_details = cand, cand_score, cand_details
         else:
             if rng.random() < accept_worse_probability:
+                moves["accepted_worse"] += 1
                 cur_plan, cur_score = cand, cand_score
+            else:
+                moves["rejected"] += 1
 
+    # 未計入的迭代是抽到不適用的操作（例如同一天互換）而直接略過
+    for name, n in moves.items():
+        perf.count(f"local_search.{name}", n)
     return best_plan, best_score, best_details
@@ -0,0 +1,103 @@
+# src/menu_planner/engine/perf.py
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, ContextManager, Dict, Iterator, Optional
+
+from ..env import env_float
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_LOG_SECONDS = 5.0
+
+# 目前這次排餐的記錄器；每個執行緒 / 每次 plan_month 各自一份，沒有啟用時 span / count 不做事
+_CURRENT: ContextVar[Optional["PerfRecorder"]] = ContextVar("menu_planner_perf", default=None)
+
+
+class PerfRecorder:
+    """
+    排餐各階段的 wall / CPU 時間（span，可巢狀、同名累加）與計數器。
+    CPU 時間用 thread_time：排餐在單一執行緒內完成，不會算到同 process 其他請求。
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.spans: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        wall0 = time.perf_counter()
+        cpu0 = time.thread_time()
+        try:
+            yield
+        finally:
+            entry = self.spans.setdefault(name, {"calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0})
+            entry["calls"] += 1
+            entry["wall_ms"] += (time.perf_counter() - wall0) * 1000
+            entry["cpu_ms"] += (time.thread_time() - cpu0) * 1000
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "spans": {
+                name: {"calls": int(v["calls"]), "wall_ms": round(v["wall_ms"], 3), "cpu_ms": round(v["cpu_ms"], 3)}
+                for name, v in self.spans.items()
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def merge_into(self, result: Dict[str, Any]) -> None:
+        """把 span / 計數加到 result["debug"]["perf"]（排餐之後的階段，例如採購明細）。"""
+        perf = result.setdefault("debug", {}).setdefault("perf", {"total_ms": 0.0, "spans": {}, "counters": {}})
+        extra = self.as_dict()
+        spans = perf.setdefault("spans", {})
+        for name, v in extra["spans"].items():
+            cur = spans.setdefault(name, {"calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0})
+            cur["calls"] += v["calls"]
+            cur["wall_ms"] = round(cur["wall_ms"] + v["wall_ms"], 3)
+            cur["cpu_ms"] = round(cur["cpu_ms"] + v["cpu_ms"], 3)
+        counters = perf.setdefault("counters", {})
+        for name, n in extra["counters"].items():
+            counters[name] = counters.get(name, 0) + n
+        perf["total_ms"] = round(float(perf.get("total_ms") or 0.0) + extra["total_ms"], 3)
+
+
+@contextmanager
+def recording(recorder: Optional[PerfRecorder] = None) -> Iterator[PerfRecorder]:
+    """在 with 區塊內啟用記錄器（引擎內的 span() / count() 寫入這個記錄器）。"""
+    rec = recorder or PerfRecorder()
+    token = _CURRENT.set(rec)
+    try:
+        yield rec
+    finally:
+        _CURRENT.reset(token)
+
+
+def span(name: str) -> ContextManager[None]:
+    rec = _CURRENT.get()
+    return nullcontext() if rec is None else rec.span(name)
+
+
+def count(name: str, n: int = 1) -> None:
+    rec = _CURRENT.get()
+    if rec is not None:
+        rec.counters[name] = rec.counters.get(name, 0) + n
+
+
+def log_perf(label: str, perf: Dict[str, Any]) -> None:
+    """總時間超過 MENU_PLAN_SLOW_LOG_SECONDS（預設 5 秒）以 INFO 記錄，其餘為 DEBUG。"""
+    total_ms = float(perf.get("total_ms") or 0.0)
+    slow_ms = env_float("MENU_PLAN_SLOW_LOG_SECONDS", DEFAULT_SLOW_LOG_SECONDS) * 1000
+    level = logging.INFO if total_ms >= slow_ms else logging.DEBUG
+    if not logger.isEnabledFor(level):
+        return
+    spans = " ".join(f"{name}={v['wall_ms']:.0f}ms" for name, v in (perf.get("spans") or {}).items())
+    counters = " ".join(f"{name}={n}" for name, n in (perf.get("counters") or {}).items())
+    logger.log(level, "%s perf total=%.0fms %s | %s", label, total_ms, spans, counters)
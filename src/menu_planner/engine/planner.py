@@ -5,18 +5,33 @@ import logging
 import math
 import random
 import re
+import threading
 import time
-from dataclasses import dataclass
-from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Set, Tuple
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
-from ..db.repo import Dish, DishIngredient, Ingredient, SQLiteRepo
+from ..config.loader import CompiledPlanConfig, compile_plan_config, config_hash, merge_plan_hard
+from ..db.catalog_cache import CachedSQLiteRepo
+from ..db.repo import CatalogSnapshot, Dish, DishIngredient, Ingredient
 from .backtracking import fill_days_after_mains, plan_mains_beam
 from .constraints import PlanDay
-from .explain import build_explanations
-from .features import _normalize_meat_type, build_dish_features
+from .explain import build_explanations, dish_info, explain_day
+from .features import DishFeatures, _normalize_meat_type, build_dish_features
 from .local_search import improve_by_local_search
-from .roles import counts_for_day, has_any_role, legacy_main_noodle_as_noodle
+from .perf import PerfRecorder, count, log_perf, recording, span
+from .progress import (
+    EVENT_DAY,
+    EVENT_MAINS,
+    EVENT_RETRY,
+    STAGE_CONTEXT,
+    STAGE_EXPLAIN,
+    PlanEventCallback,
+    ProgressCallback,
+    emit_event,
+    report_progress,
+)
+from .roles import has_any_role, legacy_main_noodle_as_noodle
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +42,7 @@ class PlanContext:
     horizon_days: int
     active_mask: List[bool]
     role_counts_by_day: List[Dict[str, int]]
+    config: CompiledPlanConfig
     hard: Dict[str, Any]
     soft: Dict[str, Any]
     weights: Dict[str, Any]
@@ -56,34 +72,22 @@ class PlanComputation:
     local_search_applied: bool
 
 
-def _parse_start_date(cfg: Dict[str, Any]) -> date:
-    s = cfg.get("start_date")
-    if not s:
-        return date.today()
-    return datetime.strptime(s, "%Y-%m-%d").date()
-
-
-def _get_active_mask(start_date: date, horizon_days: int, cfg: Dict[str, Any]) -> List[bool]:
-    sch = (cfg.get("schedule") or {})
-    weekdays = sch.get("weekdays") or [1, 2, 3, 4, 5]  # 預設週一到週五
-    allowed = set(int(x) for x in weekdays)
-    force_include_dates = {
-        str(x).strip()
-        for x in (sch.get("force_include_dates") or [])
-        if str(x).strip()
-    }
-    force_exclude_dates = {
-        str(x).strip()
-        for x in (sch.get("force_exclude_dates") or [])
-        if str(x).strip()
-    }
+def _get_active_mask(
+    start_date: date,
+    horizon_days: int,
+    cfg: Union[Dict[str, Any], CompiledPlanConfig],
+) -> List[bool]:
+    config = cfg if isinstance(cfg, CompiledPlanConfig) else compile_plan_config(cfg)
+    allowed = config.schedule_weekdays  # 預設週一到週五
+    force_include_dates = config.force_include_dates
+    force_exclude_dates = config.force_exclude_dates
 
     mask: List[bool] = []
     for i in range(horizon_days):
         cur = start_date + timedelta(days=i)
         ds = cur.isoformat()
         wd = cur.isoweekday()
-        role_counts = counts_for_day(cfg, start_date, i)
+        role_counts = config.role_counts_by_weekday[wd - 1]
         is_active = (wd in allowed) and has_any_role(role_counts)
         if ds in force_exclude_dates:
             is_active = False
@@ -93,13 +97,14 @@ def _get_active_mask(start_date: date, horizon_days: int, cfg: Dict[str, Any]) -
     return mask
 
 
-def _resolve_seed(cfg: Dict[str, Any], start_date: date) -> int:
+def resolve_seed(cfg: Dict[str, Any], start_date: date) -> int:
     """
     cfg["seed"] 可支援：
       - int: 固定 seed
       - "random": 每次都亂數
       - "time": 以時間為 seed（效果等同 random，但可讀）
       - "date": 以 start_date 為 seed（同一天重跑會一樣）
+    排餐結果快取（api/plan_cache.py）也用這個函式解析 seed 組 key。
     """
     s = cfg.get("seed", 7)
 
@@ -392,6 +397,79 @@ def _bump_soup_constraints_for_retry(hard: Dict[str, Any]) -> Dict[str, Any]:
 
 
 
+# _build_dish_ingredient_ids 會讀到的 hard 設定；這幾項相同的 cfg 可共用食材 key
+INGREDIENT_KEY_SETTINGS = (
+    "ingredient_repeat_group_by_id",
+    "ingredient_repeat_use_protein_group_categories",
+    "ingredient_repeat_name_normalize_categories",
+    "ingredient_repeat_merge_shape_variants",
+    "ingredient_repeat_enable_builtin_family_rules",
+)
+
+
+class SharedPlanInputs:
+    """
+    同一份目錄快照下可跨 cfg 共用的 context 片段（批次排餐用）。
+
+    - 菜色特徵依 start_date（價格日、到期天數）各建一次，涵蓋整份目錄；排除食材只是取子集合
+    - 食材重複判斷 key 依 INGREDIENT_KEY_SETTINGS 的值各建一次
+    - 菜色含肉表與 cfg 無關，只建一次
+    """
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.snapshot = snapshot
+        self._lock = threading.Lock()
+        self._features: Dict[date, Dict[str, DishFeatures]] = {}
+        self._ingredient_ids: Dict[str, Dict[str, Set[str]]] = {}
+        self._dish_has_meat: Optional[Dict[str, bool]] = None
+        self.builds = {"features": 0, "ingredient_keys": 0, "dish_has_meat": 0}
+
+    @classmethod
+    def from_db(cls, db_path: str) -> "SharedPlanInputs":
+        with span("catalog"):
+            return cls(CachedSQLiteRepo(db_path).fetch_catalog_snapshot())
+
+    def features(self, start_date: date) -> Dict[str, DishFeatures]:
+        with self._lock:
+            feat = self._features.get(start_date)
+            count("features.cache_hit" if feat is not None else "features.cache_miss")
+            if feat is None:
+                snapshot = self.snapshot
+                with span("features"):
+                    feat = build_dish_features(
+                        dishes=list(snapshot.dishes),
+                        dish_ingredients=snapshot.dish_ingredients,
+                        ingredients=snapshot.ingredients,
+                        prices=snapshot.latest_prices(price_date=start_date.isoformat()),
+                        inventory=snapshot.inventory,
+                        conv=snapshot.unit_converter,
+                        today=start_date,
+                    )
+                self._features[start_date] = feat
+                self.builds["features"] += 1
+            return feat
+
+    def dish_ingredient_ids(self, hard: Dict[str, Any]) -> Dict[str, Set[str]]:
+        key = config_hash({name: hard.get(name) for name in INGREDIENT_KEY_SETTINGS})
+        with self._lock:
+            out = self._ingredient_ids.get(key)
+            if out is None:
+                out = _build_dish_ingredient_ids(self.snapshot.dish_ingredients, self.snapshot.ingredients, hard)
+                self._ingredient_ids[key] = out
+                self.builds["ingredient_keys"] += 1
+            return out
+
+    def dish_has_meat(self) -> Dict[str, bool]:
+        with self._lock:
+            if self._dish_has_meat is None:
+                snapshot = self.snapshot
+                self._dish_has_meat = _build_dish_has_meat(
+                    list(snapshot.dishes), snapshot.dish_ingredients, snapshot.ingredients
+                )
+                self.builds["dish_has_meat"] += 1
+            return self._dish_has_meat
+
+
 def _merge_dish_allowed_weekdays_from_catalog(hard: Dict[str, Any], dishes: List[Dish]) -> None:
     rules = dict(hard.get("dish_allowed_weekdays") or {})
     for dish in dishes:
@@ -410,65 +488,37 @@ def _merge_dish_allowed_weekdays_from_catalog(hard: Dict[str, Any], dishes: List
     if rules:
         hard["dish_allowed_weekdays"] = rules
 
-def _prepare_context(db_path: str, cfg: Dict[str, Any]) -> PlanContext:
-    repo = SQLiteRepo(db_path)
+def _prepare_context(db_path: str, cfg: Dict[str, Any], shared: Optional[SharedPlanInputs] = None) -> PlanContext:
+    shared = shared or SharedPlanInputs.from_db(db_path)
+    config = compile_plan_config(cfg)
 
-    start_date = _parse_start_date(cfg)
-    horizon_days = int(cfg.get("horizon_days", 30))
-    active_mask = _get_active_mask(start_date, horizon_days, cfg)
-    role_counts_by_day = [counts_for_day(cfg, start_date, i) for i in range(horizon_days)]
+    start_date = config.start_date or date.today()
+    horizon_days = config.horizon_days
+    active_mask = _get_active_mask(start_date, horizon_days, config)
+    role_counts_by_day = [
+        config.role_counts_for_weekday((start_date + timedelta(days=i)).isoweekday())
+        for i in range(horizon_days)
+    ]
 
-    hard = dict(cfg.get("hard", {}) or {})
-    hard["prep_time_limit_minutes"] = cfg.get("prep_time_limit_minutes", hard.get("prep_time_limit_minutes", 90))
-    hard["per_weekday_prep_time_limit_minutes"] = cfg.get(
-        "per_weekday_prep_time_limit_minutes",
-        hard.get("per_weekday_prep_time_limit_minutes", {}),
-    )
-    hard["side_soup_meat_limit"] = cfg.get(
-        "side_soup_meat_limit",
-        cfg.get(
-            "side_soup_protein_limit",
-            hard.get("side_soup_meat_limit", hard.get("side_soup_protein_limit", 2)),
-        ),
-    )
-    hard["per_weekday_side_soup_meat_limit"] = cfg.get(
-        "per_weekday_side_soup_meat_limit",
-        cfg.get(
-            "per_weekday_side_soup_protein_limit",
-            hard.get(
-                "per_weekday_side_soup_meat_limit",
-                hard.get("per_weekday_side_soup_protein_limit", {}),
-            ),
-        ),
-    )
+    hard = merge_plan_hard(cfg)
     soft = cfg.get("soft", {}) or {}
     weights = cfg.get("weights", {}) or {}
     search = cfg.get("search", {}) or {}
-    seed = _resolve_seed(cfg, start_date)
+    seed = resolve_seed(cfg, start_date)
     hard["seed"] = seed
 
-    ingredients = repo.fetch_ingredients()
-    dish_ingredients = repo.fetch_dish_ingredients()
+    snapshot = shared.snapshot
     all_dishes = _filter_dishes_by_excluded_ingredients(
-        dishes=repo.fetch_dishes(),
-        dish_ingredients=dish_ingredients,
+        dishes=list(snapshot.dishes),
+        dish_ingredients=snapshot.dish_ingredients,
         hard=hard,
     )
     _merge_dish_allowed_weekdays_from_catalog(hard, all_dishes)
-    inventory = repo.fetch_inventory()
-    conv = repo.fetch_unit_conversions()
-    prices = repo.fetch_latest_prices(price_date=start_date.isoformat())
 
     dishes_by_id = {d.id: d for d in all_dishes}
-    feat = build_dish_features(
-        dishes=all_dishes,
-        dish_ingredients=dish_ingredients,
-        ingredients=ingredients,
-        prices=prices,
-        inventory=inventory,
-        conv=conv,
-        today=start_date,
-    )
+    # 特徵逐道菜獨立計算，整份目錄的特徵取子集合即與只算 all_dishes 相同
+    catalog_feat = shared.features(start_date)
+    feat = {d.id: catalog_feat[d.id] for d in all_dishes}
 
     mains, sides, vegs, soups, fruits, noodles = _split_dishes_by_role(all_dishes)
     auto_relaxed = _auto_relax_main_repeat_limit(
@@ -497,6 +547,8 @@ def _prepare_context(db_path: str, cfg: Dict[str, Any]) -> PlanContext:
         horizon_days=horizon_days,
         active_mask=active_mask,
         role_counts_by_day=role_counts_by_day,
+        # hard 在上面已合併目錄週幾規則、seed 與自動放寬，重新編譯後交給引擎
+        config=config.with_hard(hard),
         hard=hard,
         soft=soft,
         weights=weights,
@@ -504,8 +556,8 @@ def _prepare_context(db_path: str, cfg: Dict[str, Any]) -> PlanContext:
         seed=seed,
         all_dishes=all_dishes,
         dishes_by_id=dishes_by_id,
-        dish_ingredient_ids=_build_dish_ingredient_ids(dish_ingredients, ingredients, hard),
-        dish_has_meat=_build_dish_has_meat(all_dishes, dish_ingredients, ingredients),
+        dish_ingredient_ids=shared.dish_ingredient_ids(hard),
+        dish_has_meat=shared.dish_has_meat(),
         feat=feat,
         mains=mains,
         sides=sides,
@@ -538,43 +590,83 @@ def _build_offday_result(ctx: PlanContext) -> Dict[str, Any]:
     return result
 
 
-def _run_backtracking(ctx: PlanContext) -> Tuple[List[PlanDay], float, List[Dict[str, Any]], List[Dict[str, Any]]]:
-    bt = (ctx.search.get("backtracking") or {})
-    beam_width = int(bt.get("beam_width", 12))
-    cand_limit = int((bt.get("candidate_limit_per_role") or {}).get("main", 25))
-
-    main_ids_full = plan_mains_beam(
-        horizon_days=ctx.horizon_days,
-        mains=ctx.mains,
-        feat=ctx.feat,
-        hard=ctx.hard,
-        beam_width=beam_width,
-        candidate_limit=cand_limit,
-        seed=ctx.seed,
-        start_date=ctx.start_date,
-        active_mask=ctx.active_mask,
-        role_counts_by_day=ctx.role_counts_by_day,
-    )
+def _run_backtracking(
+    ctx: PlanContext,
+    progress: Optional[ProgressCallback] = None,
+    on_event: Optional[PlanEventCallback] = None,
+    attempt: int = 0,
+) -> Tuple[List[PlanDay], float, List[Dict[str, Any]], List[Dict[str, Any]]]:
+    search = ctx.config.search
+
+    with span("mains"):
+        main_ids_full = plan_mains_beam(
+            horizon_days=ctx.horizon_days,
+            mains=ctx.mains,
+            feat=ctx.feat,
+            hard=ctx.config.hard,
+            beam_width=search.beam_width,
+            candidate_limit=search.main_candidate_limit,
+            seed=ctx.seed,
+            start_date=ctx.start_date,
+            active_mask=ctx.active_mask,
+            role_counts_by_day=ctx.role_counts_by_day,
+            progress=progress,
+        )
 
-    return fill_days_after_mains(
-        horizon_days=ctx.horizon_days,
-        main_ids=main_ids_full,
-        sides=ctx.sides,
-        vegs=ctx.vegs,
-        soups=ctx.soups,
-        fruits=ctx.fruits,
-        noodles=ctx.noodles,
-        mains=ctx.mains,
-        feat=ctx.feat,
-        hard=ctx.hard,
-        weights=ctx.weights,
-        soft=ctx.soft,
-        dish_ingredient_ids=ctx.dish_ingredient_ids,
-        dish_has_meat=ctx.dish_has_meat,
-        start_date=ctx.start_date,
-        active_mask=ctx.active_mask,
-        role_counts_by_day=ctx.role_counts_by_day,
-    )
+    on_day = None
+    if on_event is not None:
+        emit_event(on_event, EVENT_MAINS, {
+            "attempt": attempt,
+            "days": [
+                {
+                    "date": (ctx.start_date + timedelta(days=i)).isoformat(),
+                    "day_index": i,
+                    "is_scheduled": bool(ctx.active_mask[i]),
+                    "main": dish_info(mid, ctx.dishes_by_id, ctx.feat),
+                }
+                for i, mid in enumerate(main_ids_full)
+            ],
+        })
+
+        def on_day(day_idx: int, plan_day: PlanDay, detail: Dict[str, Any]) -> None:
+            # 填菜結果為暫定：之後的 local search 仍可能調整，最終以完整結果為準
+            emit_event(on_event, EVENT_DAY, {
+                "attempt": attempt,
+                "provisional": True,
+                "day": explain_day(
+                    start_date=ctx.start_date,
+                    i=day_idx,
+                    d=plan_day,
+                    dishes_by_id=ctx.dishes_by_id,
+                    feat=ctx.feat,
+                    sd=detail,
+                    active_mask=ctx.active_mask,
+                    role_counts_by_day=ctx.role_counts_by_day,
+                ),
+            })
+
+    with span("fill"):
+        return fill_days_after_mains(
+            horizon_days=ctx.horizon_days,
+            main_ids=main_ids_full,
+            sides=ctx.sides,
+            vegs=ctx.vegs,
+            soups=ctx.soups,
+            fruits=ctx.fruits,
+            noodles=ctx.noodles,
+            mains=ctx.mains,
+            feat=ctx.feat,
+            hard=ctx.config.hard,
+            weights=ctx.config.weights,
+            soft=ctx.config.soft,
+            dish_ingredient_ids=ctx.dish_ingredient_ids,
+            dish_has_meat=ctx.dish_has_meat,
+            start_date=ctx.start_date,
+            active_mask=ctx.active_mask,
+            role_counts_by_day=ctx.role_counts_by_day,
+            progress=progress,
+            on_day=on_day,
+        )
 
 
 def _run_local_search(
@@ -583,9 +675,9 @@ def _run_local_search(
     base_score: float,
     base_expl: List[Dict[str, Any]],
     base_errors: List[Dict[str, Any]],
+    progress: Optional[ProgressCallback] = None,
 ) -> PlanComputation:
-    ls = (ctx.search.get("local_search") or {})
-    ls_enabled = bool(ls.get("enabled", True))
+    search = ctx.config.search
 
     def _is_day_incomplete(i: int, d: PlanDay) -> bool:
         counts = ctx.role_counts_by_day[i] if i < len(ctx.role_counts_by_day) else {}
@@ -609,25 +701,27 @@ def _run_local_search(
             or "side_soup_meat_limit" in ctx.hard or ctx.hard.get("per_weekday_side_soup_meat_limit")):
         local_search_safe = False
 
-    if ls_enabled and local_search_safe and (not incomplete_days) and (not base_errors):
-        improved_plan, improved_score, improved_day_details = improve_by_local_search(
-            plan_days=plan_days_full,
-            mains=ctx.mains,
-            sides=ctx.sides,
-            vegs=ctx.vegs,
-            soups=ctx.soups,
-            fruits=ctx.fruits,
-            feat=ctx.feat,
-            hard=ctx.hard,
-            weights=ctx.weights,
-            soft=ctx.soft,
-            dish_ingredient_ids=ctx.dish_ingredient_ids,
-            iterations=int(ls.get("iterations", 800)),
-            accept_worse_probability=float(ls.get("accept_worse_probability", 0.03)),
-            seed=ctx.seed,
-            start_date=ctx.start_date,
-            active_mask=ctx.active_mask,
-        )
+    if search.local_search_enabled and local_search_safe and (not incomplete_days) and (not base_errors):
+        with span("local_search"):
+            improved_plan, improved_score, improved_day_details = improve_by_local_search(
+                plan_days=plan_days_full,
+                mains=ctx.mains,
+                sides=ctx.sides,
+                vegs=ctx.vegs,
+                soups=ctx.soups,
+                fruits=ctx.fruits,
+                feat=ctx.feat,
+                hard=ctx.config.hard,
+                weights=ctx.config.weights,
+                soft=ctx.config.soft,
+                dish_ingredient_ids=ctx.dish_ingredient_ids,
+                iterations=search.local_search_iterations,
+                accept_worse_probability=search.accept_worse_probability,
+                seed=ctx.seed,
+                start_date=ctx.start_date,
+                active_mask=ctx.active_mask,
+                progress=progress,
+            )
         return PlanComputation(
             final_plan=improved_plan,
             day_details=improved_day_details,
@@ -682,24 +776,60 @@ def _build_result(ctx: PlanContext, comp: PlanComputation) -> Dict[str, Any]:
     return result
 
 
-def plan_month(db_path: str, cfg: Dict[str, Any]) -> Dict[str, Any]:
-    ctx = _prepare_context(db_path=db_path, cfg=cfg)
+def plan_month(
+    db_path: str,
+    cfg: Dict[str, Any],
+    progress: Optional[ProgressCallback] = None,
+    on_event: Optional[PlanEventCallback] = None,
+    shared: Optional[SharedPlanInputs] = None,
+) -> Dict[str, Any]:
+    """
+    progress(stage, day_index) 供背景工作回報進度；回呼丟出 PlanCancelled 即可中止。
+    on_event(kind, payload) 供串流端點逐步輸出主菜與每日填菜（暫定）結果。
+    shared 供批次排餐在多組 cfg 間共用目錄特徵等輸入（須來自同一個 db_path）。
+    各階段耗時與搜尋計數放在 result["debug"]["perf"]（見 engine/perf.py）。
+    """
+    with recording(PerfRecorder()) as recorder:
+        result = _plan_month(db_path, cfg, progress, on_event, shared)
+    result.setdefault("debug", {})["perf"] = recorder.as_dict()
+    log_perf("plan_month", result["debug"]["perf"])
+    return result
+
+
+def _plan_month(
+    db_path: str,
+    cfg: Dict[str, Any],
+    progress: Optional[ProgressCallback],
+    on_event: Optional[PlanEventCallback],
+    shared: Optional[SharedPlanInputs],
+) -> Dict[str, Any]:
+    with span("context"):
+        ctx = _prepare_context(db_path=db_path, cfg=cfg, shared=shared)
+    report_progress(progress, STAGE_CONTEXT)
 
     if not any(ctx.active_mask):
-        return _build_offday_result(ctx)
+        with span("explain"):
+            return _build_offday_result(ctx)
 
-    plan_days_full, base_score, base_expl, base_errors = _run_backtracking(ctx)
+    plan_days_full, base_score, base_expl, base_errors = _run_backtracking(ctx, progress, on_event)
 
     retry = 0
-    while any(e.get("code") == "SOUP_NO_SOLUTION" for e in base_errors) and retry < 8:
-        changed = _bump_soup_constraints_for_retry(ctx.hard)
-        if not changed:
-            break
-
-        ctx.hard.setdefault("_auto_relaxed", {}).update(changed)
-        retry += 1
-        logger.info("Retry planning due to SOUP_NO_SOLUTION, auto-relaxed: %s", changed)
-        plan_days_full, base_score, base_expl, base_errors = _run_backtracking(ctx)
-
-    computation = _run_local_search(ctx, plan_days_full, base_score, base_expl, base_errors)
-    return _build_result(ctx, computation)
+    with span("soup_retry"):
+        while any(e.get("code") == "SOUP_NO_SOLUTION" for e in base_errors) and retry < 8:
+            changed = _bump_soup_constraints_for_retry(ctx.hard)
+            if not changed:
+                break
+
+            ctx.hard.setdefault("_auto_relaxed", {}).update(changed)
+            ctx = replace(ctx, config=ctx.config.with_hard(ctx.hard))
+            retry += 1
+            logger.info("Retry planning due to SOUP_NO_SOLUTION, auto-relaxed: %s", changed)
+            emit_event(on_event, EVENT_RETRY, {"attempt": retry, "auto_relaxed": changed})
+            plan_days_full, base_score, base_expl, base_errors = _run_backtracking(
+                ctx, progress, on_event, attempt=retry
+            )
+
+    computation = _run_local_search(ctx, plan_days_full, base_score, base_expl, base_errors, progress)
+    report_progress(progress, STAGE_EXPLAIN)
+    with span("explain"):
+        return _build_result(ctx, computation)
@@ -0,0 +1,33 @@
+# src/menu_planner/engine/progress.py
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional
+
+# progress(stage, day_index)：引擎在每個階段/每天開始時呼叫；回呼可丟出 PlanCancelled 以合作式中止
+ProgressCallback = Callable[[str, Optional[int]], None]
+
+# on_event(kind, payload)：串流端點用，引擎產出階段性成果（主菜、逐日填菜）時呼叫
+PlanEventCallback = Callable[[str, Dict[str, Any]], None]
+
+STAGE_CONTEXT = "context"
+STAGE_MAINS = "mains"
+STAGE_FILL = "fill"
+STAGE_LOCAL_SEARCH = "local_search"
+STAGE_EXPLAIN = "explain"
+
+EVENT_MAINS = "mains"
+EVENT_DAY = "day"
+EVENT_RETRY = "retry"
+
+# local search 每隔幾次迭代回報一次，避免回呼成本蓋過搜尋本身
+LOCAL_SEARCH_REPORT_EVERY = 50
+
+
+def report_progress(progress: Optional[ProgressCallback], stage: str, day_index: Optional[int] = None) -> None:
+    if progress is not None:
+        progress(stage, day_index)
+
+
+def emit_event(on_event: Optional[PlanEventCallback], kind: str, payload: Dict[str, Any]) -> None:
+    if on_event is not None:
+        on_event(kind, payload)
@@ -0,0 +1,434 @@
+# src/menu_planner/engine/replan.py
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .backtracking import fill_days_after_mains, plan_mains_beam
+from .constraints import (
+    PlanDay,
+    _day_ingredient_ids,
+    _iter_prev_active_indices,
+    check_fruit_window_repeat,
+    check_ingredient_window_repeat,
+    check_noodle_window_repeat,
+    check_side_window_repeat,
+    check_soup_window_repeat,
+    check_veg_window_repeat,
+)
+from .errors import PlanError
+from .explain import build_summary, explain_day, plan_day_from_output
+from .planner import PlanContext, SharedPlanInputs, _bump_soup_constraints_for_retry, _prepare_context
+from .progress import STAGE_CONTEXT, STAGE_EXPLAIN, ProgressCallback, report_progress
+
+logger = logging.getLogger(__name__)
+
+# 邊界衝突修補最多重填幾輪；仍有衝突就以 REPLAN_BOUNDARY_CONFLICT 回報
+MAX_REPAIR_ROUNDS = 3
+# 重排區間之後要檢查的固定日（日曆天）：涵蓋 30 天麵食窗與跨週末的 7 個排餐日窗
+BOUNDARY_LOOKAHEAD_DAYS = 31
+
+
+@dataclass(frozen=True)
+class BoundaryConflict:
+    """固定日 day_index 以自己的視角檢查重複限制時，因重排日的菜色而違反。"""
+
+    day_index: int
+    kind: str
+    keys: List[str]
+    replanned_days: List[int]
+
+    def to_error(self) -> Dict[str, Any]:
+        return PlanError(
+            code="REPLAN_BOUNDARY_CONFLICT",
+            day_index=self.day_index,
+            message=f"第 {self.day_index + 1} 天（保留不動）與重排區間的菜色違反{_KIND_LABELS.get(self.kind, '')}重複限制。",
+            details={"kind": self.kind, "keys": self.keys, "replanned_days": self.replanned_days},
+        ).to_dict()
+
+
+# 佔位主菜 id：不會出現在目錄裡，只用來讓重排日算作排餐日
+_PLACEHOLDER = "\0replan"
+
+_KIND_LABELS = {
+    "side": "配菜",
+    "soup": "湯品",
+    "veg": "蔬菜",
+    "fruit": "水果",
+    "noodle": "麵食",
+    "ingredient": "食材",
+}
+
+
+def _role_ids(day: PlanDay, kind: str) -> List[str]:
+    if kind == "side":
+        return [x for x in (day.sides or []) if x]
+    return [x for x in (getattr(day, f"{kind}s", None) or []) if x]
+
+
+def _window_check(kind: str, ctx: PlanContext):
+    rep = ctx.config.hard.repeat
+    limits = {
+        "side": lambda j, x, plan: check_side_window_repeat(j, [x], plan, rep.max_same_side_in_7_days),
+        "soup": lambda j, x, plan: check_soup_window_repeat(j, x, plan, rep.max_same_soup_in_7_days),
+        "veg": lambda j, x, plan: check_veg_window_repeat(j, x, plan, rep.max_same_veg_in_7_days),
+        "fruit": lambda j, x, plan: check_fruit_window_repeat(j, x, plan, rep.max_same_fruit_in_7_days),
+        "noodle": lambda j, x, plan: (
+            check_noodle_window_repeat(j, [x], plan, rep.max_same_noodle_in_7_days, window_days=7)
+            and check_noodle_window_repeat(j, [x], plan, rep.max_same_noodle_in_30_days, window_days=30)
+        ),
+    }
+    return limits[kind]
+
+
+def find_boundary_conflicts(
+    ctx: PlanContext,
+    plan_days: List[PlanDay],
+    replanned: Set[int],
+) -> List[BoundaryConflict]:
+    """
+    引擎的重複檢查只往回看：重排日選菜時已看過之前的固定日，但之後的固定日還沒檢查。
+    這裡以重排區間之後（及區間內保留）的每個固定日為 day_idx 重跑同一組檢查，
+    只回報能歸因到重排日的衝突（固定日彼此間原本就有的違規不算）。
+    """
+    if not replanned:
+        return []
+    first, last = min(replanned), max(replanned)
+    end = min(len(plan_days), last + 1 + BOUNDARY_LOOKAHEAD_DAYS)
+    rep = ctx.config.hard.repeat
+    conflicts: List[BoundaryConflict] = []
+
+    for j in range(first + 1, end):
+        if j in replanned:
+            continue
+        day = plan_days[j]
+
+        recent = list(_iter_prev_active_indices(j, plan_days, 7))
+        for kind in ("side", "soup", "veg", "fruit", "noodle"):
+            check = _window_check(kind, ctx)
+            window = range(max(0, j - 29), j) if kind == "noodle" else recent
+            for dish_id in _role_ids(day, kind):
+                if check(j, dish_id, plan_days):
+                    continue
+                culprits = [i for i in window if i in replanned and dish_id in _role_ids(plan_days[i], kind)]
+                if culprits:
+                    conflicts.append(BoundaryConflict(j, kind, [dish_id], culprits))
+
+        dish_ids = [x for kind in ("main", "noodle", "soup", "fruit", "side", "veg") for x in _role_ids(day, kind)]
+        if dish_ids and not check_ingredient_window_repeat(
+            j,
+            dish_ids,
+            plan_days,
+            ctx.dish_ingredient_ids,
+            rep.max_same_ingredient_in_window_days,
+            window_active_days=rep.ingredient_repeat_window_days,
+            max_consecutive_days=rep.max_consecutive_ingredient_days,
+        ):
+            today_keys = _day_ingredient_ids(day, ctx.dish_ingredient_ids)
+            window_days = rep.ingredient_repeat_window_days
+            if rep.max_consecutive_ingredient_days is not None:
+                window_days = max(window_days, int(rep.max_consecutive_ingredient_days))
+            culprits = []
+            keys: Set[str] = set()
+            for i in _iter_prev_active_indices(j, plan_days, window_days):
+                if i not in replanned:
+                    continue
+                overlap = today_keys & _day_ingredient_ids(plan_days[i], ctx.dish_ingredient_ids)
+                if overlap:
+                    culprits.append(i)
+                    keys |= overlap
+            if culprits:
+                conflicts.append(BoundaryConflict(j, "ingredient", sorted(keys), culprits))
+    return conflicts
+
+
+def _window_indices(kind: str, j: int, plan_days: List[PlanDay]) -> List[int]:
+    if kind == "noodle":
+        return list(range(max(0, j - 29), j))
+    return list(_iter_prev_active_indices(j, plan_days, 7))
+
+
+def forward_blocks(
+    ctx: PlanContext,
+    fixed_days: Dict[int, PlanDay],
+    replanned: Set[int],
+) -> Dict[int, Set[str]]:
+    """
+    排主菜與填菜前，先封鎖「放在重排日 d 就會讓之後某個固定日違反重複限制」的菜色：
+    重排日以空白暫代（排程日放一個佔位主菜，讓它照樣算排餐日），
+    對每個固定日 j 的每道菜，試放到 j 窗口內的各重排日並重跑 j 的檢查；食材則以 key 計數。
+    只考慮單一重排日的影響；多個重排日合計造成的衝突由之後的邊界檢查修補。
+    """
+    if not replanned:
+        return {}
+    horizon = ctx.horizon_days
+    proxy = [
+        fixed_days[i] if i in fixed_days
+        else PlanDay(main=_PLACEHOLDER if ctx.active_mask[i] else "", sides=[], veg="", soup="", fruit="")
+        for i in range(horizon)
+    ]
+    first, last = min(replanned), max(replanned)
+    end = min(horizon, last + 1 + BOUNDARY_LOOKAHEAD_DAYS)
+    rep = ctx.config.hard.repeat
+    blocked: Dict[int, Set[str]] = {}
+    blocked_keys: Dict[int, Set[str]] = {}
+
+    for j in range(first + 1, end):
+        if j in replanned:
+            continue
+        day = proxy[j]
+        for kind in ("side", "soup", "veg", "fruit", "noodle"):
+            check = _window_check(kind, ctx)
+            for d in _window_indices(kind, j, proxy):
+                if d not in replanned:
+                    continue
+                original = proxy[d]
+                for dish_id in _role_ids(day, kind):
+                    proxy[d] = _with_role(original, kind, dish_id)
+                    if not check(j, dish_id, proxy):
+                        blocked.setdefault(d, set()).add(dish_id)
+                proxy[d] = original
+
+        limit = rep.max_same_ingredient_in_window_days
+        window = list(_iter_prev_active_indices(j, proxy, rep.ingredient_repeat_window_days))
+        targets = [d for d in window if d in replanned]
+        if not targets or limit >= 10**9:
+            continue
+        for key in _day_ingredient_ids(day, ctx.dish_ingredient_ids):
+            used = sum(1 for i in window if key in _day_ingredient_ids(proxy[i], ctx.dish_ingredient_ids))
+            if used + 2 > limit:
+                for d in targets:
+                    blocked_keys.setdefault(d, set()).add(key)
+
+    for d, keys in blocked_keys.items():
+        blocked.setdefault(d, set()).update(
+            dish_id for dish_id, dish_keys in ctx.dish_ingredient_ids.items() if dish_keys & keys
+        )
+    return blocked
+
+
+def _with_role(day: PlanDay, kind: str, dish_id: str) -> PlanDay:
+    roles = {"sides": [], "veg": "", "soup": "", "fruit": "", "noodle": ""}
+    if kind == "side":
+        roles["sides"] = [dish_id]
+    else:
+        roles[kind] = dish_id
+    return PlanDay(main=day.main, **roles)
+
+
+def _block_conflicts(
+    ctx: PlanContext,
+    plan_days: List[PlanDay],
+    conflicts: Iterable[BoundaryConflict],
+    blocked: Dict[int, Set[str]],
+) -> Tuple[bool, bool]:
+    """把衝突菜色在重排日設為不可選；回傳 (是否有新增封鎖, 是否封鎖到主菜——需重跑 beam)。"""
+    changed = mains_changed = False
+    for c in conflicts:
+        for i in c.replanned_days:
+            day = plan_days[i]
+            if c.kind == "ingredient":
+                keys = set(c.keys)
+                ids = [
+                    x for kind in ("main", "noodle", "soup", "fruit", "side", "veg") for x in _role_ids(day, kind)
+                    if ctx.dish_ingredient_ids.get(x, set()) & keys
+                ]
+            else:
+                ids = list(c.keys)
+            for dish_id in ids:
+                if dish_id not in blocked.setdefault(i, set()):
+                    blocked[i].add(dish_id)
+                    changed = True
+                    mains_changed = mains_changed or dish_id in _role_ids(day, "main")
+    return changed, mains_changed
+
+
+@dataclass
+class _RangeSolution:
+    plan_days: List[PlanDay]
+    details: List[Dict[str, Any]]
+    errors: List[Dict[str, Any]]
+    conflicts: List[BoundaryConflict]
+    repair_rounds: int
+
+
+def _plan_mains(
+    ctx: PlanContext,
+    fixed_days: Dict[int, PlanDay],
+    blocked: Dict[int, Set[str]],
+    progress: Optional[ProgressCallback],
+) -> List[str]:
+    search = ctx.config.search
+    kwargs = dict(
+        horizon_days=ctx.horizon_days,
+        mains=ctx.mains,
+        feat=ctx.feat,
+        hard=ctx.config.hard,
+        beam_width=search.beam_width,
+        candidate_limit=search.main_candidate_limit,
+        seed=ctx.seed,
+        start_date=ctx.start_date,
+        active_mask=ctx.active_mask,
+        role_counts_by_day=ctx.role_counts_by_day,
+        progress=progress,
+        fixed_main_ids={i: d.main for i, d in fixed_days.items()},
+    )
+    try:
+        return plan_mains_beam(**kwargs, blocked_by_day=blocked)
+    except PlanError as e:
+        # 封鎖只是盡量避開：封鎖後無解時改回不封鎖，衝突交給邊界檢查回報
+        if e.code != "MAIN_BEAM_NO_SOLUTION" or not blocked:
+            raise
+        return plan_mains_beam(**kwargs)
+
+
+def _solve_range(
+    ctx: PlanContext,
+    fixed_days: Dict[int, PlanDay],
+    replanned: Set[int],
+    progress: Optional[ProgressCallback],
+) -> _RangeSolution:
+    blocked = forward_blocks(ctx, fixed_days, replanned)
+    main_ids: Optional[List[str]] = None
+    rounds = 0
+    while True:
+        if main_ids is None:
+            main_ids = _plan_mains(ctx, fixed_days, blocked, progress)
+        plan_days, _, details, errors = fill_days_after_mains(
+            horizon_days=ctx.horizon_days,
+            main_ids=main_ids,
+            sides=ctx.sides,
+            vegs=ctx.vegs,
+            soups=ctx.soups,
+            fruits=ctx.fruits,
+            noodles=ctx.noodles,
+            mains=ctx.mains,
+            feat=ctx.feat,
+            hard=ctx.config.hard,
+            weights=ctx.config.weights,
+            soft=ctx.config.soft,
+            dish_ingredient_ids=ctx.dish_ingredient_ids,
+            dish_has_meat=ctx.dish_has_meat,
+            start_date=ctx.start_date,
+            active_mask=ctx.active_mask,
+            role_counts_by_day=ctx.role_counts_by_day,
+            progress=progress,
+            fixed_days=fixed_days,
+            blocked_by_day=blocked,
+        )
+        conflicts = find_boundary_conflicts(ctx, plan_days, replanned)
+        if not conflicts or rounds >= MAX_REPAIR_ROUNDS:
+            break
+        changed, mains_changed = _block_conflicts(ctx, plan_days, conflicts, blocked)
+        if not changed:
+            break
+        rounds += 1
+        logger.info("Replan boundary conflicts, refilling (round %d): %s", rounds, conflicts)
+        if mains_changed:
+            main_ids = None
+    return _RangeSolution(plan_days, details, errors, conflicts, rounds)
+
+
+def replan_month(
+    db_path: str,
+    cfg: Dict[str, Any],
+    base_result: Dict[str, Any],
+    start_index: int,
+    end_index: int,
+    locked_indices: Iterable[int] = (),
+    progress: Optional[ProgressCallback] = None,
+    shared: Optional[SharedPlanInputs] = None,
+) -> Dict[str, Any]:
+    """
+    局部重排：base_result 中 [start_index, end_index] 區間內、未列於 locked_indices 的日子重新排，
+    其餘日子原樣保留。主菜 beam 與填菜只跑重排區間，重複限制的歷史與週配額由固定日重建；
+    區間之後的固定日另做一次邊界檢查，衝突菜色在重排日封鎖後重填（最多 MAX_REPAIR_ROUNDS 輪）。
+    不跑 local search（會動到固定日）。
+    """
+    ctx = _prepare_context(db_path=db_path, cfg=cfg, shared=shared)
+    report_progress(progress, STAGE_CONTEXT)
+
+    base_days = base_result.get("days") or []
+    if len(base_days) != ctx.horizon_days or (base_days and base_days[0].get("date") != ctx.start_date.isoformat()):
+        raise PlanError(
+            code="REPLAN_RESULT_MISMATCH",
+            message="原排餐結果的起始日或天數與設定不符。",
+            details={
+                "result_days": len(base_days),
+                "result_start_date": base_days[0].get("date") if base_days else None,
+                "horizon_days": ctx.horizon_days,
+                "start_date": ctx.start_date.isoformat(),
+            },
+        )
+    if not (0 <= start_index <= end_index < ctx.horizon_days):
+        raise PlanError(
+            code="REPLAN_RANGE_INVALID",
+            message="重排區間超出排餐期間。",
+            details={"start_index": start_index, "end_index": end_index, "horizon_days": ctx.horizon_days},
+        )
+
+    locked = set(locked_indices)
+    replanned = {i for i in range(start_index, end_index + 1) if i not in locked}
+    if not replanned:
+        raise PlanError(code="REPLAN_EMPTY_RANGE", message="重排區間內的日子都已鎖定，沒有要重排的日子。")
+
+    existing = [plan_day_from_output(d) for d in base_days]
+    fixed_days = {i: d for i, d in enumerate(existing) if i not in replanned}
+
+    solution = _solve_range(ctx, fixed_days, replanned, progress)
+    # 與 plan_month 相同：湯品無解時自動放寬湯品相關限制重排（只看重排日）
+    retry = 0
+    while any(e.get("code") == "SOUP_NO_SOLUTION" for e in solution.errors) and retry < 8:
+        changed = _bump_soup_constraints_for_retry(ctx.hard)
+        if not changed:
+            break
+        ctx.hard.setdefault("_auto_relaxed", {}).update(changed)
+        ctx = replace(ctx, config=ctx.config.with_hard(ctx.hard))
+        retry += 1
+        logger.info("Retry replanning due to SOUP_NO_SOLUTION, auto-relaxed: %s", changed)
+        solution = _solve_range(ctx, fixed_days, replanned, progress)
+
+    report_progress(progress, STAGE_EXPLAIN)
+    detail_by_index = {d.get("day_index"): d for d in solution.details}
+    out_days: List[Dict[str, Any]] = []
+    for i, plan_day in enumerate(solution.plan_days):
+        if i in fixed_days:
+            out_days.append(base_days[i])
+            continue
+        out_days.append(explain_day(
+            start_date=ctx.start_date,
+            i=i,
+            d=plan_day,
+            dishes_by_id=ctx.dishes_by_id,
+            feat=ctx.feat,
+            sd=detail_by_index.get(i, {}),
+            active_mask=ctx.active_mask,
+            role_counts_by_day=ctx.role_counts_by_day,
+        ))
+
+    # 保留日原有的失敗原因照舊帶著；重排日的錯誤與邊界衝突換成新的
+    kept_errors = [e for e in (base_result.get("errors") or []) if e.get("day_index") in fixed_days]
+    all_errors = kept_errors + solution.errors + [c.to_error() for c in solution.conflicts]
+    summary = build_summary(out_days)
+    result: Dict[str, Any] = {"summary": summary, "days": out_days, "errors": all_errors, "ok": not all_errors}
+    result["debug"] = {
+        "seed": ctx.seed,
+        "active_mask": ctx.active_mask,
+        "active_days": sum(1 for x in ctx.active_mask if x),
+        "role_counts_by_day": ctx.role_counts_by_day,
+        "auto_relaxed": ctx.hard.get("_auto_relaxed", {}),
+        "failed_days": sorted({e.get("day_index") for e in all_errors if e.get("day_index") is not None}),
+        "start_date": ctx.start_date.isoformat(),
+        "final_score": summary["total_score"],
+        "local_search_enabled": False,
+        "replan": {
+            "start_index": start_index,
+            "end_index": end_index,
+            "locked_days": sorted(i for i in locked if start_index <= i <= end_index),
+            "replanned_days": sorted(replanned),
+            "repair_rounds": solution.repair_rounds,
+            "boundary_conflicts": len(solution.conflicts),
+        },
+    }
+    return result
@@ -5,6 +5,7 @@ from dataclasses import dataclass
 from datetime import date, datetime
 from typing import Dict, Optional, List, Tuple
 
+from ..config.loader import CompiledHardConstraints, CompiledWeights, HardConfig, WeightsConfig
 from .features import DishFeatures
 
 
@@ -20,8 +21,8 @@ class ScoreBreakdown:
 
 def score_day(
     day_cost: float,
-    hard: Dict,
-    weights: Dict,
+    hard: HardConfig,
+    weights: WeightsConfig,
     chosen: Dict[str, DishFeatures],  # keys: main/side1/side2/veg/soup/fruit
     context: Dict,
 ) -> ScoreBreakdown:
@@ -63,6 +64,9 @@ def score_day(
         near_min = min(near_days) if near_days else None
         return ratio, near_min, active_ids
 
+    hc = CompiledHardConstraints.coerce(hard)
+    w = CompiledWeights.coerce(weights)
+
     plan_day = _resolve_plan_date()
     effective: Dict[str, Tuple[float, Optional[int], set[str]]] = {
         k: _effective_inventory(v, plan_day) for k, v in chosen.items()
@@ -72,29 +76,28 @@ def score_day(
     total = 0.0
 
     # 成本：超過 max 扣分、低於 min 也可扣分（讓它不要太偏）
-    cr = hard.get("cost_range_per_person_per_day") or {}
-    minv = cr.get("min")
-    maxv = cr.get("max")
-    if maxv is not None and day_cost > float(maxv):
-        items["cost_over_max"] = (day_cost - float(maxv)) * float(weights.get("cost_over_max_penalty", 0))
-    if minv is not None and day_cost < float(minv):
-        items["cost_under_min"] = (float(minv) - day_cost) * float(weights.get("cost_under_min_penalty", 0))
+    minv = hc.cost_min
+    maxv = hc.cost_max
+    if maxv is not None and day_cost > maxv:
+        items["cost_over_max"] = (day_cost - maxv) * w.cost_over_max_penalty
+    if minv is not None and day_cost < minv:
+        items["cost_under_min"] = (minv - day_cost) * w.cost_under_min_penalty
 
     # 連續同肉（如果不是 hard 禁止，就當 soft 扣分）
     prev_meat = context.get("prev_main_meat")
     cur_meat = chosen["main"].meat_type
     if prev_meat is not None and cur_meat is not None and prev_meat == cur_meat:
-        items["consecutive_same_meat"] = float(weights.get("consecutive_same_meat_penalty", 0))
+        items["consecutive_same_meat"] = w.consecutive_same_meat_penalty
 
     # 連續同菜系（soft）
     prev_cuisine = context.get("prev_main_cuisine")
     cur_cuisine = chosen["main"].cuisine
     if prev_cuisine and cur_cuisine and prev_cuisine == cur_cuisine:
-        items["cuisine_consecutive"] = float(weights.get("cuisine_consecutive_penalty", 0))
+        items["cuisine_consecutive"] = w.cuisine_consecutive_penalty
 
     # 庫存 / 近到期：加分（用負數代表 bonus）
     if context.get("prefer_use_inventory", False):
-        inv_bonus = float(weights.get("use_inventory_bonus", 0))
+        inv_bonus = w.use_inventory_bonus
         # 用到庫存比例越高，加分越多
         hit = effective["main"][0]
         items["use_inventory_bonus_main"] = inv_bonus * hit  # inv_bonus 本身應該是負數
@@ -108,11 +111,10 @@ def score_day(
 
         # 偏好食材（多選）：若當日菜色命中偏好食材，額外給一點 bonus。
         # 注意：這是 soft 偏好，不是 hard 排除；即使不在偏好清單，仍可能被排到。
-        preferred_ids = {
-            str(x).strip()
-            for x in (context.get("inventory_prefer_ingredient_ids") or [])
-            if str(x).strip()
-        }
+        preferred_ids = context.get("inventory_prefer_ingredient_ids") or frozenset()
+        if not isinstance(preferred_ids, frozenset):
+            # 編譯後的 soft 已是 frozenset；舊呼叫端傳 list 時才逐一正規化
+            preferred_ids = {str(x).strip() for x in preferred_ids if str(x).strip()}
         if preferred_ids:
             prefer_hits = 0
             for key in ("main", "soup", "side1", "side2", "veg"):
@@ -123,7 +125,7 @@ def score_day(
                 items["prefer_ingredient_bonus"] = inv_bonus * (prefer_hits * 0.35)
 
     if context.get("prefer_near_expiry", False):
-        near_bonus = float(weights.get("near_expiry_bonus", 0))  # 預期是負數
+        near_bonus = w.near_expiry_bonus  # 預期是負數
         # 越接近到期（days 越小）加分越多；已過期（相對於當天）不再視為庫存命中
         def one(days: Optional[int]) -> float:
             if days is None:
@@ -160,10 +162,10 @@ def score_day(
     recent_sides    = context.get("recent_sides") or []
     recent_vegs     = context.get("recent_vegs") or []
     
-    w_main  = float(weights.get("repeat_penalty_main", 0))
-    w_soup  = float(weights.get("repeat_penalty_soup", 0))
-    w_side  = float(weights.get("repeat_penalty_side", 0))
-    w_fruit = float(weights.get("repeat_penalty_fruit", 0))
+    w_main  = w.repeat_penalty_main
+    w_soup  = w.repeat_penalty_soup
+    w_side  = w.repeat_penalty_side
+    w_fruit = w.repeat_penalty_fruit
     
     if w_main > 0 and cur_main_id:
         rep = recent_main_ids.count(cur_main_id)
@@ -0,0 +1,30 @@
+# src/menu_planner/env.py
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+# API 端點 db_path 查詢參數的預設值（以啟動時的工作目錄解析一次）
+DEFAULT_DB_PATH = str((Path.cwd() / "data" / "menu.db").resolve())
+
+
+def env_int(name: str, default: int, minimum: int = 0) -> int:
+    """讀取整數環境變數；未設定或格式錯誤時回傳 default，小於 minimum 時取 minimum。"""
+    raw = (os.getenv(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return max(minimum, int(raw))
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float, minimum: float = 0.0) -> float:
+    """讀取浮點數環境變數；規則同 env_int。"""
+    raw = (os.getenv(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return max(minimum, float(raw))
+    except ValueError:
+        return default
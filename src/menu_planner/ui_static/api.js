@@ -1,11 +1,17 @@
+import { openCatalogStore, syncCatalog } from "./shared/catalog_cache.js";
+import { expandCompactDays, expandCompactResult } from "./shared/result_compact.js";
+
 const API = {
   defaults: "/config/default",
   validate: "/config/validate",
   plan: "/plan",
+  planStream: "/plan/stream",
   enrichResult: "/result/enrich",
+  enrichResultPatch: "/result/enrich/patch",
   ingredients: "/catalog/ingredients",
   dishes: "/catalog/dishes",
   summary: "/catalog/summary",
+  catalogChanges: "/catalog/changes",
   exportExcel: "/export/excel",
 };
 
@@ -14,7 +20,7 @@ export async function fetchDefaults() {
   return await res.json();
 }
 
-export async function fetchCatalog() {
+async function fetchFullCatalog() {
   const [r1, r2] = await Promise.all([fetch(API.ingredients), fetch(API.dishes)]);
   return {
     ingredients: await r1.json(),
@@ -22,6 +28,22 @@ export async function fetchCatalog() {
   };
 }
 
+async function fetchCatalogChanges(since) {
+  const res = await fetch(`${API.catalogChanges}?since=${encodeURIComponent(since || "")}`);
+  if (!res.ok) throw new Error(`HTTP ${res.status}`);
+  return await res.json();
+}
+
+// 目錄存在 IndexedDB，載入時只取上次之後異動的列；同步失敗時退回完整載入
+export async function fetchCatalog() {
+  try {
+    const { ingredients, dishes } = await syncCatalog({ store: await openCatalogStore(), fetchChanges: fetchCatalogChanges });
+    return { ingredients, dishes };
+  } catch {
+    return await fetchFullCatalog();
+  }
+}
+
 export async function fetchCatalogSummary() {
   const res = await fetch(API.summary);
   return await res.json();
@@ -36,23 +58,86 @@ export async function validateCfg(cfg) {
   return await res.json();
 }
 
+// 排餐 / 同步結果以精簡格式傳輸（菜色與採購明細只送一份），收到後還原成完整結果
+function expandResultPayload(payload) {
+  if (payload?.result) payload.result = expandCompactResult(payload.result);
+  return payload;
+}
+
 export async function planMenu(cfg) {
-  const res = await fetch(API.plan, {
+  const res = await fetch(`${API.plan}?format=compact`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify(cfg),
   });
   const payload = await res.json().catch(() => ({}));
-  return { ok: res.ok, payload };
+  return { ok: res.ok, payload: expandResultPayload(payload) };
+}
+
+// NDJSON 串流：每收到一行事件就呼叫 onEvent(event)；回傳值與 planMenu 相同（以 result / error 事件為準）
+export async function streamPlanMenu(cfg, onEvent) {
+  const res = await fetch(API.planStream, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(cfg),
+  });
+  if (!res.ok || !res.body) {
+    const payload = await res.json().catch(() => ({}));
+    return { ok: res.ok, payload };
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let final = null;
+
+  const handleLine = (line) => {
+    if (!line.trim()) return;
+    const event = JSON.parse(line);
+    if (event.event === "result" || event.event === "error") {
+      final = event;
+    }
+    onEvent?.(event);
+  };
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop();
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer + decoder.decode());
+
+  if (!final) {
+    return { ok: false, payload: { ok: false, errors: [{ code: "STREAM_INTERRUPTED", message: "串流中斷，未收到完整結果" }] } };
+  }
+  const { event: _event, ...payload } = final;
+  return { ok: true, payload };
 }
 
 export async function enrichResult(cfg, result) {
-  const res = await fetch(API.enrichResult, {
+  const res = await fetch(`${API.enrichResult}?format=compact`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({ cfg, result }),
   });
   const payload = await res.json().catch(() => ({}));
+  return { ok: res.ok, payload: expandResultPayload(payload) };
+}
+
+// 局部同步：只送出改到的日子（day_index -> role -> 菜色 id），伺服器以 result_token 取回上一版結果
+export async function enrichResultPatch(cfg, resultToken, changes) {
+  const res = await fetch(`${API.enrichResultPatch}?format=compact`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ cfg, result_token: resultToken, changes }),
+  });
+  const payload = await res.json().catch(() => ({}));
+  if (payload?.format === "compact") {
+    payload.days = expandCompactDays(payload.days, payload.dishes, payload.procurement_rows);
+  }
   return { ok: res.ok, payload };
 }
 
@@ -2,15 +2,16 @@ import {
   fetchCatalog,
   fetchCatalogSummary,
   fetchDefaults,
-  planMenu,
+  streamPlanMenu,
   validateCfg,
   exportExcel,
   enrichResult,
+  enrichResultPatch,
 } from "./api.js";
 import { buildCfgFromFormData, deriveFormDataFromCfg } from "./cfg_transform.js";
 import { DOM } from "./dom.js";
 import { createAppState, setCatalog } from "./state.js";
-import { escapeHtml, formatErrors, pretty, renderResult, setMsg, showErrorDetail } from "./render.js";
+import { createStreamingPainter, escapeHtml, formatErrors, pretty, renderResult, setMsg, showErrorDetail } from "./render.js";
 
 const state = createAppState();
 const EDITOR_MODAL_ID = "#dish_editor_modal";
@@ -757,6 +758,45 @@ function applyDishEdit({ dayIndex, slot, dishId }) {
   return true;
 }
 
+const EDIT_ROLES = ["main", "noodle", "side", "veg", "soup", "fruit"];
+
+function dayRoleIds(day) {
+  const items = day?.items || {};
+  const out = {};
+  EDIT_ROLES.forEach((role) => {
+    const list = Array.isArray(items[`${role}s`]) && items[`${role}s`].length ? items[`${role}s`] : [items[role]];
+    out[role] = list.map((dish) => dish?.id).filter(Boolean);
+  });
+  return out;
+}
+
+function mergePatchedDays(result, payload) {
+  const days = result?.days || [];
+  (payload.days || []).forEach((patched) => {
+    const idx = days.findIndex((d, i) => (d.day_index ?? i) === patched.day_index);
+    if (idx >= 0) days[idx] = patched;
+  });
+  result.summary = { ...(result.summary || {}), ...(payload.summary || {}) };
+}
+
+async function syncEditedDay(dayIndex) {
+  const day = findDayByIndex(dayIndex);
+  if (state.resultToken && day) {
+    const sync = await enrichResultPatch(state.lastCfg, state.resultToken, { [dayIndex]: dayRoleIds(day) });
+    if (sync.ok && sync.payload?.ok) {
+      mergePatchedDays(state.lastResult, sync.payload);
+      state.resultToken = sync.payload.result_token || null;
+      return;
+    }
+  }
+  // 尚無 token 或 token 已過期：送出整份結果重算，並取得新的 token
+  const sync = await enrichResult(state.lastCfg, state.lastResult);
+  if (sync.ok && sync.payload?.ok && sync.payload?.result) {
+    state.lastResult = sync.payload.result;
+    state.resultToken = sync.payload.result_token || null;
+  }
+}
+
 function bindResultEditing() {
   ensureDishEditorModal();
   const modal = $(EDITOR_MODAL_ID);
@@ -833,10 +873,7 @@ function bindResultEditing() {
     }
     setMsg("正在同步調整後的成本與評分…");
     try {
-      const sync = await enrichResult(state.lastCfg, state.lastResult);
-      if (sync.ok && sync.payload?.ok && sync.payload?.result) {
-        state.lastResult = sync.payload.result;
-      }
+      await syncEditedDay(ctx.dayIndex);
     } catch (e) {
       // ignore: fallback to local recompute
     }
@@ -1052,6 +1089,7 @@ $(async function () {
     $(DOM.btnLoadDefaults).on("click", async () => {
       await loadDefaultsAndApply();
       state.lastResult = null;
+      state.resultToken = null;
       state.lastCfg = null;
       $(DOM.btnExportExcel).prop("disabled", true);
     });
@@ -1094,7 +1132,14 @@ $(async function () {
           return;
         }
 
-        const { ok, payload } = await planMenu(cfg);
+        const painter = createStreamingPainter(cfg);
+        let planned;
+        try {
+          planned = await streamPlanMenu(cfg, painter.onEvent);
+        } finally {
+          painter.stop();
+        }
+        const { ok, payload } = planned;
         if (!ok) {
           const errPayload = payload?.detail?.errors ? payload.detail : (payload || { errors: [{ message: "Unknown error" }] });
           setMsg(`產生失敗：\n- ${formatErrors(errPayload.errors)}`, true);
@@ -1109,6 +1154,7 @@ $(async function () {
         }
 
         state.lastResult = payload.result;
+        state.resultToken = null;
         setMsg("完成。");
         renderResult(payload.result, cfg, { editable: true });
         $(DOM.btnExportExcel).prop("disabled", false);
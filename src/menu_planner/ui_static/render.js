@@ -114,10 +114,10 @@ function renderResultColumnControls(hiddenColumns) {
   </div>`;
 }
 
-function applyResultColumnVisibility(root) {
+function applyResultColumnVisibility(root, panel = root) {
   if (!root || typeof root.querySelectorAll !== "function") return;
   const hiddenColumns = new Set(
-    Array.from(root.querySelectorAll(".result-column-toggle-input:not(:checked)"))
+    Array.from(panel.querySelectorAll(".result-column-toggle-input:not(:checked)"))
       .map((input) => input.getAttribute("data-result-column-toggle"))
       .filter(Boolean),
   );
@@ -134,7 +134,8 @@ function applyResultColumnVisibility(root) {
   root.querySelectorAll(".result-explain-cell").forEach((cell) => {
     cell.colSpan = visibleCount;
   });
-  saveHiddenResultColumns(hiddenColumns);
+  // 只有切換欄位（整個結果區）時才需要寫回設定；補繪區塊只套用現有設定
+  if (panel === root) saveHiddenResultColumns(hiddenColumns);
 }
 
 function bindResultColumnControls() {
@@ -235,6 +236,330 @@ function editableRoleCell({ items, cfg, dateText, dayIndex, role, fallbackCount,
   }).join("<span class=\"dish-sep\">、</span>");
 }
 
+// 單日的打分拆解 / 採買明細 / 庫存使用；展開「可解釋明細」時才產生
+export function renderDayExplain(d, cfg) {
+  const breakdown = d.score_breakdown || {};
+  const sum = summarizeBreakdown(breakdown);
+  const entries = Object.entries(breakdown)
+    .map(([k, v]) => {
+      const vv = Number(v) || 0;
+      return {
+        key: k,
+        label: scoreLabel(k),
+        value: vv,
+        abs: Math.abs(vv).toFixed(2),
+        isBonus: vv < 0,
+        reason: scoreReason(k, vv, d, cfg),
+      };
+    })
+    .sort((a, b) => Math.abs(b.value) - Math.abs(a.value));
+
+  const bRows = entries.map((e) => {
+    const tag = e.isBonus ? "加分" : "扣分";
+    const cls = e.isBonus ? "good" : "bad";
+    const reasonTxt = e.reason ? `<span class="meta">（${escapeHtml(e.reason)}）</span>` : "";
+    return `<div class="bd ${cls}">
+      <span>${escapeHtml(e.label)}${reasonTxt}</span>
+      <span class="v">${tag} ${e.abs}</span>
+    </div>`;
+  }).join("");
+
+  const daySummary = `今日小結：加分 ${sum.bonus.toFixed(1)} ／ 扣分 ${sum.penalty.toFixed(1)} ／ 原始 ${sum.raw.toFixed(1)}（目標匹配度 ${sum.fitness.toFixed(1)}）`;
+
+  return `<div class="explain-box">
+          <div class="ex-title">${escapeHtml(daySummary)}</div>
+          <div class="ex-title">打分拆解（影響大 → 小）</div>
+          <div class="bd-list">${bRows || "<div class='muted'>（無）</div>"}</div>
+          ${renderProcurementDetail(d)}
+          <div class="ex-title">庫存使用（ID）</div>
+          <pre class="pre">${escapeHtml(pretty({
+            main: d.items?.main?.used_inventory_ingredients,
+            soup: d.items?.soup?.used_inventory_ingredients,
+            veg: d.items?.veg?.used_inventory_ingredients,
+            sides: (d.items?.sides || []).map((x) => x?.used_inventory_ingredients),
+          }))}</pre>
+        </div>`;
+}
+
+function renderDayRows(d, idx, ctx) {
+  const { cfg, editable, errByDay, defaultPeople, peopleOverrides } = ctx;
+  let html = "";
+  const dayIndex = d.day_index ?? idx;
+  const isScheduled = (d.is_scheduled !== undefined && d.is_scheduled !== null) ? !!d.is_scheduled : true;
+  const dayErrs = errByDay.get(dayIndex) || [];
+  const isFailed = shouldRenderFailedRow(d, dayErrs);
+
+  const weekdayLabel = weekdayShortLabelFromDateString(d.date);
+  const isWeekend = isWeekendDateString(d.date);
+
+  if (!isScheduled) {
+    const offdayClass = isWeekend ? "row-offday row-weekend-offday" : "row-offday";
+    html += `<tr class="${offdayClass}">
+      <td ${resultColumnDataAttrs("date")}>${d.date || ""}</td>
+      <td class="weekday-cell" ${resultColumnDataAttrs("weekday")}>${weekdayLabel}</td>
+      <td ${resultColumnDataAttrs("people")}></td>
+      <td ${resultColumnDataAttrs("main")}><span class="muted">免排日（依排程設定）</span></td>
+      <td ${resultColumnDataAttrs("noodle")}></td>
+      <td ${resultColumnDataAttrs("side")}></td>
+      <td ${resultColumnDataAttrs("veg")}></td>
+      <td ${resultColumnDataAttrs("soup")}></td>
+      <td ${resultColumnDataAttrs("fruit")}></td>
+      <td ${resultColumnDataAttrs("cost")}></td>
+      <td ${resultColumnDataAttrs("fitness")}></td>
+    </tr>`;
+    return html;
+  }
+
+  if (isFailed) {
+    const mainName = d.items?.main?.name || "(主菜已排但明細不足)";
+    const reason = dayErrs.map((e) => (e.message || e.code)).filter(Boolean).join(" / ") || "當天無可行組合";
+    html += `<tr class="row-failed">
+      <td ${resultColumnDataAttrs("date")}>${d.date || ""}</td>
+      <td class="weekday-cell" ${resultColumnDataAttrs("weekday")}>${weekdayLabel}</td>
+      <td ${resultColumnDataAttrs("people")}>${defaultPeople}</td>
+      <td ${resultColumnDataAttrs("main")}>${escapeHtml(mainName)}</td>
+      <td ${resultColumnDataAttrs("noodle")}><span class="warn">⚠️ 排程失敗</span>：${escapeHtml(reason)}</td>
+      <td ${resultColumnDataAttrs("side")}></td>
+      <td ${resultColumnDataAttrs("veg")}></td>
+      <td ${resultColumnDataAttrs("soup")}></td>
+      <td ${resultColumnDataAttrs("fruit")}></td>
+      <td ${resultColumnDataAttrs("cost")}>${d.day_cost ?? ""}</td>
+      <td ${resultColumnDataAttrs("fitness")}></td>
+    </tr>`;
+
+    const detailJson = dayErrs.length ? pretty(dayErrs) : pretty({ message: reason });
+    html += `<tr class="explain">
+      <td class="result-explain-cell" colspan="11">
+        <details open>
+          <summary>原因與建議</summary>
+          <pre class="pre">${escapeHtml(detailJson)}</pre>
+        </details>
+      </td>
+    </tr>`;
+    return html;
+  }
+
+  const mainObj = d.items?.main || {};
+  const mainObjs = Array.isArray(d.items?.mains) && d.items.mains.length ? d.items.mains : (mainObj?.id || mainObj?.name ? [mainObj] : []);
+  const noodleObj = d.items?.noodle || {};
+  const noodleObjs = Array.isArray(d.items?.noodles) && d.items.noodles.length ? d.items.noodles : (noodleObj?.id || noodleObj?.name ? [noodleObj] : []);
+  const sideObjs = d.items?.sides || [];
+  const vegObj = d.items?.veg || {};
+  const vegObjs = Array.isArray(d.items?.vegs) && d.items.vegs.length ? d.items.vegs : (vegObj?.id || vegObj?.name ? [vegObj] : []);
+  const soupObj = d.items?.soup || {};
+  const soupObjs = Array.isArray(d.items?.soups) && d.items.soups.length ? d.items.soups : (soupObj?.id || soupObj?.name ? [soupObj] : []);
+  const fruitObj = d.items?.fruit || {};
+  const fruitObjs = Array.isArray(d.items?.fruits) && d.items.fruits.length ? d.items.fruits : (fruitObj?.id || fruitObj?.name ? [fruitObj] : []);
+
+  const main = mainObjs.map((x) => x?.name).filter(Boolean).join("、");
+  const noodle = noodleObjs.map((x) => x?.name).filter(Boolean).join("、");
+  const sides = sideObjs.map((x) => x?.name).filter(Boolean).join("、");
+  const veg = vegObjs.map((x) => x?.name).filter(Boolean).join("、");
+  const soup = soupObjs.map((x) => x?.name).filter(Boolean).join("、");
+  const fruit = fruitObjs.map((x) => x?.name).filter(Boolean).join("、");
+  const cost = d.day_cost ?? "";
+  const rawScore = Number(d.score ?? 0);
+  const fitness = (d.score_fitness !== undefined && d.score_fitness !== null) ? Number(d.score_fitness) : -rawScore;
+
+  const mainCell = editable && isScheduled
+    ? editableRoleCell({ items: mainObjs, cfg, dateText: d.date, dayIndex, role: "main", fallbackCount: 1, emptyLabel: "主菜" })
+    : escapeHtml(main);
+
+  const noodleCell = editable && isScheduled
+    ? editableRoleCell({ items: noodleObjs, cfg, dateText: d.date, dayIndex, role: "noodle", fallbackCount: 0, emptyLabel: "麵食" })
+    : escapeHtml(noodle);
+
+  const sideSlotCount = editableRoleSlotCount(cfg, d.date, "side", 2);
+  const sideCell = editable && isScheduled
+    ? Array.from({ length: Math.max(sideObjs.length, sideSlotCount) }, (_, i) => {
+      const it = sideObjs[i] || {};
+      return renderEditableDish({
+        name: it?.name || `（選擇配菜${i + 1}）`,
+        dayIndex,
+        role: "side",
+        slot: `side_${i}`,
+        dishId: it?.id,
+      });
+    }).join("<span class=\"dish-sep\">、</span>")
+    : escapeHtml(sides);
+
+  const vegCell = editable && isScheduled
+    ? editableRoleCell({ items: vegObjs, cfg, dateText: d.date, dayIndex, role: "veg", fallbackCount: 1, emptyLabel: "純蔬" })
+    : escapeHtml(veg);
+
+  const soupCell = editable && isScheduled
+    ? editableRoleCell({ items: soupObjs, cfg, dateText: d.date, dayIndex, role: "soup", fallbackCount: 1, emptyLabel: "湯品" })
+    : escapeHtml(soup);
+
+  const fruitCell = editable && isScheduled
+    ? editableRoleCell({ items: fruitObjs, cfg, dateText: d.date, dayIndex, role: "fruit", fallbackCount: 1, emptyLabel: "水果" })
+    : escapeHtml(fruit);
+
+  const dayPeople = Number(peopleOverrides[d.date] ?? d.procurement?.people ?? defaultPeople);
+  const peopleCell = editable && isScheduled
+    ? `<input class="day-people-input" type="number" min="1" max="9999" data-date="${escapeHtml(d.date || "")}" value="${dayPeople}" title="可覆寫單日用餐人數" />`
+    : String(dayPeople);
+
+  html += `<tr>
+    <td ${resultColumnDataAttrs("date")}>${d.date}</td>
+    <td class="weekday-cell" ${resultColumnDataAttrs("weekday")}>${weekdayLabel}</td>
+    <td ${resultColumnDataAttrs("people")}>${peopleCell}</td>
+    <td ${resultColumnDataAttrs("main")}>${mainCell}</td>
+    <td ${resultColumnDataAttrs("noodle")}>${noodleCell}</td>
+    <td ${resultColumnDataAttrs("side")}>${sideCell}</td>
+    <td ${resultColumnDataAttrs("veg")}>${vegCell}</td>
+    <td ${resultColumnDataAttrs("soup")}>${soupCell}</td>
+    <td ${resultColumnDataAttrs("fruit")}>${fruitCell}</td>
+    <td ${resultColumnDataAttrs("cost")}>${cost}</td>
+    <td ${resultColumnDataAttrs("fitness")}><b>${fitness.toFixed(1)}</b></td>
+  </tr>`;
+
+  if (dayErrs.length > 0 || d.failed) {
+    const reason = dayErrs.map((e) => (e.message || e.code)).filter(Boolean).join(" / ") || d.message || "部分欄位未滿足限制";
+    const detailJson = dayErrs.length ? pretty(dayErrs) : pretty({ message: reason, reason_code: d.reason_code, details: d.details });
+    html += `<tr class="explain">
+      <td class="result-explain-cell" colspan="11">
+        <details open>
+          <summary>⚠️ 部分限制未滿足：${escapeHtml(reason)}</summary>
+          <pre class="pre">${escapeHtml(detailJson)}</pre>
+        </details>
+      </td>
+    </tr>`;
+  }
+
+  html += `<tr class="explain">
+    <td class="result-explain-cell" colspan="11">
+      <details class="day-explain" data-day-position="${idx}">
+        <summary>可解釋明細</summary>
+      </details>
+    </td>
+  </tr>`;
+  return html;
+}
+
+// 長天數結果分區塊繪製：只有接近視窗的區塊才建立表格列，其餘以等高的空白列佔位；
+// 捲離視窗（且沒有展開明細或正在輸入）的區塊會再換回佔位列，DOM 數量不隨天數成長。
+const RESULT_BLOCK_DAYS = 28;
+const RESULT_WINDOWING_MIN_DAYS = 60;
+const RESULT_INITIAL_BLOCKS = 2;
+const RESULT_WINDOW_MARGIN = "800px 0px";
+const ESTIMATED_DAY_HEIGHT_PX = 72;
+
+const resultView = {
+  days: [],
+  ctx: null,
+  observer: null,
+  // 區塊 index -> 已量到的高度；同一份結果重繪時沿用，捲動位置不會跳動
+  blockHeights: new Map(),
+  materialized: new Set(),
+  dayHeightPx: ESTIMATED_DAY_HEIGHT_PX,
+};
+
+function canWindowResult(dayCount) {
+  return dayCount >= RESULT_WINDOWING_MIN_DAYS && typeof IntersectionObserver !== "undefined";
+}
+
+function blockDays(blockIndex) {
+  const start = blockIndex * RESULT_BLOCK_DAYS;
+  return { start, days: resultView.days.slice(start, start + RESULT_BLOCK_DAYS) };
+}
+
+function renderBlockRows(blockIndex) {
+  const { start, days } = blockDays(blockIndex);
+  return days.map((d, i) => renderDayRows(d, start + i, resultView.ctx)).join("");
+}
+
+function renderBlockSpacer(blockIndex) {
+  const { days } = blockDays(blockIndex);
+  const height = resultView.blockHeights.get(blockIndex) ?? Math.round(days.length * resultView.dayHeightPx);
+  return `<tr class="result-block-spacer"><td colspan="11" style="height:${height}px"></td></tr>`;
+}
+
+function renderDayBlocks(days, ctx) {
+  const sameShape = resultView.days.length === days.length;
+  resultView.days = days;
+  resultView.ctx = ctx;
+  if (!sameShape) {
+    resultView.blockHeights.clear();
+    resultView.materialized.clear();
+  }
+
+  if (!canWindowResult(days.length)) {
+    resultView.materialized.clear();
+    return `<tbody>${days.map((d, idx) => renderDayRows(d, idx, ctx)).join("")}</tbody>`;
+  }
+
+  const blockCount = Math.ceil(days.length / RESULT_BLOCK_DAYS);
+  const eager = new Set(resultView.materialized);
+  for (let i = 0; i < Math.min(RESULT_INITIAL_BLOCKS, blockCount); i += 1) eager.add(i);
+  resultView.materialized = eager;
+
+  return Array.from({ length: blockCount }, (_, k) => {
+    const isEager = eager.has(k);
+    const cls = isEager ? "result-day-block" : "result-day-block is-placeholder";
+    return `<tbody class="${cls}" data-block="${k}">${isEager ? renderBlockRows(k) : renderBlockSpacer(k)}</tbody>`;
+  }).join("");
+}
+
+function materializeBlock(root, tbody) {
+  const k = Number(tbody.dataset.block);
+  tbody.innerHTML = renderBlockRows(k);
+  tbody.classList.remove("is-placeholder");
+  resultView.materialized.add(k);
+  applyResultColumnVisibility(tbody, root);
+  const { days } = blockDays(k);
+  const height = tbody.getBoundingClientRect().height;
+  if (height > 0 && days.length) {
+    resultView.blockHeights.set(k, height);
+    resultView.dayHeightPx = height / days.length;
+  }
+}
+
+function releaseBlock(tbody) {
+  if (tbody.querySelector("details.day-explain[open]") || tbody.contains(document.activeElement)) return;
+  const k = Number(tbody.dataset.block);
+  const height = tbody.getBoundingClientRect().height;
+  if (height > 0) resultView.blockHeights.set(k, height);
+  tbody.innerHTML = renderBlockSpacer(k);
+  tbody.classList.add("is-placeholder");
+  resultView.materialized.delete(k);
+}
+
+function onDayExplainToggle(event) {
+  const details = event.target;
+  if (!details?.classList?.contains("day-explain") || !details.open || details.dataset.filled) return;
+  const day = resultView.days[Number(details.dataset.dayPosition)];
+  if (!day) return;
+  details.insertAdjacentHTML("beforeend", renderDayExplain(day, resultView.ctx?.cfg));
+  details.dataset.filled = "1";
+}
+
+function bindResultWindowing() {
+  if (typeof document === "undefined") return;
+  const root = document.querySelector(DOM.result);
+  if (!root) return;
+  if (!root.dataset.dayExplainBound) {
+    // toggle 不會冒泡，以 capture 監聽整個結果區（重繪後仍有效）
+    root.addEventListener("toggle", onDayExplainToggle, true);
+    root.dataset.dayExplainBound = "1";
+  }
+
+  if (resultView.observer) resultView.observer.disconnect();
+  resultView.observer = null;
+  const blocks = root.querySelectorAll("tbody.result-day-block");
+  if (!blocks.length) return;
+
+  resultView.observer = new IntersectionObserver((entries) => {
+    entries.forEach((entry) => {
+      const tbody = entry.target;
+      const isPlaceholder = tbody.classList.contains("is-placeholder");
+      if (entry.isIntersecting && isPlaceholder) materializeBlock(root, tbody);
+      else if (!entry.isIntersecting && !isPlaceholder) releaseBlock(tbody);
+    });
+  }, { rootMargin: RESULT_WINDOW_MARGIN });
+  blocks.forEach((tbody) => resultView.observer.observe(tbody));
+}
+
 export function renderResult(result, cfg, options = {}) {
   const editable = !!options.editable;
   const errByDay = new Map();
@@ -280,204 +605,80 @@ export function renderResult(result, cfg, options = {}) {
     <colgroup>${colgroup}</colgroup>
     <thead>
       <tr>${headCells}</tr>
-    </thead>
-    <tbody>`;
-
-  days.forEach((d, idx) => {
-    const dayIndex = d.day_index ?? idx;
-    const isScheduled = (d.is_scheduled !== undefined && d.is_scheduled !== null) ? !!d.is_scheduled : true;
-    const dayErrs = errByDay.get(dayIndex) || [];
-    const isFailed = shouldRenderFailedRow(d, dayErrs);
-
-    const weekdayLabel = weekdayShortLabelFromDateString(d.date);
-    const isWeekend = isWeekendDateString(d.date);
-
-    if (!isScheduled) {
-      const offdayClass = isWeekend ? "row-offday row-weekend-offday" : "row-offday";
-      html += `<tr class="${offdayClass}">
-        <td ${resultColumnDataAttrs("date")}>${d.date || ""}</td>
-        <td class="weekday-cell" ${resultColumnDataAttrs("weekday")}>${weekdayLabel}</td>
-        <td ${resultColumnDataAttrs("people")}></td>
-        <td ${resultColumnDataAttrs("main")}><span class="muted">免排日（依排程設定）</span></td>
-        <td ${resultColumnDataAttrs("noodle")}></td>
-        <td ${resultColumnDataAttrs("side")}></td>
-        <td ${resultColumnDataAttrs("veg")}></td>
-        <td ${resultColumnDataAttrs("soup")}></td>
-        <td ${resultColumnDataAttrs("fruit")}></td>
-        <td ${resultColumnDataAttrs("cost")}></td>
-        <td ${resultColumnDataAttrs("fitness")}></td>
-      </tr>`;
-      return;
-    }
+    </thead>`;
 
-    if (isFailed) {
-      const mainName = d.items?.main?.name || "(主菜已排但明細不足)";
-      const reason = dayErrs.map((e) => (e.message || e.code)).filter(Boolean).join(" / ") || "當天無可行組合";
-      html += `<tr class="row-failed">
-        <td ${resultColumnDataAttrs("date")}>${d.date || ""}</td>
-        <td class="weekday-cell" ${resultColumnDataAttrs("weekday")}>${weekdayLabel}</td>
-        <td ${resultColumnDataAttrs("people")}>${defaultPeople}</td>
-        <td ${resultColumnDataAttrs("main")}>${escapeHtml(mainName)}</td>
-        <td ${resultColumnDataAttrs("noodle")}><span class="warn">⚠️ 排程失敗</span>：${escapeHtml(reason)}</td>
-        <td ${resultColumnDataAttrs("side")}></td>
-        <td ${resultColumnDataAttrs("veg")}></td>
-        <td ${resultColumnDataAttrs("soup")}></td>
-        <td ${resultColumnDataAttrs("fruit")}></td>
-        <td ${resultColumnDataAttrs("cost")}>${d.day_cost ?? ""}</td>
-        <td ${resultColumnDataAttrs("fitness")}></td>
-      </tr>`;
-
-      const detailJson = dayErrs.length ? pretty(dayErrs) : pretty({ message: reason });
-      html += `<tr class="explain">
-        <td class="result-explain-cell" colspan="11">
-          <details open>
-            <summary>原因與建議</summary>
-            <pre class="pre">${escapeHtml(detailJson)}</pre>
-          </details>
-        </td>
-      </tr>`;
-      return;
-    }
+  const ctx = { cfg, editable, errByDay, defaultPeople, peopleOverrides };
+  html += renderDayBlocks(days, ctx);
+  html += "</table>";
+  $(DOM.result).html(html);
+  bindResultColumnControls();
+  bindResultWindowing();
+}
 
-    const mainObj = d.items?.main || {};
-    const mainObjs = Array.isArray(d.items?.mains) && d.items.mains.length ? d.items.mains : (mainObj?.id || mainObj?.name ? [mainObj] : []);
-    const noodleObj = d.items?.noodle || {};
-    const noodleObjs = Array.isArray(d.items?.noodles) && d.items.noodles.length ? d.items.noodles : (noodleObj?.id || noodleObj?.name ? [noodleObj] : []);
-    const sideObjs = d.items?.sides || [];
-    const vegObj = d.items?.veg || {};
-    const vegObjs = Array.isArray(d.items?.vegs) && d.items.vegs.length ? d.items.vegs : (vegObj?.id || vegObj?.name ? [vegObj] : []);
-    const soupObj = d.items?.soup || {};
-    const soupObjs = Array.isArray(d.items?.soups) && d.items.soups.length ? d.items.soups : (soupObj?.id || soupObj?.name ? [soupObj] : []);
-    const fruitObj = d.items?.fruit || {};
-    const fruitObjs = Array.isArray(d.items?.fruits) && d.items.fruits.length ? d.items.fruits : (fruitObj?.id || fruitObj?.name ? [fruitObj] : []);
-
-    const main = mainObjs.map((x) => x?.name).filter(Boolean).join("、");
-    const noodle = noodleObjs.map((x) => x?.name).filter(Boolean).join("、");
-    const sides = sideObjs.map((x) => x?.name).filter(Boolean).join("、");
-    const veg = vegObjs.map((x) => x?.name).filter(Boolean).join("、");
-    const soup = soupObjs.map((x) => x?.name).filter(Boolean).join("、");
-    const fruit = fruitObjs.map((x) => x?.name).filter(Boolean).join("、");
-    const cost = d.day_cost ?? "";
-    const rawScore = Number(d.score ?? 0);
-    const fitness = (d.score_fitness !== undefined && d.score_fitness !== null) ? Number(d.score_fitness) : -rawScore;
-
-    const mainCell = editable && isScheduled
-      ? editableRoleCell({ items: mainObjs, cfg, dateText: d.date, dayIndex, role: "main", fallbackCount: 1, emptyLabel: "主菜" })
-      : escapeHtml(main);
-
-    const noodleCell = editable && isScheduled
-      ? editableRoleCell({ items: noodleObjs, cfg, dateText: d.date, dayIndex, role: "noodle", fallbackCount: 0, emptyLabel: "麵食" })
-      : escapeHtml(noodle);
-
-    const sideSlotCount = editableRoleSlotCount(cfg, d.date, "side", 2);
-    const sideCell = editable && isScheduled
-      ? Array.from({ length: Math.max(sideObjs.length, sideSlotCount) }, (_, i) => {
-        const it = sideObjs[i] || {};
-        return renderEditableDish({
-          name: it?.name || `（選擇配菜${i + 1}）`,
-          dayIndex,
-          role: "side",
-          slot: `side_${i}`,
-          dishId: it?.id,
-        });
-      }).join("<span class=\"dish-sep\">、</span>")
-      : escapeHtml(sides);
-
-    const vegCell = editable && isScheduled
-      ? editableRoleCell({ items: vegObjs, cfg, dateText: d.date, dayIndex, role: "veg", fallbackCount: 1, emptyLabel: "純蔬" })
-      : escapeHtml(veg);
-
-    const soupCell = editable && isScheduled
-      ? editableRoleCell({ items: soupObjs, cfg, dateText: d.date, dayIndex, role: "soup", fallbackCount: 1, emptyLabel: "湯品" })
-      : escapeHtml(soup);
-
-    const fruitCell = editable && isScheduled
-      ? editableRoleCell({ items: fruitObjs, cfg, dateText: d.date, dayIndex, role: "fruit", fallbackCount: 1, emptyLabel: "水果" })
-      : escapeHtml(fruit);
-
-    const dayPeople = Number(peopleOverrides[d.date] ?? d.procurement?.people ?? defaultPeople);
-    const peopleCell = editable && isScheduled
-      ? `<input class="day-people-input" type="number" min="1" max="9999" data-date="${escapeHtml(d.date || "")}" value="${dayPeople}" title="可覆寫單日用餐人數" />`
-      : String(dayPeople);
-
-    html += `<tr>
-      <td ${resultColumnDataAttrs("date")}>${d.date}</td>
-      <td class="weekday-cell" ${resultColumnDataAttrs("weekday")}>${weekdayLabel}</td>
-      <td ${resultColumnDataAttrs("people")}>${peopleCell}</td>
-      <td ${resultColumnDataAttrs("main")}>${mainCell}</td>
-      <td ${resultColumnDataAttrs("noodle")}>${noodleCell}</td>
-      <td ${resultColumnDataAttrs("side")}>${sideCell}</td>
-      <td ${resultColumnDataAttrs("veg")}>${vegCell}</td>
-      <td ${resultColumnDataAttrs("soup")}>${soupCell}</td>
-      <td ${resultColumnDataAttrs("fruit")}>${fruitCell}</td>
-      <td ${resultColumnDataAttrs("cost")}>${cost}</td>
-      <td ${resultColumnDataAttrs("fitness")}><b>${fitness.toFixed(1)}</b></td>
-    </tr>`;
+function placeholderDayFromMain(d) {
+  const main = d?.main || {};
+  return {
+    date: d?.date,
+    day_index: d?.day_index,
+    is_scheduled: d?.is_scheduled,
+    items: { main, mains: main?.id ? [main] : [] },
+  };
+}
 
-    if (dayErrs.length > 0 || d.failed) {
-      const reason = dayErrs.map((e) => (e.message || e.code)).filter(Boolean).join(" / ") || d.message || "部分欄位未滿足限制";
-      const detailJson = dayErrs.length ? pretty(dayErrs) : pretty({ message: reason, reason_code: d.reason_code, details: d.details });
-      html += `<tr class="explain">
-        <td class="result-explain-cell" colspan="11">
-          <details open>
-            <summary>⚠️ 部分限制未滿足：${escapeHtml(reason)}</summary>
-            <pre class="pre">${escapeHtml(detailJson)}</pre>
-          </details>
-        </td>
-      </tr>`;
+// 串流排程時逐步繪製暫定結果：mains 事件先畫出主菜，day 事件逐日補齊；
+// 重繪以 requestAnimationFrame 合併，stop() 後不再覆寫最終結果。
+export function createStreamingPainter(cfg) {
+  const progress = { days: [], filled: 0, total: 0 };
+  let pending = false;
+  let stopped = false;
+
+  const paint = () => {
+    pending = false;
+    if (stopped) return;
+    const days = progress.days.filter(Boolean);
+    const totalCost = days.reduce((acc, d) => acc + (Number(d.day_cost) || 0), 0);
+    const totalScore = days.reduce((acc, d) => acc + (Number(d.score) || 0), 0);
+    renderResult({
+      summary: {
+        days: days.length,
+        total_cost: totalCost.toFixed(2),
+        avg_cost_per_day: (totalCost / Math.max(days.length, 1)).toFixed(2),
+        total_score: totalScore,
+      },
+      days,
+      errors: [],
+    }, cfg, { editable: false });
+    $(DOM.result).prepend(`<div class="muted stream-progress">排程中：已完成 ${progress.filled}/${progress.total} 天（暫定結果，完成後可能微調）</div>`);
+  };
+
+  const schedule = () => {
+    if (pending || stopped) return;
+    pending = true;
+    if (typeof window !== "undefined" && window.requestAnimationFrame) {
+      window.requestAnimationFrame(paint);
+    } else {
+      setTimeout(paint, 16);
     }
-
-    const breakdown = d.score_breakdown || {};
-    const sum = summarizeBreakdown(breakdown);
-    const entries = Object.entries(breakdown)
-      .map(([k, v]) => {
-        const vv = Number(v) || 0;
-        return {
-          key: k,
-          label: scoreLabel(k),
-          value: vv,
-          abs: Math.abs(vv).toFixed(2),
-          isBonus: vv < 0,
-          reason: scoreReason(k, vv, d, cfg),
-        };
-      })
-      .sort((a, b) => Math.abs(b.value) - Math.abs(a.value));
-
-    const bRows = entries.map((e) => {
-      const tag = e.isBonus ? "加分" : "扣分";
-      const cls = e.isBonus ? "good" : "bad";
-      const reasonTxt = e.reason ? `<span class="meta">（${escapeHtml(e.reason)}）</span>` : "";
-      return `<div class="bd ${cls}">
-        <span>${escapeHtml(e.label)}${reasonTxt}</span>
-        <span class="v">${tag} ${e.abs}</span>
-      </div>`;
-    }).join("");
-
-    const daySummary = `今日小結：加分 ${sum.bonus.toFixed(1)} ／ 扣分 ${sum.penalty.toFixed(1)} ／ 原始 ${sum.raw.toFixed(1)}（目標匹配度 ${sum.fitness.toFixed(1)}）`;
-
-    html += `<tr class="explain">
-      <td class="result-explain-cell" colspan="11">
-        <details>
-          <summary>可解釋明細</summary>
-          <div class="explain-box">
-            <div class="ex-title">${escapeHtml(daySummary)}</div>
-            <div class="ex-title">打分拆解（影響大 → 小）</div>
-            <div class="bd-list">${bRows || "<div class='muted'>（無）</div>"}</div>
-            ${renderProcurementDetail(d)}
-            <div class="ex-title">庫存使用（ID）</div>
-            <pre class="pre">${escapeHtml(pretty({
-              main: d.items?.main?.used_inventory_ingredients,
-              soup: d.items?.soup?.used_inventory_ingredients,
-              veg: d.items?.veg?.used_inventory_ingredients,
-              sides: (d.items?.sides || []).map((x) => x?.used_inventory_ingredients),
-            }))}</pre>
-          </div>
-        </details>
-      </td>
-    </tr>`;
-  });
-
-  html += "</tbody></table>";
-  $(DOM.result).html(html);
-  bindResultColumnControls();
+  };
+
+  return {
+    onEvent(event) {
+      if (event.event === "mains") {
+        progress.days = (event.days || []).map(placeholderDayFromMain);
+        progress.total = progress.days.length;
+        progress.filled = 0;
+        setMsg(event.attempt ? `湯品限制自動放寬後重新排程（第 ${event.attempt} 次）…` : "主菜已排定，逐日填菜中…");
+        schedule();
+      } else if (event.event === "day" && event.day) {
+        progress.days[event.day.day_index] = event.day;
+        progress.filled = event.day.day_index + 1;
+        schedule();
+      } else if (event.event === "stage" && event.stage === "local_search") {
+        setMsg("局部搜尋優化中…");
+      }
+    },
+    stop() {
+      stopped = true;
+    },
+  };
 }
@@ -13,3 +13,72 @@ export function setCatalogCache(cache, ingredients, dishes) {
   cache.ingById = new Map(cache.ingredients.map((x) => [x.id, x]));
   cache.dishById = new Map(cache.dishes.map((x) => [x.id, x]));
 }
+
+// ---------- 持久化目錄快取（IndexedDB + /catalog/changes 增量同步） ----------
+
+const CATALOG_DB_NAME = "menu-planner-catalog";
+const CATALOG_STORE_NAME = "catalog";
+const CATALOG_RECORD_KEY = "current";
+
+function mergeRows(rows, upserts, deletedIds, order) {
+  const byId = new Map((rows || []).map((x) => [x.id, x]));
+  (deletedIds || []).forEach((id) => byId.delete(id));
+  (upserts || []).forEach((x) => byId.set(x.id, x));
+  if (Array.isArray(order)) return order.map((id) => byId.get(id)).filter(Boolean);
+  return Array.from(byId.values());
+}
+
+// stored：{ revision, ingredients, dishes }（可為 null）；changes：GET /catalog/changes 的回應
+export function applyCatalogChanges(stored, changes) {
+  if (changes?.reset || !stored) {
+    return {
+      revision: changes?.revision || "",
+      ingredients: Array.isArray(changes?.ingredients) ? changes.ingredients : [],
+      dishes: Array.isArray(changes?.dishes) ? changes.dishes : [],
+    };
+  }
+  return {
+    revision: changes.revision || "",
+    ingredients: mergeRows(stored.ingredients, changes.ingredients, changes.deleted_ingredients, changes.ingredient_order),
+    dishes: mergeRows(stored.dishes, changes.dishes, changes.deleted_dishes, changes.dish_order),
+  };
+}
+
+// store：{ get(), put(record) }（openCatalogStore 的回傳值；null 表示不持久化）
+// fetchChanges(since)：回傳 /catalog/changes 的 JSON
+export async function syncCatalog({ store, fetchChanges }) {
+  const stored = store ? await store.get().catch(() => null) : null;
+  const since = stored?.revision || "";
+  const changes = await fetchChanges(since);
+  const merged = applyCatalogChanges(stored, changes);
+  if (store && merged.revision && merged.revision !== since) {
+    // 寫入失敗（例如無痕模式空間不足）不影響本次載入
+    await store.put(merged).catch(() => {});
+  }
+  return merged;
+}
+
+function idbRequest(req) {
+  return new Promise((resolve, reject) => {
+    req.onsuccess = () => resolve(req.result);
+    req.onerror = () => reject(req.error);
+  });
+}
+
+// 瀏覽器不支援或開啟失敗時回傳 null（退回每次完整載入）
+export async function openCatalogStore(indexedDBImpl = globalThis.indexedDB) {
+  if (!indexedDBImpl) return null;
+  let db;
+  try {
+    const req = indexedDBImpl.open(CATALOG_DB_NAME, 1);
+    req.onupgradeneeded = () => req.result.createObjectStore(CATALOG_STORE_NAME);
+    db = await idbRequest(req);
+  } catch {
+    return null;
+  }
+  const run = (mode, fn) => idbRequest(fn(db.transaction(CATALOG_STORE_NAME, mode).objectStore(CATALOG_STORE_NAME)));
+  return {
+    get: () => run("readonly", (s) => s.get(CATALOG_RECORD_KEY)).then((x) => x || null),
+    put: (record) => run("readwrite", (s) => s.put(record, CATALOG_RECORD_KEY)),
+  };
+}
@@ -0,0 +1,36 @@
+// 精簡結果格式（?format=compact）還原：items 內的菜色 id 換回 dishes 的紀錄、採購明細索引換回 procurement_rows
+// 與 api/result_compact.py 的 expand_result 對應；展開後共用的紀錄視為唯讀
+
+function expandDish(value, dishes) {
+  return typeof value === "string" ? dishes[value] ?? value : value;
+}
+
+export function expandCompactDays(days, dishes = {}, rows = []) {
+  return (Array.isArray(days) ? days : []).map((day) => {
+    if (!day || typeof day !== "object") return day;
+    const out = { ...day };
+    if (day.items && typeof day.items === "object") {
+      out.items = Object.fromEntries(
+        Object.entries(day.items).map(([slot, value]) => [
+          slot,
+          Array.isArray(value) ? value.map((x) => expandDish(x, dishes)) : expandDish(value, dishes),
+        ]),
+      );
+    }
+    if (Array.isArray(day.procurement?.dishes)) {
+      out.procurement = {
+        ...day.procurement,
+        dishes: day.procurement.dishes.map((d) =>
+          Number.isInteger(d?.ingredients) ? { ...d, ingredients: rows[d.ingredients] ?? [] } : d,
+        ),
+      };
+    }
+    return out;
+  });
+}
+
+export function expandCompactResult(result) {
+  if (!result || result.format !== "compact") return result;
+  const { format: _format, dishes = {}, procurement_rows: rows = [], days, ...rest } = result;
+  return { ...rest, days: expandCompactDays(days, dishes, rows) };
+}
@@ -6,6 +6,8 @@ export function createAppState() {
     ...createCatalogCache(),
     lastCfg: null,
     lastResult: null,
+    // 伺服器暫存的 enrich 結果 token；有值時手動調整只同步改到的日子
+    resultToken: null,
   };
 }
 
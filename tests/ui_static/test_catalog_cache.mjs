@@ -0,0 +1,60 @@
+import test from "node:test";
+import assert from "node:assert/strict";
+
+import { applyCatalogChanges, openCatalogStore, syncCatalog } from "../../src/menu_planner/ui_static/shared/catalog_cache.js";
+
+const ing = (id, name = id) => ({ id, name, category: "veg", protein_group: null, default_unit: "g" });
+const dish = (id, role = "main") => ({ id, name: id, role, tags: [] });
+
+function memoryStore(record = null) {
+  const puts = [];
+  return {
+    puts,
+    get: async () => record,
+    put: async (next) => {
+      record = next;
+      puts.push(next);
+    },
+  };
+}
+
+test("applyCatalogChanges: reset replaces rows; deltas merge upserts, deletions and order", () => {
+  const full = applyCatalogChanges(null, { revision: "c1-x", reset: true, ingredients: [ing("a"), ing("b")], dishes: [dish("m1")] });
+  assert.deepEqual(full, { revision: "c1-x", ingredients: [ing("a"), ing("b")], dishes: [dish("m1")] });
+
+  const merged = applyCatalogChanges(full, {
+    revision: "c2-x",
+    reset: false,
+    ingredients: [ing("b", "青江菜"), ing("c")],
+    dishes: [],
+    deleted_ingredients: ["a"],
+    deleted_dishes: [],
+    ingredient_order: ["c", "b"],
+  });
+  assert.equal(merged.revision, "c2-x");
+  assert.deepEqual(merged.ingredients, [ing("c"), ing("b", "青江菜")]);
+  assert.deepEqual(merged.dishes, [dish("m1")]);
+});
+
+test("syncCatalog: sends stored revision and persists only when it changes", async () => {
+  const store = memoryStore({ revision: "c1-x", ingredients: [ing("a")], dishes: [dish("m1")] });
+  const seen = [];
+  const unchanged = { revision: "c1-x", reset: false, ingredients: [], dishes: [], deleted_ingredients: [], deleted_dishes: [] };
+
+  const out = await syncCatalog({ store, fetchChanges: async (since) => (seen.push(since), unchanged) });
+  assert.deepEqual(seen, ["c1-x"]);
+  assert.deepEqual(out.ingredients, [ing("a")]);
+  assert.equal(store.puts.length, 0);
+
+  const next = await syncCatalog({
+    store,
+    fetchChanges: async () => ({ ...unchanged, revision: "c2-x", dishes: [dish("s1", "side")], dish_order: ["m1", "s1"] }),
+  });
+  assert.deepEqual(next.dishes, [dish("m1"), dish("s1", "side")]);
+  assert.equal(store.puts.length, 1);
+
+  // 沒有 IndexedDB 時不持久化，照常回傳完整資料
+  assert.equal(await openCatalogStore(undefined), null);
+  const plain = await syncCatalog({ store: null, fetchChanges: async () => ({ revision: "c3-x", reset: true, ingredients: [ing("a")], dishes: [] }) });
+  assert.deepEqual(plain.ingredients, [ing("a")]);
+});
@@ -0,0 +1,65 @@
+import test from "node:test";
+import assert from "node:assert/strict";
+
+import { createStreamingPainter } from "../../src/menu_planner/ui_static/render.js";
+
+function mockJquery() {
+  const dom = { html: "", prepended: "", msg: "" };
+  global.$ = (selector) => ({
+    html(value) {
+      dom.html = String(value || "");
+      dom.prepended = "";
+    },
+    prepend(value) {
+      dom.prepended = String(value || "");
+    },
+    text(value) {
+      dom.msg = String(value || "");
+      return { toggleClass() {} };
+    },
+    selector,
+  });
+  return dom;
+}
+
+const tick = () => new Promise((resolve) => setTimeout(resolve, 30));
+
+test("createStreamingPainter: paints mains first, then filled days, and stops before final render", async () => {
+  const dom = mockJquery();
+  const painter = createStreamingPainter({ people: 10 });
+
+  painter.onEvent({
+    event: "mains",
+    attempt: 0,
+    days: [
+      { date: "2026-03-02", day_index: 0, is_scheduled: true, main: { id: "m1", name: "主菜A" } },
+      { date: "2026-03-03", day_index: 1, is_scheduled: true, main: { id: "m2", name: "主菜B" } },
+    ],
+  });
+  await tick();
+  assert.match(dom.html, /主菜A/);
+  assert.match(dom.html, /主菜B/);
+  assert.match(dom.prepended, /0\/2/);
+  assert.match(dom.msg, /主菜已排定/);
+
+  painter.onEvent({
+    event: "day",
+    provisional: true,
+    day: {
+      date: "2026-03-02",
+      day_index: 0,
+      is_scheduled: true,
+      items: { main: { id: "m1", name: "主菜A" }, sides: [{ id: "s1", name: "配菜A" }] },
+      day_cost: 12.5,
+      score: -3,
+    },
+  });
+  await tick();
+  assert.match(dom.html, /配菜A/);
+  assert.match(dom.prepended, /1\/2/);
+
+  painter.onEvent({ event: "day", day: { date: "2026-03-03", day_index: 1, items: { sides: [{ name: "配菜B" }] } } });
+  painter.stop();
+  await tick();
+  assert.doesNotMatch(dom.html, /配菜B/);
+});
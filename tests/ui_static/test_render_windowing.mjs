@@ -0,0 +1,66 @@
+import test from "node:test";
+import assert from "node:assert/strict";
+
+import { renderDayExplain, renderResult } from "../../src/menu_planner/ui_static/render.js";
+
+function captureHtml() {
+  const out = { html: "" };
+  global.$ = () => ({
+    html(value) {
+      out.html = String(value || "");
+    },
+  });
+  return out;
+}
+
+function longResult(dayCount) {
+  const days = Array.from({ length: dayCount }, (_, i) => ({
+    day_index: i,
+    date: `2026-01-${String((i % 28) + 1).padStart(2, "0")}`,
+    is_scheduled: true,
+    items: { main: { id: `m${i}`, name: `主菜${i}號` }, sides: [] },
+    day_cost: 10,
+    score: 1,
+    score_breakdown: { cost_over_max: 1.5, inventory_bonus: -0.5 },
+    procurement: {
+      people: 10,
+      day_total: 12,
+      dishes: [{ dish_name: `主菜${i}號`, ingredients: [{ ingredient_name: "高麗菜", qty_for_people: 100, qty_unit: "g" }] }],
+    },
+  }));
+  return { summary: { days: dayCount, total_cost: 0, avg_cost_per_day: 0, total_score: 0 }, days, errors: [] };
+}
+
+test("renderResult: long plans render only the first blocks and defer per-day explanations", () => {
+  const out = captureHtml();
+  global.IntersectionObserver = class {};
+  try {
+    renderResult(longResult(120), { people: 10 }, { editable: false });
+  } finally {
+    delete global.IntersectionObserver;
+  }
+
+  assert.equal((out.html.match(/<tbody class="result-day-block" data-block="\d+">/g) || []).length, 2);
+  assert.equal((out.html.match(/<tbody class="result-day-block is-placeholder"/g) || []).length, 3);
+  assert.match(out.html, /主菜0號/);
+  assert.match(out.html, /主菜55號/);
+  assert.doesNotMatch(out.html, /主菜56號/);
+  assert.match(out.html, /<details class="day-explain" data-day-position="55">\s*<summary>可解釋明細<\/summary>\s*<\/details>/);
+  assert.doesNotMatch(out.html, /打分拆解/);
+});
+
+test("renderResult: short plans and environments without IntersectionObserver render every day", () => {
+  const out = captureHtml();
+  renderResult(longResult(120), { people: 10 }, { editable: false });
+  assert.match(out.html, /主菜119號/);
+  assert.doesNotMatch(out.html, /is-placeholder/);
+});
+
+test("renderDayExplain: builds breakdown and procurement detail on demand", () => {
+  const day = longResult(1).days[0];
+  const html = renderDayExplain(day, { people: 10 });
+  assert.match(html, /打分拆解（影響大 → 小）/);
+  assert.match(html, /扣分 1\.50/);
+  assert.match(html, /採買估算（依人數 10，日小計 12）/);
+  assert.match(html, /高麗菜/);
+});
@@ -0,0 +1,37 @@
+import test from "node:test";
+import assert from "node:assert/strict";
+
+import { expandCompactDays, expandCompactResult } from "../../src/menu_planner/ui_static/shared/result_compact.js";
+
+const dish = (id, cost = 1) => ({ id, name: id, role: "main", cost });
+const rows = [[{ ingredient_id: "ing_a", qty_for_people: 100 }], [{ ingredient_id: "ing_b", qty_for_people: 50 }]];
+
+test("expandCompactResult: restores dish records and procurement rows", () => {
+  const compact = {
+    ok: true,
+    format: "compact",
+    summary: { days: 2 },
+    dishes: { m1: dish("m1"), m2: dish("m2") },
+    procurement_rows: rows,
+    days: [
+      { day_index: 0, items: { main: "m1", mains: ["m1"], sides: [] }, procurement: { dishes: [{ dish_id: "m1", ingredients: 0 }] } },
+      { day_index: 1, items: { main: dish("m1", 9), mains: ["m2"] }, procurement: { dishes: [{ dish_id: "m2", ingredients: 1 }] } },
+    ],
+  };
+
+  const out = expandCompactResult(compact);
+
+  assert.equal(out.format, undefined);
+  assert.equal(out.dishes, undefined);
+  assert.deepEqual(out.summary, { days: 2 });
+  assert.deepEqual(out.days[0].items.main, dish("m1"));
+  assert.deepEqual(out.days[0].items.mains, [dish("m1")]);
+  assert.deepEqual(out.days[1].items.main, dish("m1", 9));
+  assert.deepEqual(out.days[1].procurement.dishes[0].ingredients, rows[1]);
+});
+
+test("expandCompactResult: leaves full results untouched", () => {
+  const full = { ok: true, days: [{ items: { main: dish("m1") } }] };
+  assert.equal(expandCompactResult(full), full);
+  assert.deepEqual(expandCompactDays(full.days), full.days);
+});
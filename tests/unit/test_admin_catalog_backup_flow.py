@@ -650,3 +650,35 @@ def test_rename_dish_same_id_does_not_trigger_backup(monkeypatch):
     assert ex.value.status_code == 400
     assert calls["backup"] == 0
     assert _FakeRepo.rename_dishes == []
+
+
+def test_backup_before_modify_coalesces_edits_and_manual_backup_waits(monkeypatch, tmp_path):
+    import sqlite3
+
+    from src.menu_planner.db.backup import CoalescedBackupScheduler
+
+    db = tmp_path / "menu.db"
+    with sqlite3.connect(db) as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+    conn.close()
+    scheduler = CoalescedBackupScheduler(window_seconds=600)
+    monkeypatch.setattr(admin_catalog, "PRE_MODIFY_BACKUPS", scheduler)
+    coalesced = admin_catalog.BACKUP_COALESCED.value()
+
+    admin_catalog.backup_before_modify(str(db), reason="ingredient_upsert")
+    admin_catalog.backup_before_modify(str(db), reason="ingredient_upsert")
+    assert admin_catalog.BACKUP_COALESCED.value() == coalesced + 1
+    assert scheduler._windows[str(db.resolve())].wait(timeout=10) is not None
+
+    admin_catalog.create_manual_db_backup(
+        admin_catalog.BackupCreateIn(reason="manual_snapshot", comment=""),
+        db_path=str(db),
+    )
+    # 手動備份不合併，回應前已寫好
+    rows = admin_catalog.list_db_backups(db_path=str(db))
+    assert [row["action_reason"] for row in rows].count("manual_snapshot") == 1
+    assert len(rows) == 2
+
+    with pytest.raises(HTTPException) as ex:
+        admin_catalog.backup_before_modify(str(tmp_path / "missing.db"))
+    assert ex.value.status_code == 500
@@ -0,0 +1,40 @@
+import sqlite3
+
+from benchmarks.catalog_generator import CatalogSpec, build_catalog_db, generate_dataset, load_template
+from benchmarks.plan_bench import Scenario, compare_results, run_scenario
+
+
+def test_generator_scales_template_deterministically_and_db_plans(tmp_path):
+    spec = CatalogSpec(dishes_per_role=12, ingredients=60, price_days=5, inventory_density=0.5)
+    template = load_template()
+    first = generate_dataset(template, spec)
+    assert first == generate_dataset(template, spec)
+    assert len(first["ingredients"]) == 60
+
+    db_path = build_catalog_db(spec, tmp_path / "bench.db", template=template)
+    with sqlite3.connect(db_path) as conn:
+        roles = dict(conn.execute("SELECT role, COUNT(*) FROM dishes GROUP BY role").fetchall())
+        price_dates = conn.execute("SELECT COUNT(DISTINCT price_date) FROM ingredient_prices").fetchone()[0]
+    assert roles == {role: 12 for role in ("main", "noodle", "side", "veg", "soup", "fruit")}
+    assert price_dates == 5
+
+    res = run_scenario(str(db_path), Scenario("h5", 5, beam_width=4, roles="light"), spec.start_date, repeat=2)
+    assert res["ok"] and res["days"] == 5
+    assert len(res["total_ms"]["runs"]) == 2
+    assert "mains" in res["spans"]
+
+
+def _result(total, mains, errors=0):
+    return {"scenarios": {"h30": {"total_ms": {"median": total}, "spans": {"mains": mains}, "errors": errors}}}
+
+
+def test_compare_flags_slowdowns_above_threshold_and_new_errors():
+    baseline = _result(1000.0, 400.0)
+    # 比例與絕對差距都要超過門檻才算退步
+    assert compare_results(_result(1200.0, 410.0), baseline, threshold=0.25) == []
+    assert compare_results(_result(12.0, 1.0), _result(5.0, 0.5), threshold=0.25, min_delta_ms=20) == []
+
+    regressions = compare_results(_result(1400.0, 400.0, errors=1), baseline, threshold=0.25)
+    assert {r["metric"] for r in regressions} == {"total", "errors"}
+    # baseline 沒有的情境不比較
+    assert compare_results({"scenarios": {"h720": _result(1.0, 1.0)["scenarios"]["h30"]}}, baseline) == []
@@ -0,0 +1,90 @@
+import json
+import sqlite3
+
+from src.menu_planner.api import catalog_changes
+from src.menu_planner.api.catalog_changes import CatalogChangeLog
+from src.menu_planner.api.main import get_catalog_changes, get_dishes, get_ingredients
+from src.menu_planner.db import catalog_cache
+from src.menu_planner.db.catalog_cache import CachedSQLiteRepo, CatalogSnapshotCache
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT NOT NULL,
+                                      protein_group TEXT, default_unit TEXT NOT NULL);
+            CREATE TABLE dishes (id TEXT PRIMARY KEY, name TEXT NOT NULL, role TEXT NOT NULL, cuisine TEXT,
+                                 meat_type TEXT, tags_json TEXT NOT NULL DEFAULT '[]');
+            CREATE TABLE dish_ingredients (dish_id TEXT, ingredient_id TEXT, qty REAL, unit TEXT);
+            CREATE TABLE ingredient_prices (ingredient_id TEXT, price_date TEXT, price_per_unit REAL, unit TEXT);
+            CREATE TABLE inventory (ingredient_id TEXT PRIMARY KEY, qty_on_hand REAL NOT NULL, unit TEXT NOT NULL,
+                                    updated_at TEXT NOT NULL, expiry_date TEXT);
+            INSERT INTO ingredients VALUES ('ing_a', '高麗菜', 'veg', NULL, 'g');
+            INSERT INTO ingredients VALUES ('ing_b', '豬肉', 'meat', 'pork', 'g');
+            INSERT INTO dishes VALUES ('m1', '紅燒肉', 'main', NULL, 'pork', '[]');
+            INSERT INTO dishes VALUES ('s1', '炒高麗菜', 'side', NULL, NULL, '[]');
+            """
+        )
+
+
+def _changes(db_path, since=None):
+    return json.loads(get_catalog_changes(since=since, db_path=db_path).body)
+
+
+def test_catalog_changes_returns_only_rows_changed_since_revision(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_cache, "CATALOG_CACHE", CatalogSnapshotCache(max_entries=2))
+    monkeypatch.setattr(catalog_changes, "CATALOG_CHANGES", CatalogChangeLog(max_revisions=4))
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+
+    full = _changes(db_path)
+    assert full["reset"] is True
+    assert [row["id"] for row in full["ingredients"]] == ["ing_a", "ing_b"]
+
+    same = _changes(db_path, since=full["revision"])
+    assert same["reset"] is False
+    assert same["revision"] == full["revision"]
+    assert same["ingredients"] == same["dishes"] == []
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE ingredients SET name = '包心菜' WHERE id = 'ing_a'")
+        conn.execute("DELETE FROM dishes WHERE id = 's1'")
+        conn.execute("INSERT INTO dishes VALUES ('a1', '滷蛋', 'main', NULL, NULL, '[]')")
+
+    delta = _changes(db_path, since=full["revision"])
+    assert delta["reset"] is False
+    assert delta["revision"] != full["revision"]
+    assert [row["name"] for row in delta["ingredients"]] == ["包心菜"]
+    assert "ingredient_order" in delta
+    assert [row["id"] for row in delta["dishes"]] == ["a1"]
+    assert delta["deleted_dishes"] == ["s1"]
+
+    # 合併後與完整查詢一致
+    repo = CachedSQLiteRepo(db_path)
+    by_id = {row["id"]: row for row in full["dishes"]}
+    by_id.pop("s1")
+    by_id.update({row["id"]: row for row in delta["dishes"]})
+    assert [by_id[i] for i in delta["dish_order"]] == json.loads(json.dumps(get_dishes(role=None, repo=repo)))
+    assert len(get_ingredients(repo=repo)) == len(delta["ingredient_order"])
+
+
+def test_catalog_changes_resets_for_unknown_or_evicted_revisions(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_cache, "CATALOG_CACHE", CatalogSnapshotCache(max_entries=2))
+    monkeypatch.setattr(catalog_changes, "CATALOG_CHANGES", CatalogChangeLog(max_revisions=1))
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+
+    first = _changes(db_path)
+    assert _changes(db_path, since="c1-otherprocess")["reset"] is True
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO ingredients VALUES ('ing_c', '雞蛋', 'egg', NULL, 'g')")
+    # 只保留一個 revision：新 revision 記錄後，舊的 since 已被淘汰
+    stale = _changes(db_path, since=first["revision"])
+    assert stale["reset"] is True
+    assert len(stale["ingredients"]) == 3
+
+    monkeypatch.setattr(catalog_cache, "CATALOG_CACHE", CatalogSnapshotCache(max_entries=0))
+    disabled = _changes(db_path, since=stale["revision"])
+    assert disabled == {"revision": "", "reset": True, "ingredients": stale["ingredients"], "dishes": stale["dishes"]}
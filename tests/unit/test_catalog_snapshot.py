@@ -0,0 +1,97 @@
+import sqlite3
+
+from src.menu_planner.db.repo import SQLiteRepo
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              category TEXT NOT NULL,
+              protein_group TEXT,
+              default_unit TEXT NOT NULL
+            );
+            CREATE TABLE dishes (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              role TEXT NOT NULL,
+              cuisine TEXT,
+              meat_type TEXT,
+              tags_json TEXT NOT NULL DEFAULT '[]'
+            );
+            CREATE TABLE dish_ingredients (
+              dish_id TEXT NOT NULL,
+              ingredient_id TEXT NOT NULL,
+              qty REAL NOT NULL,
+              unit TEXT NOT NULL
+            );
+            CREATE TABLE ingredient_prices (
+              ingredient_id TEXT NOT NULL,
+              price_date TEXT NOT NULL,
+              price_per_unit REAL NOT NULL,
+              unit TEXT NOT NULL,
+              PRIMARY KEY (ingredient_id, price_date)
+            );
+            CREATE TABLE inventory (
+              ingredient_id TEXT PRIMARY KEY,
+              qty_on_hand REAL NOT NULL,
+              unit TEXT NOT NULL,
+              updated_at TEXT NOT NULL,
+              expiry_date TEXT
+            );
+            INSERT INTO ingredients VALUES ('ing_a', '豆腐', 'soy', NULL, 'g');
+            INSERT INTO dishes(id, name, role, cuisine, meat_type, tags_json)
+            VALUES ('d1', '麻婆豆腐', 'main', 'tw', 'pork', '["辣"]');
+            INSERT INTO dish_ingredients VALUES ('d1', 'ing_a', 100, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-03-01', 0.1, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-03-15', 0.2, 'g');
+            INSERT INTO inventory VALUES ('ing_a', 500, 'g', '2026-03-01', '2026-03-30');
+            """
+        )
+
+
+def _table_exists(path: str, table: str) -> bool:
+    with sqlite3.connect(path) as conn:
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    return row is not None
+
+
+def test_catalog_snapshot_reads_all_tables_and_resolves_prices_as_of(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+
+    snapshot = SQLiteRepo(db_path).fetch_catalog_snapshot()
+
+    assert [d.id for d in snapshot.dishes] == ["d1"]
+    assert snapshot.dishes[0].tags == ["辣"]
+    assert snapshot.dishes[0].allowed_weekdays == [1, 2, 3, 4, 5, 6, 7]
+    assert snapshot.dishes[0].prep_minutes == 0
+    assert snapshot.ingredients["ing_a"].name == "豆腐"
+    assert snapshot.dish_ingredients[0].qty == 100.0
+    assert snapshot.inventory["ing_a"].qty_on_hand == 500.0
+    assert snapshot.latest_prices()["ing_a"].price_per_unit == 0.2
+    assert snapshot.latest_prices("2026-03-10")["ing_a"].price_per_unit == 0.1
+    assert snapshot.latest_prices("2026-02-01") == {}
+    assert snapshot.unit_conversions == {}
+    # 唯讀路徑不應建立 unit_conversions
+    assert not _table_exists(db_path, "unit_conversions")
+
+
+def test_catalog_snapshot_refreshes_schema_flags_after_migration(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    repo = SQLiteRepo(db_path)
+
+    assert repo.fetch_catalog_snapshot().schema.has_prep_minutes is False
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("ALTER TABLE dishes ADD COLUMN prep_minutes INTEGER NOT NULL DEFAULT 0")
+        conn.execute("UPDATE dishes SET prep_minutes = 35 WHERE id = 'd1'")
+
+    snapshot = repo.fetch_catalog_snapshot()
+    assert snapshot.schema.has_prep_minutes is True
+    assert snapshot.dishes[0].prep_minutes == 35
+    assert repo.fetch_dishes()[0].prep_minutes == 35
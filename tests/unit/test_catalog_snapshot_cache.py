@@ -0,0 +1,101 @@
+import sqlite3
+
+from src.menu_planner.db import catalog_cache
+from src.menu_planner.db.admin_repo import SQLiteAdminRepo
+from src.menu_planner.db.catalog_cache import CatalogSnapshotCache
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              category TEXT NOT NULL,
+              protein_group TEXT,
+              default_unit TEXT NOT NULL
+            );
+            CREATE TABLE dishes (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              role TEXT NOT NULL,
+              cuisine TEXT,
+              meat_type TEXT,
+              tags_json TEXT NOT NULL DEFAULT '[]'
+            );
+            CREATE TABLE dish_ingredients (dish_id TEXT, ingredient_id TEXT, qty REAL, unit TEXT);
+            CREATE TABLE ingredient_prices (ingredient_id TEXT, price_date TEXT, price_per_unit REAL, unit TEXT);
+            CREATE TABLE inventory (
+              ingredient_id TEXT PRIMARY KEY,
+              qty_on_hand REAL NOT NULL,
+              unit TEXT NOT NULL,
+              updated_at TEXT NOT NULL,
+              expiry_date TEXT
+            );
+            INSERT INTO ingredients VALUES ('ing_a', '高麗菜', 'veg', NULL, 'g');
+            """
+        )
+
+
+def test_cache_serves_repeat_reads_and_reloads_after_external_write(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    cache = CatalogSnapshotCache(max_entries=2)
+
+    first = cache.get(db_path)
+    assert cache.get(db_path) is first
+    assert cache.stats()["hits"] == 1
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO ingredients VALUES ('ing_b', '青江菜', 'veg', NULL, 'g')")
+
+    second = cache.get(db_path)
+    assert second is not first
+    assert second.revision > first.revision
+    assert set(second.ingredients) == {"ing_a", "ing_b"}
+
+
+def test_admin_repo_write_invalidates_shared_cache(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    cache = CatalogSnapshotCache(max_entries=2)
+    monkeypatch.setattr(catalog_cache, "CATALOG_CACHE", cache)
+
+    before = catalog_cache.get_catalog_snapshot(db_path)
+    SQLiteAdminRepo(db_path).upsert_ingredient(
+        "ing_c", {"name": "菠菜", "category": "veg", "protein_group": None, "default_unit": "g"}
+    )
+
+    assert cache.stats()["cached_dbs"] == 0
+    after = catalog_cache.get_catalog_snapshot(db_path)
+    assert "ing_c" in after.ingredients
+    assert after.revision > before.revision
+
+
+def test_cache_evicts_least_recently_used_db(tmp_path):
+    paths = []
+    for name in ("a.db", "b.db", "c.db"):
+        path = str(tmp_path / name)
+        _create_db(path)
+        paths.append(path)
+    cache = CatalogSnapshotCache(max_entries=2)
+
+    snap_a = cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])
+    cache.get(paths[2])
+
+    assert cache.stats()["cached_dbs"] == 2
+    assert cache.get(paths[0]) is snap_a
+    cache.get(paths[1])
+    assert cache.stats()["misses"] == 4
+
+
+def test_cache_disabled_reads_directly(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    cache = CatalogSnapshotCache(max_entries=0)
+
+    assert cache.get(db_path).revision == 0
+    assert cache.stats()["cached_dbs"] == 0
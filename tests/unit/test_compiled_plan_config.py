@@ -0,0 +1,66 @@
+from datetime import date
+
+from src.menu_planner.config.loader import (
+    CompiledHardConstraints,
+    compile_plan_config,
+    config_hash,
+    load_defaults,
+)
+from src.menu_planner.engine.constraints import check_main_hard
+
+
+def test_compile_plan_config_resolves_weekday_overrides_and_sets():
+    cfg = load_defaults()
+    cfg["start_date"] = "2026-03-02"
+    cfg["per_weekday_prep_time_limit_minutes"] = {"3": 45}
+    cfg["hard"]["fixed_main_meat_by_weekday"] = {"1": "chicken", 2: ["pork", "beef"]}
+    cfg["soft"]["inventory_prefer_ingredient_ids"] = [" ing_a ", "", "ing_b"]
+
+    compiled = compile_plan_config(cfg)
+
+    assert compiled.start_date == date(2026, 3, 2)
+    assert compiled.role_counts_for_weekday(3)["noodle"] == 1
+    assert compiled.role_counts_for_weekday(1)["noodle"] == 0
+    assert compiled.hard.prep_limit_for_weekday(3) == 45
+    assert compiled.hard.prep_limit_for_weekday(1) == 90
+    assert compiled.hard.fixed_meats_for_weekday(1) == {"chicken"}
+    assert compiled.hard.fixed_meats_for_weekday(2) == {"pork", "beef"}
+    assert compiled.hard.fixed_meats_for_weekday(3) is None
+    assert compiled.hard.fixed_single_meat_weekdays == {"chicken": (1,)}
+    assert compiled.hard.repeat.max_same_ingredient_in_window_days == 2
+    assert compiled.soft.inventory_prefer_ingredient_ids == frozenset({"ing_a", "ing_b"})
+    assert compiled.weights.near_expiry_bonus == -12.0
+
+
+def test_config_hash_is_stable_across_key_order():
+    a = {"horizon_days": 5, "hard": {"exclude_dish_ids": ["d1"], "repeat_limits": {"max_same_main_in_30_days": 1}}}
+    b = {"hard": {"repeat_limits": {"max_same_main_in_30_days": 1}, "exclude_dish_ids": ["d1"]}, "horizon_days": 5}
+
+    assert config_hash(a) == config_hash(b)
+    assert compile_plan_config(a).config_hash == compile_plan_config(b).config_hash
+    b["horizon_days"] = 6
+    assert config_hash(a) != config_hash(b)
+
+
+def test_compiled_hard_matches_dict_semantics_in_check_main_hard():
+    hard = {
+        "weekly_max_main_meat": {"chicken": 1},
+        "fixed_main_meat_by_weekday": {"3": "chicken"},
+        "repeat_limits": {"max_same_main_in_30_days": 1},
+    }
+    compiled = CompiledHardConstraints.from_dict(hard)
+    start = date(2026, 3, 2)  # 週一
+    kwargs = dict(
+        day_idx=0,
+        main_id="m1",
+        main_meat_type="chicken",
+        plan_main_ids=[],
+        plan_main_meats=[],
+        weekly_meat_counts={},
+        start_date=start,
+    )
+
+    # 週三固定 chicken 會保留同週配額，週一不能先用掉
+    assert check_main_hard(hard=hard, **kwargs) is False
+    assert check_main_hard(hard=compiled, **kwargs) is False
+    assert check_main_hard(hard=compiled, **{**kwargs, "main_meat_type": "pork"}) is True
@@ -0,0 +1,122 @@
+import sqlite3
+from datetime import date
+
+import pytest
+from fastapi import HTTPException, Response
+from starlette.requests import Request
+
+from src.menu_planner.api import conditional
+from src.menu_planner.api.conditional import (
+    Validators,
+    catalog_conditional,
+    catalog_summary_conditional,
+    defaults_conditional,
+    etag_matches,
+)
+from src.menu_planner.config.loader import load_defaults
+from src.menu_planner.db import catalog_cache
+from src.menu_planner.db.catalog_cache import CatalogSnapshotCache
+
+
+def _request(**headers):
+    raw = [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw, "query_string": b""})
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT NOT NULL,
+                                      protein_group TEXT, default_unit TEXT NOT NULL);
+            CREATE TABLE dishes (id TEXT PRIMARY KEY, name TEXT NOT NULL, role TEXT NOT NULL, cuisine TEXT,
+                                 meat_type TEXT, tags_json TEXT NOT NULL DEFAULT '[]');
+            CREATE TABLE dish_ingredients (dish_id TEXT, ingredient_id TEXT, qty REAL, unit TEXT);
+            CREATE TABLE ingredient_prices (ingredient_id TEXT, price_date TEXT, price_per_unit REAL, unit TEXT);
+            CREATE TABLE inventory (ingredient_id TEXT PRIMARY KEY, qty_on_hand REAL NOT NULL, unit TEXT NOT NULL,
+                                    updated_at TEXT NOT NULL, expiry_date TEXT);
+            INSERT INTO ingredients VALUES ('ing_a', '高麗菜', 'veg', NULL, 'g');
+            """
+        )
+
+
+def test_validators_match_etag_first_then_last_modified():
+    v = Validators(etag='W/"c3-abcd"', modified_at=1_700_000_000.5)
+    headers = v.headers()
+    assert headers["Cache-Control"] == "no-cache"
+    assert headers["Last-Modified"] == "Tue, 14 Nov 2023 22:13:20 GMT"
+
+    assert etag_matches('"x", "c3-abcd"', v.etag)
+    assert v.not_modified('W/"c3-abcd"', None)
+    # If-None-Match 不符時不看 If-Modified-Since
+    assert not v.not_modified('W/"c2-abcd"', headers["Last-Modified"])
+    assert v.not_modified(None, headers["Last-Modified"])
+    assert not v.not_modified(None, "Tue, 14 Nov 2023 22:13:19 GMT")
+    assert not v.not_modified(None, "not a date")
+
+
+def test_catalog_conditional_returns_304_until_catalog_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_cache, "CATALOG_CACHE", CatalogSnapshotCache(max_entries=2))
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+
+    response = Response()
+    catalog_conditional(_request(), response, db_path=db_path)
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"c')
+    assert "last-modified" in response.headers
+
+    with pytest.raises(HTTPException) as exc:
+        catalog_conditional(_request(if_none_match=etag), Response(), db_path=db_path)
+    assert exc.value.status_code == 304
+    assert exc.value.headers["ETag"] == etag
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO ingredients VALUES ('ing_b', '青江菜', 'veg', NULL, 'g')")
+
+    fresh = Response()
+    catalog_conditional(_request(if_none_match=etag), fresh, db_path=db_path)
+    assert fresh.headers["etag"] != etag
+
+
+def test_catalog_summary_etag_changes_with_date(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_cache, "CATALOG_CACHE", CatalogSnapshotCache(max_entries=2))
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+
+    class _Day(date):
+        current = date(2026, 10, 19)
+
+        @classmethod
+        def today(cls):
+            return cls.current
+
+    monkeypatch.setattr(conditional, "date", _Day)
+    response = Response()
+    catalog_summary_conditional(_request(), response, db_path=db_path)
+    etag = response.headers["etag"]
+    assert etag.endswith('-d20261019"')
+    # 換日不會改變檔案時間，只帶 If-Modified-Since 不能回 304
+    assert "last-modified" not in response.headers
+
+    with pytest.raises(HTTPException) as exc:
+        catalog_summary_conditional(_request(if_none_match=etag), Response(), db_path=db_path)
+    assert exc.value.status_code == 304
+
+    # 目錄沒有寫入，但隔天的有效庫存可能不同
+    _Day.current = date(2026, 10, 20)
+    fresh = Response()
+    catalog_summary_conditional(_request(if_none_match=etag), fresh, db_path=db_path)
+    assert fresh.headers["etag"] != etag
+
+
+def test_defaults_conditional_and_memoized_defaults_are_independent_copies():
+    response = Response()
+    defaults_conditional(_request(), response)
+    with pytest.raises(HTTPException) as exc:
+        defaults_conditional(_request(if_none_match=response.headers["etag"]), Response())
+    assert exc.value.status_code == 304
+
+    first = load_defaults()
+    first["horizon_days"] = -1
+    assert load_defaults() != first
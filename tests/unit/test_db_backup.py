@@ -1,3 +1,4 @@
+import sqlite3
 from datetime import datetime
 from pathlib import Path
 
@@ -83,3 +84,59 @@ def test_create_db_backup_writes_reason_and_comment_metadata(monkeypatch, tmp_pa
     assert created.name in meta
     assert meta[created.name]["reason"] == "inventory_bulk_import"
     assert meta[created.name]["comment"] == "匯入前備份"
+
+
+def _create_sqlite_db(path: Path) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE prices (id INTEGER PRIMARY KEY, price REAL)")
+        conn.executemany("INSERT INTO prices (price) VALUES (?)", [(i * 0.5,) for i in range(2000)])
+    conn.close()
+
+
+def _prices(path: Path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_create_db_backup_uses_online_backup_for_sqlite(tmp_path):
+    db = tmp_path / "menu.db"
+    _create_sqlite_db(db)
+
+    created = backup_mod.create_db_backup(str(db), step_pages=2)
+
+    assert _prices(created) == 2000
+    assert not list((tmp_path / "backups").glob(".*.partial"))
+
+
+def test_coalesced_scheduler_keeps_pre_modify_snapshot_per_window(tmp_path):
+    db = tmp_path / "menu.db"
+    _create_sqlite_db(db)
+    observed = []
+    scheduler = backup_mod.CoalescedBackupScheduler(
+        window_seconds=600, step_pages=4, observer=lambda seconds, outcome: observed.append(outcome)
+    )
+
+    first, created = scheduler.request(str(db), reason="ingredient_price_upsert")
+    with sqlite3.connect(db) as conn:
+        conn.execute("DELETE FROM prices WHERE id > 1000")
+    conn.close()
+    joined, joined_created = scheduler.request(str(db), reason="ingredient_price_upsert")
+
+    assert created is True and joined_created is False
+    assert joined is first and first.joined == 1
+    # 背景寫出的是第一次修改前的狀態
+    path = first.wait(timeout=10)
+    assert _prices(path) == 2000
+    assert len(list((tmp_path / "backups").glob("menu_*.db"))) == 1
+    assert observed == ["ok"]
+
+    forced, forced_created = scheduler.request(str(db), reason="admin_manual_snapshot", coalesce=False)
+    assert forced_created is True and _prices(forced.wait(timeout=10)) == 1000
+
+    scheduler.reset(str(db))
+    after_reset, created_after_reset = scheduler.request(str(db))
+    assert created_after_reset is True
+    assert after_reset.wait(timeout=10) is not None
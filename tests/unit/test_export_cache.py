@@ -0,0 +1,186 @@
+import asyncio
+import io
+import sqlite3
+import threading
+import time
+
+import openpyxl
+
+from src.menu_planner.api import export_cache, main
+from src.menu_planner.api.conditional import etag_matches
+from src.menu_planner.api.export_cache import ExportArtifactCache, export_cache_key
+from src.menu_planner.api.main import post_export_excel
+from src.menu_planner.db import catalog_cache
+from src.menu_planner.db.catalog_cache import CatalogSnapshotCache
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              category TEXT NOT NULL,
+              protein_group TEXT,
+              default_unit TEXT NOT NULL
+            );
+            CREATE TABLE dishes (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              role TEXT NOT NULL,
+              cuisine TEXT,
+              meat_type TEXT,
+              tags_json TEXT NOT NULL DEFAULT '[]'
+            );
+            CREATE TABLE dish_ingredients (dish_id TEXT, ingredient_id TEXT, qty REAL, unit TEXT);
+            CREATE TABLE inventory (
+              ingredient_id TEXT PRIMARY KEY,
+              qty_on_hand REAL NOT NULL,
+              unit TEXT NOT NULL,
+              updated_at TEXT NOT NULL,
+              expiry_date TEXT
+            );
+            CREATE TABLE ingredient_prices (ingredient_id TEXT, price_date TEXT, price_per_unit REAL, unit TEXT);
+            INSERT INTO ingredients VALUES ('ing_a', '豆腐', 'soy', NULL, 'g');
+            INSERT INTO dish_ingredients VALUES ('m1', 'ing_a', 100, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-03-01', 0.1, 'g');
+            """
+        )
+
+
+def _result():
+    days = [
+        {"date": f"2026-03-0{i + 2}", "day_index": i, "items": {"main": {"id": "m1", "name": "紅燒豆腐"}}}
+        for i in range(3)
+    ]
+    return {"days": days}
+
+
+def _body(response) -> bytes:
+    async def collect():
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    return asyncio.run(collect())
+
+
+def test_artifact_cache_coalesces_concurrent_builds_and_evicts_by_size(tmp_path):
+    cache = ExportArtifactCache(directory=str(tmp_path / "exports"), max_bytes=10)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def write(f):
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        f.write(b"12345678")
+
+    out = []
+    first = threading.Thread(target=lambda: out.append(cache.get_or_build("k1", write)))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: out.append(cache.get_or_build("k1", write)))
+    second.start()
+    assert cache.stats()["inflight"] == 1
+    time.sleep(0.05)
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert len(calls) == 1
+    assert sorted(a.status for a in out) in (["miss", "shared"], ["hit", "miss"])
+    assert [a.fileobj.read() for a in out] == [b"12345678", b"12345678"]
+
+    hit = cache.get_or_build("k1", write)
+    assert (hit.status, hit.size) == ("hit", 8)
+    # 新檔加入後超過 10 bytes：淘汰最久未用的 k1
+    cache.get_or_build("k2", lambda f: f.write(b"abcdefgh"))
+    assert sorted(p.name for p in (tmp_path / "exports").iterdir()) == ["k2.xlsx"]
+    # 被淘汰的檔案已開啟的讀者仍可讀完
+    assert hit.fileobj.read() == b"12345678"
+    for artifact in (*out, hit):
+        artifact.fileobj.close()
+
+    disabled = ExportArtifactCache(directory=str(tmp_path / "off"), max_bytes=0)
+    assert disabled.get_or_build("k1", lambda f: f.write(b"x")).status == "bypass"
+    assert not (tmp_path / "off").exists()
+
+
+def test_export_route_serves_cached_artifact_with_etag(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    monkeypatch.setattr(catalog_cache, "CATALOG_CACHE", CatalogSnapshotCache(max_entries=2))
+    monkeypatch.setattr(export_cache, "EXPORT_CACHE", ExportArtifactCache(directory=str(tmp_path / "exports")))
+    payload = {"cfg": {"people": 10}, "result": _result()}
+
+    first = post_export_excel(payload=payload, db_path=db_path, client="t", if_none_match=None)
+    content = _body(first)
+    assert first.headers["X-Export-Cache"] == "miss"
+    assert first.headers["Content-Length"] == str(len(content))
+    wb = openpyxl.load_workbook(io.BytesIO(content))
+    assert wb["採買明細"].max_row == 4
+
+    second = post_export_excel(payload=payload, db_path=db_path, client="t", if_none_match=None)
+    assert second.headers["X-Export-Cache"] == "hit"
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert _body(second) == content
+
+    not_modified = post_export_excel(
+        payload=payload, db_path=db_path, client="t", if_none_match=first.headers["ETag"],
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == first.headers["ETag"]
+
+    other = post_export_excel(payload={**payload, "cfg": {"people": 20}}, db_path=db_path, client="t",
+                              if_none_match=first.headers["ETag"])
+    assert other.status_code == 200
+    assert other.headers["ETag"] != first.headers["ETag"]
+    _body(other)
+
+
+def test_export_route_skips_procurement_on_hit_and_tracks_catalog(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    monkeypatch.setattr(catalog_cache, "CATALOG_CACHE", CatalogSnapshotCache(max_entries=2))
+    monkeypatch.setattr(export_cache, "EXPORT_CACHE", ExportArtifactCache(directory=str(tmp_path / "exports")))
+    calls = []
+    attach = main.attach_procurement_details
+
+    def counting_attach(**kwargs):
+        calls.append(1)
+        return attach(**kwargs)
+
+    monkeypatch.setattr(main, "attach_procurement_details", counting_attach)
+    payload = {"cfg": {"people": 10}, "result": _result()}
+
+    first = post_export_excel(payload=payload, db_path=db_path, client="t", if_none_match=None)
+    _body(first)
+    hit = post_export_excel(payload=payload, db_path=db_path, client="t", if_none_match=None)
+    _body(hit)
+    not_modified = post_export_excel(payload=payload, db_path=db_path, client="t", if_none_match=first.headers["ETag"])
+    assert hit.headers["X-Export-Cache"] == "hit"
+    assert not_modified.status_code == 304
+    # 命中與 304 都不重算採購明細
+    assert len(calls) == 1
+
+    # 價格變動會改變採購明細，同一份結果要重新產生
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO ingredient_prices VALUES ('ing_a', '2026-03-02', 0.2, 'g')")
+    changed = post_export_excel(payload=payload, db_path=db_path, client="t", if_none_match=first.headers["ETag"])
+    assert changed.status_code == 200
+    assert changed.headers["X-Export-Cache"] == "miss"
+    _body(changed)
+    assert len(calls) == 2
+
+
+def test_export_cache_key_ignores_dict_order_and_etag_matching():
+    a = export_cache_key({"people": 1, "seed": 7}, {"days": [{"a": 1, "b": 2}]}, "cat1")
+    b = export_cache_key({"seed": 7, "people": 1}, {"days": [{"b": 2, "a": 1}]}, "cat1")
+    assert a == b
+    assert a != export_cache_key({"people": 2, "seed": 7}, {"days": [{"a": 1, "b": 2}]}, "cat1")
+    assert a != export_cache_key({"people": 1, "seed": 7}, {"days": [{"a": 1, "b": 2}]}, "cat2")
+    # 送回的舊採購明細匯出前會重算，不影響 key
+    assert a == export_cache_key({"people": 1, "seed": 7}, {"days": [{"a": 1, "b": 2, "procurement": [1]}]}, "cat1")
+    assert etag_matches('"x", W/"abc"', 'W/"abc"')
+    assert etag_matches("*", 'W/"abc"')
+    assert not etag_matches('"abd"', 'W/"abc"')
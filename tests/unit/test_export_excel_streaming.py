@@ -0,0 +1,62 @@
+import io
+
+import openpyxl
+
+from src.menu_planner.api.export_excel import build_plan_workbook, iter_file_chunks, spool_plan_workbook
+
+
+def _result(days: int):
+    out = []
+    for i in range(days):
+        out.append({
+            "date": f"2026-03-{i + 2:02d}",
+            "items": {"main": {"id": "m1", "name": "紅燒豆腐"}},
+            "day_cost": 30,
+            "procurement": {
+                "people": 10,
+                "dishes": [{
+                    "role": "main",
+                    "dish_name": "紅燒豆腐",
+                    "ingredients": [{
+                        "ingredient_id": "ing_a", "ingredient_name": "板豆腐（大）", "qty_per_person": 100,
+                        "qty_for_people": 1000, "qty_unit": "g", "unit_price": 0.1, "unit_price_unit": "g",
+                        "line_total": 100.0, "price_date": "2026-03-01",
+                    }],
+                    "dish_total": 100.0,
+                }],
+                "day_total": 100.0,
+            },
+        })
+    return {"days": out}
+
+
+def test_spooled_export_streams_same_workbook_and_rolls_to_disk():
+    result = _result(9)
+    spool = spool_plan_workbook({}, result, max_size=1024)
+    assert spool._rolled  # 超過上限已轉存暫存檔
+
+    content = b"".join(iter_file_chunks(spool, chunk_size=4096))
+    assert spool.closed
+    wb = openpyxl.load_workbook(io.BytesIO(content))
+    assert wb.sheetnames == ["菜單", "摘要", "設定", "採買明細", "採買彙總", "採買週彙總"]
+    assert wb["採買明細"].max_row == 10
+
+
+def test_write_only_export_keeps_widths_styles_and_filters():
+    wb = openpyxl.load_workbook(io.BytesIO(build_plan_workbook({}, _result(9))))
+
+    summary = wb["採買彙總"]
+    assert summary.freeze_panes == "A2"
+    assert summary.auto_filter.ref == f"A1:I{summary.max_row}"
+    # 食材欄寬依全形字計算：板豆腐（大） = 6 個全形字 + padding
+    assert summary.column_dimensions["C"].width == 14
+    assert summary.cell(row=1, column=1).font.b is True
+    daily = [row for row in summary.iter_rows(min_row=2) if row[2].value == "每日小計"]
+    assert len(daily) == 9
+    assert daily[0][0].fill.fgColor.rgb == "FFFDE68A"
+
+    weekly = wb["採買週彙總"]
+    assert [weekly.cell(row=r, column=3).value for r in range(2, weekly.max_row + 1)] == [
+        "板豆腐（大）", "每週小計", "板豆腐（大）", "每週小計", "全部合計",
+    ]
+    assert weekly.cell(row=weekly.max_row, column=6).value == 900.0
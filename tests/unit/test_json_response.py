@@ -0,0 +1,68 @@
+import asyncio
+import json
+from datetime import date
+
+import pytest
+
+from src.menu_planner.api import json_response
+from src.menu_planner.api.json_response import SERIALIZATION_STATS, PreserializedJSONResponse, encode_json
+
+
+def _payload():
+    return {
+        "ok": True,
+        "result": {"days": [{"date": "2026-03-02", "items": {"main": {"id": "m1", "name": "紅燒豆腐"}}, "cost": 1.25}]},
+    }
+
+
+def _send_all(response):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(response({"type": "http"}, None, send))
+    return messages
+
+
+def test_encode_json_matches_compact_json_dumps_with_and_without_orjson(monkeypatch):
+    expected = json.dumps(_payload(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert encode_json(_payload()) == expected
+    # 非 JSON 型別交給 FastAPI 的通用轉換
+    assert json.loads(encode_json({"d": date(2026, 3, 2), "s": {"a"}})) == {"d": "2026-03-02", "s": ["a"]}
+
+    monkeypatch.setattr(json_response, "orjson", None)
+    assert encode_json(_payload()) == expected
+    assert json.loads(encode_json({"d": date(2026, 3, 2)})) == {"d": "2026-03-02"}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_encode_json_writes_null_for_non_finite_floats_on_both_paths(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(json_response, "orjson", None)
+    payload = {"score": float("nan"), "rows": [1.5, float("inf"), (float("-inf"), 2)], "d": date(2026, 3, 2)}
+
+    assert encode_json(payload) == b'{"score":null,"rows":[1.5,null,[null,2]],"d":"2026-03-02"}'
+
+
+def test_preserialized_response_records_timing_and_streams_large_bodies():
+    before = SERIALIZATION_STATS.stats().get("test", {}).get("count", 0)
+
+    small = PreserializedJSONResponse(_payload(), headers={"X-Plan-Cache": "miss"}, endpoint="test")
+    assert json.loads(small.body) == _payload()
+    assert small.headers["X-Plan-Cache"] == "miss"
+    assert small.headers["Server-Timing"].startswith("serialize;dur=")
+    assert [m.get("more_body", False) for m in _send_all(small)[1:]] == [False]
+
+    large = PreserializedJSONResponse({"blob": "x" * 600_000}, endpoint="test", stream_min_bytes=1024)
+    messages = _send_all(large)
+    chunks = [m["body"] for m in messages[1:]]
+    assert len(chunks) == 4  # 3 塊 + 結尾
+    assert b"".join(chunks) == large.body
+    assert dict(messages[0]["headers"])[b"content-length"] == str(len(large.body)).encode()
+
+    stats = SERIALIZATION_STATS.stats()["test"]
+    assert stats["count"] == before + 2
+    assert stats["bytes"] >= len(large.body)
@@ -0,0 +1,83 @@
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+
+from src.menu_planner.api import metrics
+from src.menu_planner.api.metrics import Histogram, MetricsMiddleware, observe_plan_perf
+
+
+def _call(app, path):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "headers": [], "query_string": b""}
+    asyncio.run(app(scope, receive, send))
+    return messages[0]["status"]
+
+
+def test_histogram_renders_cumulative_buckets_per_label():
+    h = Histogram("test_seconds", "測試", buckets=(0.1, 1.0))
+    h.observe(0.05, stage="mains")
+    h.observe(0.1, stage="mains")
+    h.observe(5.0, stage="mains")
+    lines = h.render()
+    assert 'test_seconds_bucket{stage="mains",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{stage="mains",le="1"} 2' in lines
+    assert 'test_seconds_bucket{stage="mains",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="mains"} 3' in lines
+    assert 'test_seconds_sum{stage="mains"} 5.15' in lines
+
+
+def test_middleware_labels_by_route_template_and_counts_sqlite_lock_errors():
+    inner = FastAPI()
+
+    @inner.get("/items/{item_id}")
+    def get_item(item_id: str):
+        return {"id": item_id}
+
+    @inner.get("/locked")
+    def locked():
+        raise sqlite3.OperationalError("database is locked")
+
+    app = MetricsMiddleware(inner)
+    before = metrics.HTTP_REQUESTS.value(route="/items/{item_id}", method="GET", status=200)
+    locks = metrics.SQLITE_LOCK_ERRORS.value()
+
+    assert _call(app, "/items/a") == 200
+    assert _call(app, "/items/b") == 200
+    assert _call(app, "/nope") == 404
+    with pytest.raises(sqlite3.OperationalError):
+        _call(app, "/locked")
+
+    assert metrics.HTTP_REQUESTS.value(route="/items/{item_id}", method="GET", status=200) == before + 2
+    assert metrics.HTTP_REQUESTS.value(route=metrics.ROUTE_UNMATCHED, method="GET", status=404) >= 1
+    assert metrics.SQLITE_LOCK_ERRORS.value() == locks + 1
+
+
+def test_plan_perf_feeds_stage_histograms_and_features_hit_ratio():
+    observe_plan_perf({
+        "debug": {
+            "perf": {
+                "total_ms": 1500.0,
+                "spans": {"mains": {"calls": 1, "wall_ms": 1100.0, "cpu_ms": 1000.0}},
+                "counters": {"features.cache_hit": 3, "features.cache_miss": 1},
+            }
+        }
+    })
+    # 沒有 debug.perf（快取命中、舊結果）時不記錄
+    observe_plan_perf({"days": []})
+
+    text = metrics.METRICS.render()
+    assert 'menu_plan_stage_duration_seconds_bucket{stage="mains",le="2.5"}' in text
+    assert 'menu_cache_lookups_total{cache="features",result="hit"}' in text
+    assert 'menu_cache_hit_ratio{cache="features"}' in text
+    assert 'menu_plan_scheduler_slots{state="active"}' in text
+    assert 'menu_process_memory_bytes{kind="rss"}' in text
+    assert "# TYPE menu_http_request_duration_seconds histogram" in text
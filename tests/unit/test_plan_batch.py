@@ -0,0 +1,224 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from src.menu_planner.api import plan_batch
+from src.menu_planner.api.plan_batch import parse_batch_variants, run_plan_batch
+from src.menu_planner.api.plan_cache import PlanResultCache
+from src.menu_planner.api.plan_scheduler import PlanScheduler
+from src.menu_planner.config.loader import load_defaults
+from src.menu_planner.engine.errors import PlanError
+from src.menu_planner.engine.planner import SharedPlanInputs, _prepare_context
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              category TEXT NOT NULL,
+              protein_group TEXT,
+              default_unit TEXT NOT NULL
+            );
+            CREATE TABLE dishes (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              role TEXT NOT NULL,
+              cuisine TEXT,
+              meat_type TEXT,
+              tags_json TEXT NOT NULL DEFAULT '[]'
+            );
+            CREATE TABLE dish_ingredients (dish_id TEXT, ingredient_id TEXT, qty REAL, unit TEXT);
+            CREATE TABLE ingredient_prices (ingredient_id TEXT, price_date TEXT, price_per_unit REAL, unit TEXT);
+            CREATE TABLE inventory (
+              ingredient_id TEXT PRIMARY KEY,
+              qty_on_hand REAL NOT NULL,
+              unit TEXT NOT NULL,
+              updated_at TEXT NOT NULL,
+              expiry_date TEXT
+            );
+            INSERT INTO ingredients VALUES ('ing_a', '豆腐', 'soy', NULL, 'g');
+            INSERT INTO ingredients VALUES ('ing_b', '雞腿', 'meat', 'chicken', 'g');
+            INSERT INTO dishes VALUES ('m1', '紅燒豆腐', 'main', 'tw', NULL, '[]');
+            INSERT INTO dishes VALUES ('m2', '烤雞腿', 'main', 'tw', 'chicken', '[]');
+            INSERT INTO dish_ingredients VALUES ('m1', 'ing_a', 100, 'g');
+            INSERT INTO dish_ingredients VALUES ('m2', 'ing_b', 150, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-03-01', 0.1, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_b', '2026-03-01', 0.3, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_b', '2026-04-01', 0.5, 'g');
+            """
+        )
+
+
+def _cfg(**overrides):
+    cfg = load_defaults()
+    cfg["start_date"] = "2026-03-02"
+    cfg["horizon_days"] = 5
+    cfg["seed"] = 7
+    cfg.update(overrides)
+    return cfg
+
+
+def test_shared_inputs_are_built_once_for_agreeing_configs(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    shared = SharedPlanInputs.from_db(db_path)
+
+    a = _prepare_context(db_path, _cfg(), shared=shared)
+    b = _prepare_context(db_path, _cfg(weights={**load_defaults()["weights"], "cost": 3.0}), shared=shared)
+    assert shared.builds == {"features": 1, "ingredient_keys": 1, "dish_has_meat": 1}
+    assert a.feat == b.feat == _prepare_context(db_path, _cfg()).feat
+    assert a.dish_ingredient_ids is b.dish_ingredient_ids
+
+    april = _prepare_context(db_path, _cfg(start_date="2026-04-06"), shared=shared)
+    assert shared.builds["features"] == 2
+    assert april.feat["m2"].cost_per_serving == 75.0
+    assert a.feat["m2"].cost_per_serving == 45.0
+
+    excluded = _cfg()
+    excluded["hard"] = {**excluded["hard"], "exclude_ingredient_ids": ["ing_b"], "ingredient_repeat_merge_shape_variants": False}
+    ctx = _prepare_context(db_path, excluded, shared=shared)
+    assert set(ctx.feat) == {"m1"}
+    assert shared.builds == {"features": 2, "ingredient_keys": 2, "dish_has_meat": 1}
+
+
+def test_parse_batch_variants_validates_each_variant(monkeypatch):
+    assert parse_batch_variants({"variants": []})[1][0]["code"] == "BATCH_EMPTY"
+
+    monkeypatch.setenv("MENU_PLAN_BATCH_MAX_VARIANTS", "2")
+    assert parse_batch_variants({"variants": [{"cfg": {}}] * 3})[1][0]["code"] == "BATCH_TOO_LARGE"
+
+    variants, errors = parse_batch_variants({"variants": [{"cfg": _cfg()}, {"label": "x"}]})
+    assert variants == [{"label": "方案 1", "cfg": _cfg()}]
+    assert errors[0]["code"] == "BATCH_VARIANT_INVALID"
+    assert errors[0]["details"]["variant"] == 1
+
+
+def test_run_plan_batch_plans_misses_in_parallel_chunks_and_compares(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    shared_ids = set()
+
+    def fake_plan_month(db_path, cfg, shared=None):
+        shared_ids.add(id(shared))
+        if cfg["horizon_days"] == 4:
+            raise PlanError(code="NO_MAIN", message="沒有主菜")
+        cost = float(cfg["horizon_days"] * 10)
+        return {
+            "ok": cfg["horizon_days"] != 6,
+            "errors": [],
+            "days": [],
+            "summary": {"total_cost": cost, "avg_cost_per_day": 10.0},
+            "debug": {"final_score": 100.0 - cost, "failed_days": [2] if cfg["horizon_days"] == 6 else []},
+        }
+
+    monkeypatch.setattr(plan_batch, "plan_month", fake_plan_month)
+    scheduler = PlanScheduler(max_concurrency=2, executor_factory=lambda n: ThreadPoolExecutor(max_workers=n))
+    cache = PlanResultCache(disk_dir=str(tmp_path / "cache"))
+    variants = [
+        {"label": "基準", "cfg": _cfg()},
+        {"label": "長一點", "cfg": _cfg(horizon_days=6)},
+        {"label": "失敗", "cfg": _cfg(horizon_days=4)},
+    ]
+
+    out = run_plan_batch(db_path, variants, client="ip:test", scheduler=scheduler, cache=cache, include_results=False)
+
+    # 三組未命中分成兩批，各佔一個名額；同一批共用一份 SharedPlanInputs
+    assert scheduler.stats()["completed"] == 2
+    assert len(shared_ids) == 2
+    rows = out["comparison"]["rows"]
+    assert [r["total_cost"] for r in rows] == [50.0, 60.0, None]
+    assert rows[1]["vs_first"] == {"total_cost": 10.0, "score": -10.0, "failed_day_count": 1.0}
+    assert rows[1]["failed_days"] == [2]
+    assert out["comparison"]["lowest_cost"] == 0
+    assert out["comparison"]["best_score"] == 1
+    assert out["comparison"]["fewest_failed_days"] == 0
+    assert out["variants"][2]["errors"][0]["code"] == "NO_MAIN"
+    assert "result" not in out["variants"][0]
+
+    again = run_plan_batch(db_path, variants[:2], client="ip:test", scheduler=scheduler, cache=cache)
+    assert [r["cache"] for r in again["comparison"]["rows"]] == ["hit-memory", "hit-memory"]
+    assert scheduler.stats()["completed"] == 2
+    assert again["variants"][0]["result"]["summary"]["total_cost"] == 50.0
+
+
+def test_run_plan_batch_keeps_chunks_within_per_client_queue_when_scheduler_is_busy(monkeypatch, tmp_path):
+    import threading
+    import time
+
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+
+    def fake_plan_month(db_path, cfg, shared=None):
+        return {"ok": True, "errors": [], "days": [], "summary": {"total_cost": float(cfg["horizon_days"])}, "debug": {}}
+
+    monkeypatch.setattr(plan_batch, "plan_month", fake_plan_month)
+    scheduler = PlanScheduler(
+        max_concurrency=4,
+        max_queued_per_client=2,
+        executor_factory=lambda n: ThreadPoolExecutor(max_workers=n),
+    )
+    cache = PlanResultCache(disk_dir=str(tmp_path / "cache"))
+    variants = [{"label": str(h), "cfg": _cfg(horizon_days=h)} for h in (3, 4, 5, 6)]
+
+    release = threading.Event()
+    holders = [threading.Thread(target=lambda: scheduler.run("other", release.wait)) for _ in range(4)]
+    for t in holders:
+        t.start()
+    out = {}
+    batch = threading.Thread(target=lambda: out.update(run_plan_batch(
+        db_path, variants, client="ip:test", scheduler=scheduler, cache=cache, include_results=False
+    )))
+    try:
+        deadline = time.time() + 5
+        while scheduler.stats()["active"] < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        batch.start()
+        deadline = time.time() + 5
+        while scheduler.stats()["waiting"] + scheduler.stats()["rejected"] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        # 名額全被佔用時，批次只排入每人上限內的件數，不會被自己的其他批次擠成 429
+        assert scheduler.stats()["rejected"] == 0
+    finally:
+        release.set()
+        batch.join(timeout=10)
+        for t in holders:
+            t.join(timeout=10)
+
+    assert [r["total_cost"] for r in out["comparison"]["rows"]] == [3.0, 4.0, 5.0, 6.0]
+    assert scheduler.stats()["rejected"] == 0
+
+
+def test_run_plan_batch_reports_unexpected_errors_per_variant_and_caches_the_rest(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+
+    def fake_plan_month(db_path, cfg, shared=None):
+        if cfg["horizon_days"] == 4:
+            raise KeyError("roles")
+        return {"ok": True, "errors": [], "days": [], "summary": {"total_cost": float(cfg["horizon_days"])}, "debug": {}}
+
+    monkeypatch.setattr(plan_batch, "plan_month", fake_plan_month)
+    scheduler = PlanScheduler(max_concurrency=2, executor_factory=lambda n: ThreadPoolExecutor(max_workers=n))
+    cache = PlanResultCache(disk_dir=str(tmp_path / "cache"))
+    variants = [{"label": str(h), "cfg": _cfg(horizon_days=h)} for h in (3, 4, 5)]
+
+    out = run_plan_batch(db_path, variants, client="ip:test", scheduler=scheduler, cache=cache, include_results=False)
+    assert [r["total_cost"] for r in out["comparison"]["rows"]] == [3.0, None, 5.0]
+    assert out["variants"][1]["errors"] == [{"code": "INTERNAL_ERROR", "message": "'roles'"}]
+
+    # 整批在 worker 內失敗（例如讀不到目錄）時，只有該批的方案帶錯誤，其他批已寫入快取
+    def failing_batch_task(db_path, cfgs):
+        if any(cfg["horizon_days"] == 6 for cfg in cfgs):
+            raise ValueError("壞掉的批次")
+        return real_task(db_path, cfgs)
+
+    real_task = plan_batch.plan_batch_task
+    monkeypatch.setattr(plan_batch, "plan_batch_task", failing_batch_task)
+    more = [{"label": str(h), "cfg": _cfg(horizon_days=h)} for h in (6, 7)]
+    out = run_plan_batch(db_path, more, client="ip:test", scheduler=scheduler, cache=cache, include_results=False)
+    rows = out["comparison"]["rows"]
+    assert [r["total_cost"] for r in rows] == [None, 7.0]
+    assert out["variants"][0]["errors"][0]["message"] == "壞掉的批次"
+    assert cache.lookup(db_path, more[1]["cfg"]).result is not None
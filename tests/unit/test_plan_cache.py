@@ -0,0 +1,166 @@
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from src.menu_planner.api import main, plan_cache, plan_scheduler
+from src.menu_planner.api.plan_cache import PlanResultCache
+from src.menu_planner.api.plan_scheduler import PlanScheduler
+from src.menu_planner.config.loader import load_defaults
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              category TEXT NOT NULL,
+              protein_group TEXT,
+              default_unit TEXT NOT NULL
+            );
+            CREATE TABLE dishes (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              role TEXT NOT NULL,
+              cuisine TEXT,
+              meat_type TEXT,
+              tags_json TEXT NOT NULL DEFAULT '[]'
+            );
+            CREATE TABLE dish_ingredients (dish_id TEXT, ingredient_id TEXT, qty REAL, unit TEXT);
+            CREATE TABLE ingredient_prices (ingredient_id TEXT, price_date TEXT, price_per_unit REAL, unit TEXT);
+            CREATE TABLE inventory (
+              ingredient_id TEXT PRIMARY KEY,
+              qty_on_hand REAL NOT NULL,
+              unit TEXT NOT NULL,
+              updated_at TEXT NOT NULL,
+              expiry_date TEXT
+            );
+            INSERT INTO ingredients VALUES ('ing_a', '豆腐', 'soy', NULL, 'g');
+            """
+        )
+
+
+def _cfg(**overrides):
+    cfg = load_defaults()
+    cfg["start_date"] = "2026-03-02"
+    cfg["seed"] = 7
+    cfg.update(overrides)
+    return cfg
+
+
+def test_cache_hits_memory_then_disk_and_returns_independent_copies(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    disk_dir = str(tmp_path / "cache")
+    cache = PlanResultCache(disk_dir=disk_dir)
+
+    first = cache.lookup(db_path, _cfg())
+    assert first.status == "miss"
+    cache.store(first.key, {"days": [{"day_index": 0}], "ok": True})
+
+    hit = cache.lookup(db_path, _cfg())
+    assert hit.status == "hit-memory"
+    assert hit.key == first.key
+    hit.result["days"].clear()
+    assert cache.lookup(db_path, _cfg()).result["days"] == [{"day_index": 0}]
+
+    # 新的 process（新快取實例）仍可由磁碟命中
+    other = PlanResultCache(disk_dir=disk_dir)
+    assert other.lookup(db_path, _cfg()).status == "hit-disk"
+    assert other.lookup(db_path, _cfg()).status == "hit-memory"
+
+
+def test_cache_key_tracks_seed_start_date_and_catalog_content(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    cache = PlanResultCache(disk_dir=str(tmp_path / "cache"))
+
+    assert cache.lookup(db_path, _cfg(seed="random")).status == "bypass"
+    assert cache.lookup(db_path, _cfg(seed=" Time ")).status == "bypass"
+
+    base = cache.lookup(db_path, _cfg()).key
+    # 未指定 seed 時預設為 7
+    no_seed = _cfg()
+    del no_seed["seed"]
+    assert cache.lookup(db_path, no_seed).key == base
+    assert cache.lookup(db_path, _cfg(seed=8)).key != base
+    assert cache.lookup(db_path, _cfg(seed="date")).key != base
+    assert cache.lookup(db_path, _cfg(start_date="2026-03-09")).key != base
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO ingredients VALUES ('ing_b', '青江菜', 'veg', NULL, 'g')")
+    assert cache.lookup(db_path, _cfg()).key != base
+
+
+def test_cache_enforces_byte_cap_and_ttl(tmp_path, monkeypatch):
+    cache = PlanResultCache(max_memory_bytes=60, max_disk_bytes=0, ttl_seconds=10)
+    now = [1000.0]
+    monkeypatch.setattr(plan_cache.time, "time", lambda: now[0])
+
+    cache.store("a", {"v": "x" * 20})
+    cache.store("b", {"v": "y" * 20})
+    assert cache._memory_get("a") is not None
+    cache.store("c", {"v": "z" * 20})
+    # a 剛被讀過，淘汰最久未用的 b
+    assert cache._memory_get("b") is None
+    assert cache._memory_get("a") is not None
+
+    now[0] += 11
+    assert cache._memory_get("a") is None
+    assert cache.stats()["memory_entries"] == 1
+
+
+def test_post_plan_reports_cache_status_and_skips_replanning(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    monkeypatch.setattr(plan_cache, "PLAN_CACHE", PlanResultCache(disk_dir=str(tmp_path / "cache")))
+    calls = []
+
+    def fake_plan_month(db_path, cfg):
+        calls.append(cfg.get("seed"))
+        return {"ok": True, "errors": [], "summary": {"days": 0}, "days": []}
+
+    monkeypatch.setattr(plan_scheduler, "plan_month", fake_plan_month)
+    monkeypatch.setattr(
+        plan_scheduler,
+        "PLAN_SCHEDULER",
+        PlanScheduler(max_concurrency=1, executor_factory=lambda n: ThreadPoolExecutor(max_workers=n)),
+    )
+
+    first = main.post_plan(cfg=_cfg(), db_path=db_path, client="ip:test")
+    second = main.post_plan(cfg=_cfg(), db_path=db_path, client="ip:test")
+    random_seed = main.post_plan(cfg=_cfg(seed="random"), db_path=db_path, client="ip:test")
+    payload = json.loads(second.body)
+
+    assert first.headers["X-Plan-Cache"] == "miss"
+    assert second.headers["X-Plan-Cache"] == "hit-memory"
+    assert second.headers["X-Plan-Cache-Key"] == first.headers["X-Plan-Cache-Key"]
+    assert random_seed.headers["X-Plan-Cache"] == "bypass"
+    assert calls == [7, "random"]
+    assert payload["result"]["summary"]["people"] == 250
+
+
+def test_cache_hit_does_not_return_stored_perf(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    monkeypatch.setattr(plan_cache, "PLAN_CACHE", PlanResultCache(disk_dir=str(tmp_path / "cache")))
+
+    def fake_plan_month(db_path, cfg):
+        perf = {"total_ms": 1234.0, "spans": {"mains": {"calls": 1, "wall_ms": 900.0, "cpu_ms": 900.0}}, "counters": {}}
+        return {"ok": True, "errors": [], "summary": {"days": 0}, "days": [], "debug": {"seed": 7, "perf": perf}}
+
+    monkeypatch.setattr(plan_scheduler, "plan_month", fake_plan_month)
+    monkeypatch.setattr(
+        plan_scheduler,
+        "PLAN_SCHEDULER",
+        PlanScheduler(max_concurrency=1, executor_factory=lambda n: ThreadPoolExecutor(max_workers=n)),
+    )
+
+    first = json.loads(main.post_plan(cfg=_cfg(), db_path=db_path, client="ip:test").body)
+    second = json.loads(main.post_plan(cfg=_cfg(), db_path=db_path, client="ip:test").body)
+
+    # 未命中時回傳這次排餐的耗時（含採購明細）
+    assert set(first["result"]["debug"]["perf"]["spans"]) == {"mains", "procurement"}
+    # 命中時沒有重新排餐，不回傳舊的耗時；其餘 debug 欄位保留
+    assert second["result"]["debug"] == {"seed": 7}
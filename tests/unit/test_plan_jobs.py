@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from src.menu_planner.api import plan_jobs
+from src.menu_planner.api.plan_jobs import PlanJobManager
+from src.menu_planner.api.plan_scheduler import PlanScheduler
+from src.menu_planner.api.routes import plan_jobs as plan_job_routes
+from src.menu_planner.engine.errors import PlanCancelled
+
+_LOCAL_SYNC = SimpleNamespace(dict=dict, Event=threading.Event)
+
+
+def _scheduler(max_concurrency=1):
+    return PlanScheduler(max_concurrency=max_concurrency, executor_factory=lambda n: ThreadPoolExecutor(max_workers=n))
+
+
+def _manager(runner, scheduler=None, max_workers=1, **kwargs):
+    return PlanJobManager(
+        max_workers=max_workers,
+        scheduler=scheduler or _scheduler(),
+        sync_factory=lambda: _LOCAL_SYNC,
+        runner=runner,
+        **kwargs,
+    )
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _cooperative_runner(release: threading.Event):
+    def runner(db_path, cfg, state, cancel_event):
+        state.update({"status": "running", "started_at": time.time()})
+        for day in range(int(cfg["horizon_days"])):
+            if cancel_event.is_set():
+                return {"ok": False, "cancelled": True, "errors": [PlanCancelled(day_index=day).to_dict()]}
+            state.update({"stage": "fill", "day_index": day})
+            release.wait(0.02)
+        return {"ok": True, "result": {"days": list(range(int(cfg["horizon_days"])))}}
+
+    return runner
+
+
+def test_plan_job_reports_progress_and_keeps_result():
+    release = threading.Event()
+    release.set()
+    manager = _manager(_cooperative_runner(release))
+    try:
+        job = manager.submit("menu.db", {"horizon_days": 3})
+        assert _wait_until(lambda: manager.get(job.id).status == "succeeded")
+
+        payload = manager.get(job.id).to_dict()
+        assert payload["progress"] == {"stage": "fill", "day_index": 2, "horizon_days": 3}
+        assert payload["result"] == {"days": [0, 1, 2]}
+        assert "result" not in manager.get(job.id).to_dict(include_result=False)
+    finally:
+        manager.shutdown()
+
+
+def test_plan_job_cancel_is_cooperative_and_queued_jobs_are_dropped():
+    release = threading.Event()
+    manager = _manager(_cooperative_runner(release))
+    try:
+        running = manager.submit("menu.db", {"horizon_days": 1000})
+        queued = manager.submit("menu.db", {"horizon_days": 1})
+        assert _wait_until(lambda: manager.get(running.id).status == "running")
+
+        assert manager.cancel(queued.id).status == "cancelled"
+        manager.cancel(running.id)
+        assert _wait_until(lambda: manager.get(running.id).status == "cancelled")
+        assert manager.get(running.id).to_dict()["errors"][0]["code"] == "PLAN_CANCELLED"
+    finally:
+        release.set()
+        manager.shutdown()
+
+
+def test_plan_job_limits_pending_and_evicts_finished_after_ttl(monkeypatch):
+    release = threading.Event()
+    manager = _manager(_cooperative_runner(release), max_pending=1, ttl_seconds=60)
+    monkeypatch.setattr(plan_jobs, "PLAN_JOBS", manager)
+    try:
+        job = manager.submit("menu.db", {"horizon_days": 1000})
+        with pytest.raises(HTTPException) as exc:
+            plan_job_routes.submit_plan_job(cfg={"horizon_days": 5}, db_path="menu.db")
+        assert exc.value.status_code == 429
+        assert exc.value.headers["Retry-After"]
+
+        plan_job_routes.cancel_plan_job(job.id)
+        assert _wait_until(lambda: manager.get(job.id).finished)
+        manager.get(job.id).finished_at -= 120
+        with pytest.raises(HTTPException) as exc:
+            plan_job_routes.get_plan_job(job.id)
+        assert exc.value.status_code == 404
+    finally:
+        release.set()
+        manager.shutdown()
+
+
+def test_plan_jobs_share_scheduler_slots_with_sync_requests():
+    release = threading.Event()
+    release.set()
+    scheduler = _scheduler(max_concurrency=1)
+    manager = _manager(_cooperative_runner(release), scheduler=scheduler, max_workers=2)
+    try:
+        with scheduler.slot("alice"):
+            waiting = manager.submit("menu.db", {"horizon_days": 2})
+            cancelled = manager.submit("menu.db", {"horizon_days": 2})
+            # 名額被同步請求佔用時，背景工作只排隊、不另開 process
+            assert _wait_until(lambda: scheduler.stats()["waiting"] == 2)
+            assert manager.get(waiting.id).status == "queued"
+            manager.cancel(cancelled.id)
+            assert _wait_until(lambda: manager.get(cancelled.id).status == "cancelled")
+            assert scheduler.stats()["waiting"] == 1
+
+        assert _wait_until(lambda: manager.get(waiting.id).status == "succeeded")
+        assert scheduler.stats()["active"] == 0
+    finally:
+        manager.shutdown()
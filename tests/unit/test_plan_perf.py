@@ -0,0 +1,91 @@
+import logging
+import sqlite3
+
+from src.menu_planner.api.export_cache import export_cache_key
+from src.menu_planner.api.procurement import attach_procurement_details
+from src.menu_planner.config.loader import load_defaults
+from src.menu_planner.db.repo import SQLiteRepo
+from src.menu_planner.engine import perf
+from src.menu_planner.engine.perf import PerfRecorder, log_perf, recording
+from src.menu_planner.engine.planner import plan_month
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT NOT NULL,
+                                      protein_group TEXT, default_unit TEXT NOT NULL);
+            CREATE TABLE dishes (id TEXT PRIMARY KEY, name TEXT NOT NULL, role TEXT NOT NULL, cuisine TEXT,
+                                 meat_type TEXT, tags_json TEXT NOT NULL DEFAULT '[]');
+            CREATE TABLE dish_ingredients (dish_id TEXT, ingredient_id TEXT, qty REAL, unit TEXT);
+            CREATE TABLE ingredient_prices (ingredient_id TEXT, price_date TEXT, price_per_unit REAL, unit TEXT);
+            CREATE TABLE inventory (ingredient_id TEXT PRIMARY KEY, qty_on_hand REAL NOT NULL, unit TEXT NOT NULL,
+                                    updated_at TEXT NOT NULL, expiry_date TEXT);
+            INSERT INTO ingredients VALUES ('ing_a', '豆腐', 'soy', NULL, 'g');
+            INSERT INTO ingredients VALUES ('ing_b', '雞腿', 'meat', 'chicken', 'g');
+            INSERT INTO dishes VALUES ('m1', '紅燒豆腐', 'main', 'tw', NULL, '[]');
+            INSERT INTO dishes VALUES ('m2', '烤雞腿', 'main', 'tw', 'chicken', '[]');
+            INSERT INTO dish_ingredients VALUES ('m1', 'ing_a', 100, 'g');
+            INSERT INTO dish_ingredients VALUES ('m2', 'ing_b', 150, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-03-01', 0.1, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_b', '2026-03-01', 0.3, 'g');
+            """
+        )
+
+
+def _cfg():
+    cfg = load_defaults()
+    cfg["start_date"] = "2026-03-02"
+    cfg["horizon_days"] = 5
+    cfg["seed"] = 7
+    cfg["hard"]["no_consecutive_same_main_meat"] = False
+    cfg["hard"]["weekly_max_main_meat"] = {}
+    cfg["hard"]["repeat_limits"]["max_same_main_in_30_days"] = 5
+    return cfg
+
+
+def test_recorder_accumulates_spans_and_counters_only_while_recording():
+    perf.count("ignored")  # 沒有啟用記錄器時不做事
+    with perf.span("ignored"):
+        pass
+
+    with recording() as rec:
+        for _ in range(2):
+            with perf.span("fill"):
+                perf.count("dfs.leaves", 3)
+    out = rec.as_dict()
+    assert out["spans"]["fill"]["calls"] == 2
+    assert out["spans"]["fill"]["wall_ms"] >= 0
+    assert out["counters"] == {"dfs.leaves": 6}
+
+    extra = PerfRecorder()
+    with extra.span("procurement"):
+        extra.count("dfs.leaves")
+    result = {"debug": {"perf": out}}
+    extra.merge_into(result)
+    assert set(result["debug"]["perf"]["spans"]) == {"fill", "procurement"}
+    assert result["debug"]["perf"]["counters"]["dfs.leaves"] == 7
+
+
+def test_plan_month_reports_phase_timings_and_search_counters(tmp_path, caplog):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+
+    result = plan_month(db_path=db_path, cfg=_cfg())
+    report = result["debug"]["perf"]
+    assert {"context", "mains", "fill", "explain"} <= set(report["spans"])
+    assert report["counters"]["beam.expansions"] > 0
+    assert report["counters"]["check.main_hard"] > 0
+    assert report["total_ms"] >= report["spans"]["mains"]["wall_ms"]
+
+    enriched = attach_procurement_details(result=result, cfg=_cfg(), repo=SQLiteRepo(db_path))
+    assert enriched["debug"]["perf"]["spans"]["procurement"]["calls"] == 1
+    # 計時不影響匯出快取 key
+    without_perf = {**enriched, "debug": {k: v for k, v in enriched["debug"].items() if k != "perf"}}
+    assert export_cache_key(_cfg(), enriched, "cat") == export_cache_key(_cfg(), without_perf, "cat")
+
+    with caplog.at_level(logging.DEBUG, logger="src.menu_planner.engine.perf"):
+        log_perf("plan_month", report)
+    assert "plan_month perf total=" in caplog.text
+    assert "check.main_hard=" in caplog.text
@@ -0,0 +1,209 @@
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from types import SimpleNamespace
+
+from src.menu_planner.api import plan_scheduler
+from src.menu_planner.api.plan_replan import parse_replan_payload
+from src.menu_planner.api.plan_scheduler import PlanScheduler
+from src.menu_planner.api.result_compact import compact_result
+from src.menu_planner.api.routes.plan_replan import post_plan_replan
+from src.menu_planner.config.loader import compile_plan_config, load_defaults
+from src.menu_planner.db.repo import Dish
+from src.menu_planner.engine.backtracking import plan_mains_beam
+from src.menu_planner.engine.constraints import PlanDay
+from src.menu_planner.engine.errors import PlanError
+from src.menu_planner.engine.features import DishFeatures
+from src.menu_planner.engine.planner import plan_month
+from src.menu_planner.engine.replan import find_boundary_conflicts, replan_month
+
+
+def _main(dish_id: str, meat_type: str) -> Dish:
+    return Dish(id=dish_id, name=dish_id, role="main", cuisine="tw", meat_type=meat_type, tags=[])
+
+
+def _feat(dish_id: str, meat_type: str) -> DishFeatures:
+    return DishFeatures(
+        dish_id=dish_id,
+        role="main",
+        meat_type=meat_type,
+        cuisine="tw",
+        cost_per_serving=10.0,
+        inventory_hit_ratio=0.0,
+        near_expiry_days_min=None,
+        used_inventory_ingredients=[],
+    )
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              category TEXT NOT NULL,
+              protein_group TEXT,
+              default_unit TEXT NOT NULL
+            );
+            CREATE TABLE dishes (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              role TEXT NOT NULL,
+              cuisine TEXT,
+              meat_type TEXT,
+              tags_json TEXT NOT NULL DEFAULT '[]'
+            );
+            CREATE TABLE dish_ingredients (dish_id TEXT, ingredient_id TEXT, qty REAL, unit TEXT);
+            CREATE TABLE ingredient_prices (ingredient_id TEXT, price_date TEXT, price_per_unit REAL, unit TEXT);
+            CREATE TABLE inventory (
+              ingredient_id TEXT PRIMARY KEY,
+              qty_on_hand REAL NOT NULL,
+              unit TEXT NOT NULL,
+              updated_at TEXT NOT NULL,
+              expiry_date TEXT
+            );
+            INSERT INTO ingredients VALUES ('ing_a', '豆腐', 'soy', NULL, 'g');
+            INSERT INTO ingredients VALUES ('ing_b', '雞腿', 'meat', 'chicken', 'g');
+            INSERT INTO dishes VALUES ('m1', '紅燒豆腐', 'main', 'tw', NULL, '[]');
+            INSERT INTO dishes VALUES ('m2', '烤雞腿', 'main', 'tw', 'chicken', '[]');
+            INSERT INTO dish_ingredients VALUES ('m1', 'ing_a', 100, 'g');
+            INSERT INTO dish_ingredients VALUES ('m2', 'ing_b', 150, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-03-01', 0.1, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_b', '2026-03-01', 0.3, 'g');
+            """
+        )
+
+
+def _cfg(**overrides):
+    cfg = load_defaults()
+    cfg["start_date"] = "2026-03-02"
+    cfg["horizon_days"] = 5
+    cfg["seed"] = 7
+    # 目錄只有兩道主菜：放寬主菜重複與週配額
+    cfg["hard"]["no_consecutive_same_main_meat"] = False
+    cfg["hard"]["weekly_max_main_meat"] = {}
+    cfg["hard"]["repeat_limits"]["max_same_main_in_30_days"] = 5
+    cfg.update(overrides)
+    return cfg
+
+
+def test_beam_keeps_fixed_mains_and_skips_blocked_candidates():
+    mains = [_main("pork1", "pork"), _main("pork2", "pork"), _main("chicken1", "chicken"), _main("fish1", "fish"), _main("fish2", "fish")]
+    feat = {d.id: _feat(d.id, d.meat_type) for d in mains}
+
+    out = plan_mains_beam(
+        horizon_days=4,
+        mains=mains,
+        feat=feat,
+        hard={"no_consecutive_same_main_meat": True},
+        beam_width=4,
+        candidate_limit=10,
+        start_date=date(2026, 3, 2),
+        fixed_main_ids={0: "pork1", 2: "chicken1", 3: "fish1"},
+        blocked_by_day={1: {"fish1"}},
+    )
+
+    # 第 1 天前後是豬、雞（之後的固定日也要檢查連續同肉），魚 fish1 被封鎖
+    assert out == ["pork1", "fish2", "chicken1", "fish1"]
+
+
+def test_boundary_conflicts_are_attributed_to_replanned_days_only():
+    cfg = load_defaults()
+    cfg["hard"]["repeat_limits"] = {**cfg["hard"].get("repeat_limits", {}), "max_same_soup_in_7_days": 1}
+    ctx = SimpleNamespace(config=compile_plan_config(cfg), dish_ingredient_ids={})
+
+    def day(soup: str) -> PlanDay:
+        return PlanDay(main="m", sides=[], veg="", soup=soup, fruit="")
+
+    plan = [day("s_old"), day("s_old"), day("s_new"), day("s_new")]
+    conflicts = find_boundary_conflicts(ctx, plan, replanned={2})
+
+    assert [(c.day_index, c.kind, c.keys, c.replanned_days) for c in conflicts] == [(3, "soup", ["s_new"], [2])]
+    # 第 0、1 天原本就重複，不算重排造成的衝突
+    assert conflicts[0].to_error()["code"] == "REPLAN_BOUNDARY_CONFLICT"
+
+
+def test_replan_month_only_changes_requested_days(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    cfg = _cfg()
+    base = plan_month(db_path=db_path, cfg=cfg)
+
+    out = replan_month(db_path=db_path, cfg={**cfg, "seed": 11}, base_result=base, start_index=1, end_index=3, locked_indices=[2])
+
+    assert [d["date"] for d in out["days"]] == [d["date"] for d in base["days"]]
+    for i in (0, 2, 4):
+        assert out["days"][i] == base["days"][i]
+    assert out["debug"]["replan"]["replanned_days"] == [1, 3]
+    assert out["debug"]["replan"]["locked_days"] == [2]
+    assert out["debug"]["local_search_enabled"] is False
+
+    try:
+        replan_month(db_path=db_path, cfg=cfg, base_result=base, start_index=2, end_index=2, locked_indices=[2])
+    except PlanError as e:
+        assert e.code == "REPLAN_EMPTY_RANGE"
+    else:
+        raise AssertionError("expected REPLAN_EMPTY_RANGE")
+
+
+def test_parse_replan_payload_maps_dates_to_indices():
+    result = {"days": [{"date": f"2026-03-0{i + 2}", "day_index": i} for i in range(5)]}
+    cfg = load_defaults()
+    cfg.pop("start_date", None)
+    cfg.pop("horizon_days", None)
+
+    request, errs = parse_replan_payload({
+        "cfg": cfg,
+        "result": result,
+        "range": {"start": "2026-03-03", "end": "2026-03-05"},
+        "locked_dates": ["2026-03-04"],
+    })
+    assert errs == []
+    assert request["cfg"]["start_date"] == "2026-03-02"
+    assert request["cfg"]["horizon_days"] == 5
+    assert (request["start_index"], request["end_index"], request["locked_indices"]) == (1, 3, [2])
+
+    _, errs = parse_replan_payload({"cfg": cfg, "result": result, "range": {"start": "2026-03-05", "end": "2026-03-03"}})
+    assert errs[0]["code"] == "REPLAN_RANGE_INVALID"
+    _, errs = parse_replan_payload({"cfg": cfg})
+    assert errs[0]["code"] == "REPLAN_INVALID"
+
+
+def _replan_via_route(monkeypatch, db_path, result):
+    monkeypatch.setattr(
+        plan_scheduler,
+        "PLAN_SCHEDULER",
+        PlanScheduler(max_concurrency=1, executor_factory=lambda n: ThreadPoolExecutor(max_workers=n)),
+    )
+    response = post_plan_replan(
+        {"cfg": _cfg(seed=11), "result": result, "range": {"start": "2026-03-03", "end": "2026-03-04"}},
+        db_path=db_path,
+        client="ip:test",
+    )
+    return json.loads(response.body)
+
+
+def test_replan_route_wraps_result_like_plan(monkeypatch, tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    base = plan_month(db_path=db_path, cfg=_cfg())
+
+    payload = _replan_via_route(monkeypatch, db_path, base)
+
+    assert payload["ok"] is True
+    assert payload["result"]["debug"]["replan"]["replanned_days"] == [1, 2]
+    assert payload["result"]["days"][0]["items"] == base["days"][0]["items"]
+
+
+def test_replan_route_accepts_compact_result(monkeypatch, tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    base = plan_month(db_path=db_path, cfg=_cfg())
+
+    payload = _replan_via_route(monkeypatch, db_path, compact_result(base))
+
+    assert payload["ok"] is True
+    assert payload["result"]["debug"]["replan"]["replanned_days"] == [1, 2]
+    assert payload["result"]["days"][0]["items"] == base["days"][0]["items"]
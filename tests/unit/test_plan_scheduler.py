@@ -0,0 +1,149 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi import HTTPException
+
+from src.menu_planner.api import main, plan_scheduler
+from src.menu_planner.api.plan_scheduler import PlanScheduler, PlanSchedulerBusy, plan_task, unwrap_task_result
+from src.menu_planner.config.loader import load_defaults
+from src.menu_planner.engine.errors import PlanError
+
+
+def _scheduler(**kwargs):
+    kwargs.setdefault("max_concurrency", 1)
+    return PlanScheduler(executor_factory=lambda n: ThreadPoolExecutor(max_workers=n), **kwargs)
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def _queue_waiter(scheduler, client, order, threads):
+    before = scheduler.stats()["waiting"]
+
+    def work():
+        with scheduler.slot(client):
+            order.append(client)
+
+    t = threading.Thread(target=work)
+    t.start()
+    threads.append(t)
+    assert _wait_until(lambda: scheduler.stats()["waiting"] == before + 1)
+
+
+def test_scheduler_grants_waiting_clients_round_robin():
+    scheduler = _scheduler(max_queue=10, max_queued_per_client=5)
+    order, threads = [], []
+
+    with scheduler.slot("holder"):
+        for client in ("alice", "alice", "alice", "bob"):
+            _queue_waiter(scheduler, client, order, threads)
+    for t in threads:
+        t.join(5.0)
+
+    # alice 先排了三件，bob 仍在 alice 的第二件之前放行
+    assert order == ["alice", "bob", "alice", "alice"]
+    assert scheduler.stats()["active"] == 0
+
+
+def test_scheduler_rejects_when_queue_or_client_quota_is_full():
+    scheduler = _scheduler(max_queue=2, max_queued_per_client=1)
+    order, threads = [], []
+
+    with scheduler.slot("holder"):
+        _queue_waiter(scheduler, "alice", order, threads)
+        with pytest.raises(PlanSchedulerBusy, match="等待"):
+            scheduler.check_admission("alice")
+        _queue_waiter(scheduler, "bob", order, threads)
+        with pytest.raises(PlanSchedulerBusy) as exc:
+            scheduler.check_admission("carol")
+        assert exc.value.retry_after >= 1
+    for t in threads:
+        t.join(5.0)
+
+    assert scheduler.stats()["rejected"] == 2
+    scheduler.check_admission("carol")
+
+
+def test_scheduler_times_out_waiting_requests():
+    scheduler = _scheduler(queue_timeout_seconds=0.05)
+
+    with scheduler.slot("holder"):
+        with pytest.raises(PlanSchedulerBusy, match="逾時"):
+            with scheduler.slot("alice"):
+                pass
+
+    assert scheduler.stats()["waiting"] == 0
+    assert scheduler.stats()["waiting_clients"] == 0
+
+
+def test_run_restores_plan_errors_from_worker(monkeypatch):
+    def fake_plan_month(db_path, cfg):
+        raise PlanError(code="NO_MAIN", message="沒有主菜", day_index=3)
+
+    monkeypatch.setattr(plan_scheduler, "plan_month", fake_plan_month)
+    scheduler = _scheduler()
+
+    with pytest.raises(PlanError) as exc:
+        unwrap_task_result(scheduler.run("alice", plan_task, "menu.db", {}))
+
+    assert exc.value.to_dict() == {"code": "NO_MAIN", "message": "沒有主菜", "day_index": 3}
+    assert scheduler.stats()["completed"] == 1
+
+
+def test_post_plan_returns_429_with_retry_after_when_busy(monkeypatch):
+    scheduler = _scheduler(max_queue=0)
+    monkeypatch.setattr(plan_scheduler, "PLAN_SCHEDULER", scheduler)
+    cfg = load_defaults()
+    cfg["seed"] = "random"
+
+    with scheduler.slot("holder"):
+        with pytest.raises(HTTPException) as exc:
+            main.post_plan(cfg=cfg, db_path="menu.db", client="ip:test")
+
+    assert exc.value.status_code == 429
+    assert exc.value.detail["errors"][0]["code"] == "PLAN_BUSY"
+    assert int(exc.value.headers["Retry-After"]) >= 1
+
+
+class _BrokenPool(ThreadPoolExecutor):
+    """模擬 worker 被殺掉後的 ProcessPoolExecutor：之後送出的工作都得到 BrokenProcessPool。"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+
+def test_run_replaces_broken_process_pool_and_maps_to_503(monkeypatch):
+    monkeypatch.setattr(plan_scheduler, "plan_month", lambda db_path, cfg: {"ok": True, "days": []})
+    pools = []
+
+    def factory(n):
+        pools.append(_BrokenPool(max_workers=n) if not pools else ThreadPoolExecutor(max_workers=n))
+        return pools[-1]
+
+    scheduler = PlanScheduler(max_concurrency=1, executor_factory=factory)
+    monkeypatch.setattr(plan_scheduler, "PLAN_SCHEDULER", scheduler)
+    cfg = load_defaults()
+    cfg["seed"] = "random"
+
+    with pytest.raises(HTTPException) as exc:
+        main.post_plan(cfg=cfg, db_path="menu.db", client="ip:test")
+    assert exc.value.status_code == 503
+    assert exc.value.detail["errors"][0]["code"] == "PLAN_WORKER_CRASHED"
+    assert int(exc.value.headers["Retry-After"]) >= 1
+    assert pools[0]._shutdown
+
+    # 下一次呼叫建立新的 pool，不必重啟 API
+    assert unwrap_task_result(scheduler.run("alice", plan_task, "menu.db", {})) == {"ok": True, "days": []}
+    assert len(pools) == 2
+    assert scheduler.stats()["active"] == 0
@@ -0,0 +1,160 @@
+import json
+import sqlite3
+import threading
+from datetime import date
+
+from src.menu_planner.api.plan_stream import stream_plan_events
+from src.menu_planner.db.repo import Dish
+from src.menu_planner.engine.backtracking import fill_days_after_mains
+from src.menu_planner.engine.errors import PlanError
+from src.menu_planner.engine.features import DishFeatures
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              category TEXT NOT NULL,
+              protein_group TEXT,
+              default_unit TEXT NOT NULL
+            );
+            CREATE TABLE dishes (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              role TEXT NOT NULL,
+              cuisine TEXT,
+              meat_type TEXT,
+              tags_json TEXT NOT NULL DEFAULT '[]'
+            );
+            CREATE TABLE dish_ingredients (dish_id TEXT, ingredient_id TEXT, qty REAL, unit TEXT);
+            CREATE TABLE ingredient_prices (ingredient_id TEXT, price_date TEXT, price_per_unit REAL, unit TEXT);
+            CREATE TABLE inventory (
+              ingredient_id TEXT PRIMARY KEY,
+              qty_on_hand REAL NOT NULL,
+              unit TEXT NOT NULL,
+              updated_at TEXT NOT NULL,
+              expiry_date TEXT
+            );
+            INSERT INTO ingredients VALUES ('ing_a', '豆腐', 'soy', NULL, 'g');
+            INSERT INTO dishes VALUES ('m1', '紅燒豆腐', 'main', 'tw', NULL, '[]');
+            INSERT INTO dish_ingredients VALUES ('m1', 'ing_a', 100, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-03-01', 0.1, 'g');
+            """
+        )
+
+
+def _day(i: int) -> dict:
+    return {"date": f"2026-03-0{i + 2}", "day_index": i, "items": {"main": {"id": "m1", "name": "紅燒豆腐"}}}
+
+
+def _decode(lines):
+    return [json.loads(line) for line in lines]
+
+
+def test_stream_emits_days_with_procurement_before_final_result(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+
+    def runner(db_path, cfg, progress, on_event):
+        progress("mains", 0)
+        on_event("mains", {"attempt": 0, "days": [{"day_index": 0}, {"day_index": 1}]})
+        for i in range(2):
+            progress("fill", i)
+            on_event("day", {"attempt": 0, "provisional": True, "day": _day(i)})
+        return {"ok": True, "errors": [], "summary": {"days": 2}, "days": [_day(0), _day(1)]}
+
+    events = _decode(stream_plan_events(db_path, {"people": 10}, runner=runner))
+
+    assert [e["event"] for e in events] == ["stage", "mains", "stage", "day", "day", "result"]
+    assert events[3]["day"]["procurement"]["day_total"] == 100.0
+    final = events[-1]
+    assert final["ok"] is True
+    assert final["result"]["summary"]["people"] == 10
+    assert final["result"]["days"][1]["procurement"]["dishes"][0]["dish_id"] == "m1"
+
+
+def test_stream_reports_plan_error_as_event(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+
+    def runner(db_path, cfg, progress, on_event):
+        raise PlanError(code="NO_MAIN", message="沒有主菜")
+
+    events = _decode(stream_plan_events(db_path, {}, runner=runner))
+
+    assert events == [{"event": "error", "ok": False, "errors": [PlanError(code="NO_MAIN", message="沒有主菜").to_dict()]}]
+
+
+def test_closing_stream_cancels_running_plan(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    stopped = threading.Event()
+    outcome = {}
+
+    def runner(db_path, cfg, progress, on_event):
+        try:
+            day = 0
+            while True:
+                progress("fill", day)
+                on_event("day", {"attempt": 0, "provisional": True, "day": _day(day % 2)})
+                day += 1
+        except Exception as e:
+            outcome["error"] = e
+            raise
+        finally:
+            stopped.set()
+
+    stream = stream_plan_events(db_path, {}, runner=runner)
+    assert json.loads(next(stream))["event"] == "stage"
+    stream.close()
+
+    assert stopped.wait(5.0)
+    assert outcome["error"].code == "PLAN_CANCELLED"
+
+
+def _mk_dish(dish_id: str, role: str) -> Dish:
+    return Dish(id=dish_id, name=dish_id, role=role, cuisine="tw", meat_type=None, tags=[])
+
+
+def _mk_feat(dish_id: str, role: str) -> DishFeatures:
+    return DishFeatures(
+        dish_id=dish_id,
+        role=role,
+        meat_type="pork" if role == "main" else None,
+        cuisine="tw",
+        cost_per_serving=10.0,
+        inventory_hit_ratio=0.0,
+        near_expiry_days_min=None,
+        used_inventory_ingredients=[],
+    )
+
+
+def test_fill_days_after_mains_reports_each_settled_day_through_on_day():
+    by_role = {
+        role: [f"{role}_{i}" for i in range(count)]
+        for role, count in (("main", 2), ("side", 4), ("veg", 2), ("soup", 2), ("fruit", 2))
+    }
+    feat = {dish_id: _mk_feat(dish_id, role) for role, ids in by_role.items() for dish_id in ids}
+    committed = []
+
+    plan_days, _score, explanations, errors = fill_days_after_mains(
+        horizon_days=2,
+        main_ids=by_role["main"],
+        sides=[_mk_dish(x, "side") for x in by_role["side"]],
+        vegs=[_mk_dish(x, "veg") for x in by_role["veg"]],
+        soups=[_mk_dish(x, "soup") for x in by_role["soup"]],
+        fruits=[_mk_dish(x, "fruit") for x in by_role["fruit"]],
+        feat=feat,
+        hard={"seed": 7, "cost_range_per_person_per_day": {"min": 0, "max": 999}},
+        weights={},
+        soft={},
+        dish_ingredient_ids={dish_id: {f"ing_{dish_id}"} for dish_id in feat},
+        start_date=date(2026, 5, 1),
+        on_day=lambda i, d, detail: committed.append((i, d, detail)),
+    )
+
+    assert errors == []
+    assert committed == [(0, plan_days[0], explanations[0]), (1, plan_days[1], explanations[1])]
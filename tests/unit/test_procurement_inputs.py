@@ -0,0 +1,106 @@
+import sqlite3
+
+from src.menu_planner.api.procurement import ProcurementTable
+from src.menu_planner.db import catalog_cache
+from src.menu_planner.db.catalog_cache import CachedSQLiteRepo, CatalogSnapshotCache
+from src.menu_planner.db.repo import SQLiteRepo
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              category TEXT NOT NULL,
+              protein_group TEXT,
+              default_unit TEXT NOT NULL
+            );
+            CREATE TABLE dishes (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              role TEXT NOT NULL,
+              cuisine TEXT,
+              meat_type TEXT,
+              tags_json TEXT NOT NULL DEFAULT '[]'
+            );
+            CREATE TABLE dish_ingredients (dish_id TEXT, ingredient_id TEXT, qty REAL, unit TEXT);
+            CREATE TABLE ingredient_prices (ingredient_id TEXT, price_date TEXT, price_per_unit REAL, unit TEXT);
+            CREATE TABLE inventory (
+              ingredient_id TEXT PRIMARY KEY,
+              qty_on_hand REAL NOT NULL,
+              unit TEXT NOT NULL,
+              updated_at TEXT NOT NULL,
+              expiry_date TEXT
+            );
+            INSERT INTO ingredients VALUES ('ing_a', '豆腐', 'soy', NULL, 'g');
+            INSERT INTO ingredients VALUES ('ing_b', '雞腿', 'meat', 'chicken', 'g');
+            INSERT INTO ingredients VALUES ('ing_c', '高麗菜', 'veg', NULL, 'g');
+            INSERT INTO dishes VALUES ('m1', '紅燒豆腐', 'main', 'tw', NULL, '[]');
+            INSERT INTO dishes VALUES ('m2', '烤雞腿', 'main', 'tw', 'chicken', '[]');
+            INSERT INTO dishes VALUES ('v1', '炒高麗菜', 'veg', 'tw', NULL, '[]');
+            INSERT INTO dish_ingredients VALUES ('m1', 'ing_b', 20, 'g');
+            INSERT INTO dish_ingredients VALUES ('m1', 'ing_a', 100, 'g');
+            INSERT INTO dish_ingredients VALUES ('m2', 'ing_b', 150, 'g');
+            INSERT INTO dish_ingredients VALUES ('v1', 'ing_c', 80, 'g');
+            INSERT INTO dish_ingredients VALUES ('m1', 'ing_missing', 5, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-02-01', 0.08, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-03-01', 0.1, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_b', '2026-03-01', 0.3, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_c', '2026-03-01', 0.05, 'g');
+            """
+        )
+
+
+def test_fetch_procurement_inputs_loads_only_referenced_ingredients_with_latest_price(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    monkeypatch.setattr(catalog_cache, "CATALOG_CACHE", CatalogSnapshotCache(max_entries=2))
+
+    direct = SQLiteRepo(db_path).fetch_procurement_inputs(["m1"])
+    assert [(di.dish_id, di.ingredient_id) for di in direct.dish_ingredients] == [
+        ("m1", "ing_a"), ("m1", "ing_b"), ("m1", "ing_missing"),
+    ]
+    assert set(direct.ingredients) == {"ing_a", "ing_b"}
+    assert direct.prices["ing_a"].price_per_unit == 0.1
+    assert set(direct.prices) == {"ing_a", "ing_b"}
+
+    cached = CachedSQLiteRepo(db_path).fetch_procurement_inputs(["m1"])
+    assert sorted((di.dish_id, di.ingredient_id) for di in cached.dish_ingredients) == sorted(
+        (di.dish_id, di.ingredient_id) for di in direct.dish_ingredients
+    )
+    assert cached.ingredients == direct.ingredients
+    assert cached.prices == direct.prices
+
+    everything = SQLiteRepo(db_path).fetch_procurement_inputs()
+    assert len(everything.dish_ingredients) == 5
+    assert set(everything.ingredients) == {"ing_a", "ing_b", "ing_c"}
+
+
+def test_procurement_table_groups_lines_by_day_and_week():
+    def day(date, people, lines):
+        return {
+            "date": date,
+            "procurement": {
+                "people": people,
+                "dishes": [{"ingredients": [
+                    {"ingredient_id": iid, "ingredient_name": iid, "qty_unit": "g", "unit_price_unit": "g",
+                     "unit_price": 0.1, "qty_for_people": qty, "line_total": qty * 0.1}
+                    for iid, qty in lines
+                ]}],
+            },
+        }
+
+    days = [day(f"2026-03-{i + 2:02d}", 10, [("ing_a", 100), ("ing_b", 50), ("ing_a", 20)]) for i in range(8)]
+    days.insert(3, {"date": "2026-03-05-skip"})
+    table = ProcurementTable.from_days(days)
+
+    assert len(table) == 24
+    assert table.day_dates[3] == "2026-03-05"
+    by_day = table.group_sum(("day_pos", "ingredient_id"))
+    assert by_day[(0, "ing_a")] == (120.0, 12.0)
+    by_week = table.group_sum(("week", "ingredient_id"))
+    assert list(by_week) == [(0, "ing_a"), (0, "ing_b"), (1, "ing_a"), (1, "ing_b")]
+    assert by_week[(0, "ing_b")][0] == 350.0
+    assert by_week[(1, "ing_a")][0] == 120.0
@@ -0,0 +1,126 @@
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+from openpyxl import Workbook
+
+from src.menu_planner.api.export_excel_sheets import append_procurement_rollup_sheet
+from src.menu_planner.api.procurement import attach_procurement_details
+from src.menu_planner.api.procurement_rollup import build_procurement_rollup
+from src.menu_planner.api.routes.procurement import post_procurement_rollup
+from src.menu_planner.db import catalog_cache
+from src.menu_planner.db.catalog_cache import CatalogSnapshotCache
+from src.menu_planner.db.repo import SQLiteRepo
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              category TEXT NOT NULL,
+              protein_group TEXT,
+              default_unit TEXT NOT NULL
+            );
+            CREATE TABLE dishes (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              role TEXT NOT NULL,
+              cuisine TEXT,
+              meat_type TEXT,
+              tags_json TEXT NOT NULL DEFAULT '[]'
+            );
+            CREATE TABLE dish_ingredients (dish_id TEXT, ingredient_id TEXT, qty REAL, unit TEXT);
+            CREATE TABLE inventory (
+              ingredient_id TEXT PRIMARY KEY,
+              qty_on_hand REAL NOT NULL,
+              unit TEXT NOT NULL,
+              updated_at TEXT NOT NULL,
+              expiry_date TEXT
+            );
+            CREATE TABLE ingredient_prices (ingredient_id TEXT, price_date TEXT, price_per_unit REAL, unit TEXT);
+            INSERT INTO ingredients VALUES ('ing_a', '豆腐', 'soy', NULL, 'g');
+            INSERT INTO ingredients VALUES ('ing_b', '雞腿', 'meat', 'chicken', 'g');
+            INSERT INTO dish_ingredients VALUES ('m1', 'ing_a', 100, 'g');
+            INSERT INTO dish_ingredients VALUES ('m2', 'ing_b', 150, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-01-01', 0.05, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-03-01', 0.1, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-03-05', 0.2, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_a', '2026-06-01', 0.9, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_b', '2026-03-10', 0.3, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_b', '2026-04-10', 0.4, 'g');
+            """
+        )
+
+
+def _result(dates):
+    days = []
+    for i, d in enumerate(dates):
+        main = {"id": "m1" if i % 2 == 0 else "m2", "name": "主菜"}
+        days.append({"date": d, "day_index": i, "items": {"main": main, "sides": [], "veg": {}, "soup": {}, "fruit": {}}})
+    return {"days": days}
+
+
+def _line(day):
+    return day["procurement"]["dishes"][0]["ingredients"][0]
+
+
+def test_procurement_prices_each_day_as_of_its_date(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    dates = ["2026-03-02", "2026-03-03", "2026-03-04", "2026-03-05", "2026-03-06"]
+
+    inputs = SQLiteRepo(db_path).fetch_procurement_inputs(["m1", "m2"], (dates[0], dates[-1]))
+    assert [p.price_date for p in inputs.price_history["ing_a"]] == ["2026-01-01", "2026-03-01", "2026-03-05"]
+    assert [p.price_date for p in inputs.price_history["ing_b"]] == ["2026-03-10"]
+
+    out = attach_procurement_details(_result(dates), {"people": 10}, SQLiteRepo(db_path))
+    days = out["days"]
+    assert (_line(days[0])["unit_price"], _line(days[0])["price_date"]) == (0.1, "2026-03-01")
+    assert (_line(days[4])["unit_price"], _line(days[4])["price_date"]) == (0.2, "2026-03-05")
+    # 當日前還沒有雞腿價格：以最早一筆計價
+    assert (_line(days[1])["unit_price"], _line(days[1])["line_total"]) == (0.3, 450.0)
+
+
+def test_rollup_consolidates_weeks_periods_and_ingredients(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    dates = [f"2026-03-{d:02d}" for d in range(2, 12)]
+    result = attach_procurement_details(_result(dates), {"people": 10}, SQLiteRepo(db_path))
+
+    rollup = build_procurement_rollup(result, period_days=3)
+
+    assert [len(day["lines"]) for day in rollup["days"]] == [1] * 10
+    assert [(w["week"], w["start_date"], w["end_date"]) for w in rollup["weeks"]] == [
+        (1, "2026-03-02", "2026-03-08"), (2, "2026-03-09", "2026-03-11"),
+    ]
+    assert [p["period"] for p in rollup["periods"]] == [1, 2, 3, 4]
+    tofu = next(line for line in rollup["weeks"][0]["lines"] if line["ingredient_id"] == "ing_a")
+    assert tofu["qty"] == 4000.0
+    assert tofu["total"] == round(1000 * 0.1 * 2 + 1000 * 0.2 * 2, 2)
+    assert rollup["grand_total"] == round(sum(d["procurement"]["day_total"] for d in result["days"]), 2)
+    assert rollup["grand_total"] == round(sum(w["total"] for w in rollup["weeks"]), 2)
+    assert rollup["grand_total"] == round(sum(line["total"] for line in rollup["ingredients"]), 2)
+
+    wb = Workbook()
+    append_procurement_rollup_sheet(wb, rollup)
+    rows = list(wb["採買週彙總"].iter_rows(values_only=True))
+    assert rows[-1][2:] == ("全部合計", "", "", rollup["grand_total"])
+
+
+def test_rollup_route_prices_uploaded_result_and_validates_period(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    monkeypatch.setattr(catalog_cache, "CATALOG_CACHE", CatalogSnapshotCache(max_entries=2))
+    result = _result(["2026-03-02", "2026-03-03"])
+
+    out = post_procurement_rollup(payload={"result": result, "cfg": {"people": 2}, "period_days": 1}, db_path=db_path)
+    assert out["ok"] is True
+    assert [p["total"] for p in out["rollup"]["periods"]] == [20.0, 90.0]
+
+    with pytest.raises(HTTPException) as exc:
+        post_procurement_rollup(payload={"result": result, "period_days": 0}, db_path=db_path)
+    assert exc.value.status_code == 400
+    assert exc.value.detail["errors"][0]["code"] == "PROCUREMENT_PERIOD_INVALID"
@@ -0,0 +1,86 @@
+import importlib
+import json
+import pstats
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+from src.menu_planner.api.auth import dependencies
+from src.menu_planner.api.auth.auth_store import AuthStore, create_token
+from src.menu_planner.api.profiling import ProfileArtifactStore, ProfileSession, profile_session_for
+
+auth_store_module = importlib.import_module("src.menu_planner.api.auth.auth_store")
+
+
+def _install_temp_auth_store(monkeypatch, tmp_path: Path) -> AuthStore:
+    store = AuthStore(tmp_path / "auth_users.json")
+    monkeypatch.setattr(dependencies, "AUTH_STORE", store)
+    monkeypatch.setattr(auth_store_module, "AUTH_STORE", store)
+    return store
+
+
+def _busy_loop(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def test_cprofile_session_reports_hotspots_and_saves_loadable_artifact(tmp_path):
+    store = ProfileArtifactStore(directory=str(tmp_path), max_bytes=10 * 1024 * 1024)
+    session = ProfileSession("cprofile", "plan", top_n=5, store=store)
+    with session.active():
+        _busy_loop(200_000)
+
+    report = session.report
+    assert report["mode"] == "cprofile" and len(report["hotspots"]) <= 5
+    assert any("_busy_loop" in row["function"] or "<genexpr>" in row["function"] for row in report["hotspots"])
+    assert report["artifact"].endswith(".prof")
+    stats = pstats.Stats(str(store.path(report["artifact"])))
+    assert any(func[2] == "_busy_loop" for func in stats.stats)
+    # 檔名只接受目錄內的檔案
+    assert store.path("../auth_users.json") is None
+
+
+def test_tracemalloc_session_reports_allocation_sites_and_store_is_size_capped(tmp_path):
+    store = ProfileArtifactStore(directory=str(tmp_path), max_bytes=1)
+    session = ProfileSession("tracemalloc", "export_excel", top_n=3, store=store)
+    with session.active():
+        kept = [bytearray(1024) for _ in range(2000)]
+
+    assert session.report["peak_kb"] >= 2000
+    assert any("test_profiling.py:" in row["location"] for row in session.report["hotspots"])
+    # 超過上限的結果檔不保存
+    assert session.report["artifact"] is None
+    assert len(kept) == 2000
+
+    store = ProfileArtifactStore(directory=str(tmp_path), max_bytes=64)
+    first = store.save("plan_cprofile", ".json", json.dumps({"a": "x" * 40}).encode())
+    second = store.save("plan_cprofile", ".json", json.dumps({"b": "y" * 40}).encode())
+    assert [item["name"] for item in store.list()] == [second]
+    assert store.path(first) is None
+
+
+def test_profile_dependency_requires_db_operator(monkeypatch, tmp_path):
+    monkeypatch.setenv("AUTH_BOOTSTRAP_SUPERUSERS", "[]")
+    store = _install_temp_auth_store(monkeypatch, tmp_path)
+    store.register("owner", "Password123!")
+    store.register("editor", "EditorPass123!")
+    store.approve_user("editor", "data_editor", "owner")
+    dependency = profile_session_for("plan")
+
+    # 未指定時不需登入
+    assert dependency(profile=None, authorization=None) is None
+    with pytest.raises(HTTPException) as invalid:
+        dependency(profile="perf", authorization=None)
+    assert invalid.value.status_code == 400
+    with pytest.raises(HTTPException) as anonymous:
+        dependency(profile="cprofile", authorization=None)
+    assert anonymous.value.status_code == 401
+
+    editor_token = create_token(store.authenticate("editor", "EditorPass123!"))
+    with pytest.raises(HTTPException) as forbidden:
+        dependency(profile="cprofile", authorization=f"Bearer {editor_token}")
+    assert forbidden.value.status_code == 403
+
+    owner_token = create_token(store.authenticate("owner", "Password123!"))
+    session = dependency(profile="TraceMalloc", authorization=f"Bearer {owner_token}")
+    assert session.mode == "tracemalloc" and session.endpoint == "plan"
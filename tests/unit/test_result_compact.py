@@ -0,0 +1,74 @@
+import copy
+import json
+
+from src.menu_planner.api.result_compact import (
+    compact_days,
+    compact_result,
+    expand_days,
+    expand_result,
+    parse_result_format,
+)
+
+
+def _dish(did, cost=1.0):
+    return {"id": did, "name": did, "role": "main", "cost": cost, "used_inventory_ingredients": []}
+
+
+def _line(iid, qty):
+    return {"ingredient_id": iid, "qty_for_people": qty, "unit_price": 0.1, "line_total": round(qty * 0.1, 2)}
+
+
+def _day(i, main, lines):
+    return {
+        "date": f"2026-03-{i + 2:02d}",
+        "day_index": i,
+        "items": {"main": main, "mains": [main], "noodle": {**_dish(""), "role": ""}, "noodles": []},
+        "day_cost": main["cost"],
+        "procurement": {"people": 10, "dishes": [{"dish_id": main["id"], "ingredients": lines, "dish_total": 1.0}]},
+    }
+
+
+def _result():
+    shared_lines = [_line("ing_a", 100)]
+    days = [
+        _day(0, _dish("m1"), shared_lines),
+        _day(1, _dish("m2"), [_line("ing_b", 50)]),
+        _day(2, _dish("m1"), shared_lines),
+        # 另一份內容相同的明細（例如從 JSON 載回）也應共用
+        _day(3, _dish("m1"), [_line("ing_a", 100)]),
+        # 同 id 但內容不同：保留完整紀錄
+        _day(4, _dish("m1", cost=9.0), [_line("ing_a", 120)]),
+    ]
+    return {"ok": True, "summary": {"days": 5}, "days": days}
+
+
+def test_compact_result_dedupes_dishes_and_procurement_rows_and_round_trips():
+    result = _result()
+    original = copy.deepcopy(result)
+
+    compact = compact_result(result)
+
+    assert result == original  # 不修改原結果
+    assert compact["format"] == "compact"
+    assert set(compact["dishes"]) == {"m1", "m2", ""}
+    assert [day["items"]["main"] for day in compact["days"][:4]] == ["m1", "m2", "m1", "m1"]
+    assert compact["days"][4]["items"]["main"]["cost"] == 9.0
+    assert [day["procurement"]["dishes"][0]["ingredients"] for day in compact["days"]] == [0, 1, 0, 0, 2]
+    assert len(compact["procurement_rows"]) == 3
+    assert len(json.dumps(compact)) < len(json.dumps(result))
+
+    assert expand_result(compact) == original
+    assert expand_result(original) is original
+
+
+def test_compact_days_for_patch_responses_and_format_parsing():
+    days = _result()["days"][1:3]
+    compact = compact_days(days)
+    assert set(compact["dishes"]) == {"m1", "m2", ""}
+    assert expand_days(compact["days"], compact["dishes"], compact["procurement_rows"]) == days
+
+    assert parse_result_format(None) == ("full", [])
+    assert parse_result_format("Compact") == ("compact", [])
+    value, errs = parse_result_format("xml")
+    assert value is None
+    assert errs[0]["code"] == "RESULT_FORMAT_INVALID"
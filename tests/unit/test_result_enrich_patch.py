@@ -0,0 +1,149 @@
+import copy
+import sqlite3
+
+from src.menu_planner.api import result_store
+from src.menu_planner.api.result_enrich import enrich_result, parse_result_changes, patch_result
+from src.menu_planner.api.result_store import ResultStore
+
+
+def _create_db(path: str) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE ingredients (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              category TEXT NOT NULL,
+              protein_group TEXT,
+              default_unit TEXT NOT NULL
+            );
+            CREATE TABLE dishes (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              role TEXT NOT NULL,
+              cuisine TEXT,
+              meat_type TEXT,
+              tags_json TEXT NOT NULL DEFAULT '[]'
+            );
+            CREATE TABLE dish_ingredients (dish_id TEXT, ingredient_id TEXT, qty REAL, unit TEXT);
+            CREATE TABLE ingredient_prices (ingredient_id TEXT, price_date TEXT, price_per_unit REAL, unit TEXT);
+            CREATE TABLE inventory (
+              ingredient_id TEXT PRIMARY KEY,
+              qty_on_hand REAL NOT NULL,
+              unit TEXT NOT NULL,
+              updated_at TEXT NOT NULL,
+              expiry_date TEXT
+            );
+            INSERT INTO ingredients VALUES ('ing_main', '主料', 'protein', NULL, 'g');
+            INSERT INTO ingredients VALUES ('ing_side', '配料', 'veg', NULL, 'g');
+            INSERT INTO dishes VALUES ('main_chicken', '雞肉主菜', 'main', 'tw', 'chicken', '[]');
+            INSERT INTO dishes VALUES ('main_pork', '豬肉主菜', 'main', 'tw', 'pork', '[]');
+            INSERT INTO dishes VALUES ('side_a', '配菜A', 'side', 'tw', NULL, '[]');
+            INSERT INTO dishes VALUES ('side_b', '配菜B', 'side', 'tw', NULL, '[]');
+            INSERT INTO dishes VALUES ('veg_a', '青菜', 'veg', 'tw', NULL, '[]');
+            INSERT INTO dishes VALUES ('soup_a', '湯', 'soup', 'tw', NULL, '[]');
+            INSERT INTO dishes VALUES ('fruit_a', '水果', 'fruit', 'tw', NULL, '[]');
+            INSERT INTO dish_ingredients VALUES ('main_chicken', 'ing_main', 100, 'g');
+            INSERT INTO dish_ingredients VALUES ('main_pork', 'ing_main', 120, 'g');
+            INSERT INTO dish_ingredients VALUES ('side_a', 'ing_side', 30, 'g');
+            INSERT INTO dish_ingredients VALUES ('side_b', 'ing_side', 30, 'g');
+            INSERT INTO dish_ingredients VALUES ('veg_a', 'ing_side', 30, 'g');
+            INSERT INTO dish_ingredients VALUES ('soup_a', 'ing_side', 30, 'g');
+            INSERT INTO dish_ingredients VALUES ('fruit_a', 'ing_side', 30, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_main', '2026-03-01', 0.02, 'g');
+            INSERT INTO ingredient_prices VALUES ('ing_side', '2026-03-01', 0.01, 'g');
+            """
+        )
+
+
+def _day(i: int, main_id: str):
+    return {
+        "date": f"2026-03-2{i}",
+        "day_index": i,
+        "items": {
+            "main": {"id": main_id},
+            "sides": [{"id": "side_a"}, {"id": "side_b"}],
+            "veg": {"id": "veg_a"},
+            "soup": {"id": "soup_a"},
+            "fruit": {"id": "fruit_a"},
+        },
+    }
+
+
+_CFG = {
+    "start_date": "2026-03-20",
+    "people": 10,
+    "hard": {"cost_range_per_person_per_day": {"min": 0, "max": 999}},
+    "weights": {"consecutive_same_meat_penalty": 5},
+    "soft": {},
+}
+
+
+def test_patch_matches_full_enrich_on_edited_day_and_next_day(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    base = enrich_result(db_path, copy.deepcopy(_CFG), {
+        "days": [_day(0, "main_chicken"), _day(1, "main_pork"), _day(2, "main_chicken"), _day(3, "main_pork")],
+        "summary": {},
+    })
+    snapshot = copy.deepcopy(base)
+
+    changes, errs = parse_result_changes({"1": {"main": ["main_chicken"]}}, len(base["days"]))
+    assert errs == []
+    patched, indices = patch_result(db_path, copy.deepcopy(_CFG), base, changes)
+
+    # 第 1 天改成雞肉：第 1、2 天都變成連續同肉，只重算這兩天；原結果不被修改
+    assert indices == [1, 2]
+    assert base == snapshot
+    assert patched["days"][3] is base["days"][3]
+
+    full_input = copy.deepcopy(base)
+    full_input["days"][1]["items"]["main"] = {"id": "main_chicken"}
+    full = enrich_result(db_path, copy.deepcopy(_CFG), full_input)
+    for i in indices:
+        for key in ("score", "score_breakdown", "score_fitness", "score_summary"):
+            assert patched["days"][i][key] == full["days"][i][key]
+    assert patched["days"][1]["score_breakdown"].get("consecutive_same_meat") == 5
+    assert patched["days"][1]["items"]["main"]["name"] == "雞肉主菜"
+    assert patched["days"][1]["procurement"]["day_total"] == full["days"][1]["procurement"]["day_total"]
+    assert patched["summary"]["total_score"] == full["summary"]["total_score"]
+
+
+def test_patch_does_not_write_catalog_weekday_rules_into_cfg(tmp_path):
+    db_path = str(tmp_path / "menu.db")
+    _create_db(db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("ALTER TABLE dishes ADD COLUMN allowed_weekdays_json TEXT")
+        conn.execute("UPDATE dishes SET allowed_weekdays_json = '[1, 3]' WHERE id = 'main_pork'")
+    conn.close()
+    base = enrich_result(db_path, copy.deepcopy(_CFG), {
+        "days": [_day(0, "main_chicken"), _day(1, "main_pork")],
+        "summary": {},
+    })
+    cfg = copy.deepcopy(_CFG)
+
+    changes, _ = parse_result_changes({"0": {"main": ["main_pork"]}}, len(base["days"]))
+    patch_result(db_path, cfg, base, changes)
+    enrich_result(db_path, cfg, copy.deepcopy(base))
+
+    assert cfg == _CFG
+
+
+def test_parse_result_changes_rejects_unknown_days_and_roles():
+    assert parse_result_changes({}, 3)[1][0]["code"] == "RESULT_PATCH_INVALID"
+    assert parse_result_changes({"5": {"main": ["m"]}}, 3)[1][0]["details"] == {"day_index": "5"}
+    assert parse_result_changes({"0": {"dessert": ["m"]}}, 3)[1][0]["details"] == {"day_index": 0, "role": "dessert"}
+    assert parse_result_changes({"0": {"side": ["s1", ""]}}, 3) == ({0: {"side": ["s1"]}}, [])
+
+
+def test_result_store_evicts_oldest_and_expires(monkeypatch):
+    store = ResultStore(max_entries=2, ttl_seconds=10)
+    first = store.put({}, {"days": [1]})
+    second = store.put({}, {"days": [2]})
+    third = store.put({}, {"days": [3]})
+    assert store.get(first) is None
+    assert store.get(second).result == {"days": [2]}
+
+    real_time = result_store.time.time
+    monkeypatch.setattr(result_store.time, "time", lambda: real_time() + 60)
+    assert store.get(third) is None
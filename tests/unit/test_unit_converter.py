@@ -0,0 +1,60 @@
+from src.menu_planner.api.procurement import build_procurement_days
+from src.menu_planner.db.repo import DishIngredient, Ingredient, PriceItem
+from src.menu_planner.db.units import UNKNOWN_UNIT_CODE, UnitConverter
+
+
+def test_unit_converter_resolves_transitive_and_inverse_paths():
+    conv = UnitConverter({("斤", "g"): 600, ("kg", "g"): 1000})
+
+    assert conv.convert_one(1, "斤", "kg") == 0.6
+    assert round(conv.convert_one(1, "kg", "斤"), 6) == round(1000 / 600, 6)
+    assert conv.convert_one(300, "g", "斤") == 0.5
+    assert conv.convert_one(5, "ml", "g") is None
+    assert conv.convert_one(5, "份", "份") == 5
+
+
+def test_unit_converter_prefers_direct_factor_over_inverse():
+    conv = UnitConverter({("g", "kg"): 0.001, ("kg", "g"): 999})
+
+    assert conv.factor("g", "kg") == 0.001
+    assert conv.factor("kg", "g") == 999
+
+
+def test_unit_converter_batch_convert_by_codes():
+    conv = UnitConverter({("斤", "g"): 600, ("kg", "g"): 1000})
+    from_codes = conv.codes(["斤", "g", "ml"])
+    to_codes = conv.codes(["kg", "kg", "kg"])
+
+    assert from_codes[2] == UNKNOWN_UNIT_CODE
+    out = conv.convert([2, 500, 1], from_codes, to_codes)
+    assert [round(x, 6) if x is not None else None for x in out] == [1.2, 0.5, None]
+
+
+def test_build_procurement_days_uses_transitive_unit_conversion():
+    result = {
+        "days": [
+            {
+                "date": "2026-03-20",
+                "day_index": 0,
+                "items": {"main": {"id": "m1", "name": "紅燒豆腐"}, "sides": [], "veg": {}, "soup": {}, "fruit": {}},
+            }
+        ]
+    }
+
+    dish_ingredients = [DishIngredient(dish_id="m1", ingredient_id="ing1", qty=1, unit="斤")]
+    ingredients = {"ing1": Ingredient(id="ing1", name="豆腐", category="protein", protein_group=None, default_unit="g")}
+    prices = {"ing1": PriceItem(ingredient_id="ing1", price_date="2026-03-01", price_per_unit=50, unit="kg")}
+
+    days = build_procurement_days(
+        result=result,
+        default_people=10,
+        people_overrides={},
+        dish_ingredients=dish_ingredients,
+        ingredients=ingredients,
+        prices=prices,
+        unit_conversions={("斤", "g"): 600, ("kg", "g"): 1000},
+    )
+
+    ing = days[0]["dishes"][0]["ingredients"][0]
+    assert ing["line_total"] == 300.0
+    assert days[0]["day_total"] == 300.0